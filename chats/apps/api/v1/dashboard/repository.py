@@ -4,12 +4,14 @@ from urllib import parse
 
 from django.conf import settings
 from django.db.models import Avg, Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django_redis import get_redis_connection
 from pendulum.parser import parse as pendulum_parse
 
 from chats.apps.accounts.models import User
 from chats.apps.dashboard.models import RoomMetrics
+from chats.apps.dashboard.rollups import get_average, split_rooms_filter
 from chats.apps.projects.models import ProjectPermission
 from chats.apps.rooms.models import Room
 
@@ -155,10 +157,19 @@ class ClosedRoomsRepository:
 
         user_agents = []
         if filters.user_request:
-            rooms_query = self.model.filter(
-                queue__sector__in=filters.user_request.manager_sectors()
-            )
-            closed_rooms = rooms_query.filter(**self.rooms_filter).count()
+            manager_sectors = filters.user_request.manager_sectors()
+            rooms_query = self.model.filter(queue__sector__in=manager_sectors)
+
+            split = split_rooms_filter(self.rooms_filter, "ended_at")
+            if split is None:
+                closed_rooms = rooms_query.filter(**self.rooms_filter).count()
+            else:
+                closed_rooms = (
+                    split.rollups.filter(sector__in=manager_sectors).aggregate(
+                        closed_rooms=Coalesce(Sum("closed_rooms"), 0)
+                    )["closed_rooms"]
+                    + rooms_query.filter(**split.raw_filter).count()
+                )
             user_agents = [ClosedRoomData(closed_rooms=closed_rooms)]
             return user_agents
 
@@ -209,13 +220,25 @@ class TransferCountRepository:
 
         transfer_count = []
         if filters.user_request:
-            rooms_query = self.model.filter(
-                queue__sector__in=filters.user_request.manager_sectors()
-            )
-
-            transfer_metric = rooms_query.filter(**self.rooms_filter).aggregate(
-                transfer_count=Sum("metric__transfer_count")
-            )["transfer_count"]
+            manager_sectors = filters.user_request.manager_sectors()
+            rooms_query = self.model.filter(queue__sector__in=manager_sectors)
+
+            split = split_rooms_filter(self.rooms_filter, "created_on")
+            if split is None:
+                transfer_metric = rooms_query.filter(**self.rooms_filter).aggregate(
+                    transfer_count=Sum("metric__transfer_count")
+                )["transfer_count"]
+            else:
+                transfer_metric = split.rollups.filter(
+                    sector__in=manager_sectors
+                ).aggregate(transfer_count=Coalesce(Sum("transfer_count"), 0))[
+                    "transfer_count"
+                ] + (
+                    rooms_query.filter(**split.raw_filter).aggregate(
+                        transfer_count=Sum("metric__transfer_count")
+                    )["transfer_count"]
+                    or 0
+                )
             if transfer_metric is None:
                 transfer_metric = 0
 
@@ -319,10 +342,21 @@ class ActiveChatsRepository:
         active_rooms = []
 
         if filters.user_request:
-            rooms_query = self.model.filter(
-                queue__sector__in=filters.user_request.manager_sectors()
-            )
-            active_chats_count = rooms_query.filter(**self.rooms_filter).count()
+            manager_sectors = filters.user_request.manager_sectors()
+            rooms_query = self.model.filter(queue__sector__in=manager_sectors)
+
+            # Only date ranges count closed rooms, which are rolled up,
+            # currently active rooms are always counted from rooms
+            split = split_rooms_filter(self.rooms_filter, "created_on")
+            if split is None:
+                active_chats_count = rooms_query.filter(**self.rooms_filter).count()
+            else:
+                active_chats_count = (
+                    split.rollups.filter(sector__in=manager_sectors).aggregate(
+                        closed_rooms=Coalesce(Sum("closed_assigned_rooms"), 0)
+                    )["closed_rooms"]
+                    + rooms_query.filter(**split.raw_filter).count()
+                )
             active_rooms = [ActiveRoomData(active_rooms=active_chats_count)]
             return active_rooms
 
@@ -330,6 +364,11 @@ class ActiveChatsRepository:
 
 
 class SectorRepository:
+    ROLLUP_DIVISION_LEVELS = {
+        "room__queue__sector": "sector",
+        "room__queue": "queue",
+    }
+
     def __init__(self) -> None:
         self.model = RoomMetrics.objects.filter(
             room__queue__is_deleted=False,
@@ -376,9 +415,14 @@ class SectorRepository:
         self._filter_sector(filters)
         self._filter_agents(filters)
 
-        room_metric_query = self.model.filter(
-            room__queue__sector__in=filters.user_request.manager_sectors()
-        )
+        manager_sectors = filters.user_request.manager_sectors()
+        room_metric_query = self.model.filter(room__queue__sector__in=manager_sectors)
+
+        split = split_rooms_filter(self.rooms_filter, "created_on", prefix="room__")
+        if split is not None:
+            return self._division_data_from_rollups(
+                split, room_metric_query, manager_sectors
+            )
 
         sector_query = (
             room_metric_query.filter(**self.rooms_filter)  # date, project or sector
@@ -406,6 +450,76 @@ class SectorRepository:
 
         return sectors
 
+    def _division_data_from_rollups(self, split, room_metric_query, manager_sectors):
+        rollup_division_level = self.ROLLUP_DIVISION_LEVELS[self.division_level]
+        rollups_query = (
+            split.rollups.filter(sector__in=manager_sectors)
+            .values(f"{rollup_division_level}__uuid")
+            .annotate(
+                uuid=F(f"{rollup_division_level}__uuid"),
+                name=F(f"{rollup_division_level}__name"),
+                count=Sum("metrics_count"),
+                waiting_time=Sum("waiting_time_sum"),
+                response_time=Sum("message_response_time_sum"),
+                interact_time=Sum("interaction_time_sum"),
+            )
+            .values(
+                "uuid",
+                "name",
+                "count",
+                "waiting_time",
+                "response_time",
+                "interact_time",
+            )
+        )
+        raw_query = (
+            room_metric_query.filter(**split.raw_filter)
+            .values(f"{self.division_level}__uuid")
+            .annotate(
+                uuid=F(f"{self.division_level}__uuid"),
+                name=F(f"{self.division_level}__name"),
+                count=Count("pk"),
+                waiting_time=Sum("waiting_time"),
+                response_time=Sum("message_response_time"),
+                interact_time=Sum("interaction_time"),
+            )
+            .values(
+                "uuid",
+                "name",
+                "count",
+                "waiting_time",
+                "response_time",
+                "interact_time",
+            )
+        )
+
+        totals = {}
+        for division in [*rollups_query, *raw_query]:
+            total = totals.setdefault(
+                division["uuid"],
+                {
+                    "name": division["name"],
+                    "count": 0,
+                    "waiting_time": 0,
+                    "response_time": 0,
+                    "interact_time": 0,
+                },
+            )
+            for field in ("count", "waiting_time", "response_time", "interact_time"):
+                total[field] += division[field] or 0
+
+        return [
+            Sector(
+                uuid=str(uuid),
+                name=total["name"],
+                waiting_time=get_average(total["waiting_time"], total["count"]),
+                response_time=get_average(total["response_time"], total["count"]),
+                interact_time=get_average(total["interact_time"], total["count"]),
+            )
+            for uuid, total in totals.items()
+            if total["count"]
+        ]
+
 
 class ORMRoomsDataRepository(RoomsDataRepository):
     def __init__(self) -> None:
@@ -468,9 +582,14 @@ class ORMRoomsDataRepository(RoomsDataRepository):
         waiting_time_agg = Avg("metric__waiting_time")
 
         if filters.user_request:
-            rooms_query = self.model.filter(
-                queue__sector__in=filters.user_request.manager_sectors()
-            )
+            manager_sectors = filters.user_request.manager_sectors()
+            rooms_query = self.model.filter(queue__sector__in=manager_sectors)
+
+            split = split_rooms_filter(self.rooms_filter, "created_on")
+            if split is not None:
+                return self._get_rooms_data_from_rollups(
+                    split, rooms_query, manager_sectors
+                )
 
             general_data = rooms_query.filter(**self.rooms_filter).aggregate(
                 interact_time=interact_time_agg,
@@ -479,6 +598,26 @@ class ORMRoomsDataRepository(RoomsDataRepository):
             )
             return general_data
 
+    def _get_rooms_data_from_rollups(self, split, rooms_query, manager_sectors):
+        rollups_data = split.rollups.filter(sector__in=manager_sectors).aggregate(
+            count=Coalesce(Sum("metrics_count"), 0),
+            interact_time=Coalesce(Sum("interaction_time_sum"), 0),
+            response_time=Coalesce(Sum("message_response_time_sum"), 0),
+            waiting_time=Coalesce(Sum("waiting_time_sum"), 0),
+        )
+        raw_data = rooms_query.filter(**split.raw_filter).aggregate(
+            count=Count("metric"),
+            interact_time=Coalesce(Sum("metric__interaction_time"), 0),
+            response_time=Coalesce(Sum("metric__message_response_time"), 0),
+            waiting_time=Coalesce(Sum("metric__waiting_time"), 0),
+        )
+
+        count = rollups_data["count"] + raw_data["count"]
+        return {
+            field: get_average(rollups_data[field] + raw_data[field], count)
+            for field in ("interact_time", "response_time", "waiting_time")
+        }
+
 
 class RoomsCacheRepository(CacheRepository):
     def get(self, key: str, default=None):
@@ -16,6 +16,10 @@ from chats.apps.api.v1.queues.serializers import QueueSerializer
 from chats.apps.api.v1.sectors.serializers import TagSimpleSerializer
 from chats.apps.contacts.models import Contact
 from chats.apps.dashboard.models import RoomMetrics
+from chats.apps.dashboard.utils import (
+    is_incremental_response_time_enabled,
+    track_response_time,
+)
 from chats.apps.msgs.models import Message, MessageMedia
 from chats.apps.projects.models.models import FlowStart, Project
 from chats.apps.queues.models import Queue
@@ -483,7 +487,10 @@ class RoomFlowSerializer(serializers.ModelSerializer):
                     protocol=protocol,
                     service_chat=service_chat,
                 )
-                RoomMetrics.objects.create(room=room)
+                RoomMetrics.objects.create(
+                    room=room,
+                    response_time_tracked=is_incremental_response_time_enabled(),
+                )
         else:
             room = Room.objects.create(
                 **validated_data,
@@ -493,7 +500,10 @@ class RoomFlowSerializer(serializers.ModelSerializer):
                 protocol=protocol,
                 service_chat=service_chat,
             )
-            RoomMetrics.objects.create(room=room)
+            RoomMetrics.objects.create(
+                room=room,
+                response_time_tracked=is_incremental_response_time_enabled(),
+            )
 
         if history_data:
             self.process_message_history(room, history_data)
@@ -666,6 +676,8 @@ class RoomFlowSerializer(serializers.ModelSerializer):
             if all_media:
                 MessageMedia.objects.bulk_create(all_media)
 
+            track_response_time(room, created_messages)
+
             room.notify_room("create")
 
             if room.user is None and room.contact and any_incoming_msgs:
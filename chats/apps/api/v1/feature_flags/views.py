@@ -3,11 +3,13 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 from weni.feature_flags.services import FeatureFlagsService
+from weni.feature_flags.views import FeatureFlagsWebhookView
 
 from chats.apps.api.v1.feature_flags.serializers import (
     FeatureFlagsQueryParamsSerializer,
 )
 from chats.apps.api.v1.permissions import ProjectQueryParamPermission
+from chats.apps.feature_flags.cache import invalidate_feature_flags_cache
 
 
 class FeatureFlagsViewSet(GenericViewSet):
@@ -42,3 +44,18 @@ class FeatureFlagsViewSet(GenericViewSet):
         )
 
         return Response({"active_features": active_features}, status=status.HTTP_200_OK)
+
+
+class FeatureFlagsDefinitionsWebhookView(FeatureFlagsWebhookView):
+    """
+    Growthbook webhook that, after the feature definitions are refreshed,
+    invalidates the cached feature flags evaluations.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+
+        if 200 <= response.status_code < 300:
+            invalidate_feature_flags_cache()
+
+        return response
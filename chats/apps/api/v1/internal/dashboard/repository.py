@@ -9,7 +9,9 @@ from django.db.models import (
     Case,
     Count,
     Exists,
+    ExpressionWrapper,
     F,
+    FloatField,
     IntegerField,
     OuterRef,
     Q,
@@ -18,7 +20,7 @@ from django.db.models import (
     Value,
     When,
 )
-from django.db.models.functions import Coalesce, Concat, JSONObject
+from django.db.models.functions import Cast, Coalesce, Concat, JSONObject, NullIf
 from django.utils import timezone
 from pendulum.parser import parse as pendulum_parse
 
@@ -34,6 +36,7 @@ from chats.apps.projects.dates import parse_date_with_timezone
 from chats.apps.projects.models import ProjectPermission
 from chats.apps.projects.models.models import CustomStatus, Project
 from chats.apps.csat.models import CSATSurvey
+from chats.apps.dashboard.rollups import split_rooms_filter
 from chats.apps.rooms.models import Room
 
 
@@ -41,6 +44,83 @@ class AgentRepository:
     def __init__(self):
         self.model = User.objects
 
+    def _get_closed_rooms_annotations(self, closed_rooms: dict, rooms_filter: dict):
+        split = split_rooms_filter(
+            {**closed_rooms, **rooms_filter}, "rooms__ended_at", prefix="rooms__"
+        )
+        if split is None:
+            return {
+                "closed": Count(
+                    "rooms__uuid",
+                    distinct=True,
+                    filter=Q(**closed_rooms, **rooms_filter),
+                ),
+                "avg_first_response_time": Avg(
+                    "rooms__metric__first_response_time",
+                    filter=Q(**closed_rooms, **rooms_filter)
+                    & Q(rooms__metric__first_response_time__gt=0),
+                ),
+                "avg_message_response_time": Avg(
+                    "rooms__metric__message_response_time",
+                    filter=Q(**closed_rooms, **rooms_filter)
+                    & Q(rooms__metric__message_response_time__gt=0),
+                ),
+                "avg_interaction_time": Avg(
+                    "rooms__metric__interaction_time",
+                    filter=Q(**closed_rooms, **rooms_filter)
+                    & Q(rooms__metric__interaction_time__gt=0),
+                ),
+            }
+
+        # Correlated subqueries keep the rolled up and the raw parts
+        # from being multiplied by the joins of the agents query
+        rollups = (
+            split.rollups.filter(agent=OuterRef("email")).order_by().values("agent")
+        )
+        raw_rooms = (
+            Room.objects.filter(
+                user=OuterRef("email"),
+                **{
+                    lookup.replace("rooms__", "", 1): value
+                    for lookup, value in split.raw_filter.items()
+                },
+            )
+            .order_by()
+            .values("user")
+        )
+
+        def rollup_total(field):
+            return Coalesce(
+                Subquery(rollups.annotate(total=Sum(field)).values("total")), 0
+            )
+
+        def raw_total(aggregate):
+            return Coalesce(
+                Subquery(raw_rooms.annotate(total=aggregate).values("total")), 0
+            )
+
+        annotations = {
+            "closed": rollup_total("closed_rooms") + raw_total(Count("pk")),
+        }
+        for metric in (
+            "first_response_time",
+            "message_response_time",
+            "interaction_time",
+        ):
+            positive = Q(**{f"metric__{metric}__gt": 0})
+            total = rollup_total(f"closed_{metric}_sum") + raw_total(
+                Sum(f"metric__{metric}", filter=positive)
+            )
+            count = rollup_total(f"closed_{metric}_count") + raw_total(
+                Count("metric", filter=positive)
+            )
+            annotations[f"avg_{metric}"] = ExpressionWrapper(
+                Cast(total, FloatField()) / NullIf(count, 0),
+                output_field=FloatField(),
+            )
+
+        return annotations
+
     def get_agents_data(self, filters: Filters, project, include_removed: bool = False):
         tz = project.timezone
         initial_datetime = (
@@ -217,31 +297,12 @@ class AgentRepository:
                     default=Value(3),
                     output_field=IntegerField(),
                 ),
-                closed=Count(
-                    "rooms__uuid",
-                    distinct=True,
-                    filter=Q(**closed_rooms, **rooms_filter),
-                ),
                 opened=Count(
                     "rooms__uuid",
                     distinct=True,
                     filter=Q(**opened_rooms, **rooms_filter),
                 ),
-                avg_first_response_time=Avg(
-                    "rooms__metric__first_response_time",
-                    filter=Q(**closed_rooms, **rooms_filter)
-                    & Q(rooms__metric__first_response_time__gt=0),
-                ),
-                avg_message_response_time=Avg(
-                    "rooms__metric__message_response_time",
-                    filter=Q(**closed_rooms, **rooms_filter)
-                    & Q(rooms__metric__message_response_time__gt=0),
-                ),
-                avg_interaction_time=Avg(
-                    "rooms__metric__interaction_time",
-                    filter=Q(**closed_rooms, **rooms_filter)
-                    & Q(rooms__metric__interaction_time__gt=0),
-                ),
+                **self._get_closed_rooms_annotations(closed_rooms, rooms_filter),
                 custom_status=custom_status_subquery,
                 # time_in_service_order: cálculo desativado (código comentado acima)
             )
@@ -23,3 +23,174 @@ ws_messages_received_total = Counter(
 ws_connection_duration = Histogram(
     "ws_connection_duration_seconds", "WebSocket connection duration", ["consumer"]
 )
+
+routing_triggers_total = Counter(
+    "routing_triggers_total", "Routing triggers received by the routing scheduler"
+)
+
+routing_triggers_coalesced_total = Counter(
+    "routing_triggers_coalesced_total",
+    "Routing triggers coalesced with an already pending trigger",
+)
+
+routing_passes_total = Counter(
+    "routing_passes_total", "Sector routing passes executed by the routing scheduler"
+)
+
+routing_trigger_to_assignment_seconds = Histogram(
+    "routing_trigger_to_assignment_seconds",
+    "Time between the oldest pending routing trigger and the end of its routing pass",
+)
+
+feature_flag_cache_hits_total = Counter(
+    "feature_flag_cache_hits_total",
+    "Feature flag evaluations served from cache",
+    ["layer"],
+)
+
+feature_flag_cache_misses_total = Counter(
+    "feature_flag_cache_misses_total",
+    "Feature flag evaluations not found in cache",
+)
+
+ws_outbox_events_enqueued_total = Counter(
+    "ws_outbox_events_enqueued_total",
+    "Channels group events enqueued in a notification outbox",
+)
+
+ws_outbox_events_deduplicated_total = Counter(
+    "ws_outbox_events_deduplicated_total",
+    "Channels group events dropped as duplicates of an already enqueued event",
+)
+
+ws_outbox_flush_seconds = Histogram(
+    "ws_outbox_flush_seconds",
+    "Time spent serializing and sending the events of a notification outbox",
+)
+
+ws_sender_sent_total = Counter(
+    "ws_sender_sent_total", "Messages delivered by the background websocket sender"
+)
+
+ws_sender_retries_total = Counter(
+    "ws_sender_retries_total", "Channels group sends retried after a failure"
+)
+
+ws_sender_dropped_total = Counter(
+    "ws_sender_dropped_total",
+    "Messages dropped by the background websocket sender",
+    ["reason"],
+)
+
+ws_sender_pending = Gauge(
+    "ws_sender_pending",
+    "Messages pending in the background websocket sender",
+    multiprocess_mode="livesum",
+)
+
+ws_lifecycle_waiting = Gauge(
+    "ws_lifecycle_waiting",
+    "Agent websocket lifecycle calls waiting for a database slot",
+    multiprocess_mode="livesum",
+)
+
+ws_lifecycle_rejected_total = Counter(
+    "ws_lifecycle_rejected_total",
+    "Agent websocket connects refused because no database slot was free in time",
+)
+
+last_seen_flush_size = Histogram(
+    "last_seen_flush_size",
+    "Agent heartbeats written to the database per last_seen flush",
+    buckets=[0, 10, 50, 100, 500, 1000, 5000, 10000, 50000],
+)
+
+last_seen_flush_lag_seconds = Histogram(
+    "last_seen_flush_lag_seconds",
+    "Time between the oldest pending agent heartbeat and its last_seen flush",
+)
+
+eda_publish_total = Counter(
+    "eda_publish_total",
+    "Messages settled by the EDA publisher, confirmed by the broker or spooled",
+    ["result"],
+)
+
+eda_publish_confirm_seconds = Histogram(
+    "eda_publish_confirm_seconds",
+    "Time between queueing an EDA message and its broker confirm",
+)
+
+eda_publish_batch_size = Histogram(
+    "eda_publish_batch_size",
+    "Messages published by the EDA publisher per batch of confirms",
+    buckets=[1, 5, 10, 25, 50, 100, 250, 500],
+)
+
+eda_publisher_pending = Gauge(
+    "eda_publisher_pending",
+    "Messages queued in the EDA publisher",
+    multiprocess_mode="livesum",
+)
+
+eda_consumer_messages_total = Counter(
+    "eda_consumer_messages_total",
+    "Messages settled by the EDA consumer runtime",
+    ["queue", "result"],
+)
+
+eda_consumer_handler_seconds = Histogram(
+    "eda_consumer_handler_seconds",
+    "Time spent by the EDA consumers handling a message",
+    ["queue"],
+)
+
+eda_consumer_lag_seconds = Histogram(
+    "eda_consumer_lag_seconds",
+    "Time between the delivery of an EDA message and the start of its handling",
+    ["queue"],
+)
+
+eda_consumer_queue_depth = Gauge(
+    "eda_consumer_queue_depth",
+    "Messages ready in the broker queues of the EDA consumers",
+    ["queue"],
+    multiprocess_mode="livemax",
+)
+
+message_status_batch_size = Histogram(
+    "message_status_batch_size",
+    "Message statuses applied per batch",
+    buckets=[0, 1, 10, 50, 100, 250, 500, 1000, 2500],
+)
+
+message_status_total = Counter(
+    "message_status_total",
+    "Message statuses handled by the batched ingestion",
+    ["result"],
+)
+
+webhook_deliveries_total = Counter(
+    "webhook_deliveries_total",
+    "Room callbacks handled by the webhook worker",
+    ["project", "result"],
+)
+
+webhook_delivery_seconds = Histogram(
+    "webhook_delivery_seconds",
+    "Time between enqueueing a room callback and its delivery",
+    ["project"],
+    buckets=[0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900],
+)
+
+webhook_circuit_opened_total = Counter(
+    "webhook_circuit_opened_total",
+    "Times the webhook worker paused a failing callback destination",
+)
+
+report_peak_memory_bytes = Histogram(
+    "report_peak_memory_bytes",
+    "Peak memory allocated while generating a custom report",
+    ["file_type"],
+    buckets=[2**power for power in range(20, 34)],
+)
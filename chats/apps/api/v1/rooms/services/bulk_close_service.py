@@ -10,6 +10,7 @@ from chats.apps.queues.models import Queue
 from chats.apps.queues.utils import start_queue_priority_routing
 from chats.apps.rooms.models import Room
 from chats.apps.rooms.views import close_room
+from chats.utils.websockets import notification_outbox
 
 logger = logging.getLogger(__name__)
 
@@ -115,26 +116,28 @@ class BulkCloseService:
 
             affected_queue_ids = set()
 
-            for room in batch:
-                try:
-                    tags = room_tags_map.get(str(room.uuid), [])
-                    room.close(tags=tags, end_by=end_by, closed_by=closed_by)
-                    result.add_success()
-
-                    # Track queue for routing after the batch
-                    if room.queue_id:
-                        affected_queue_ids.add(room.queue_id)
-
-                except Exception as e:
-                    error_msg = f"Room {room.uuid}: {str(e)}"
-                    result.add_failure(room.uuid, error_msg)
-                    logger.warning(f"[BULK_CLOSE] Failed to close room: {error_msg}")
-                    continue
-
-                # Post-close operations (notifications, billing, metrics).
-                # Failures here are logged but do NOT count as close failures
-                # since the room is already closed in the database.
-                self._post_close(room)
+            # Notifications of the whole batch are flushed together
+            with notification_outbox():
+                for room in batch:
+                    try:
+                        tags = room_tags_map.get(str(room.uuid), [])
+                        room.close(tags=tags, end_by=end_by, closed_by=closed_by)
+                        result.add_success()
+
+                        # Track queue for routing after the batch
+                        if room.queue_id:
+                            affected_queue_ids.add(room.queue_id)
+
+                    except Exception as e:
+                        error_msg = f"Room {room.uuid}: {str(e)}"
+                        result.add_failure(room.uuid, error_msg)
+                        logger.warning(f"[BULK_CLOSE] Failed to close room: {error_msg}")
+                        continue
+
+                    # Post-close operations (notifications, billing, metrics).
+                    # Failures here are logged but do NOT count as close failures
+                    # since the room is already closed in the database.
+                    self._post_close(room)
 
             # Trigger queue priority routing once per unique queue
             for queue_id in affected_queue_ids:
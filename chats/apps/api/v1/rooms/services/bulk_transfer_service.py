@@ -17,6 +17,7 @@ from chats.apps.rooms.flows_ticketer_service import change_ticketer_for_room
 from chats.apps.rooms.models import Room
 from chats.apps.rooms.utils import create_transfer_json
 from chats.apps.rooms.views import create_room_feedback_message
+from chats.utils.websockets import notification_outbox
 
 
 logger = logging.getLogger(__name__)
@@ -412,24 +413,26 @@ class BulkTransferService:
     def _process_batch(self, batch, result, user, queue, user_request):
         affected_queue_ids = set()
 
-        for room in batch:
-            try:
-                old_queue_id = room.queue_id
-                with transaction.atomic():
-                    self._transfer_room(room, user, queue, user_request)
-                result.add_success()
-
-                if old_queue_id:
-                    affected_queue_ids.add(old_queue_id)
-                if room.queue_id:
-                    affected_queue_ids.add(room.queue_id)
-
-            except Exception as e:
-                error_msg = f"Room {room.uuid}: {str(e)}"
-                result.add_failure(room.uuid, error_msg)
-                logger.warning(
-                    f"[BULK_TRANSFER] Failed to transfer room: {error_msg}"
-                )
+        # Notifications of the whole batch are flushed together
+        with notification_outbox():
+            for room in batch:
+                try:
+                    old_queue_id = room.queue_id
+                    with transaction.atomic():
+                        self._transfer_room(room, user, queue, user_request)
+                    result.add_success()
+
+                    if old_queue_id:
+                        affected_queue_ids.add(old_queue_id)
+                    if room.queue_id:
+                        affected_queue_ids.add(room.queue_id)
+
+                except Exception as e:
+                    error_msg = f"Room {room.uuid}: {str(e)}"
+                    result.add_failure(room.uuid, error_msg)
+                    logger.warning(
+                        f"[BULK_TRANSFER] Failed to transfer room: {error_msg}"
+                    )
 
         for queue_id in affected_queue_ids:
             try:
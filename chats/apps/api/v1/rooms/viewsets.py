@@ -30,7 +30,6 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
 from sentry_sdk import capture_exception
-from weni.feature_flags.shortcuts import is_feature_active
 
 from chats.apps.accounts.authentication.drf.authorization import (
     ProjectAdminAuthentication,
@@ -83,6 +82,7 @@ from chats.apps.api.v1.rooms.services.rooms_count_by_queue_service import (
 )
 from chats.apps.dashboard.models import ReportStatus, RoomMetrics
 from chats.apps.dashboard.utils import calculate_last_queue_waiting_time
+from chats.apps.feature_flags.cache import is_feature_active
 from chats.apps.msgs.models import Message
 from chats.apps.projects.models.models import Project, ProjectPermission
 from chats.apps.queues.models import Queue
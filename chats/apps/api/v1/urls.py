@@ -1,5 +1,4 @@
 from django.urls import include, path
-from weni.feature_flags.views import FeatureFlagsWebhookView
 
 from chats.apps.ai_features.audio_transcription.views import (
     AudioTranscriptionFeedbackTagsView,
@@ -21,6 +20,7 @@ from chats.apps.api.v1.dashboard.viewsets import (
     ModelFieldsViewSet,
     ReportFieldsValidatorViewSet,
 )
+from chats.apps.api.v1.feature_flags.views import FeatureFlagsDefinitionsWebhookView
 from chats.apps.api.v1.human_support.views import HumanSupportNexusSettingsView
 from chats.apps.api.v1.internal.agents.views import AgentDisconnectView
 from chats.apps.api.v1.internal.ai_features.views import FeaturePromptsView
@@ -84,7 +84,7 @@ urlpatterns = [
     ),
     path(
         "feature_flags/growthbook_webhook/",
-        FeatureFlagsWebhookView.as_view(),
+        FeatureFlagsDefinitionsWebhookView.as_view(),
         name="feature_flags_webhook",
     ),
     path(
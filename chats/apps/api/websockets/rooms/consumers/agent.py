@@ -19,6 +19,7 @@ from chats.apps.api.v1.prometheus.metrics import (
     ws_disconnects_total,
     ws_messages_received_total,
 )
+from chats.apps.api.websockets.rooms import lifecycle
 from chats.apps.msgs.exceptions import MessageCreateError
 from chats.apps.msgs.usecases.create_agent_message import (
     CreateAgentMessageUseCase,
@@ -28,9 +29,14 @@ from chats.apps.history.filters.rooms_filter import (
     get_history_rooms_queryset_by_contact,
 )
 from chats.apps.projects.models.models import ProjectPermission
+from chats.apps.projects.usecases.last_seen_heartbeats import (
+    is_heartbeat_index_enabled,
+    record_heartbeat,
+)
 from chats.apps.projects.usecases.status_service import InServiceStatusService
 from chats.apps.rooms.models import Room
-from chats.core.cache import CacheClient
+from chats.core.cache import AsyncCacheClient
+from chats.utils.ws_sender import async_group_send
 
 logger = logging.getLogger(__name__)
 
@@ -58,7 +64,7 @@ class AgentRoomConsumer(AsyncJsonWebsocketConsumer):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.cache = CacheClient()
+        self.cache = AsyncCacheClient()
 
     async def connect(self, *args, **kwargs):
         """
@@ -86,6 +92,8 @@ class AgentRoomConsumer(AsyncJsonWebsocketConsumer):
         if self.user.is_anonymous or close is True or self.project is None:
             # Reject the connection
             await self.close()
+        elif lifecycle.is_lifecycle_service_enabled():
+            await self.connect_with_lifecycle_service()
         else:
             # Accept the connection
             try:
@@ -109,6 +117,60 @@ class AgentRoomConsumer(AsyncJsonWebsocketConsumer):
                         self.ping_timeout_checker()
                     )
 
+    async def connect_with_lifecycle_service(self):
+        """
+        Load the connection with a single database call, refusing it when
+        the lifecycle service is saturated.
+        """
+        try:
+            connection = await lifecycle.lifecycle_executor.run(
+                lifecycle.load_agent_connection,
+                self.user,
+                self.project,
+                timeout=settings.WS_AGENT_LIFECYCLE_ACQUIRE_TIMEOUT,
+            )
+        except ObjectDoesNotExist:
+            await self.close()
+            return
+        except lifecycle.LifecycleBusyError:
+            logger.warning(
+                "Agent connection lifecycle is busy, refusing connection of %s",
+                self.user.email,
+            )
+            # Try Again Later
+            await self.close(code=1013)
+            return
+
+        self.permission = connection.permission
+        self.queues = connection.queue_ids
+        await self.accept()
+        for queue in self.queues:
+            await self.join({"name": "queue", "id": str(queue)})
+        await self.load_user()
+        self.last_ping = timezone.now()
+        self._last_seen_updated_at = None
+
+        if connection.ping_timeout_enabled:
+            self._last_seen_updated_at = connection.permission.last_seen
+            self.ping_timeout_task = asyncio.create_task(self.ping_timeout_checker())
+
+    async def set_offline(self):
+        """
+        Set the agent OFFLINE and log the change.
+        """
+        if lifecycle.is_lifecycle_service_enabled():
+            await lifecycle.lifecycle_executor.run(
+                lifecycle.set_agent_status,
+                self.permission,
+                self.user,
+                ProjectPermission.STATUS_OFFLINE,
+            )
+            return
+
+        await self.set_user_status(ProjectPermission.STATUS_OFFLINE)
+        await self.finalize_in_service_if_needed()
+        await self.log_status_change(ProjectPermission.STATUS_OFFLINE)
+
     async def disconnect(self, *args, **kwargs):
         # Cancel the ping timeout checker task
         if hasattr(self, "ping_timeout_task") and not self.ping_timeout_task.done():
@@ -152,9 +214,7 @@ class AgentRoomConsumer(AsyncJsonWebsocketConsumer):
                         "User %s has no other active connections, setting status to OFFLINE",
                         self.user.email,
                     )
-                    await self.set_user_status("OFFLINE")
-                    await self.finalize_in_service_if_needed()
-                    await self.log_status_change("OFFLINE")
+                    await self.set_offline()
                 else:
                     logger.info(
                         "User %s has other active connections, not setting status to OFFLINE",
@@ -166,25 +226,19 @@ class AgentRoomConsumer(AsyncJsonWebsocketConsumer):
                     "WS Connection Check is disabled, setting %s status to OFFLINE",
                     self.user.email,
                 )
-                await self.set_user_status("OFFLINE")
-                await self.finalize_in_service_if_needed()
-                await self.log_status_change("OFFLINE")
+                await self.set_offline()
 
     async def set_connection_check_response(self, connection_id: str, response: bool):
-        self.cache.set(
+        await self.cache.set(
             f"{CONNECTION_CHECK_CACHE_PREFIX}{connection_id}",
             str(response),
             ex=CONNECTION_CHECK_CACHE_TTL,
         )
 
     async def get_connection_check_response(self):
-        key = f"{CONNECTION_CHECK_CACHE_PREFIX}{self.connection_id}"
-        response = self.cache.get(key)
-
-        if response is not None:
-            self.cache.delete(key)
-
-        return response
+        return await self.cache.get_and_delete(
+            f"{CONNECTION_CHECK_CACHE_PREFIX}{self.connection_id}"
+        )
 
     async def receive_json(self, payload):
         """
@@ -365,7 +419,7 @@ class AgentRoomConsumer(AsyncJsonWebsocketConsumer):
                     event["content"].get("user_email"),
                 )
                 # Send response through the channel layer
-                await self.channel_layer.group_send(
+                await async_group_send(
                     f"permission_{self.permission.pk}",
                     {
                         "type": "notify",
@@ -375,6 +429,7 @@ class AgentRoomConsumer(AsyncJsonWebsocketConsumer):
                             "user_email": self.user.email,
                         },
                     },
+                    channel_layer=self.channel_layer,
                 )
         elif event.get("action") == "connection_check_response":
             # Handle the response by setting the flag
@@ -449,6 +504,10 @@ class AgentRoomConsumer(AsyncJsonWebsocketConsumer):
     def _update_last_seen_db(self):
         """Update the last_seen timestamp on the permission in database."""
         self.permission.last_seen = timezone.now()
+        if is_heartbeat_index_enabled() and record_heartbeat(
+            self.permission.project_id, self.permission.pk, self.permission.last_seen
+        ):
+            return
         self.permission.save(update_fields=["last_seen"])
 
     @database_sync_to_async
@@ -475,7 +534,7 @@ class AgentRoomConsumer(AsyncJsonWebsocketConsumer):
         group_name = f"permission_{self.permission.pk}"
 
         # Send a check message to the group
-        await self.channel_layer.group_send(
+        await async_group_send(
             group_name,
             {
                 "type": "notify",
@@ -485,6 +544,7 @@ class AgentRoomConsumer(AsyncJsonWebsocketConsumer):
                     "user_email": self.user.email,
                 },
             },
+            channel_layer=self.channel_layer,
         )
 
         logger.info(
@@ -578,14 +638,8 @@ class AgentRoomConsumer(AsyncJsonWebsocketConsumer):
                         f"Setting status to OFFLINE and closing connection."
                     )
 
-                    # Set user status to OFFLINE
-                    await self.set_user_status(ProjectPermission.STATUS_OFFLINE)
-
-                    # Finalize any in-service status
-                    await self.finalize_in_service_if_needed()
-
-                    # Log the status change
-                    await self.log_status_change(ProjectPermission.STATUS_OFFLINE)
+                    # Set user status to OFFLINE and log the change
+                    await self.set_offline()
 
                     # Close the WebSocket connection
                     await self.close(code=1000)
@@ -0,0 +1,161 @@
+"""
+Connection lifecycle of the agent websocket consumer.
+
+With settings.WS_AGENT_LIFECYCLE_SERVICE enabled, `AgentRoomConsumer` does the
+database work of a connect, and of going offline, in a single call each
+instead of one thread hop per step:
+
+- `load_agent_connection` loads the permission with its project, the queues
+  to listen to and the ping timeout feature flag (and refreshes last_seen
+  when it is enabled);
+- `set_agent_status` writes the status with one UPDATE, notifies the agent
+  and enqueues the status log.
+
+Those calls run through `lifecycle_executor`, which lets at most
+WS_AGENT_LIFECYCLE_MAX_CONCURRENCY of them use the thread pool at a time, per
+process. Connects that wait longer than WS_AGENT_LIFECYCLE_ACQUIRE_TIMEOUT
+seconds for a slot are refused (`LifecycleBusyError`) so clients retry later,
+instead of reconnect storms exhausting the thread pool and the database
+connections. Status updates always wait for their slot.
+"""
+
+import asyncio
+import weakref
+from dataclasses import dataclass
+from typing import Optional, Set
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from weni.feature_flags.shortcuts import is_feature_active_for_attributes
+
+from chats.apps.api.v1.prometheus.metrics import (
+    ws_lifecycle_rejected_total,
+    ws_lifecycle_waiting,
+)
+from chats.apps.projects.models.models import ProjectPermission
+from chats.apps.projects.usecases.last_seen_heartbeats import (
+    is_heartbeat_index_enabled,
+    record_heartbeat,
+)
+
+
+class LifecycleBusyError(Exception):
+    pass
+
+
+@dataclass
+class AgentConnection:
+    permission: ProjectPermission
+    queue_ids: Set
+    ping_timeout_enabled: bool
+
+
+class BoundedExecutor:
+    """
+    Run sync database calls in the thread pool, at most `max_concurrency`
+    at a time per event loop.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None):
+        self._max_concurrency = max_concurrency
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(
+                self._max_concurrency or settings.WS_AGENT_LIFECYCLE_MAX_CONCURRENCY
+            )
+        return semaphore
+
+    async def run(self, func, *args, timeout: Optional[float] = None):
+        """
+        Run `func(*args)` once a slot is free. Raises LifecycleBusyError when
+        no slot was freed within `timeout` seconds (None waits forever).
+        """
+        semaphore = self._get_semaphore()
+
+        ws_lifecycle_waiting.inc()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            ws_lifecycle_rejected_total.inc()
+            raise LifecycleBusyError()
+        finally:
+            ws_lifecycle_waiting.dec()
+
+        try:
+            return await database_sync_to_async(func)(*args)
+        finally:
+            semaphore.release()
+
+
+lifecycle_executor = BoundedExecutor()
+
+
+def is_lifecycle_service_enabled() -> bool:
+    return settings.WS_AGENT_LIFECYCLE_SERVICE
+
+
+def get_queue_ids(permission: ProjectPermission) -> Set:
+    """
+    Same queues as `ProjectPermission.queue_ids`, with one query.
+    """
+    if permission.is_admin:
+        return set(permission.queue_ids)
+
+    sector_manager_queues = permission.sector_authorizations.filter(
+        sector__queues__isnull=False
+    ).values_list("sector__queues__uuid", flat=True)
+    queue_agent_queues = permission.queue_authorizations.exclude(role=2).values_list(
+        "queue", flat=True
+    )
+    return set(sector_manager_queues.union(queue_agent_queues))
+
+
+def load_agent_connection(user, project_uuid: str) -> AgentConnection:
+    """
+    Everything the consumer needs to accept an agent connection.
+    Raises ProjectPermission.DoesNotExist when the user has no permission.
+    """
+    permission = ProjectPermission.objects.select_related("project").get(
+        user=user, project__uuid=project_uuid
+    )
+
+    ping_timeout_enabled = is_feature_active_for_attributes(
+        settings.WS_PING_TIMEOUT_FEATURE_FLAG_KEY,
+        {"projectUUID": str(permission.project.uuid)},
+    )
+    if ping_timeout_enabled:
+        permission.last_seen = timezone.now()
+        if not is_heartbeat_index_enabled() or not record_heartbeat(
+            permission.project_id, permission.pk, permission.last_seen
+        ):
+            ProjectPermission.objects.filter(pk=permission.pk).update(
+                last_seen=permission.last_seen
+            )
+
+    return AgentConnection(
+        permission=permission,
+        queue_ids=get_queue_ids(permission),
+        ping_timeout_enabled=ping_timeout_enabled,
+    )
+
+
+def set_agent_status(permission: ProjectPermission, user, status: str) -> None:
+    """
+    Set the agent status, notify the agent and log the change.
+    """
+    from chats.apps.projects.tasks import log_agent_status_change
+
+    ProjectPermission.objects.filter(pk=permission.pk).update(status=status)
+    permission.status = status
+    permission.notify_user("update", "system")
+
+    log_agent_status_change.delay(
+        agent_email=user.email,
+        project_uuid=str(permission.project.uuid),
+        status=status,
+    )
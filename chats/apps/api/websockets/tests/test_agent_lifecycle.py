@@ -0,0 +1,138 @@
+from unittest.mock import patch
+
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TestCase, override_settings
+
+from chats.apps.accounts.authentication.channels.middleware import TokenAuthMiddleware
+from chats.apps.api.utils import create_user_and_token
+from chats.apps.api.websockets.rooms.lifecycle import (
+    BoundedExecutor,
+    LifecycleBusyError,
+    load_agent_connection,
+    set_agent_status,
+)
+from chats.apps.api.websockets.rooms.routing import websocket_urlpatterns
+from chats.apps.projects.models import Project, ProjectPermission
+from chats.apps.queues.models import QueueAuthorization
+from chats.apps.sectors.models import Sector, SectorAuthorization
+
+
+class AgentLifecycleTestCase(TestCase):
+    def setUp(self):
+        self.user, self.token = create_user_and_token(nickname="agent")
+        self.project = Project.objects.create(name="Test Lifecycle Project")
+        self.permission = self.project.permissions.create(
+            user=self.user, role=ProjectPermission.ROLE_ATTENDANT
+        )
+        self.sector = Sector.objects.create(
+            name="Managed Sector",
+            project=self.project,
+            rooms_limit=3,
+            work_start="07:00",
+            work_end="17:00",
+        )
+        SectorAuthorization.objects.create(
+            sector=self.sector, permission=self.permission, role=1
+        )
+        self.sector.queues.create(name="Managed queue 1")
+        self.sector.queues.create(name="Managed queue 2")
+        other_sector = Sector.objects.create(
+            name="Other Sector",
+            project=self.project,
+            rooms_limit=3,
+            work_start="07:00",
+            work_end="17:00",
+        )
+        QueueAuthorization.objects.create(
+            queue=other_sector.queues.create(name="Agent queue"),
+            permission=self.permission,
+            role=1,
+        )
+
+    @patch(
+        "chats.apps.api.websockets.rooms.lifecycle.is_feature_active_for_attributes",
+        return_value=False,
+    )
+    def test_load_agent_connection(self, mock_is_feature_active_for_attributes):
+        # The permission with its project, then the queues
+        with self.assertNumQueries(2):
+            connection = load_agent_connection(self.user, str(self.project.uuid))
+
+        self.assertEqual(connection.permission, self.permission)
+        self.assertFalse(connection.ping_timeout_enabled)
+        self.assertEqual(connection.queue_ids, set(self.permission.queue_ids))
+        self.assertEqual(len(connection.queue_ids), 3)
+
+    @patch(
+        "chats.apps.api.websockets.rooms.lifecycle.is_feature_active_for_attributes",
+        return_value=True,
+    )
+    def test_load_agent_connection_updates_last_seen(
+        self, mock_is_feature_active_for_attributes
+    ):
+        connection = load_agent_connection(self.user, str(self.project.uuid))
+
+        self.assertTrue(connection.ping_timeout_enabled)
+        self.permission.refresh_from_db()
+        self.assertEqual(self.permission.last_seen, connection.permission.last_seen)
+
+    def test_load_agent_connection_without_permission(self):
+        other_user, _ = create_user_and_token(nickname="other")
+
+        with self.assertRaises(ProjectPermission.DoesNotExist):
+            load_agent_connection(other_user, str(self.project.uuid))
+
+    @patch("chats.apps.projects.tasks.log_agent_status_change.delay")
+    @patch.object(ProjectPermission, "notify_user")
+    def test_set_agent_status(self, mock_notify_user, mock_log_delay):
+        self.permission.status = ProjectPermission.STATUS_ONLINE
+        self.permission.save(update_fields=["status"])
+
+        set_agent_status(self.permission, self.user, ProjectPermission.STATUS_OFFLINE)
+
+        self.permission.refresh_from_db()
+        self.assertEqual(self.permission.status, ProjectPermission.STATUS_OFFLINE)
+        mock_notify_user.assert_called_once_with("update", "system")
+        mock_log_delay.assert_called_once_with(
+            agent_email=self.user.email,
+            project_uuid=str(self.project.uuid),
+            status=ProjectPermission.STATUS_OFFLINE,
+        )
+
+    async def test_bounded_executor_refuses_when_saturated(self):
+        executor = BoundedExecutor(max_concurrency=1)
+        semaphore = executor._get_semaphore()
+        await semaphore.acquire()
+
+        with self.assertRaises(LifecycleBusyError):
+            await executor.run(lambda: None, timeout=0.01)
+
+        semaphore.release()
+        self.assertEqual(await executor.run(lambda value: value, 1, timeout=1), 1)
+
+    @override_settings(WS_AGENT_LIFECYCLE_SERVICE=True)
+    @patch("chats.apps.projects.tasks.log_agent_status_change.delay")
+    @patch(
+        "chats.apps.api.websockets.rooms.lifecycle.is_feature_active_for_attributes",
+        return_value=False,
+    )
+    async def test_consumer_connects_and_goes_offline(
+        self, mock_is_feature_active_for_attributes, mock_log_delay
+    ):
+        application = TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+        communicator = WebsocketCommunicator(
+            application,
+            f"/ws/agent/rooms?Token={self.token.pk}&project={self.project.pk}",
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        await communicator.disconnect()
+
+        permission = await database_sync_to_async(ProjectPermission.objects.get)(
+            pk=self.permission.pk
+        )
+        self.assertEqual(permission.status, ProjectPermission.STATUS_OFFLINE)
+        mock_log_delay.assert_called_once()
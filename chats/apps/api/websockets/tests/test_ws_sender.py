@@ -0,0 +1,80 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+
+from chats.utils.websockets import send_channels_group
+from chats.utils.ws_sender import (
+    BackgroundWebsocketSender,
+    async_group_send,
+    get_retry_delay,
+)
+
+
+class AsyncGroupSendTestCase(TestCase):
+    @override_settings(WEBSOCKET_RETRY_SLEEP=0.5, WEBSOCKET_RETRY_MAX_SLEEP=2)
+    def test_retry_delay_is_exponential_and_capped(self):
+        self.assertEqual(
+            [get_retry_delay(attempt) for attempt in range(4)], [0.5, 1, 2, 2]
+        )
+
+    @patch("chats.utils.ws_sender.asyncio.sleep", new_callable=AsyncMock)
+    def test_retries_without_blocking(self, mock_sleep):
+        channel_layer = MagicMock()
+        channel_layer.group_send = AsyncMock(side_effect=[Exception("error"), None])
+
+        sent = async_to_sync(async_group_send)(
+            "queue_1", {"type": "notify"}, retries=3, channel_layer=channel_layer
+        )
+
+        self.assertTrue(sent)
+        self.assertEqual(channel_layer.group_send.await_count, 2)
+        mock_sleep.assert_awaited_once()
+
+    @patch("chats.utils.ws_sender.capture_exception")
+    @patch("chats.utils.ws_sender.asyncio.sleep", new_callable=AsyncMock)
+    def test_gives_up_after_retries(self, mock_sleep, mock_capture_exception):
+        channel_layer = MagicMock()
+        channel_layer.group_send = AsyncMock(side_effect=Exception("error"))
+
+        sent = async_to_sync(async_group_send)(
+            "queue_1", {"type": "notify"}, retries=2, channel_layer=channel_layer
+        )
+
+        self.assertFalse(sent)
+        self.assertEqual(channel_layer.group_send.await_count, 3)
+        mock_capture_exception.assert_called_once()
+
+
+class BackgroundWebsocketSenderTestCase(TestCase):
+    @patch("chats.utils.ws_sender.get_channel_layer")
+    def test_submit_delivers_in_background(self, mock_get_channel_layer):
+        channel_layer = MagicMock()
+        channel_layer.group_send = AsyncMock()
+        mock_get_channel_layer.return_value = channel_layer
+
+        sender = BackgroundWebsocketSender(max_pending=10)
+
+        self.assertTrue(sender.submit("queue_1", {"type": "notify"}))
+        self.assertTrue(sender.wait_until_idle(timeout=5))
+
+        channel_layer.group_send.assert_awaited_once_with("queue_1", {"type": "notify"})
+
+    @patch("chats.utils.ws_sender.get_channel_layer")
+    def test_submit_drops_messages_above_max_pending(self, mock_get_channel_layer):
+        sender = BackgroundWebsocketSender(max_pending=1)
+        sender._ensure_started()
+        sender._pending = 1
+
+        self.assertFalse(sender.submit("queue_1", {"type": "notify"}))
+        mock_get_channel_layer.assert_not_called()
+
+    @override_settings(USE_WS_BACKGROUND_SENDER=True)
+    @patch("chats.utils.websockets.get_background_sender")
+    def test_send_channels_group_hands_off_to_sender(self, mock_get_sender):
+        send_channels_group("queue_1", "notify", {"id": 1}, "rooms.update")
+
+        mock_get_sender.return_value.submit.assert_called_once()
+        group_name, message = mock_get_sender.return_value.submit.call_args[0]
+        self.assertEqual(group_name, "queue_1")
+        self.assertEqual(message["action"], "rooms.update")
@@ -0,0 +1,28 @@
+# Generated by Django 4.0.4 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archive_chats', '0003_alter_archiveconversationsjob_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archiveconversationsjob',
+            name='archived_bytes',
+            field=models.BigIntegerField(default=0, help_text="Size of the files uploaded by the job's batch tasks", verbose_name='Archived bytes'),
+        ),
+        migrations.AddField(
+            model_name='archiveconversationsjob',
+            name='archived_rooms',
+            field=models.PositiveIntegerField(default=0, help_text="Rooms archived by the job's batch tasks", verbose_name='Archived rooms'),
+        ),
+        migrations.AddField(
+            model_name='archiveconversationsjob',
+            name='last_batch_finished_at',
+            field=models.DateTimeField(blank=True, help_text="The date and time the job's last batch task finished", null=True, verbose_name='Last batch finished at'),
+        ),
+    ]
@@ -26,6 +26,22 @@ class ArchiveConversationsJob(models.Model):
         blank=True,
         help_text=_("The date and time the job started"),
     )
+    archived_rooms = models.PositiveIntegerField(
+        _("Archived rooms"),
+        default=0,
+        help_text=_("Rooms archived by the job's batch tasks"),
+    )
+    archived_bytes = models.BigIntegerField(
+        _("Archived bytes"),
+        default=0,
+        help_text=_("Size of the files uploaded by the job's batch tasks"),
+    )
+    last_batch_finished_at = models.DateTimeField(
+        _("Last batch finished at"),
+        null=True,
+        blank=True,
+        help_text=_("The date and time the job's last batch task finished"),
+    )
 
     class Meta:
         verbose_name = _("Archive conversation job")
@@ -34,6 +50,23 @@ class ArchiveConversationsJob(models.Model):
     def __str__(self):
         return f"Archive Conversations Job {self.uuid} - {self.started_at}"
 
+    @property
+    def elapsed_seconds(self) -> Optional[float]:
+        if not self.started_at or not self.last_batch_finished_at:
+            return None
+
+        return (self.last_batch_finished_at - self.started_at).total_seconds()
+
+    @property
+    def rooms_per_second(self) -> Optional[float]:
+        elapsed_seconds = self.elapsed_seconds
+        return self.archived_rooms / elapsed_seconds if elapsed_seconds else None
+
+    @property
+    def bytes_per_second(self) -> Optional[float]:
+        elapsed_seconds = self.elapsed_seconds
+        return self.archived_bytes / elapsed_seconds if elapsed_seconds else None
+
 
 class RoomArchivedConversation(models.Model):
     uuid = models.UUIDField(
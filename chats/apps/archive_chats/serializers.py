@@ -8,6 +8,16 @@ from chats.apps.contacts.models import Contact
 from chats.apps.rooms.models import RoomNote
 
 
+def to_utc_isoformat(value) -> str:
+    # Ensure the datetime is timezone-aware and convert to UTC
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, timezone.utc)
+    else:
+        value = value.astimezone(timezone.utc)
+
+    return value.isoformat()
+
+
 class ArchiveUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -48,13 +58,7 @@ class ArchiveMessageSerializer(serializers.ModelSerializer):
         ]
 
     def get_created_on(self, obj) -> str:
-        # Ensure the datetime is timezone-aware and convert to UTC
-        if timezone.is_naive(obj.created_on):
-            dt = timezone.make_aware(obj.created_on, timezone.utc)
-        else:
-            dt = obj.created_on.astimezone(timezone.utc)
-
-        return dt.isoformat()
+        return to_utc_isoformat(obj.created_on)
 
     def get_internal_note(self, obj: Message) -> Optional[dict]:
         internal_note: RoomNote = getattr(obj, "internal_note", None)
@@ -1,21 +1,26 @@
 from abc import ABC, abstractmethod
 from datetime import timedelta
+import gzip
+from itertools import groupby, islice
 import json
 import logging
+from operator import itemgetter
 import tempfile
+import time
 from urllib.parse import urlparse
 
 import boto3
-from typing import Iterable, List
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from uuid import UUID
 from django.core.exceptions import ValidationError
 from django.urls import reverse
 from django.utils import timezone
 from django.core.files.base import File
+from django.core.files.uploadedfile import UploadedFile
 from sentry_sdk import capture_exception
 from django.conf import settings
 from django.db import IntegrityError, transaction
-from django.db.models import Q
+from django.db.models import F, Q
 from weni.feature_flags.services import FeatureFlagsService
 
 
@@ -24,16 +29,38 @@ from chats.apps.archive_chats.models import (
     ArchiveConversationsJob,
     RoomArchivedConversation,
 )
-from chats.apps.archive_chats.serializers import ArchiveMessageSerializer
+from chats.apps.archive_chats.serializers import to_utc_isoformat
 from chats.apps.core.integrations.aws.s3.helpers import is_file_in_the_same_bucket
 from chats.apps.core.integrations.aws.s3.helpers import get_presigned_url
-from chats.apps.rooms.models import Room
+from chats.apps.rooms.models import Room, RoomNoteMedia
 from chats.apps.msgs.models import Message, MessageMedia
 
 
 logger = logging.getLogger(__name__)
 
 
+MESSAGES_FILE_NAME = "messages.jsonl"
+MESSAGES_FILE_CONTENT_TYPE = "application/x-ndjson"
+
+ARCHIVE_MESSAGE_FIELDS = (
+    "pk",
+    "text",
+    "created_on",
+    "user__email",
+    "user__first_name",
+    "contact",
+    "contact__name",
+    "contact__external_id",
+    "automatic_message__automatic_message_type",
+    "internal_note__pk",
+    "internal_note__text",
+)
+
+# Reused by every archive, the C accelerated encoder is picked when no
+# indentation is requested
+messages_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
 def is_file_on_chats_bucket(url: str) -> bool:
     return is_file_in_the_same_bucket(url, settings.AWS_STORAGE_BUCKET_NAME)
 
@@ -152,6 +179,236 @@ class ArchiveChatsService(BaseArchiveChatsService):
 
         return room_archived_conversation
 
+    def archive_rooms_batch(
+        self, room_uuids: List[UUID], job: ArchiveConversationsJob
+    ) -> List[RoomArchivedConversation]:
+        """
+        Archive several rooms at once, trading the per-room round trips of
+        ``archive_room_history`` for a few statements per batch:
+
+          * the rooms are claimed with a single ``select_for_update`` query,
+          * the messages of all of them are read in one ordered query,
+          * one file is still uploaded per room,
+          * messages are deleted in batches spanning all the rooms.
+
+        Rooms whose upload fails are registered as FAILED, the same way
+        ``archive_room_history`` does, and are resumed by a later job.
+        Returns the archived conversations that were finished.
+        """
+        started = time.monotonic()
+
+        conversations = self._claim_rooms_for_archive(room_uuids, job)
+        if not conversations:
+            return []
+
+        pending_uploads = {
+            conversation.room_id: conversation
+            for conversation in conversations
+            if conversation.status == ArchiveConversationsJobStatus.PROCESSING_MESSAGES
+        }
+        uploaded = [
+            conversation
+            for conversation in conversations
+            if conversation.room_id not in pending_uploads
+        ]
+        archived_bytes = 0
+
+        try:
+            rooms_messages = self._iter_rooms_messages(list(pending_uploads))
+            for room_id, messages in rooms_messages:
+                conversation = pending_uploads.pop(room_id)
+                file_size = self._upload_batch_messages_file(conversation, messages)
+                if file_size is not None:
+                    uploaded.append(conversation)
+                    archived_bytes += file_size
+
+            # Rooms without any message still get their (empty) file
+            for conversation in pending_uploads.values():
+                file_size = self._upload_batch_messages_file(conversation, [])
+                if file_size is not None:
+                    uploaded.append(conversation)
+                    archived_bytes += file_size
+
+            self._delete_rooms_messages(uploaded)
+        except Exception as e:
+            sentry_event_id = capture_exception(e)
+            logger.error(
+                f"[ArchiveChatsService] Error archiving rooms batch "
+                f"with job {job.uuid}: {e}",
+                exc_info=True,
+            )
+            for conversation in list(pending_uploads.values()) + uploaded:
+                conversation.register_error(e, sentry_event_id)
+
+            return []
+
+        elapsed = max(time.monotonic() - started, 0.001)
+        ArchiveConversationsJob.objects.filter(pk=job.pk).update(
+            archived_rooms=F("archived_rooms") + len(uploaded),
+            archived_bytes=F("archived_bytes") + archived_bytes,
+            last_batch_finished_at=timezone.now(),
+        )
+
+        logger.info(
+            f"[ArchiveChatsService] Archived {len(uploaded)} rooms "
+            f"({archived_bytes} bytes) with job {job.uuid} in {elapsed:.2f}s: "
+            f"{len(uploaded) / elapsed:.2f} rooms/s, "
+            f"{archived_bytes / elapsed:.0f} bytes/s"
+        )
+
+        return uploaded
+
+    def _claim_rooms_for_archive(
+        self, room_uuids: List[UUID], job: ArchiveConversationsJob
+    ) -> List[RoomArchivedConversation]:
+        """
+        Claim the archived conversations of a batch of rooms, skipping the
+        rows locked or recently claimed by other workers, and the finished
+        ones. The rows are created at dispatch by the scheduler.
+
+        Conversations that still need their file have their status set to
+        PROCESSING_MESSAGES.
+        """
+        now = timezone.now()
+
+        with transaction.atomic():
+            conversations = [
+                conversation
+                for conversation in (
+                    RoomArchivedConversation.objects.select_for_update(
+                        skip_locked=True, of=("self",)
+                    )
+                    .select_related("room__queue__sector__project")
+                    .filter(room_id__in=room_uuids)
+                    .exclude(status=ArchiveConversationsJobStatus.FINISHED)
+                )
+                if not self._is_actively_processed(conversation)
+            ]
+            if not conversations:
+                return []
+
+            upload_pks = []
+            for conversation in conversations:
+                conversation.job = job
+                conversation.archive_process_started_at = now
+                if self._needs_processing_and_upload(conversation):
+                    conversation.status = (
+                        ArchiveConversationsJobStatus.PROCESSING_MESSAGES
+                    )
+                    upload_pks.append(conversation.pk)
+
+            RoomArchivedConversation.objects.filter(
+                pk__in=[conversation.pk for conversation in conversations]
+            ).update(job=job, archive_process_started_at=now)
+            RoomArchivedConversation.objects.filter(pk__in=upload_pks).update(
+                status=ArchiveConversationsJobStatus.PROCESSING_MESSAGES
+            )
+
+        logger.info(
+            f"[ArchiveChatsService] Claimed {len(conversations)} of "
+            f"{len(room_uuids)} rooms with job {job.uuid}"
+        )
+
+        return conversations
+
+    def _iter_rooms_messages(
+        self, room_ids: List[UUID]
+    ) -> Iterator[Tuple[UUID, Iterator[dict]]]:
+        """
+        Yield each room that has messages, with its archived messages, out of
+        a single query ordered by room. Each room's messages must be consumed
+        before moving to the next room.
+        """
+        page_size = settings.ARCHIVE_CHATS_MESSAGE_PAGE_SIZE
+        rows = (
+            Message.objects.filter(room_id__in=room_ids)
+            .order_by("room_id", "created_on", "pk")
+            .values_list("room_id", *ARCHIVE_MESSAGE_FIELDS)
+            .iterator(chunk_size=page_size)
+        )
+
+        for room_id, room_rows in groupby(rows, key=itemgetter(0)):
+            yield room_id, self._iter_room_rows_messages(room_rows, page_size)
+
+    def _iter_room_rows_messages(
+        self, room_rows: Iterable[tuple], page_size: int
+    ) -> Iterator[dict]:
+        messages_rows = (row[1:] for row in room_rows)
+        while True:
+            page = list(islice(messages_rows, page_size))
+            if not page:
+                break
+
+            yield from self._serialize_messages_page(page)
+
+    def _upload_batch_messages_file(
+        self,
+        room_archived_conversation: RoomArchivedConversation,
+        messages: Iterable[dict],
+    ) -> Optional[int]:
+        try:
+            return self._upload_messages_file(room_archived_conversation, messages)
+        except Exception as e:
+            sentry_event_id = capture_exception(e)
+            room_archived_conversation.register_error(e, sentry_event_id)
+            logger.error(
+                f"[ArchiveChatsService] Error uploading messages file "
+                f"for room {room_archived_conversation.room_id}: {e}",
+                exc_info=True,
+            )
+            return None
+
+    def _delete_rooms_messages(
+        self, room_archived_conversations: List[RoomArchivedConversation]
+    ) -> None:
+        """
+        Delete the messages of already uploaded rooms in batches spanning
+        all of them, then finish their archived conversations at once.
+        """
+        if not room_archived_conversations:
+            return
+
+        pks = [conversation.pk for conversation in room_archived_conversations]
+        room_ids = [
+            conversation.room_id for conversation in room_archived_conversations
+        ]
+        RoomArchivedConversation.objects.filter(pk__in=pks).update(
+            status=ArchiveConversationsJobStatus.DELETING_MESSAGES_FROM_DB
+        )
+
+        batch_size = settings.ARCHIVE_CHATS_MESSAGES_DELETE_BATCH_SIZE
+        deleted = 0
+        while True:
+            with transaction.atomic():
+                messages_pks = list(
+                    Message.objects.filter(room_id__in=room_ids).values_list(
+                        "pk", flat=True
+                    )[:batch_size]
+                )
+                if not messages_pks:
+                    break
+
+                # Deleted through the ORM, so medias, automatic messages and
+                # note links are cascaded like in delete_room_messages
+                Message.objects.filter(pk__in=messages_pks).delete()
+                deleted += len(messages_pks)
+
+        now = timezone.now()
+        RoomArchivedConversation.objects.filter(pk__in=pks).update(
+            status=ArchiveConversationsJobStatus.FINISHED,
+            messages_deleted_at=now,
+            archive_process_finished_at=now,
+        )
+        for conversation in room_archived_conversations:
+            conversation.status = ArchiveConversationsJobStatus.FINISHED
+            conversation.messages_deleted_at = now
+            conversation.archive_process_finished_at = now
+
+        logger.info(
+            f"[ArchiveChatsService] Deleted {deleted} messages "
+            f"for {len(room_ids)} rooms"
+        )
+
     def _claim_room_for_archive(
         self, room: Room, job: ArchiveConversationsJob
     ) -> "RoomArchivedConversation | None":
@@ -374,48 +631,134 @@ class ArchiveChatsService(BaseArchiveChatsService):
         last_pk = None
 
         while True:
-            qs = (
-                Message.objects.filter(room=room)
-                .select_related(
-                    "user", "contact", "automatic_message", "internal_note"
-                )
-                .prefetch_related("medias", "internal_note__medias")
-                .order_by("created_on", "pk")
-            )
+            qs = Message.objects.filter(room=room).order_by("created_on", "pk")
             if last_pk is not None:
                 qs = qs.filter(
                     Q(created_on__gt=last_created_on)
                     | Q(created_on=last_created_on, pk__gt=last_pk)
                 )
 
-            page = list(qs[:page_size])
+            page = list(qs.values_list(*ARCHIVE_MESSAGE_FIELDS)[:page_size])
             if not page:
                 break
 
-            for message in page:
-                message_context = {"media": []}
-                for media in message.medias.all():
-                    url = self.process_media(media)
-                    if url:
-                        message_context["media"].append(
-                            {
-                                "url": url,
-                                "content_type": media.content_type,
-                                "created_on": media.created_on.isoformat(),
-                            }
-                        )
+            yield from self._serialize_messages_page(page)
+
+            last_created_on = page[-1][2]
+            last_pk = page[-1][0]
+
+    def _serialize_messages_page(self, page: List[tuple]) -> Iterator[dict]:
+        """
+        Build the archived data of a page of ARCHIVE_MESSAGE_FIELDS rows,
+        fetching the medias of all its messages at once.
+        """
+        medias = self._get_messages_medias([row[0] for row in page])
+        notes_medias = self._get_notes_medias(
+            [row[9] for row in page if row[9] is not None]
+        )
+
+        for (
+            pk,
+            text,
+            created_on,
+            user_email,
+            user_name,
+            contact_pk,
+            contact_name,
+            contact_external_id,
+            automatic_message_type,
+            note_pk,
+            note_text,
+        ) in page:
+            internal_note = None
+            if note_pk is not None:
+                internal_note = {
+                    "uuid": str(note_pk),
+                    "text": note_text,
+                    "media": notes_medias.get(note_pk, []),
+                }
+
+            # Same shape as ArchiveMessageSerializer, without building
+            # model instances and running the serializer per message
+            yield {
+                "uuid": str(pk),
+                "text": text,
+                "created_on": to_utc_isoformat(created_on),
+                "user": (
+                    {"email": user_email, "name": user_name}
+                    if user_email is not None
+                    else None
+                ),
+                "contact": (
+                    {"name": contact_name, "external_id": contact_external_id}
+                    if contact_pk is not None
+                    else None
+                ),
+                "is_automatic_message": automatic_message_type is not None,
+                "automatic_message_type": automatic_message_type,
+                "internal_note": internal_note,
+                "media": medias.get(pk, []),
+            }
+
+    def _get_messages_medias(self, message_pks: List[UUID]) -> Dict[UUID, list]:
+        medias = {}
+        rows = (
+            MessageMedia.objects.filter(message__in=message_pks)
+            .order_by("created_on", "pk")
+            .values_list(
+                "message_id", "content_type", "media_file", "media_url", "created_on"
+            )
+        )
+        for message_pk, content_type, media_file, media_url, created_on in rows:
+            url = self.process_media(
+                MessageMedia(media_file=media_file, media_url=media_url)
+            )
+            if url:
+                medias.setdefault(message_pk, []).append(
+                    {
+                        "url": url,
+                        "content_type": content_type,
+                        "created_on": created_on.isoformat(),
+                    }
+                )
 
-                yield ArchiveMessageSerializer(message, context=message_context).data
+        return medias
 
-            last_created_on = page[-1].created_on
-            last_pk = page[-1].pk
+    def _get_notes_medias(self, note_pks: List[UUID]) -> Dict[UUID, list]:
+        medias = {}
+        if not note_pks:
+            return medias
+
+        rows = (
+            RoomNoteMedia.objects.filter(note__in=note_pks)
+            .order_by("created_on", "pk")
+            .values_list("note_id", "content_type", "media_file", "media_url")
+        )
+        for note_pk, content_type, media_file, media_url in rows:
+            media = RoomNoteMedia(media_file=media_file, media_url=media_url)
+            medias.setdefault(note_pk, []).append(
+                {"content_type": content_type, "url": media.url}
+            )
+
+        return medias
 
     def upload_messages_file(
         self,
         room_archived_conversation: RoomArchivedConversation,
         messages: Iterable[dict],
     ) -> None:
+        self._upload_messages_file(room_archived_conversation, messages)
 
+        return room_archived_conversation
+
+    def _upload_messages_file(
+        self,
+        room_archived_conversation: RoomArchivedConversation,
+        messages: Iterable[dict],
+    ) -> int:
+        """
+        Write and upload the messages file, returning its size in bytes.
+        """
         if (
             room_archived_conversation.status
             != ArchiveConversationsJobStatus.PROCESSING_MESSAGES
@@ -424,10 +767,28 @@ class ArchiveChatsService(BaseArchiveChatsService):
                 f"Room archived conversation {room_archived_conversation.uuid} is not in processing messages status"
             )
 
+        compress = settings.ARCHIVE_CHATS_COMPRESS_MESSAGES_FILE
+
         with tempfile.SpooledTemporaryFile(max_size=5 * 1024 * 1024) as tmp:
+            if compress:
+                # The JSONL is compressed as it is written, so only the
+                # compressed bytes are ever buffered
+                writer = gzip.GzipFile(
+                    fileobj=tmp,
+                    mode="wb",
+                    compresslevel=settings.ARCHIVE_CHATS_COMPRESSION_LEVEL,
+                )
+            else:
+                writer = tmp
+
             for message in messages:
-                tmp.write(json.dumps(message, ensure_ascii=False).encode("utf-8"))
-                tmp.write(b"\n")
+                writer.write(messages_encoder.encode(message).encode("utf-8"))
+                writer.write(b"\n")
+
+            if compress:
+                writer.close()
+
+            file_size = tmp.tell()
 
             room_archived_conversation.status = (
                 ArchiveConversationsJobStatus.UPLOADING_MESSAGES_FILE
@@ -442,18 +803,26 @@ class ArchiveChatsService(BaseArchiveChatsService):
 
             tmp.seek(0)
 
-            room_archived_conversation.file.save(
-                "messages.jsonl",
-                File(tmp),
-                save=True,
-            )
+            if compress:
+                # The ".gz" extension makes the storage set
+                # "Content-Encoding: gzip" on the object, so clients
+                # downloading it through its URL get the plain JSONL back
+                file_name = f"{MESSAGES_FILE_NAME}.gz"
+                file = UploadedFile(
+                    tmp, name=file_name, content_type=MESSAGES_FILE_CONTENT_TYPE
+                )
+            else:
+                file_name = MESSAGES_FILE_NAME
+                file = File(tmp)
+
+            room_archived_conversation.file.save(file_name, file, save=True)
 
         room_archived_conversation.status = (
             ArchiveConversationsJobStatus.MESSAGES_FILE_UPLOADED
         )
         room_archived_conversation.save(update_fields=["status"])
 
-        return room_archived_conversation
+        return file_size
 
     def process_media(self, media: MessageMedia) -> None:
         if not media.media_file:
@@ -1,6 +1,7 @@
 import time
 from datetime import datetime, timezone
 from itertools import islice
+from typing import List
 from uuid import UUID
 
 import logging
@@ -76,7 +77,11 @@ def start_archive_rooms_messages():
 
     loop_start = time.monotonic()
 
-    if settings.ARCHIVE_CHATS_USE_BATCH_DISPATCH:
+    if settings.ARCHIVE_CHATS_USE_MULTI_ROOM_TASKS:
+        dispatched = _dispatch_multi_room(
+            room_uuids, job.uuid, expiration_dt, rooms_count
+        )
+    elif settings.ARCHIVE_CHATS_USE_BATCH_DISPATCH:
         dispatched = _dispatch_batched(room_uuids, job.uuid, expiration_dt, rooms_count)
     else:
         dispatched = _dispatch_sequential(
@@ -176,6 +181,21 @@ def _dispatch_batched(room_uuids, job_uuid, expiration_dt, rooms_count):
     return dispatched
 
 
+def _dispatch_multi_room(room_uuids, job_uuid, expiration_dt, rooms_count):
+    rooms_per_task = settings.ARCHIVE_CHATS_ROOMS_PER_TASK
+    dispatched = 0
+    for batch in _chunked(room_uuids, rooms_per_task):
+        archive_rooms_messages_batch.apply_async(
+            args=[batch, job_uuid], expires=expiration_dt
+        )
+        dispatched += 1
+    logger.info(
+        f"[start_archive_rooms_messages] Dispatched {rooms_count} rooms "
+        f"in {dispatched} batch tasks"
+    )
+    return dispatched
+
+
 @shared_task(queue="archive-chats")
 def archive_room_messages(room_uuid: UUID, job_uuid: UUID):
     logger.info(
@@ -209,3 +229,24 @@ def archive_room_messages(room_uuid: UUID, job_uuid: UUID):
         f"[archive_room_messages] ArchiveChatsService "
         f"finished archiving room history for room {room_uuid} with job {job_uuid}"
     )
+
+
+@shared_task(queue="archive-chats")
+def archive_rooms_messages_batch(room_uuids: List[UUID], job_uuid: UUID):
+    logger.info(
+        f"[archive_rooms_messages_batch] Starting archive of {len(room_uuids)} "
+        f"rooms with job {job_uuid}"
+    )
+    try:
+        job = ArchiveConversationsJob.objects.get(uuid=job_uuid)
+    except ArchiveConversationsJob.DoesNotExist:
+        logger.error(f"[archive_rooms_messages_batch] Job {job_uuid} not found")
+        return
+
+    service = ArchiveChatsService()
+    archived = service.archive_rooms_batch(room_uuids, job)
+
+    logger.info(
+        f"[archive_rooms_messages_batch] Archived {len(archived)} of "
+        f"{len(room_uuids)} rooms with job {job_uuid}"
+    )
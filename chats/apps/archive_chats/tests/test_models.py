@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 from django.test import TestCase
 from django.core.files.uploadedfile import SimpleUploadedFile
 
@@ -19,6 +21,24 @@ class TestArchiveConversationsJob(TestCase):
             str(job), f"Archive Conversations Job {job.uuid} - {job.started_at}"
         )
 
+    def test_throughput(self):
+        started_at = timezone.now()
+        job = ArchiveConversationsJob(
+            started_at=started_at,
+            archived_rooms=100,
+            archived_bytes=5000,
+            last_batch_finished_at=started_at + timedelta(seconds=10),
+        )
+
+        self.assertEqual(job.rooms_per_second, 10)
+        self.assertEqual(job.bytes_per_second, 500)
+
+    def test_throughput_without_finished_batches(self):
+        job = ArchiveConversationsJob(started_at=timezone.now())
+
+        self.assertIsNone(job.rooms_per_second)
+        self.assertIsNone(job.bytes_per_second)
+
 
 class TestRoomArchivedConversation(TestCase):
     def setUp(self):
@@ -1,3 +1,4 @@
+import gzip
 import json
 from datetime import timedelta
 from unittest.mock import patch, MagicMock
@@ -15,7 +16,7 @@ from chats.apps.archive_chats.models import (
 from chats.apps.archive_chats.serializers import ArchiveMessageSerializer
 from chats.apps.archive_chats.services import ArchiveChatsService
 from chats.apps.msgs.models import AutomaticMessage, Message, MessageMedia
-from chats.apps.rooms.models import Room, RoomNote
+from chats.apps.rooms.models import Room, RoomNote, RoomNoteMedia
 from chats.apps.queues.models import Queue
 from chats.apps.sectors.models import Sector
 from chats.apps.projects.models import Project
@@ -23,6 +24,16 @@ from chats.apps.contacts.models import Contact
 from chats.apps.accounts.models import User
 
 
+def read_archived_messages(room_archived_conversation):
+    with room_archived_conversation.file.open("rb") as file:
+        content = file.read()
+
+    if room_archived_conversation.file.name.endswith(".gz"):
+        content = gzip.decompress(content)
+
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
 class TestArchiveChatsService(TestCase):
     def setUp(self):
         self.bucket = MagicMock()
@@ -478,6 +489,70 @@ class TestArchiveChatsService(TestCase):
             ArchiveConversationsJobStatus.PENDING,
         )
 
+    def test_process_messages_matches_archive_message_serializer(self):
+        automatic_message = Message.objects.create(
+            room=self.room, user=self.user, text="Welcome", created_on=timezone.now()
+        )
+        AutomaticMessage.objects.create(message=automatic_message, room=self.room)
+        contact_message = Message.objects.create(
+            room=self.room, contact=self.contact, text="Hi", created_on=timezone.now()
+        )
+        note_message = Message.objects.create(
+            room=self.room, user=self.user, text="Note", created_on=timezone.now()
+        )
+        note = RoomNote.objects.create(
+            room=self.room, user=self.user, text="Test note", message=note_message
+        )
+        RoomNoteMedia.objects.create(
+            note=note,
+            content_type="image/png",
+            media_url="https://example.com/note.png",
+        )
+
+        archived_conversation = RoomArchivedConversation.objects.create(
+            job=self.service.start_archive_job(),
+            room=self.room,
+        )
+        messages_data = list(self.service.process_messages(archived_conversation))
+
+        expected = [
+            ArchiveMessageSerializer(message, context={"media": []}).data
+            for message in (automatic_message, contact_message, note_message)
+        ]
+        self.assertEqual(messages_data, [dict(data) for data in expected])
+        self.assertEqual(messages_data[0]["automatic_message_type"], "automatic_open")
+        self.assertEqual(
+            messages_data[2]["internal_note"]["media"],
+            [{"content_type": "image/png", "url": "https://example.com/note.png"}],
+        )
+
+    @override_settings(ARCHIVE_CHATS_COMPRESS_MESSAGES_FILE=True)
+    def test_upload_messages_file_compressed(self):
+        archived_conversation = RoomArchivedConversation.objects.create(
+            job=self.service.start_archive_job(),
+            room=self.room,
+            status=ArchiveConversationsJobStatus.PROCESSING_MESSAGES,
+        )
+        messages = [
+            {"uuid": "1", "text": "Olá", "media": []},
+            {"uuid": "2", "text": "Test message", "media": []},
+        ]
+
+        self.service.upload_messages_file(
+            room_archived_conversation=archived_conversation,
+            messages=messages,
+        )
+
+        archived_conversation.refresh_from_db()
+        self.assertEqual(
+            archived_conversation.file.name,
+            f"archived_conversations/{self.project.uuid}/{self.room.uuid}/messages.jsonl.gz",
+        )
+        with archived_conversation.file.open("rb") as f:
+            self.assertEqual(f.read(2), b"\x1f\x8b")
+
+        self.assertEqual(read_archived_messages(archived_conversation), messages)
+
     @patch("chats.apps.archive_chats.services.get_presigned_url")
     def test_get_archived_media_url(self, mock_get_presigned_url):
         object_key = f"archived_conversations/{self.project.uuid}/{self.room.uuid}/media/test.jpg"
@@ -829,3 +904,93 @@ class TestArchiveChatsService(TestCase):
         self.assertEqual(
             AutomaticMessage.objects.filter(message__room=self.room).count(), 0
         )
+
+    @override_settings(
+        ARCHIVE_CHATS_MESSAGE_PAGE_SIZE=1, ARCHIVE_CHATS_MESSAGES_DELETE_BATCH_SIZE=2
+    )
+    def test_archive_rooms_batch(self):
+        other_room = Room.objects.create(queue=self.queue)
+        empty_room = Room.objects.create(queue=self.queue)
+        messages = {
+            room: [
+                Message.objects.create(
+                    room=room, user=self.user, text=text, created_on=timezone.now()
+                )
+                for text in ("first", "second")
+            ]
+            for room in (self.room, other_room)
+        }
+        job = self.service.start_archive_job()
+        for room in (self.room, other_room, empty_room):
+            RoomArchivedConversation.objects.create(
+                job=job, room=room, status=ArchiveConversationsJobStatus.PENDING
+            )
+
+        archived = self.service.archive_rooms_batch(
+            [self.room.uuid, other_room.uuid, empty_room.uuid], job
+        )
+
+        self.assertEqual(len(archived), 3)
+        self.assertFalse(
+            Message.objects.filter(room__in=[self.room, other_room]).exists()
+        )
+        for room in (self.room, other_room, empty_room):
+            conversation = RoomArchivedConversation.objects.get(room=room)
+            self.assertEqual(
+                conversation.status, ArchiveConversationsJobStatus.FINISHED
+            )
+            self.assertIsNotNone(conversation.messages_deleted_at)
+            self.assertEqual(
+                [message["uuid"] for message in read_archived_messages(conversation)],
+                [str(message.pk) for message in messages.get(room, [])],
+            )
+
+        job.refresh_from_db()
+        self.assertEqual(job.archived_rooms, 3)
+        self.assertGreater(job.archived_bytes, 0)
+        self.assertIsNotNone(job.rooms_per_second)
+
+    @override_settings(ARCHIVE_CHATS_IN_PROGRESS_TIMEOUT_HOURS=12)
+    def test_archive_rooms_batch_skips_finished_and_in_progress_rooms(self):
+        finished_room = Room.objects.create(queue=self.queue)
+        job = self.service.start_archive_job()
+        RoomArchivedConversation.objects.create(
+            job=job,
+            room=self.room,
+            status=ArchiveConversationsJobStatus.PROCESSING_MESSAGES,
+            archive_process_started_at=timezone.now(),
+        )
+        RoomArchivedConversation.objects.create(
+            job=job, room=finished_room, status=ArchiveConversationsJobStatus.FINISHED
+        )
+
+        archived = self.service.archive_rooms_batch(
+            [self.room.uuid, finished_room.uuid], job
+        )
+
+        self.assertEqual(archived, [])
+        job.refresh_from_db()
+        self.assertEqual(job.archived_rooms, 0)
+
+    @patch(
+        "chats.apps.archive_chats.services.ArchiveChatsService._upload_messages_file"
+    )
+    @patch("chats.apps.archive_chats.services.capture_exception")
+    def test_archive_rooms_batch_registers_upload_errors(
+        self, mock_capture_exception, mock_upload_messages_file
+    ):
+        mock_capture_exception.return_value = "test-event-id"
+        mock_upload_messages_file.side_effect = Exception("Upload error")
+        message = Message.objects.create(
+            room=self.room, user=self.user, text="Test", created_on=timezone.now()
+        )
+        job = self.service.start_archive_job()
+        RoomArchivedConversation.objects.create(job=job, room=self.room)
+
+        archived = self.service.archive_rooms_batch([self.room.uuid], job)
+
+        self.assertEqual(archived, [])
+        self.assertTrue(Message.objects.filter(pk=message.pk).exists())
+        conversation = RoomArchivedConversation.objects.get(room=self.room)
+        self.assertEqual(conversation.status, ArchiveConversationsJobStatus.FAILED)
+        self.assertEqual(conversation.errors[0]["error"], "Upload error")
@@ -14,6 +14,7 @@ from chats.apps.archive_chats.services import ArchiveChatsService
 from chats.apps.archive_chats.tasks import (
     _create_pending_records,
     archive_room_messages,
+    archive_rooms_messages_batch,
     start_archive_rooms_messages,
 )
 from chats.apps.rooms.models import Room
@@ -259,6 +260,51 @@ class TestStartArchiveRoomsMessages(TestCase):
 
         assert mock_archive_room_messages_apply_async.call_count == len(rooms)
 
+    @override_settings(ARCHIVE_CHATS_MAX_ROOMS=50)
+    @override_settings(ARCHIVE_CHATS_IS_ACTIVE_FOR_ALL_PROJECTS=True)
+    @override_settings(ARCHIVE_CHATS_USE_MULTI_ROOM_TASKS=True)
+    @override_settings(ARCHIVE_CHATS_ROOMS_PER_TASK=2)
+    @patch("chats.apps.archive_chats.tasks.ArchiveChatsService", return_value=service)
+    @patch("chats.apps.archive_chats.tasks.archive_room_messages.apply_async")
+    @patch("chats.apps.archive_chats.tasks.archive_rooms_messages_batch.apply_async")
+    @patch("chats.apps.archive_chats.tasks.calculate_archive_task_expiration_dt")
+    def test_start_archive_rooms_messages_with_multi_room_tasks(
+        self,
+        mock_calculate_archive_task_expiration_dt,
+        mock_archive_rooms_messages_batch_apply_async,
+        mock_archive_room_messages_apply_async,
+        mock_archive_chats_service,
+    ):
+        expiration_dt = timezone.now() + timedelta(hours=1)
+        mock_calculate_archive_task_expiration_dt.return_value = expiration_dt
+
+        job = ArchiveConversationsJob.objects.create(started_at=timezone.now())
+        service.start_archive_job.return_value = job
+
+        rooms = [
+            Room.objects.create(
+                is_active=False,
+                ended_at=timezone.now() - rdelta(years=1),
+            )
+            for _ in range(3)
+        ]
+
+        start_archive_rooms_messages()
+
+        mock_archive_room_messages_apply_async.assert_not_called()
+        assert mock_archive_rooms_messages_batch_apply_async.call_count == 2
+
+        dispatched_room_uuids = []
+        for (
+            dispatch_call
+        ) in mock_archive_rooms_messages_batch_apply_async.call_args_list:
+            batch, job_uuid = dispatch_call.kwargs["args"]
+            assert job_uuid == job.uuid
+            assert dispatch_call.kwargs["expires"] == expiration_dt
+            dispatched_room_uuids.extend(batch)
+
+        assert sorted(dispatched_room_uuids) == sorted(room.uuid for room in rooms)
+
 
 class TestCreatePendingRecords(TestCase):
     @override_settings(ARCHIVE_CHATS_BULK_CREATE_PENDING_BATCH_SIZE=100)
@@ -433,3 +479,23 @@ class TestArchiveRoomMessages(TestCase):
         archive_room_messages(uuid.uuid4(), job.uuid)
 
         service.archive_room_history.assert_not_called()
+
+
+class TestArchiveRoomsMessagesBatch(TestCase):
+    def setUp(self):
+        service.reset_mock()
+
+    @patch("chats.apps.archive_chats.tasks.ArchiveChatsService", return_value=service)
+    def test_archive_rooms_messages_batch(self, mock_archive_chats_service):
+        job = ArchiveConversationsJob.objects.create(started_at=timezone.now())
+        room_uuids = [uuid.uuid4(), uuid.uuid4()]
+        service.archive_rooms_batch.return_value = []
+
+        archive_rooms_messages_batch(room_uuids, job.uuid)
+
+        service.archive_rooms_batch.assert_called_once_with(room_uuids, job)
+
+    def test_archive_rooms_messages_batch_with_job_not_found(self):
+        archive_rooms_messages_batch([uuid.uuid4()], uuid.uuid4())
+
+        service.archive_rooms_batch.assert_not_called()
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chats.apps.dashboard.rollups import backfill_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute the hourly dashboard rollups of past dates, extending the "
+        "rolled up period backwards hour by hour"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=90,
+            help="How many days back from now the rollups should cover",
+        )
+
+    def handle(self, *args, **options):
+        start = timezone.now() - timedelta(days=options["days"])
+        computed = backfill_rollups(start)
+
+        self.stdout.write(self.style.SUCCESS(f"Done, {computed} hours rolled up"))
@@ -0,0 +1,113 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from chats.apps.dashboard.models import RoomMetrics
+from chats.apps.dashboard.utils import (
+    RESPONSE_TIME_STATE_FIELDS,
+    apply_messages_to_response_time,
+)
+from chats.apps.msgs.models import Message
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the incremental response time state of rooms that are not "
+        "tracked yet (or of every room, with --all), streaming rooms and "
+        "messages in batches"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--project", type=str, default=None)
+        parser.add_argument(
+            "--active-only",
+            action="store_true",
+            help="Only backfill rooms that are still open",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help=(
+                "Also recompute tracked rooms, whose state went stale while "
+                "ROOM_METRICS_INCREMENTAL_RESPONSE_TIME was disabled"
+            ),
+        )
+
+    def get_queryset(self, options):
+        queryset = RoomMetrics.objects.all()
+
+        if not options["all"]:
+            queryset = queryset.filter(response_time_tracked=False)
+
+        if options["project"]:
+            queryset = queryset.filter(room__queue__sector__project=options["project"])
+        if options["active_only"]:
+            queryset = queryset.filter(room__is_active=True)
+
+        return queryset.order_by("pk")
+
+    def backfill_metrics(self, metrics: RoomMetrics):
+        room = metrics.room
+        messages = (
+            Message.objects.filter(
+                Q(user__isnull=False) | Q(contact__isnull=False),
+                room=room,
+                created_on__gte=room.created_on,
+            )
+            .order_by("created_on")
+            .only("created_on", "user", "contact")
+            .iterator(chunk_size=2000)
+        )
+
+        metrics.response_time_sum = timedelta(0)
+        metrics.response_count = 0
+        metrics.last_contact_message_at = None
+        metrics.last_message_from_agent = False
+        metrics.last_tracked_message_at = None
+
+        apply_messages_to_response_time(metrics, messages, room.created_on)
+        metrics.response_time_tracked = True
+
+    def handle(self, *args, **options):
+        queryset = self.get_queryset(options)
+        batch_size = options["batch_size"]
+        last_pk = None
+        total = 0
+
+        while True:
+            batch_queryset = queryset
+            if last_pk is not None:
+                batch_queryset = batch_queryset.filter(pk__gt=last_pk)
+
+            with transaction.atomic():
+                # Locking the rows makes messages created meanwhile wait for
+                # the backfill, and then be applied on top of it
+                batch = list(
+                    batch_queryset.select_related("room")
+                    .select_for_update(of=("self",))
+                    .only(
+                        "pk",
+                        "room__pk",
+                        "room__created_on",
+                        *RESPONSE_TIME_STATE_FIELDS,
+                        "response_time_tracked",
+                    )[:batch_size]
+                )
+                if not batch:
+                    break
+
+                for metrics in batch:
+                    self.backfill_metrics(metrics)
+
+                RoomMetrics.objects.bulk_update(
+                    batch, RESPONSE_TIME_STATE_FIELDS + ["response_time_tracked"]
+                )
+
+            last_pk = batch[-1].pk
+            total += len(batch)
+            self.stdout.write(f"Backfilled {total} rooms")
+
+        self.stdout.write(self.style.SUCCESS(f"Done, {total} rooms backfilled"))
@@ -0,0 +1,120 @@
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from chats.apps.dashboard.models import MetricGoal
+from chats.apps.dashboard.services.metric_goal_alerts import (
+    FEATURE_FLAG_CACHE_KEY_TEMPLATE,
+    detect_violations,
+)
+from chats.apps.projects.models import Project
+from chats.apps.queues.models import Queue
+from chats.apps.rooms.models import Room
+from chats.apps.sectors.models import Sector
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the metric goal violation detection against synthetic "
+        "projects, created inside a transaction that is rolled back"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--projects", type=int, default=1000)
+        parser.add_argument("--rooms-per-project", type=int, default=20)
+        parser.add_argument("--runs", type=int, default=5)
+
+    def create_projects(self, options):
+        now = timezone.now()
+        projects = Project.objects.bulk_create(
+            [
+                Project(name=f"Metric goal benchmark {index}")
+                for index in range(options["projects"])
+            ]
+        )
+        sectors = Sector.objects.bulk_create(
+            [
+                Sector(
+                    name="Benchmark",
+                    project=project,
+                    rooms_limit=10,
+                    work_start="00:00",
+                    work_end="23:59",
+                )
+                for project in projects
+            ]
+        )
+        queues = Queue.objects.bulk_create(
+            [Queue(name="Benchmark", sector=sector) for sector in sectors]
+        )
+        MetricGoal.objects.bulk_create(
+            [
+                MetricGoal(
+                    project=project,
+                    metric=MetricGoal.METRIC_WAITING_TIME,
+                    # Spread thresholds so only part of the rooms violate
+                    threshold_seconds=60 * (1 + index % 10),
+                    rooms_threshold_count=1,
+                )
+                for index, project in enumerate(projects)
+            ]
+        )
+        Room.objects.bulk_create(
+            [
+                Room(
+                    queue=queue,
+                    is_active=True,
+                    added_to_queue_at=now - timedelta(minutes=room_index),
+                )
+                for queue in queues
+                for room_index in range(options["rooms_per_project"])
+            ],
+            batch_size=5000,
+        )
+
+        # Skip the feature flag lookups, which are not what is measured
+        cache.set_many(
+            {
+                FEATURE_FLAG_CACHE_KEY_TEMPLATE.format(
+                    project_uuid=str(project.uuid)
+                ): True
+                for project in projects
+            },
+            timeout=600,
+        )
+        return projects
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            projects = self.create_projects(options)
+
+            durations = []
+            for _ in range(options["runs"]):
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    violations = detect_violations(MetricGoal.METRIC_WAITING_TIME)
+                    durations.append(time.perf_counter() - start)
+
+            self.stdout.write(
+                f"{len(projects)} projects, {len(violations)} violating: "
+                f"{len(queries)} queries, "
+                f"best {min(durations) * 1000:.1f}ms, "
+                f"mean {sum(durations) / len(durations) * 1000:.1f}ms"
+            )
+
+            cache.delete_many(
+                [
+                    FEATURE_FLAG_CACHE_KEY_TEMPLATE.format(
+                        project_uuid=str(project.uuid)
+                    )
+                    for project in projects
+                ]
+            )
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("Done, benchmark data rolled back"))
@@ -0,0 +1,40 @@
+# Generated by Django 4.0.4 on 2026-10-17 12:00
+
+import datetime
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0013_metricgoal_active_lookup_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roommetrics',
+            name='response_time_sum',
+            field=models.DurationField(default=datetime.timedelta(0), verbose_name='Message response time sum'),
+        ),
+        migrations.AddField(
+            model_name='roommetrics',
+            name='response_count',
+            field=models.IntegerField(default=0, verbose_name='Message response count'),
+        ),
+        migrations.AddField(
+            model_name='roommetrics',
+            name='last_contact_message_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Last contact message at'),
+        ),
+        migrations.AddField(
+            model_name='roommetrics',
+            name='last_message_from_agent',
+            field=models.BooleanField(default=False, verbose_name='Last message was from an agent?'),
+        ),
+        migrations.AddField(
+            model_name='roommetrics',
+            name='response_time_tracked',
+            field=models.BooleanField(default=False, verbose_name='Is the response time tracked incrementally?'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 4.0.4 on 2026-10-17 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('projects', '0036_alter_agentstatuslog_options_and_more'),
+        ('queues', '0011_merge_20260708_1718'),
+        ('sectors', '0029_sectorauthorization_is_deleted_and_more'),
+        ('dashboard', '0014_roommetrics_response_time_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomRollupCoverage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField(verbose_name='Start')),
+                ('end', models.DateTimeField(verbose_name='End')),
+            ],
+            options={
+                'verbose_name': 'Room rollup coverage',
+                'verbose_name_plural': 'Room rollup coverage',
+            },
+        ),
+        migrations.CreateModel(
+            name='RoomHourlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(verbose_name='Hour bucket')),
+                ('opened_rooms', models.IntegerField(default=0, verbose_name='Opened rooms')),
+                ('closed_assigned_rooms', models.IntegerField(default=0, verbose_name='Opened rooms already closed by an agent')),
+                ('transfer_count', models.IntegerField(default=0, verbose_name='Transfer count')),
+                ('metrics_count', models.IntegerField(default=0, verbose_name='Assigned rooms with metrics')),
+                ('waiting_time_sum', models.BigIntegerField(default=0, verbose_name='Waiting time sum')),
+                ('message_response_time_sum', models.BigIntegerField(default=0, verbose_name='Message response time sum')),
+                ('interaction_time_sum', models.BigIntegerField(default=0, verbose_name='Interaction time sum')),
+                ('closed_rooms', models.IntegerField(default=0, verbose_name='Closed rooms')),
+                ('closed_first_response_time_sum', models.BigIntegerField(default=0, verbose_name='Closed rooms first response time sum')),
+                ('closed_first_response_time_count', models.IntegerField(default=0, verbose_name='Closed rooms first response time count')),
+                ('closed_message_response_time_sum', models.BigIntegerField(default=0, verbose_name='Closed rooms message response time sum')),
+                ('closed_message_response_time_count', models.IntegerField(default=0, verbose_name='Closed rooms message response time count')),
+                ('closed_interaction_time_sum', models.BigIntegerField(default=0, verbose_name='Closed rooms interaction time sum')),
+                ('closed_interaction_time_count', models.IntegerField(default=0, verbose_name='Closed rooms interaction time count')),
+                ('agent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='room_rollups', to=settings.AUTH_USER_MODEL, to_field='email', verbose_name='Agent')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='room_rollups', to='projects.project', verbose_name='Project')),
+                ('queue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='room_rollups', to='queues.queue', verbose_name='Queue')),
+                ('sector', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='room_rollups', to='sectors.sector', verbose_name='Sector')),
+            ],
+            options={
+                'verbose_name': 'Room hourly rollup',
+                'verbose_name_plural': 'Room hourly rollups',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='roomhourlyrollup',
+            index=models.Index(fields=['project', 'bucket'], name='room_rollup_project_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roomhourlyrollup',
+            index=models.Index(fields=['sector', 'bucket'], name='room_rollup_sector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roomhourlyrollup',
+            index=models.Index(fields=['agent', 'bucket'], name='room_rollup_agent_idx'),
+        ),
+    ]
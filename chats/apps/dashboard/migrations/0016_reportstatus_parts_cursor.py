@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0015_roomhourlyrollup_roomrollupcoverage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportstatus',
+            name='parts_cursor',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
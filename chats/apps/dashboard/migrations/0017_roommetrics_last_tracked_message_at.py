@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0016_reportstatus_parts_cursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roommetrics',
+            name='last_tracked_message_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Last tracked message at'),
+        ),
+    ]
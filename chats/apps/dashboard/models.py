@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.db.models import Q
@@ -22,6 +24,26 @@ class RoomMetrics(BaseModel):
     interaction_time = models.IntegerField(_("Room interaction time"), default=0)
     transfer_count = models.IntegerField(_("Room transfer count"), default=0)
 
+    # Running state of the message response time, updated as messages are
+    # created. Only trusted when `response_time_tracked` is set, i.e. the
+    # state was maintained since the room was created or was backfilled.
+    response_time_sum = models.DurationField(
+        _("Message response time sum"), default=timedelta(0)
+    )
+    response_count = models.IntegerField(_("Message response count"), default=0)
+    last_contact_message_at = models.DateTimeField(
+        _("Last contact message at"), null=True, blank=True
+    )
+    last_message_from_agent = models.BooleanField(
+        _("Last message was from an agent?"), default=False
+    )
+    last_tracked_message_at = models.DateTimeField(
+        _("Last tracked message at"), null=True, blank=True
+    )
+    response_time_tracked = models.BooleanField(
+        _("Is the response time tracked incrementally?"), default=False
+    )
+
     class Meta:
         verbose_name = _("Room metric")
         verbose_name_plural = _("Room metrics")
@@ -73,6 +95,9 @@ class ReportStatus(BaseModel):
     fields_config = models.JSONField()
     error_message = models.TextField(blank=True, null=True)
     retry_count = models.IntegerField(default=0)
+    # Keyset cursor and written parts count of each report table,
+    # used to resume the report after a failure
+    parts_cursor = models.JSONField(default=dict, blank=True)
 
     def __str__(self):
         return f"Report Status: {self.project.name} - {self.status}"
@@ -158,3 +183,103 @@ class MetricGoal(BaseModel):
 
     def __str__(self):
         return f"{self.project.name} - {self.metric}"
+
+
+class RoomHourlyRollup(models.Model):
+    """
+    Room counters and metric sums pre-aggregated per project, sector, queue,
+    agent and hour, used by the dashboard instead of scanning rooms.
+
+    Counters in the first group are bucketed by the hour the room was created,
+    the `closed_*` ones by the hour the room was closed.
+    """
+
+    project = models.ForeignKey(
+        "projects.Project",
+        related_name="room_rollups",
+        verbose_name=_("Project"),
+        on_delete=models.CASCADE,
+    )
+    sector = models.ForeignKey(
+        "sectors.Sector",
+        related_name="room_rollups",
+        verbose_name=_("Sector"),
+        on_delete=models.CASCADE,
+    )
+    queue = models.ForeignKey(
+        "queues.Queue",
+        related_name="room_rollups",
+        verbose_name=_("Queue"),
+        on_delete=models.CASCADE,
+    )
+    agent = models.ForeignKey(
+        "accounts.User",
+        related_name="room_rollups",
+        verbose_name=_("Agent"),
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        to_field="email",
+    )
+    bucket = models.DateTimeField(_("Hour bucket"))
+
+    opened_rooms = models.IntegerField(_("Opened rooms"), default=0)
+    closed_assigned_rooms = models.IntegerField(
+        _("Opened rooms already closed by an agent"), default=0
+    )
+    transfer_count = models.IntegerField(_("Transfer count"), default=0)
+    metrics_count = models.IntegerField(_("Assigned rooms with metrics"), default=0)
+    waiting_time_sum = models.BigIntegerField(_("Waiting time sum"), default=0)
+    message_response_time_sum = models.BigIntegerField(
+        _("Message response time sum"), default=0
+    )
+    interaction_time_sum = models.BigIntegerField(_("Interaction time sum"), default=0)
+
+    closed_rooms = models.IntegerField(_("Closed rooms"), default=0)
+    closed_first_response_time_sum = models.BigIntegerField(
+        _("Closed rooms first response time sum"), default=0
+    )
+    closed_first_response_time_count = models.IntegerField(
+        _("Closed rooms first response time count"), default=0
+    )
+    closed_message_response_time_sum = models.BigIntegerField(
+        _("Closed rooms message response time sum"), default=0
+    )
+    closed_message_response_time_count = models.IntegerField(
+        _("Closed rooms message response time count"), default=0
+    )
+    closed_interaction_time_sum = models.BigIntegerField(
+        _("Closed rooms interaction time sum"), default=0
+    )
+    closed_interaction_time_count = models.IntegerField(
+        _("Closed rooms interaction time count"), default=0
+    )
+
+    class Meta:
+        verbose_name = _("Room hourly rollup")
+        verbose_name_plural = _("Room hourly rollups")
+        indexes = [
+            models.Index(fields=["project", "bucket"], name="room_rollup_project_idx"),
+            models.Index(fields=["sector", "bucket"], name="room_rollup_sector_idx"),
+            models.Index(fields=["agent", "bucket"], name="room_rollup_agent_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.queue_id} - {self.agent_id} - {self.bucket}"
+
+
+class RoomRollupCoverage(models.Model):
+    """
+    Hours [start, end) for which room rollups were computed.
+    A single row is kept.
+    """
+
+    start = models.DateTimeField(_("Start"))
+    end = models.DateTimeField(_("End"))
+
+    class Meta:
+        verbose_name = _("Room rollup coverage")
+        verbose_name_plural = _("Room rollup coverage")
+
+    def __str__(self):
+        return f"{self.start} - {self.end}"
@@ -0,0 +1,380 @@
+"""
+Hourly room rollups for the dashboard.
+
+Every completed hour is aggregated into RoomHourlyRollup rows by the
+`update_dashboard_rollups` task. Rooms changed after their hour was rolled up
+are marked dirty and the hours they belong to are recomputed on the next run:
+saving a room or its metrics marks the room when a rolled up field may have
+changed, and writers bypassing `save` (queryset updates, bulk writes) of
+those fields must call `mark_rooms_dirty` themselves.
+
+Dashboard repositories read the rollups for the complete hours of the
+requested window and only query raw rooms for the remaining, most recent part.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, QuerySet, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from chats.apps.dashboard.models import RoomHourlyRollup, RoomRollupCoverage
+
+logger = logging.getLogger(__name__)
+
+
+BUCKET_SIZE = timedelta(hours=1)
+DIRTY_ROOMS_KEY = "dashboard_rollups:dirty_rooms"
+
+ROOM_DIMENSIONS = ("queue__sector__project", "queue__sector", "queue", "user")
+
+# Room lookups that can be answered by a rollup dimension
+ROOM_FILTER_DIMENSIONS = {
+    "queue__sector__project": "project",
+    "queue__sector": "sector",
+    "queue__sector__in": "sector__in",
+    "queue": "queue",
+    "queue__in": "queue__in",
+    "user": "agent",
+}
+# Room state lookups implied by the rollup counter the caller reads
+ROOM_STATE_LOOKUPS = ("is_active", "user__isnull")
+
+# Fields read by `compute_rollups`, saving other fields keeps rooms clean
+ROOM_ROLLUP_FIELDS = frozenset(
+    {
+        "queue",
+        "queue_id",
+        "user",
+        "user_id",
+        "is_active",
+        "created_on",
+        "ended_at",
+    }
+)
+ROOM_METRICS_ROLLUP_FIELDS = frozenset(
+    {
+        "room",
+        "room_id",
+        "waiting_time",
+        "message_response_time",
+        "first_response_time",
+        "interaction_time",
+        "transfer_count",
+    }
+)
+
+
+def is_dashboard_rollups_enabled() -> bool:
+    return settings.DASHBOARD_ROLLUPS_ENABLED
+
+
+def truncate_to_bucket(value: datetime) -> datetime:
+    return value.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def get_coverage() -> Optional[RoomRollupCoverage]:
+    return RoomRollupCoverage.objects.order_by("pk").first()
+
+
+def get_rollup_window(start: datetime, end: datetime) -> Optional[tuple]:
+    """
+    Return the [start, end) range of complete, rolled up hours inside
+    the [start, end] window, or None when rollups can not be used for it.
+    """
+    if not is_dashboard_rollups_enabled():
+        return None
+
+    # Windows starting in the middle of an hour (e.g. half-hour timezones)
+    # can not be answered by hourly buckets
+    if truncate_to_bucket(start) != start:
+        return None
+
+    coverage = get_coverage()
+    if coverage is None or start < coverage.start:
+        return None
+
+    rollup_end = min(truncate_to_bucket(end), coverage.end)
+    if rollup_end <= start:
+        return None
+
+    return start, rollup_end
+
+
+def get_average(total, count) -> Optional[float]:
+    return total / count if count else None
+
+
+@dataclass
+class RollupSplit:
+    # Rollups of the complete hours of the window
+    rollups: QuerySet
+    # Room filters for the rest of the window
+    raw_filter: dict
+
+
+def split_rooms_filter(
+    rooms_filter: dict, date_field: str, prefix: str = ""
+) -> Optional[RollupSplit]:
+    """
+    Split a dashboard rooms filter, ranged over `date_field` with either
+    `__range` or `__gte` (until now), into rollups and raw room filters.
+
+    `prefix` is the path from the filtered model to the room (e.g. "rooms__").
+    The raw part is always bounded by the room date the rollups are
+    bucketed by, also when `date_field` belongs to the filtered model (e.g.
+    the `created_on` of room metrics).
+
+    Returns None when the filter can not be answered by rollups, e.g. when
+    filtering by tags, and the caller should query raw rooms only.
+    """
+    range_lookup = f"{date_field}__range"
+    gte_lookup = f"{date_field}__gte"
+
+    if range_lookup in rooms_filter:
+        start, end = rooms_filter[range_lookup]
+    elif gte_lookup in rooms_filter:
+        start, end = rooms_filter[gte_lookup], timezone.now()
+    else:
+        return None
+
+    dimension_filter = {}
+    raw_filter = {}
+    for lookup, value in rooms_filter.items():
+        if lookup in (range_lookup, gte_lookup):
+            continue
+
+        raw_filter[lookup] = value
+        room_lookup = (
+            lookup.replace(prefix, "", 1) if lookup.startswith(prefix) else None
+        )
+
+        if room_lookup in ROOM_FILTER_DIMENSIONS:
+            dimension_filter[ROOM_FILTER_DIMENSIONS[room_lookup]] = value
+        elif room_lookup not in ROOM_STATE_LOOKUPS:
+            return None
+
+    window = get_rollup_window(start, end)
+    if window is None:
+        return None
+
+    rollup_start, rollup_end = window
+    room_date_field = (
+        date_field if date_field.startswith(prefix) else f"{prefix}{date_field}"
+    )
+    raw_filter[f"{room_date_field}__gte"] = rollup_end
+    raw_filter[f"{room_date_field}__lte"] = end
+
+    rollups = RoomHourlyRollup.objects.filter(
+        bucket__gte=rollup_start,
+        bucket__lt=rollup_end,
+        queue__is_deleted=False,
+        sector__is_deleted=False,
+        **dimension_filter,
+    )
+    return RollupSplit(rollups=rollups, raw_filter=raw_filter)
+
+
+def compute_rollups(bucket: datetime, project_ids: Iterable = None) -> int:
+    """
+    (Re)compute the rollups of an hour, for every project or only the given
+    ones, with one grouped query per bucketing date. Returns the rows written.
+    """
+    from chats.apps.rooms.models import Room
+
+    bucket_end = bucket + BUCKET_SIZE
+    rooms = Room.objects.filter(queue__isnull=False)
+    if project_ids is not None:
+        project_ids = list(project_ids)
+        rooms = rooms.filter(queue__sector__project__in=project_ids)
+
+    assigned = Q(user__isnull=False)
+    created_rooms = (
+        rooms.filter(created_on__gte=bucket, created_on__lt=bucket_end)
+        .values(*ROOM_DIMENSIONS)
+        .annotate(
+            opened_rooms=Count("pk"),
+            closed_assigned_rooms=Count("pk", filter=assigned & Q(is_active=False)),
+            transfer_count=Coalesce(Sum("metric__transfer_count"), 0),
+            metrics_count=Count("metric", filter=assigned),
+            waiting_time_sum=Coalesce(Sum("metric__waiting_time", filter=assigned), 0),
+            message_response_time_sum=Coalesce(
+                Sum("metric__message_response_time", filter=assigned), 0
+            ),
+            interaction_time_sum=Coalesce(
+                Sum("metric__interaction_time", filter=assigned), 0
+            ),
+        )
+    )
+
+    closed_aggregates = {"closed_rooms": Count("pk")}
+    for metric in ("first_response_time", "message_response_time", "interaction_time"):
+        positive = Q(**{f"metric__{metric}__gt": 0})
+        closed_aggregates[f"closed_{metric}_sum"] = Coalesce(
+            Sum(f"metric__{metric}", filter=positive), 0
+        )
+        closed_aggregates[f"closed_{metric}_count"] = Count("metric", filter=positive)
+
+    closed_rooms = (
+        rooms.filter(is_active=False, ended_at__gte=bucket, ended_at__lt=bucket_end)
+        .values(*ROOM_DIMENSIONS)
+        .annotate(**closed_aggregates)
+    )
+
+    rollups: Dict[tuple, RoomHourlyRollup] = {}
+    for group in (created_rooms, closed_rooms):
+        for values in group:
+            key = tuple(values.pop(dimension) for dimension in ROOM_DIMENSIONS)
+            rollup = rollups.get(key)
+            if rollup is None:
+                rollup = rollups[key] = RoomHourlyRollup(
+                    project_id=key[0],
+                    sector_id=key[1],
+                    queue_id=key[2],
+                    agent_id=key[3],
+                    bucket=bucket,
+                )
+            for field, value in values.items():
+                setattr(rollup, field, value)
+
+    with transaction.atomic():
+        stale_rollups = RoomHourlyRollup.objects.filter(bucket=bucket)
+        if project_ids is not None:
+            stale_rollups = stale_rollups.filter(project__in=project_ids)
+        stale_rollups.delete()
+        RoomHourlyRollup.objects.bulk_create(rollups.values(), batch_size=1000)
+
+    return len(rollups)
+
+
+def is_rolled_up_room_saved(room, update_fields, rollup_fields) -> bool:
+    """
+    Whether saving `update_fields` (None for every field) of the room, or of
+    a model rolled up with it, may change hours already rolled up.
+    """
+    if not is_dashboard_rollups_enabled():
+        return False
+
+    if update_fields is not None and rollup_fields.isdisjoint(update_fields):
+        return False
+
+    # Rooms created in the current hour only touch hours not rolled up yet
+    return room.created_on < truncate_to_bucket(timezone.now())
+
+
+def mark_rooms_dirty(room_pks: Iterable) -> None:
+    """
+    Flag rooms whose rolled up hours must be recomputed,
+    once the current transaction is committed.
+    """
+    if not is_dashboard_rollups_enabled():
+        return
+
+    room_pks = [str(room_pk) for room_pk in room_pks]
+    if not room_pks:
+        return
+
+    def mark():
+        try:
+            get_redis_connection().sadd(DIRTY_ROOMS_KEY, *room_pks)
+        except Exception as error:
+            logger.error("[DASHBOARD ROLLUPS] Error marking rooms dirty: %s", error)
+
+    transaction.on_commit(mark)
+
+
+def pop_dirty_rooms() -> List[str]:
+    redis_connection = get_redis_connection()
+    with redis_connection.pipeline(transaction=True) as pipeline:
+        room_pks, _ = (
+            pipeline.smembers(DIRTY_ROOMS_KEY).delete(DIRTY_ROOMS_KEY).execute()
+        )
+    return [room_pk.decode() for room_pk in room_pks]
+
+
+def get_dirty_buckets(room_pks: List[str], start: datetime, end: datetime) -> dict:
+    """
+    Map each rolled up hour, inside [start, end), touched by the rooms
+    to the projects that must be recomputed for it.
+    """
+    from chats.apps.rooms.models import Room
+
+    buckets = {}
+    rooms = (
+        Room.objects.filter(pk__in=room_pks, queue__isnull=False)
+        .values_list("queue__sector__project", "created_on", "ended_at")
+        .iterator(chunk_size=2000)
+    )
+    for project_id, created_on, ended_at in rooms:
+        for date in (created_on, ended_at):
+            if date is None:
+                continue
+            bucket = truncate_to_bucket(date)
+            if start <= bucket < end:
+                buckets.setdefault(bucket, set()).add(project_id)
+
+    return buckets
+
+
+def update_rollups(now: datetime = None) -> int:
+    """
+    Roll up the hours completed since the last run, then recompute the
+    hours touched by dirty rooms. Returns the number of hours computed.
+    """
+    current_bucket = truncate_to_bucket(now or timezone.now())
+
+    # Taken before computing, so rooms changed meanwhile stay dirty
+    dirty_room_pks = pop_dirty_rooms()
+
+    coverage = get_coverage()
+    if coverage is None:
+        coverage = RoomRollupCoverage.objects.create(
+            start=current_bucket, end=current_bucket
+        )
+
+    computed = 0
+    dirty_buckets = get_dirty_buckets(dirty_room_pks, coverage.start, coverage.end)
+    for bucket, project_ids in sorted(dirty_buckets.items()):
+        compute_rollups(bucket, project_ids)
+        computed += 1
+
+    max_buckets = settings.DASHBOARD_ROLLUPS_MAX_BUCKETS_PER_RUN
+    while coverage.end < current_bucket and max_buckets > 0:
+        compute_rollups(coverage.end)
+        coverage.end += BUCKET_SIZE
+        coverage.save(update_fields=["end"])
+        computed += 1
+        max_buckets -= 1
+
+    return computed
+
+
+def backfill_rollups(start: datetime) -> int:
+    """
+    Extend the rollups backwards, hour by hour, down to `start`.
+    Returns the number of hours computed.
+    """
+    start = truncate_to_bucket(start)
+    coverage = get_coverage()
+    if coverage is None:
+        current_bucket = truncate_to_bucket(timezone.now())
+        coverage = RoomRollupCoverage.objects.create(
+            start=current_bucket, end=current_bucket
+        )
+
+    computed = 0
+    while coverage.start > start:
+        bucket = coverage.start - BUCKET_SIZE
+        compute_rollups(bucket)
+        coverage.start = bucket
+        coverage.save(update_fields=["start"])
+        computed += 1
+
+    return computed
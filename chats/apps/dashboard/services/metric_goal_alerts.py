@@ -1,8 +1,9 @@
 """Detect Metric Goal violations and drive the Redis state machine.
 
 The service is invoked by a Celery beat sweep every 30 seconds. For each
-metric type, we iterate over the configured (and active) ``MetricGoal``
-rows and run a small aggregate query against ``rooms_room``. Results are
+metric type, a single aggregate query against ``rooms_room``, joined to
+the configured (and active) ``MetricGoal`` rows for their thresholds,
+returns the violating rooms of every project at once. Results are
 compared against the previous state stored in Redis so we can identify
 transitions and dispatch WebSocket broadcasts and emails accordingly.
 
@@ -20,11 +21,16 @@ Two independent Redis state machines run in parallel:
    ``email_enabled`` is true and ``violating_count`` crosses into
    ``>= rooms_threshold_count``. Dropping below that count clears the
    toast state so the next climb back to the threshold fires again.
+
+The projects currently in each state are indexed per metric in Redis
+sorted sets, scored by the expiration of their state key, so a sweep
+never has to scan the keyspace.
 """
 
 from __future__ import annotations
 
 import logging
+import time
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from math import ceil
@@ -32,7 +38,18 @@ from typing import Dict, Iterable, List, Set
 
 from django.conf import settings
 from django.core.cache import cache
-from django.db.models import Count, Exists, Max, OuterRef
+from django.db.models import (
+    Count,
+    DateTimeField,
+    DurationField,
+    Exists,
+    ExpressionWrapper,
+    F,
+    Max,
+    OuterRef,
+    QuerySet,
+    Value,
+)
 from django.utils import timezone
 from django_redis import get_redis_connection
 from weni.feature_flags.shortcuts import is_feature_active_for_attributes
@@ -96,6 +113,8 @@ DEFAULT_STATE_TTL_SECONDS = 30 * 60
 
 STATE_KEY_TEMPLATE = "metric_goal_state:{project_uuid}:{metric}"
 ALERT_STATE_KEY_TEMPLATE = "metric_goal_alert_state:{project_uuid}:{metric}"
+STATE_INDEX_KEY_TEMPLATE = "metric_goal_state_index:{metric}"
+ALERT_STATE_INDEX_KEY_TEMPLATE = "metric_goal_alert_state_index:{metric}"
 
 
 TRANSITION_NEW = "new"
@@ -149,24 +168,13 @@ class Violation:
         }
 
 
-def _build_violation_queryset(metric: str, project_uuid: str, cutoff: datetime):
-    """Return the queryset of rooms currently violating the metric.
+def _filter_violating_rooms(rooms: QuerySet, metric: str, cutoff) -> QuerySet:
+    """Narrow active ``rooms`` down to the ones violating the metric.
 
-    Rooms are scoped to the project via ``queue__sector__project`` (the
-    same join used by ``MetricGoalBreachService``) instead of the
-    denormalized ``Room.project_uuid`` field. That field is only
-    populated by one of the room-creation paths (the Flows external
-    integration), so filtering by it silently excludes rooms created
-    through any other path (API v2, transfers, discussions, etc.),
-    undercounting violations and causing thresholds to behave
-    inconsistently with what the dashboard shows.
+    ``cutoff`` is either a datetime or an expression resolving to one.
     """
-    base = Room.objects.filter(
-        queue__sector__project__uuid=project_uuid, is_active=True
-    )
-
     if metric == MetricGoal.METRIC_WAITING_TIME:
-        return base.filter(
+        return rooms.filter(
             user__isnull=True,
             added_to_queue_at__isnull=False,
             added_to_queue_at__lte=cutoff,
@@ -177,20 +185,17 @@ def _build_violation_queryset(metric: str, project_uuid: str, cutoff: datetime):
             room=OuterRef("pk"),
             first_response_time__gt=0,
         )
-        return (
-            base.filter(
-                user__isnull=False,
-                first_user_assigned_at__isnull=False,
-                first_user_assigned_at__lte=cutoff,
-            )
-            .annotate(has_responded=Exists(responded))
-            .filter(has_responded=False)
+        return rooms.filter(
+            ~Exists(responded),
+            user__isnull=False,
+            first_user_assigned_at__isnull=False,
+            first_user_assigned_at__lte=cutoff,
         )
 
     if metric == MetricGoal.METRIC_CONVERSATION_DURATION:
         # Must match MetricGoalBreachService / TimeMetricsService: only
         # rooms currently assigned to an agent count as "in conversation".
-        return base.filter(
+        return rooms.filter(
             user__isnull=False,
             first_user_assigned_at__isnull=False,
             first_user_assigned_at__lte=cutoff,
@@ -199,6 +204,56 @@ def _build_violation_queryset(metric: str, project_uuid: str, cutoff: datetime):
     raise ValueError(f"Unknown metric: {metric}")
 
 
+def _build_violations_queryset(
+    metric: str, project_uuids: List[str], now: datetime
+) -> QuerySet:
+    """Return the violating rooms count and oldest age field per project.
+
+    Each room is joined to its project's goal for ``metric`` (at most one,
+    see ``unique_project_metric_goal``) and compared to the cutoff derived
+    from that goal's ``threshold_seconds``, so every project is evaluated
+    by the same grouped query.
+
+    Rooms are scoped to a project via ``queue__sector__project`` (the
+    same join used by ``MetricGoalBreachService``) instead of the
+    denormalized ``Room.project_uuid`` field. That field is only
+    populated by one of the room-creation paths (the Flows external
+    integration), so filtering by it silently excludes rooms created
+    through any other path (API v2, transfers, discussions, etc.),
+    undercounting violations and causing thresholds to behave
+    inconsistently with what the dashboard shows.
+    """
+    rooms = (
+        Room.objects.filter(
+            queue__sector__project__uuid__in=project_uuids,
+            queue__sector__project__metric_goals__metric=metric,
+            queue__sector__project__metric_goals__is_active=True,
+            is_active=True,
+        )
+        # Declared after the filter above so it reuses its goal join
+        .alias(
+            goal_threshold_seconds=F(
+                "queue__sector__project__metric_goals__threshold_seconds"
+            )
+        )
+    )
+    cutoff = ExpressionWrapper(
+        Value(now)
+        - ExpressionWrapper(
+            F("goal_threshold_seconds") * Value(timedelta(seconds=1)),
+            output_field=DurationField(),
+        ),
+        output_field=DateTimeField(),
+    )
+
+    return (
+        _filter_violating_rooms(rooms, metric, cutoff)
+        .values("queue__sector__project__uuid")
+        .annotate(count=Count("uuid"), oldest=Max(_max_age_field(metric)))
+        .order_by()
+    )
+
+
 def _max_age_field(metric: str) -> str:
     if metric == MetricGoal.METRIC_WAITING_TIME:
         return "added_to_queue_at"
@@ -232,9 +287,9 @@ def detect_violations(
 ) -> List[Violation]:
     """Return the list of projects currently violating ``metric``.
 
-    One small aggregate query is issued per configured ``MetricGoal``.
-    With ~230 active projects this stays well within the planner's
-    sweet spot and keeps query shapes index-friendly.
+    The violating rooms of every project with an active goal are counted
+    by one grouped query (see ``_build_violations_queryset``), plus one
+    query for the active rooms count when a goal uses a percent threshold.
 
     A project is included as soon as at least one room breaches
     ``threshold_seconds``. ``process_violations`` then drives the widget
@@ -242,8 +297,8 @@ def detect_violations(
     for toast and email notifications.
     """
     now = now or timezone.now()
-    goals = [
-        goal
+    goals = {
+        str(goal["project__uuid"]): goal
         for goal in MetricGoal.objects.filter(metric=metric, is_active=True).values(
             "project__uuid",
             "threshold_seconds",
@@ -252,27 +307,21 @@ def detect_violations(
             "email_enabled",
         )
         if is_metric_goal_alerts_enabled(str(goal["project__uuid"]))
-    ]
+    }
     if not goals:
         return []
 
-    project_uuids = [str(g["project__uuid"]) for g in goals]
-    needs_active_count = any(g["rooms_threshold_percent"] for g in goals)
+    needs_active_count = any(g["rooms_threshold_percent"] for g in goals.values())
     active_counts = (
-        _project_active_room_counts(project_uuids) if needs_active_count else {}
+        _project_active_room_counts(list(goals)) if needs_active_count else {}
     )
 
-    age_field = _max_age_field(metric)
     violations: List[Violation] = []
 
-    for goal in goals:
-        project_uuid = str(goal["project__uuid"])
-        threshold_seconds = goal["threshold_seconds"]
-        cutoff = now - timedelta(seconds=threshold_seconds)
-
-        qs = _build_violation_queryset(metric, project_uuid, cutoff)
-        agg = qs.aggregate(count=Count("uuid"), oldest=Max(age_field))
-        violating_count = agg["count"] or 0
+    for row in _build_violations_queryset(metric, list(goals), now):
+        project_uuid = str(row["queue__sector__project__uuid"])
+        goal = goals[project_uuid]
+        violating_count = row["count"]
 
         if violating_count == 0:
             continue
@@ -280,7 +329,7 @@ def detect_violations(
         active_count = active_counts.get(project_uuid)
         threshold_count = _resolve_threshold_count(goal, active_count)
 
-        oldest = agg["oldest"]
+        oldest = row["oldest"]
         max_age = int((now - oldest).total_seconds()) if oldest else 0
 
         violations.append(
@@ -289,7 +338,7 @@ def detect_violations(
                 metric=metric,
                 violating_count=violating_count,
                 max_value_seconds=max_age,
-                threshold_seconds=threshold_seconds,
+                threshold_seconds=goal["threshold_seconds"],
                 rooms_threshold_count=threshold_count,
                 rooms_threshold_percent=goal["rooms_threshold_percent"],
                 active_rooms_count=active_count,
@@ -311,13 +360,29 @@ def _alert_state_key(project_uuid: str, metric: str) -> str:
     )
 
 
-def _claim_key(redis_conn, key: str, value: str, ttl_seconds: int) -> bool:
-    """SET NX + refresh TTL. Returns True when the key was newly created."""
+def _claim_key(
+    redis_conn,
+    key: str,
+    value: str,
+    ttl_seconds: int,
+    index_key: str,
+    project_uuid: str,
+) -> bool:
+    """SET NX + refresh TTL. Returns True when the key was newly created.
+
+    The project is (re)indexed with the key's expiration as its score.
+    """
     was_set = redis_conn.set(key, value, nx=True, ex=ttl_seconds)
-    if was_set:
-        return True
-    redis_conn.expire(key, ttl_seconds)
-    return False
+    if not was_set:
+        redis_conn.expire(key, ttl_seconds)
+    redis_conn.zadd(index_key, {project_uuid: time.time() + ttl_seconds})
+    return bool(was_set)
+
+
+def _clear_key(redis_conn, key: str, index_key: str, project_uuid: str) -> bool:
+    """Remove a state key and its index entry."""
+    redis_conn.zrem(index_key, project_uuid)
+    return bool(redis_conn.delete(key))
 
 
 def _claim_state(
@@ -325,7 +390,12 @@ def _claim_state(
 ) -> bool:
     """Mark (project, metric) as violating (any room in breach)."""
     return _claim_key(
-        redis_conn, _state_key(project_uuid, metric), STATE_VIOLATING, ttl_seconds
+        redis_conn,
+        _state_key(project_uuid, metric),
+        STATE_VIOLATING,
+        ttl_seconds,
+        STATE_INDEX_KEY_TEMPLATE.format(metric=metric),
+        project_uuid,
     )
 
 
@@ -338,41 +408,54 @@ def _claim_alert_state(
         _alert_state_key(project_uuid, metric),
         STATE_ALERTING,
         ttl_seconds,
+        ALERT_STATE_INDEX_KEY_TEMPLATE.format(metric=metric),
+        project_uuid,
     )
 
 
 def _clear_state(redis_conn, project_uuid: str, metric: str) -> bool:
     """Remove the violating state key."""
-    return bool(redis_conn.delete(_state_key(project_uuid, metric)))
+    return _clear_key(
+        redis_conn,
+        _state_key(project_uuid, metric),
+        STATE_INDEX_KEY_TEMPLATE.format(metric=metric),
+        project_uuid,
+    )
 
 
 def _clear_alert_state(redis_conn, project_uuid: str, metric: str) -> bool:
     """Remove the toast/email alerting state key."""
-    return bool(redis_conn.delete(_alert_state_key(project_uuid, metric)))
-
-
-def _keys_for_metric(redis_conn, template: str, metric: str) -> Set[str]:
-    """List ``project_uuid`` values currently flagged for ``template``."""
-    pattern = template.format(project_uuid="*", metric=metric)
-    project_uuids: Set[str] = set()
-    for raw in redis_conn.scan_iter(match=pattern):
-        key = raw.decode() if isinstance(raw, bytes) else raw
-        try:
-            project_uuid = key.split(":")[1]
-        except IndexError:
-            continue
-        project_uuids.add(project_uuid)
-    return project_uuids
+    return _clear_key(
+        redis_conn,
+        _alert_state_key(project_uuid, metric),
+        ALERT_STATE_INDEX_KEY_TEMPLATE.format(metric=metric),
+        project_uuid,
+    )
+
+
+def _keys_for_metric(redis_conn, index_template: str, metric: str) -> Set[str]:
+    """List ``project_uuid`` values currently indexed for ``index_template``.
+
+    Entries whose state key already expired are pruned, matching what a
+    keyspace scan would have found.
+    """
+    index_key = index_template.format(metric=metric)
+    now = time.time()
+    redis_conn.zremrangebyscore(index_key, "-inf", now)
+    return {
+        raw.decode() if isinstance(raw, bytes) else raw
+        for raw in redis_conn.zrangebyscore(index_key, now, "+inf")
+    }
 
 
 def _violating_keys_for_metric(redis_conn, metric: str) -> Set[str]:
     """List ``project_uuid`` values currently flagged as violating."""
-    return _keys_for_metric(redis_conn, STATE_KEY_TEMPLATE, metric)
+    return _keys_for_metric(redis_conn, STATE_INDEX_KEY_TEMPLATE, metric)
 
 
 def _alerting_keys_for_metric(redis_conn, metric: str) -> Set[str]:
     """List ``project_uuid`` values currently flagged for toast/email."""
-    return _keys_for_metric(redis_conn, ALERT_STATE_KEY_TEMPLATE, metric)
+    return _keys_for_metric(redis_conn, ALERT_STATE_INDEX_KEY_TEMPLATE, metric)
 
 
 @dataclass(frozen=True)
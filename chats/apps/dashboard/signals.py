@@ -1,8 +1,15 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
-from chats.apps.dashboard.models import ReportStatus
+from chats.apps.dashboard.models import ReportStatus, RoomMetrics
+from chats.apps.dashboard.rollups import (
+    ROOM_METRICS_ROLLUP_FIELDS,
+    ROOM_ROLLUP_FIELDS,
+    is_rolled_up_room_saved,
+    mark_rooms_dirty,
+)
 from chats.apps.dashboard.usecases import InvalidateReportStatusCacheUseCase
+from chats.apps.rooms.models import Room
 
 
 @receiver(post_save, sender=ReportStatus)
@@ -10,3 +17,17 @@ def invalidate_report_status_cache_on_save(sender, instance, **kwargs):
     InvalidateReportStatusCacheUseCase().execute(
         project_uuid=str(instance.project_id),
     )
+
+
+@receiver(post_save, sender=Room)
+def mark_room_rollups_dirty(sender, instance, update_fields=None, **kwargs):
+    if is_rolled_up_room_saved(instance, update_fields, ROOM_ROLLUP_FIELDS):
+        mark_rooms_dirty([instance.pk])
+
+
+@receiver(post_save, sender=RoomMetrics)
+def mark_room_metrics_rollups_dirty(sender, instance, update_fields=None, **kwargs):
+    if is_rolled_up_room_saved(
+        instance.room, update_fields, ROOM_METRICS_ROLLUP_FIELDS
+    ):
+        mark_rooms_dirty([instance.room_id])
@@ -1,23 +1,31 @@
 import io
 import logging
 import os
+import shutil
 import tempfile
+import tracemalloc
 import zipfile
+from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional
+from typing import BinaryIO, List, Optional
 from uuid import UUID
 
 import pandas as pd
+import xlsxwriter
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.base import ContentFile
 from django.core.mail import EmailMultiAlternatives
 from django.db import transaction
+from django.db.models import F, Q
 
+from chats.apps.api.v1.prometheus.metrics import report_peak_memory_bytes
 from chats.apps.dashboard.email_templates import (
     get_metric_goal_alert_email,
     get_report_ready_email,
 )
 from chats.apps.dashboard.models import MetricGoal, ReportStatus, RoomMetrics
+from chats.apps.dashboard.rollups import is_dashboard_rollups_enabled, update_rollups
 from chats.apps.dashboard.services.metric_goal_alerts import (
     Violation,
     is_metric_goal_alerts_enabled,
@@ -27,6 +35,8 @@ from chats.apps.dashboard.utils import (
     calculate_first_response_time,
     calculate_last_queue_waiting_time,
     calculate_response_time,
+    get_average_response_time,
+    is_incremental_response_time_enabled,
 )
 from chats.apps.projects.models import Project
 from chats.apps.rooms.models import Room
@@ -103,7 +113,7 @@ def _save_report_locally(
     report_buffer.seek(0)
     file_path = os.path.join(base_dir, filename)
     with open(file_path, "wb") as f:
-        f.write(report_buffer.getvalue())
+        shutil.copyfileobj(report_buffer, f)
     return file_path
 
 
@@ -217,109 +227,241 @@ def _write_chunk_to_part(
     storage.save(part_name, ContentFile(csv_content.encode("utf-8")))
 
 
+REPORT_COPY_CHUNK_SIZE = 1024 * 1024
+
+# Stable ordering used to page report tables with keyset pagination
+REPORT_CURSOR_CREATED_ON = "report_cursor_created_on"
+REPORT_CURSOR_PK = "report_cursor_pk"
+
+
+def _get_parts_cursor(report, prefix: str) -> dict:
+    if report is None:
+        return {}
+    return (report.parts_cursor or {}).get(prefix) or {}
+
+
+def _save_parts_cursor(report, prefix: str, cursor: dict) -> None:
+    """Records the parts written so far, after the last part was saved."""
+    from django.utils import timezone as dj_timezone
+
+    if report is None:
+        return
+
+    report.parts_cursor = {**(report.parts_cursor or {}), prefix: cursor}
+    ReportStatus.objects.filter(pk=report.pk).update(
+        parts_cursor=report.parts_cursor, modified_on=dj_timezone.now()
+    )
+
+
+def _reset_parts_cursor(report) -> None:
+    report.parts_cursor = {}
+    ReportStatus.objects.filter(pk=report.pk).update(parts_cursor={})
+
+
+def _discard_unrecorded_parts(
+    storage: ExcelStorage, parts_dir: str, prefix: str, parts_count: int
+) -> None:
+    """
+    Deletes parts that are not recorded in the cursor, e.g. a part written
+    right before a worker crash, so they are not duplicated on resume.
+    """
+    recorded = {
+        f"{parts_dir}/{prefix}.part{part_idx:06d}.csv"
+        for part_idx in range(parts_count)
+    }
+    for part_path in _list_existing_parts(storage, parts_dir, prefix):
+        if part_path not in recorded:
+            storage.delete(part_path)
+
+
+def _fetch_page(queryset, last_key: Optional[tuple], chunk_size: int) -> List[dict]:
+    """
+    Fetches the rows after `last_key`, seeking on (created_on, pk) instead
+    of using an OFFSET, with a server-side cursor where the database allows.
+    """
+    page = queryset
+    if last_key is not None:
+        last_created_on, last_pk = last_key
+        page = page.filter(
+            Q(created_on__gt=last_created_on)
+            | Q(created_on=last_created_on, pk__gt=last_pk)
+        )
+
+    rows = list(page[:chunk_size].iterator(chunk_size=chunk_size))
+
+    if len(rows) == chunk_size:
+        # Lookups on multi-valued relations return a row per related object,
+        # so the rows of the last record may continue in the next page
+        last_pk = rows[-1][REPORT_CURSOR_PK]
+        rows = [row for row in rows if row[REPORT_CURSOR_PK] != last_pk]
+        rows.extend(queryset.filter(pk=last_pk).iterator(chunk_size=chunk_size))
+
+    return rows
+
+
 def _write_parts_from_queryset(
     storage: ExcelStorage,
     parts_dir: str,
     queryset,
     chunk_size: int,
-    completed_parts_count: int,
     prefix: str,
     project_tz=None,
     report=None,
 ) -> None:
-    """Writes queryset data as CSV parts, resuming from completed_parts_count."""
-    from django.utils import timezone as dj_timezone
-
-    if not queryset.query.order_by:
-        queryset = queryset.order_by("pk")
-
-    total_rows = queryset.count()
-    if total_rows == 0:
+    """
+    Writes queryset data as CSV parts, resuming after the last part
+    recorded in the report parts cursor.
+    """
+    cursor = _get_parts_cursor(report, prefix)
+    if cursor.get("done"):
         return
 
-    resume_offset = completed_parts_count * chunk_size
-    part_index = completed_parts_count
-    header_written = completed_parts_count > 0
+    part_index = cursor.get("parts", 0)
+    _discard_unrecorded_parts(storage, parts_dir, prefix, part_index)
 
-    for start in range(resume_offset, total_rows, chunk_size):
-        end = min(start + chunk_size, total_rows)
+    last_key = None
+    if part_index > 0:
+        last_key = (datetime.fromisoformat(cursor["created_on"]), cursor["pk"])
         logging.info(
-            "Writing %s part: start=%s end=%s total=%s part_index=%s",
-            prefix,
-            start,
-            end,
-            total_rows,
-            part_index,
+            "Resuming %s parts from part %s after %s", prefix, part_index, last_key
         )
-        rows = _strip_tz(list(queryset[start:end]), project_tz)
+
+    queryset = queryset.annotate(
+        **{
+            REPORT_CURSOR_CREATED_ON: F("created_on"),
+            REPORT_CURSOR_PK: F("pk"),
+        }
+    ).order_by("created_on", "pk")
+
+    while True:
+        rows = _fetch_page(queryset, last_key, chunk_size)
         if not rows:
-            continue
+            break
+
+        last_key = (rows[-1][REPORT_CURSOR_CREATED_ON], rows[-1][REPORT_CURSOR_PK])
+        for row in rows:
+            row.pop(REPORT_CURSOR_CREATED_ON)
+            row.pop(REPORT_CURSOR_PK)
 
+        logging.info(
+            "Writing %s part: rows=%s part_index=%s", prefix, len(rows), part_index
+        )
+        rows = _strip_tz(rows, project_tz)
         df = _excel_safe_dataframe(pd.DataFrame(rows), project_tz)
         _write_chunk_to_part(
-            storage, parts_dir, part_index, df, not header_written, prefix
+            storage, parts_dir, part_index, df, part_index == 0, prefix
         )
-        header_written = True
         part_index += 1
 
-        if report is not None:
-            ReportStatus.objects.filter(pk=report.pk).update(
-                modified_on=dj_timezone.now()
-            )
+        _save_parts_cursor(
+            report,
+            prefix,
+            {
+                "parts": part_index,
+                "created_on": last_key[0].isoformat(),
+                "pk": str(last_key[1]),
+            },
+        )
+
+    _save_parts_cursor(
+        report, prefix, {**_get_parts_cursor(report, prefix), "done": True}
+    )
 
 
-def _read_part_content(storage: ExcelStorage, part_path: str) -> str:
-    """Reads content from a part file."""
+def _read_part_dataframe(
+    storage: ExcelStorage,
+    part_path: str,
+    has_header: bool,
+    column_names: Optional[List[str]] = None,
+) -> Optional[pd.DataFrame]:
+    """
+    Parses a part file straight from storage.
+    Part 0 has the header row; parts 1+ are read with `column_names`.
+    Returns None for empty parts.
+    """
     with storage.open(part_path, "rb") as f:
-        return f.read().decode("utf-8")
+        try:
+            if has_header:
+                return pd.read_csv(f)
+            return pd.read_csv(f, header=None, names=column_names)
+        except pd.errors.EmptyDataError:
+            return None
+
+
+# Header style applied by DataFrame.to_excel
+EXCEL_HEADER_FORMAT = {
+    "bold": True,
+    "top": 1,
+    "right": 1,
+    "bottom": 1,
+    "left": 1,
+    "align": "center",
+    "valign": "top",
+}
+
+
+def _excel_cell_value(value):
+    """Converts a dataframe value the same way DataFrame.to_excel does."""
+    if pd.isna(value):
+        return None
+    if pd.api.types.is_bool(value):
+        return bool(value)
+    if pd.api.types.is_integer(value):
+        return int(value)
+    if pd.api.types.is_float(value):
+        if value == float("inf"):
+            return "inf"
+        if value == float("-inf"):
+            return "-inf"
+        return float(value)
+    return value
 
 
 def _combine_parts_to_sheet(
     storage: ExcelStorage,
-    writer,
+    workbook,
+    header_format,
     part_paths: List[str],
     sheet_name: str,
     config: dict,
 ) -> None:
-    """Combines CSV parts into an Excel sheet.
+    """Streams CSV parts into an Excel sheet, row by row.
 
-    Part 0 has the header row; parts 1+ contain only data rows.
+    The workbook is written in constant memory mode, so rows must be
+    written in order and only the current part is held in memory.
     """
     if not part_paths:
         requested_fields = config.get("fields") or []
-        pd.DataFrame(columns=requested_fields).to_excel(
-            writer, sheet_name=sheet_name, index=False
-        )
+        worksheet = workbook.add_worksheet(sheet_name)
+        worksheet.write_row(0, 0, requested_fields, header_format)
         return
 
+    worksheet = None
     current_row = 0
     column_names = None
 
     for index, path in enumerate(part_paths):
-        content = _read_part_content(storage, path)
-        if not content or not content.strip():
+        df = _read_part_dataframe(storage, path, index == 0, column_names)
+        if df is None:
             continue
 
         if index == 0:
-            df = pd.read_csv(io.StringIO(content))
             column_names = df.columns.tolist()
-        else:
-            df = pd.read_csv(io.StringIO(content), header=None, names=column_names)
 
         if df.empty:
             continue
 
-        is_first_write = current_row == 0
-        df.to_excel(
-            writer,
-            sheet_name=sheet_name,
-            index=False,
-            header=is_first_write,
-            startrow=current_row,
-        )
-        if is_first_write:
+        if worksheet is None:
+            worksheet = workbook.add_worksheet(sheet_name)
+            worksheet.write_row(0, 0, df.columns.tolist(), header_format)
             current_row = 1
-        current_row += len(df)
+
+        for values in df.itertuples(index=False, name=None):
+            for column, value in enumerate(values):
+                value = _excel_cell_value(value)
+                if value is not None:
+                    worksheet.write(current_row, column, value)
+            current_row += 1
 
 
 def _finalize_from_all_parts(
@@ -330,15 +472,37 @@ def _finalize_from_all_parts(
     rooms_config: dict,
     agent_config: dict,
     project_tz=None,
-) -> bytes:
-    """Finalizes report from parts of both tables."""
-    if file_type == "xlsx":
-        return _finalize_xlsx_from_all_parts(
-            storage, room_part_paths, agent_part_paths, rooms_config, agent_config
-        )
-    return _finalize_csv_from_all_parts(
-        storage, room_part_paths, agent_part_paths, rooms_config, agent_config
-    )
+) -> BinaryIO:
+    """
+    Finalizes report from parts of both tables into a temporary file,
+    returned rewound. The caller must close it.
+    """
+    report_file = tempfile.TemporaryFile()
+    try:
+        if file_type == "xlsx":
+            _finalize_xlsx_from_all_parts(
+                storage,
+                room_part_paths,
+                agent_part_paths,
+                rooms_config,
+                agent_config,
+                report_file,
+            )
+        else:
+            _finalize_csv_from_all_parts(
+                storage,
+                room_part_paths,
+                agent_part_paths,
+                rooms_config,
+                agent_config,
+                report_file,
+            )
+    except Exception:
+        report_file.close()
+        raise
+
+    report_file.seek(0)
+    return report_file
 
 
 def _finalize_xlsx_from_all_parts(
@@ -347,47 +511,48 @@ def _finalize_xlsx_from_all_parts(
     agent_part_paths: List[str],
     rooms_config: dict,
     agent_config: dict,
-) -> bytes:
+    destination: BinaryIO,
+) -> None:
     """Combines CSV parts from both tables into a final XLSX file."""
-    _, xlsx_temp_path = tempfile.mkstemp(suffix=".xlsx")
-    try:
-        with pd.ExcelWriter(xlsx_temp_path, engine="xlsxwriter") as writer:
-            if rooms_config:
-                _combine_parts_to_sheet(
-                    storage, writer, room_part_paths, "rooms", rooms_config
-                )
-            if agent_config:
-                _combine_parts_to_sheet(
-                    storage, writer, agent_part_paths, "agent_status_logs", agent_config
-                )
+    workbook = xlsxwriter.Workbook(destination, {"constant_memory": True})
+    header_format = workbook.add_format(EXCEL_HEADER_FORMAT)
 
-        with open(xlsx_temp_path, "rb") as f:
-            return f.read()
-    finally:
-        try:
-            os.unlink(xlsx_temp_path)
-        except OSError:
-            pass
+    if rooms_config:
+        _combine_parts_to_sheet(
+            storage, workbook, header_format, room_part_paths, "rooms", rooms_config
+        )
+    if agent_config:
+        _combine_parts_to_sheet(
+            storage,
+            workbook,
+            header_format,
+            agent_part_paths,
+            "agent_status_logs",
+            agent_config,
+        )
 
+    workbook.close()
 
-def _stream_parts_to_csv_file(
-    storage: ExcelStorage, part_paths: List[str], config: dict, destination_path: str
+
+def _stream_parts_to_file(
+    storage: ExcelStorage, part_paths: List[str], config: dict, destination: BinaryIO
 ) -> None:
-    """Streams CSV parts directly to a file, one part at a time in memory."""
-    with open(destination_path, "w", encoding="utf-8") as f:
-        if not part_paths:
-            requested_fields = config.get("fields") or []
-            if requested_fields:
-                f.write(",".join(requested_fields) + "\n")
-            return
-
-        for path in part_paths:
-            content = _read_part_content(storage, path)
-            if not content:
-                continue
-            f.write(content)
-            if not content.endswith("\n"):
-                f.write("\n")
+    """Streams CSV parts to a binary file, without loading whole parts."""
+    if not part_paths:
+        requested_fields = config.get("fields") or []
+        if requested_fields:
+            destination.write((",".join(requested_fields) + "\n").encode("utf-8"))
+        return
+
+    for path in part_paths:
+        ends_with_newline = True
+        with storage.open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(REPORT_COPY_CHUNK_SIZE), b""):
+                destination.write(chunk)
+                ends_with_newline = chunk.endswith(b"\n")
+
+        if not ends_with_newline:
+            destination.write(b"\n")
 
 
 def _finalize_csv_from_all_parts(
@@ -396,43 +561,49 @@ def _finalize_csv_from_all_parts(
     agent_part_paths: List[str],
     rooms_config: dict,
     agent_config: dict,
-) -> bytes:
+    destination: BinaryIO,
+) -> None:
     """Combines CSV parts from both tables into a final ZIP file.
 
-    Uses temp files so only one part is held in memory at a time.
+    Parts are streamed straight into the archive entries.
     """
-    _, zip_temp_path = tempfile.mkstemp(suffix=".zip")
-    csv_temp_paths = []
-    try:
-        with zipfile.ZipFile(zip_temp_path, "w", zipfile.ZIP_DEFLATED) as archive:
-            if rooms_config:
-                _, rooms_csv_path = tempfile.mkstemp(suffix=".csv")
-                csv_temp_paths.append(rooms_csv_path)
-                _stream_parts_to_csv_file(
-                    storage, room_part_paths, rooms_config, rooms_csv_path
+    with zipfile.ZipFile(destination, "w", zipfile.ZIP_DEFLATED) as archive:
+        if rooms_config:
+            with archive.open("rooms.csv", "w") as rooms_csv:
+                _stream_parts_to_file(
+                    storage, room_part_paths, rooms_config, rooms_csv
                 )
-                archive.write(rooms_csv_path, "rooms.csv")
 
-            if agent_config:
-                _, agent_csv_path = tempfile.mkstemp(suffix=".csv")
-                csv_temp_paths.append(agent_csv_path)
-                _stream_parts_to_csv_file(
-                    storage, agent_part_paths, agent_config, agent_csv_path
+        if agent_config:
+            with archive.open("agent_status_logs.csv", "w") as agent_csv:
+                _stream_parts_to_file(
+                    storage, agent_part_paths, agent_config, agent_csv
                 )
-                archive.write(agent_csv_path, "agent_status_logs.csv")
 
-        with open(zip_temp_path, "rb") as f:
-            return f.read()
+
+@contextmanager
+def _track_report_peak_memory(report, file_type: str):
+    """Records the peak memory allocated while generating the report."""
+    if not settings.REPORTS_TRACK_PEAK_MEMORY:
+        yield
+        return
+
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    elif hasattr(tracemalloc, "reset_peak"):
+        # Python 3.9+, before it the peak may predate the report
+        tracemalloc.reset_peak()
+
+    try:
+        yield
     finally:
-        for temp_path in csv_temp_paths:
-            try:
-                os.unlink(temp_path)
-            except OSError:
-                pass
-        try:
-            os.unlink(zip_temp_path)
-        except OSError:
-            pass
+        _, peak = tracemalloc.get_traced_memory()
+        if not was_tracing:
+            tracemalloc.stop()
+
+        report_peak_memory_bytes.labels(file_type=file_type).observe(peak)
+        logging.info("Report %s peak memory: %s bytes", report.uuid, peak)
 
 
 def generate_metrics(room_uuid: UUID):
@@ -443,7 +614,11 @@ def generate_metrics(room_uuid: UUID):
     room = Room.objects.get(uuid=room_uuid)
 
     metric_room = RoomMetrics.objects.get_or_create(room=room)[0]
-    metric_room.message_response_time = calculate_response_time(room)
+
+    if is_incremental_response_time_enabled() and metric_room.response_time_tracked:
+        metric_room.message_response_time = get_average_response_time(metric_room)
+    else:
+        metric_room.message_response_time = calculate_response_time(room)
 
     if not room.is_active and room.first_user_assigned_at and room.ended_at:
         metric_room.interaction_time = (
@@ -495,6 +670,27 @@ def calculate_first_response_time_task(room_uuid: UUID):
         )
 
 
+@app.task(name="update_dashboard_rollups")
+def update_dashboard_rollups():
+    """
+    Roll up the room hours completed since the last run and recompute
+    the hours of rooms changed after being rolled up.
+    """
+    if not is_dashboard_rollups_enabled():
+        return
+
+    lock_key = "dashboard_rollups:lock"
+    if not cache.add(lock_key, True, timeout=settings.CELERY_TASK_TIME_LIMIT):
+        logger.info("[DASHBOARD ROLLUPS] Rollups update already running")
+        return
+
+    try:
+        computed = update_rollups()
+        logger.info("[DASHBOARD ROLLUPS] %s hours rolled up", computed)
+    finally:
+        cache.delete(lock_key)
+
+
 def _write_model_to_xlsx(writer, model_name: str, model_data: dict, project_tz=None):
     if not model_data:
         return
@@ -670,22 +866,11 @@ def _process_report_with_resume(report, report_validator, available_fields, proj
         rooms_queryset = (processed or {}).get("queryset")
 
         if rooms_queryset is not None:
-            completed_room_parts = _list_existing_parts(storage, parts_dir, "rooms")
-            completed_room_count = len(completed_room_parts)
-
-            if completed_room_count > 0:
-                logging.info(
-                    "Resuming report %s rooms from part %s",
-                    report.uuid,
-                    completed_room_count,
-                )
-
             _write_parts_from_queryset(
                 storage,
                 parts_dir,
                 rooms_queryset,
                 chunk_size,
-                completed_room_count,
                 "rooms",
                 project_tz,
                 report=report,
@@ -699,24 +884,11 @@ def _process_report_with_resume(report, report_validator, available_fields, proj
         agent_queryset = (processed or {}).get("queryset")
 
         if agent_queryset is not None:
-            completed_agent_parts = _list_existing_parts(
-                storage, parts_dir, "agent_status_logs"
-            )
-            completed_agent_count = len(completed_agent_parts)
-
-            if completed_agent_count > 0:
-                logging.info(
-                    "Resuming report %s agent_status_logs from part %s",
-                    report.uuid,
-                    completed_agent_count,
-                )
-
             _write_parts_from_queryset(
                 storage,
                 parts_dir,
                 agent_queryset,
                 chunk_size,
-                completed_agent_count,
                 "agent_status_logs",
                 project_tz,
                 report=report,
@@ -725,7 +897,7 @@ def _process_report_with_resume(report, report_validator, available_fields, proj
     room_part_paths = _list_existing_parts(storage, parts_dir, "rooms")
     agent_part_paths = _list_existing_parts(storage, parts_dir, "agent_status_logs")
 
-    final_bytes = _finalize_from_all_parts(
+    report_file = _finalize_from_all_parts(
         storage,
         room_part_paths,
         agent_part_paths,
@@ -736,8 +908,10 @@ def _process_report_with_resume(report, report_validator, available_fields, proj
     )
 
     _cleanup_parts(storage, parts_dir)
+    # The parts are gone, a retry must generate them again
+    _reset_parts_cursor(report)
 
-    return io.BytesIO(final_bytes), file_type
+    return report_file, file_type
 
 
 def _save_and_send_report(report, report_buffer, file_type, user_email):
@@ -833,11 +1007,16 @@ def process_pending_reports():
         report_validator = ReportFieldsValidatorViewSet()
         available_fields = ModelFieldsPresenter.get_models_info()
 
-        report_buffer, file_type = _process_report_with_resume(
-            report, report_validator, available_fields, project_tz
-        )
+        file_type = _norm_file_type((report.fields_config or {}).get("type"))
+        with _track_report_peak_memory(report, file_type):
+            report_file, file_type = _process_report_with_resume(
+                report, report_validator, available_fields, project_tz
+            )
 
-        _save_and_send_report(report, report_buffer, file_type, user_email)
+        try:
+            _save_and_send_report(report, report_file, file_type, user_email)
+        finally:
+            report_file.close()
 
         report.status = "ready"
         report.save()
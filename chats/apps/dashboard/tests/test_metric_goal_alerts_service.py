@@ -11,6 +11,7 @@ from chats.apps.contacts.models import Contact
 from chats.apps.dashboard.models import MetricGoal, RoomMetrics
 from chats.apps.dashboard.services import metric_goal_alerts
 from chats.apps.dashboard.services.metric_goal_alerts import (
+    STATE_INDEX_KEY_TEMPLATE,
     STATE_KEY_TEMPLATE,
     Violation,
     detect_violations,
@@ -26,6 +27,7 @@ class FakeRedis:
 
     def __init__(self):
         self.store: dict[str, bytes] = {}
+        self.sorted_sets: dict[str, dict[str, float]] = {}
 
     def set(self, key, value, nx=False, ex=None):
         if nx and key in self.store:
@@ -53,6 +55,32 @@ class FakeRedis:
             if key.startswith(prefix) and key.endswith(suffix):
                 yield key
 
+    def zadd(self, key, mapping):
+        self.sorted_sets.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    def zrem(self, key, *members):
+        sorted_set = self.sorted_sets.get(key, {})
+        return sum(1 for member in members if sorted_set.pop(member, None))
+
+    def zremrangebyscore(self, key, min_score, max_score):
+        sorted_set = self.sorted_sets.get(key, {})
+        removed = [
+            member
+            for member, score in sorted_set.items()
+            if float(min_score) <= score <= float(max_score)
+        ]
+        for member in removed:
+            del sorted_set[member]
+        return len(removed)
+
+    def zrangebyscore(self, key, min_score, max_score):
+        return [
+            member.encode()
+            for member, score in self.sorted_sets.get(key, {}).items()
+            if float(min_score) <= score <= float(max_score)
+        ]
+
 
 def _build_active_room(project, queue, *, user=None, age_seconds=0):
     """Create an active room dated ``age_seconds`` in the past."""
@@ -236,6 +264,54 @@ class DetectViolationsTestCase(TestCase):
         self.assertEqual(results[0].violating_count, 1)
         self.assertEqual(assigned.user_id, user.email)
 
+    def test_detects_all_projects_with_one_grouped_query(self):
+        MetricGoal.objects.create(
+            project=self.project,
+            metric=MetricGoal.METRIC_WAITING_TIME,
+            threshold_seconds=60,
+            rooms_threshold_count=1,
+        )
+        _build_active_room(self.project, self.queue, age_seconds=300)
+        _build_active_room(self.project, self.queue, age_seconds=30)
+
+        other_project = Project.objects.create(name="Other project")
+        other_sector = Sector.objects.create(
+            name="sector",
+            project=other_project,
+            rooms_limit=10,
+            work_start="08:00",
+            work_end="18:00",
+        )
+        other_queue = other_sector.queues.create(name="queue")
+        MetricGoal.objects.create(
+            project=other_project,
+            metric=MetricGoal.METRIC_WAITING_TIME,
+            threshold_seconds=600,
+            rooms_threshold_count=1,
+        )
+        # Above the first project's threshold, but not its own
+        _build_active_room(other_project, other_queue, age_seconds=300)
+        _build_active_room(other_project, other_queue, age_seconds=900)
+        _build_active_room(other_project, other_queue, age_seconds=1200)
+
+        # One query for the goals, one for the violating rooms
+        with self.assertNumQueries(2):
+            results = detect_violations(MetricGoal.METRIC_WAITING_TIME)
+
+        counts = {
+            violation.project_uuid: violation.violating_count for violation in results
+        }
+        self.assertEqual(
+            counts, {str(self.project.uuid): 1, str(other_project.uuid): 2}
+        )
+        other_violation = next(
+            violation
+            for violation in results
+            if violation.project_uuid == str(other_project.uuid)
+        )
+        self.assertEqual(other_violation.threshold_seconds, 600)
+        self.assertGreaterEqual(other_violation.max_value_seconds, 1200)
+
 
 class ProcessViolationsTestCase(TestCase):
     def setUp(self):
@@ -332,6 +408,35 @@ class ProcessViolationsTestCase(TestCase):
         self.assertNotIn(state_key, self.fake_redis.store)
         self.assertEqual(result.resolved, [str(self.project.uuid)])
 
+    def test_state_is_indexed_per_metric(self):
+        self._seed_violation()
+        process_violations(MetricGoal.METRIC_WAITING_TIME)
+
+        index_key = STATE_INDEX_KEY_TEMPLATE.format(
+            metric=MetricGoal.METRIC_WAITING_TIME
+        )
+        self.assertIn(str(self.project.uuid), self.fake_redis.sorted_sets[index_key])
+
+        Room.objects.filter(project_uuid=str(self.project.uuid)).update(is_active=False)
+        process_violations(MetricGoal.METRIC_WAITING_TIME)
+
+        self.assertEqual(self.fake_redis.sorted_sets[index_key], {})
+
+    def test_expired_index_entries_are_not_resolved(self):
+        index_key = STATE_INDEX_KEY_TEMPLATE.format(
+            metric=MetricGoal.METRIC_WAITING_TIME
+        )
+        self.fake_redis.zadd(index_key, {"expired-project": 0})
+        resolved: list[str] = []
+
+        process_violations(
+            MetricGoal.METRIC_WAITING_TIME,
+            on_resolved=lambda uuid, metric: resolved.append(uuid),
+        )
+
+        self.assertEqual(resolved, [])
+        self.assertEqual(self.fake_redis.sorted_sets[index_key], {})
+
     def test_idempotent_under_repeated_sweeps(self):
         self._seed_violation()
         emails: list[Violation] = []
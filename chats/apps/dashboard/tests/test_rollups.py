@@ -0,0 +1,221 @@
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase, override_settings
+
+from chats.apps.accounts.models import User
+from chats.apps.api.v1.dashboard.dto import Filters
+from chats.apps.api.v1.dashboard.repository import (
+    ClosedRoomsRepository,
+    ORMRoomsDataRepository,
+)
+from chats.apps.dashboard.models import (
+    RoomHourlyRollup,
+    RoomMetrics,
+    RoomRollupCoverage,
+)
+from chats.apps.dashboard.rollups import (
+    compute_rollups,
+    split_rooms_filter,
+    update_rollups,
+)
+from chats.apps.dashboard.signals import (
+    mark_room_metrics_rollups_dirty,
+    mark_room_rollups_dirty,
+)
+from chats.apps.projects.models import Project
+from chats.apps.queues.models import Queue
+from chats.apps.rooms.models import Room
+from chats.apps.sectors.models import Sector
+
+
+DAY = datetime(2026, 1, 10, tzinfo=dt_timezone.utc)
+
+
+@override_settings(DASHBOARD_ROLLUPS_ENABLED=True)
+class DashboardRollupsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="agent@example.com")
+        self.project = Project.objects.create(name="Test Project", timezone="UTC")
+        self.sector = Sector.objects.create(
+            name="Test Sector",
+            rooms_limit=1,
+            work_start="00:00:00",
+            work_end="23:59:59",
+            project=self.project,
+        )
+        self.queue = Queue.objects.create(name="Test Queue", sector=self.sector)
+
+        self._create_room(DAY.replace(hour=10, minute=15), DAY.replace(hour=11))
+        self._create_room(DAY.replace(hour=10, minute=40), DAY.replace(hour=14))
+        self._create_room(DAY.replace(hour=15, minute=5), None)
+
+    def _create_room(self, created_on, ended_at):
+        room = Room.objects.create(queue=self.queue, user=self.user)
+        Room.objects.filter(pk=room.pk).update(
+            created_on=created_on,
+            ended_at=ended_at,
+            is_active=ended_at is None,
+        )
+        RoomMetrics.objects.create(
+            room=room,
+            waiting_time=10,
+            message_response_time=20,
+            first_response_time=30,
+            interaction_time=40,
+            transfer_count=1,
+        )
+        return room
+
+    def _filters(self, **kwargs):
+        user_request = MagicMock()
+        user_request.manager_sectors.return_value = Sector.objects.all()
+        return Filters(project=self.project, user_request=user_request, **kwargs)
+
+    def test_compute_rollups_aggregates_rooms_by_hour(self):
+        compute_rollups(DAY.replace(hour=10))
+        compute_rollups(DAY.replace(hour=11))
+
+        opened = RoomHourlyRollup.objects.get(bucket=DAY.replace(hour=10))
+        self.assertEqual(opened.agent_id, self.user.email)
+        self.assertEqual(opened.project_id, self.project.pk)
+        self.assertEqual(opened.opened_rooms, 2)
+        self.assertEqual(opened.closed_assigned_rooms, 2)
+        self.assertEqual(opened.transfer_count, 2)
+        self.assertEqual(opened.waiting_time_sum, 20)
+        self.assertEqual(opened.closed_rooms, 0)
+
+        closed = RoomHourlyRollup.objects.get(bucket=DAY.replace(hour=11))
+        self.assertEqual(closed.opened_rooms, 0)
+        self.assertEqual(closed.closed_rooms, 1)
+        self.assertEqual(closed.closed_first_response_time_sum, 30)
+        self.assertEqual(closed.closed_first_response_time_count, 1)
+
+    def test_compute_rollups_replaces_previous_rows(self):
+        compute_rollups(DAY.replace(hour=10))
+        compute_rollups(DAY.replace(hour=10))
+
+        self.assertEqual(
+            RoomHourlyRollup.objects.filter(bucket=DAY.replace(hour=10)).count(), 1
+        )
+
+    def test_split_uses_rollups_for_covered_hours_only(self):
+        RoomRollupCoverage.objects.create(start=DAY, end=DAY.replace(hour=12))
+        end = DAY.replace(hour=23, minute=59, second=59)
+
+        split = split_rooms_filter(
+            {"ended_at__range": [DAY, end], "is_active": False, "user": "a@b.com"},
+            "ended_at",
+        )
+
+        self.assertEqual(split.raw_filter["ended_at__gte"], DAY.replace(hour=12))
+        self.assertEqual(split.raw_filter["ended_at__lte"], end)
+        self.assertEqual(split.raw_filter["user"], "a@b.com")
+        self.assertNotIn("ended_at__range", split.raw_filter)
+
+    def test_split_bounds_the_raw_part_by_the_room_date(self):
+        RoomRollupCoverage.objects.create(start=DAY, end=DAY.replace(hour=12))
+        end = DAY.replace(hour=23, minute=59, second=59)
+
+        # Ranged over the room metrics `created_on`
+        split = split_rooms_filter(
+            {"created_on__range": [DAY, end], "room__queue": "queue"},
+            "created_on",
+            prefix="room__",
+        )
+
+        self.assertEqual(
+            split.raw_filter,
+            {
+                "room__queue": "queue",
+                "room__created_on__gte": DAY.replace(hour=12),
+                "room__created_on__lte": end,
+            },
+        )
+
+    def test_split_falls_back_to_rooms(self):
+        RoomRollupCoverage.objects.create(start=DAY, end=DAY.replace(hour=12))
+        end = DAY.replace(hour=23, minute=59, second=59)
+
+        # Tags have no rollup dimension
+        self.assertIsNone(
+            split_rooms_filter(
+                {"ended_at__range": [DAY, end], "tags__uuid": "tag"}, "ended_at"
+            )
+        )
+        # Not covered by rollups
+        self.assertIsNone(
+            split_rooms_filter(
+                {"ended_at__range": [DAY - timedelta(days=1), end]}, "ended_at"
+            )
+        )
+        # Not aligned to an hour
+        self.assertIsNone(
+            split_rooms_filter(
+                {"ended_at__range": [DAY + timedelta(minutes=30), end]}, "ended_at"
+            )
+        )
+        with override_settings(DASHBOARD_ROLLUPS_ENABLED=False):
+            self.assertIsNone(
+                split_rooms_filter({"ended_at__range": [DAY, end]}, "ended_at")
+            )
+
+    @patch("chats.apps.dashboard.rollups.pop_dirty_rooms")
+    def test_repositories_match_raw_rooms(self, mock_pop_dirty_rooms):
+        mock_pop_dirty_rooms.return_value = []
+        RoomRollupCoverage.objects.create(start=DAY, end=DAY)
+        update_rollups(now=DAY.replace(hour=12, minute=30))
+
+        self.assertEqual(RoomRollupCoverage.objects.get().end, DAY.replace(hour=12))
+
+        date_filters = {"start_date": "2026-01-10", "end_date": "2026-01-10"}
+        with override_settings(DASHBOARD_ROLLUPS_ENABLED=False):
+            raw_closed = ClosedRoomsRepository().closed_rooms(
+                self._filters(**date_filters)
+            )
+            raw_data = ORMRoomsDataRepository().get_rooms_data(
+                self._filters(**date_filters)
+            )
+
+        with self.assertNumQueries(3):
+            closed = ClosedRoomsRepository().closed_rooms(self._filters(**date_filters))
+
+        self.assertEqual(closed, raw_closed)
+        self.assertEqual(closed[0].closed_rooms, 2)
+        self.assertEqual(
+            ORMRoomsDataRepository().get_rooms_data(self._filters(**date_filters)),
+            raw_data,
+        )
+
+    @patch("chats.apps.dashboard.rollups.pop_dirty_rooms")
+    def test_update_rollups_recomputes_dirty_rooms(self, mock_pop_dirty_rooms):
+        mock_pop_dirty_rooms.return_value = []
+        RoomRollupCoverage.objects.create(start=DAY, end=DAY)
+        update_rollups(now=DAY.replace(hour=16))
+
+        room = Room.objects.get(created_on=DAY.replace(hour=15, minute=5))
+        Room.objects.filter(pk=room.pk).update(
+            is_active=False, ended_at=DAY.replace(hour=15, minute=30)
+        )
+        mock_pop_dirty_rooms.return_value = [str(room.pk)]
+        update_rollups(now=DAY.replace(hour=16))
+
+        rollup = RoomHourlyRollup.objects.get(bucket=DAY.replace(hour=15))
+        self.assertEqual(rollup.closed_rooms, 1)
+
+    @patch("chats.apps.dashboard.signals.mark_rooms_dirty")
+    def test_saves_mark_rooms_dirty_when_rolled_up_fields_change(
+        self, mock_mark_rooms_dirty
+    ):
+        room = Room.objects.get(created_on=DAY.replace(hour=10, minute=15))
+
+        mark_room_rollups_dirty(Room, room, update_fields=frozenset({"config"}))
+        mark_room_metrics_rollups_dirty(
+            RoomMetrics, room.metric, update_fields=frozenset({"response_count"})
+        )
+        mock_mark_rooms_dirty.assert_not_called()
+
+        mark_room_rollups_dirty(Room, room, update_fields=frozenset({"user"}))
+        mark_room_metrics_rollups_dirty(RoomMetrics, room.metric)
+        self.assertEqual(mock_mark_rooms_dirty.call_count, 2)
@@ -1,7 +1,11 @@
+import io
+import zipfile
 from datetime import datetime
 from datetime import timezone as dt_timezone
 from unittest.mock import MagicMock, Mock, patch
 
+import openpyxl
+import pandas as pd
 from django.test import TestCase, override_settings
 
 from chats.apps.accounts.models import User
@@ -10,9 +14,11 @@ from chats.apps.dashboard.models import ReportStatus
 from chats.apps.api.v1.dashboard.presenter import ModelFieldsPresenter
 from chats.apps.api.v1.dashboard.viewsets import ReportFieldsValidatorViewSet
 from chats.apps.dashboard.tasks import (
+    _finalize_from_all_parts,
     _norm_file_type,
     _strip_tz,
     _strip_tz_value,
+    _write_parts_from_queryset,
     generate_custom_fields_report,
     process_pending_reports,
 )
@@ -443,6 +449,159 @@ class ProcessPendingReportsTests(TestCase):
         self.assertEqual(report_status.status, "ready")
 
 
+class InMemoryPartsStorage:
+    def __init__(self):
+        self.files = {}
+
+    def listdir(self, path):
+        return [], [name.split("/")[-1] for name in self.files]
+
+    def save(self, name, content):
+        self.files[name] = content.read().decode("utf-8")
+        return name
+
+    def delete(self, name):
+        self.files.pop(name, None)
+
+    def open(self, name, mode="rb"):
+        return io.BytesIO(self.files[name].encode("utf-8"))
+
+
+class WritePartsFromQuerysetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@example.com")
+        self.project = Project.objects.create(name="Test Project", timezone="UTC")
+        self.sector = Sector.objects.create(
+            name="Test Sector",
+            rooms_limit=5,
+            work_start="00:00:00",
+            work_end="23:59:59",
+            project=self.project,
+        )
+        self.queue = Queue.objects.create(name="Test Queue", sector=self.sector)
+        self.rooms = [Room.objects.create(queue=self.queue) for _ in range(5)]
+        self.rooms.sort(key=lambda room: (room.created_on, str(room.pk)))
+        self.report = ReportStatus.objects.create(
+            project=self.project, user=self.user, fields_config={}
+        )
+        self.storage = InMemoryPartsStorage()
+        self.queryset = Room.objects.filter(queue=self.queue).values("uuid")
+
+    def _written_uuids(self):
+        return [
+            line
+            for name in sorted(self.storage.files)
+            for line in self.storage.files[name].splitlines()
+            if line != "uuid"
+        ]
+
+    def test_writes_every_row_once_in_keyset_order(self):
+        _write_parts_from_queryset(
+            self.storage, "tmp", self.queryset, 2, "rooms", report=self.report
+        )
+
+        self.assertEqual(len(self.storage.files), 3)
+        self.assertEqual(self._written_uuids(), [str(room.pk) for room in self.rooms])
+        self.report.refresh_from_db()
+        self.assertTrue(self.report.parts_cursor["rooms"]["done"])
+        self.assertEqual(self.report.parts_cursor["rooms"]["parts"], 3)
+
+    def test_resumes_after_last_recorded_part(self):
+        self.storage.files = {
+            "tmp/rooms.part000000.csv": "uuid\nfirst\nsecond\n",
+            # Written before the crash, but never recorded
+            "tmp/rooms.part000001.csv": "uuid\nstale\n",
+        }
+        self.report.parts_cursor = {
+            "rooms": {
+                "parts": 1,
+                "created_on": self.rooms[1].created_on.isoformat(),
+                "pk": str(self.rooms[1].pk),
+            }
+        }
+        self.report.save()
+
+        _write_parts_from_queryset(
+            self.storage, "tmp", self.queryset, 2, "rooms", report=self.report
+        )
+
+        self.assertEqual(
+            self._written_uuids(),
+            ["first", "second"] + [str(room.pk) for room in self.rooms[2:]],
+        )
+
+
+class FinalizeFromAllPartsTests(TestCase):
+    def setUp(self):
+        self.storage = InMemoryPartsStorage()
+        self.storage.files = {
+            "tmp/rooms.part000000.csv": "uuid,is_active,count\nroom-1,True,1\n",
+            "tmp/rooms.part000001.csv": "room-2,False,\n",
+            "tmp/agent_status_logs.part000000.csv": "agent,log_date\na@b.com,2024-01-01",
+        }
+        self.room_parts = ["tmp/rooms.part000000.csv", "tmp/rooms.part000001.csv"]
+        self.agent_parts = ["tmp/agent_status_logs.part000000.csv"]
+        self.rooms_config = {"fields": ["uuid", "is_active", "count"]}
+        self.agent_config = {"fields": ["agent", "log_date"]}
+
+    def _finalize(self, file_type, agent_parts=None):
+        report_file = _finalize_from_all_parts(
+            self.storage,
+            self.room_parts,
+            self.agent_parts if agent_parts is None else agent_parts,
+            file_type,
+            self.rooms_config,
+            self.agent_config,
+        )
+        self.addCleanup(report_file.close)
+        return report_file
+
+    def _pandas_xlsx(self):
+        # How the report was written before streaming it
+        output = io.BytesIO()
+        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
+            rooms = pd.read_csv(io.StringIO(self.storage.files[self.room_parts[0]]))
+            rooms.to_excel(writer, sheet_name="rooms", index=False)
+            pd.read_csv(
+                io.StringIO(self.storage.files[self.room_parts[1]]),
+                header=None,
+                names=rooms.columns.tolist(),
+            ).to_excel(
+                writer, sheet_name="rooms", index=False, header=False, startrow=2
+            )
+            pd.DataFrame(columns=self.agent_config["fields"]).to_excel(
+                writer, sheet_name="agent_status_logs", index=False
+            )
+        output.seek(0)
+        return output
+
+    def _sheets(self, xlsx_file):
+        workbook = openpyxl.load_workbook(xlsx_file)
+        return {
+            sheet.title: [
+                [(cell.value, cell.font.b) for cell in row] for row in sheet.iter_rows()
+            ]
+            for sheet in workbook.worksheets
+        }
+
+    def test_xlsx_matches_pandas_output(self):
+        self.assertEqual(
+            self._sheets(self._finalize("xlsx", agent_parts=[])),
+            self._sheets(self._pandas_xlsx()),
+        )
+
+    def test_csv_streams_parts_into_archive(self):
+        with zipfile.ZipFile(self._finalize("csv")) as archive:
+            self.assertEqual(
+                archive.read("rooms.csv").decode(),
+                "uuid,is_active,count\nroom-1,True,1\nroom-2,False,\n",
+            )
+            self.assertEqual(
+                archive.read("agent_status_logs.csv").decode(),
+                "agent,log_date\na@b.com,2024-01-01\n",
+            )
+
+
 class ModelFieldsPresenterTests(TestCase):
     def test_rooms_fields_contains_expected_keys(self):
         models_info = ModelFieldsPresenter.get_models_info()
@@ -1,6 +1,8 @@
 from datetime import timedelta
+from io import StringIO
 
-from django.test import TestCase
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from freezegun import freeze_time
 
 from chats.apps.accounts.models import User
@@ -9,6 +11,7 @@ from chats.apps.dashboard.models import RoomMetrics
 from chats.apps.dashboard.utils import (
     calculate_response_time,
     calculate_last_queue_waiting_time,
+    get_average_response_time,
 )
 from chats.apps.msgs.models import Message
 from chats.apps.rooms.models import Room
@@ -166,6 +169,123 @@ class CalculateResponseTimeTests(TestCase):
         self.assertEqual(calculate_response_time(self.room), 20)
 
 
+@override_settings(ROOM_METRICS_INCREMENTAL_RESPONSE_TIME=True)
+class IncrementalResponseTimeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="agent@example.com")
+        self.contact = Contact.objects.create()
+        self.project = Project.objects.create(name="Test Project")
+        self.sector = Sector.objects.create(
+            name="Test Sector",
+            rooms_limit=1,
+            work_start="00:00:00",
+            work_end="23:59:59",
+            project=self.project,
+        )
+        self.queue = Queue.objects.create(name="Test Queue", sector=self.sector)
+        self.room = Room.objects.create(contact=self.contact, queue=self.queue)
+        self.now = self.room.created_on
+
+    def _create_messages(self):
+        for sender, offset in [
+            ("contact", -100),
+            ("agent", 5),
+            ("contact", 10),
+            ("contact", 20),
+            ("agent", 50),
+            ("agent", 60),
+            ("contact", 100),
+            ("agent", 160),
+        ]:
+            Message.objects.create(
+                room=self.room,
+                user=self.user if sender == "agent" else None,
+                contact=self.contact if sender == "contact" else None,
+                text="Hello",
+                created_on=self.now + timedelta(seconds=offset),
+            )
+
+    def test_tracked_metrics_match_full_calculation(self):
+        metrics = RoomMetrics.objects.create(room=self.room, response_time_tracked=True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._create_messages()
+        metrics.refresh_from_db()
+
+        # (5 + 30 + 60) / 3
+        self.assertEqual(metrics.response_count, 3)
+        self.assertEqual(get_average_response_time(metrics), 31)
+        self.assertEqual(
+            get_average_response_time(metrics), calculate_response_time(self.room)
+        )
+
+    def test_metrics_are_updated_once_committed(self):
+        metrics = RoomMetrics.objects.create(room=self.room, response_time_tracked=True)
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self._create_messages()
+        metrics.refresh_from_db()
+        self.assertEqual(metrics.response_count, 0)
+
+        for callback in callbacks:
+            callback()
+        metrics.refresh_from_db()
+        self.assertEqual(metrics.response_count, 3)
+
+    def test_messages_older_than_the_tracked_ones_stop_the_tracking(self):
+        metrics = RoomMetrics.objects.create(room=self.room, response_time_tracked=True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._create_messages()
+            # e.g. history message with a past creation date
+            Message.objects.create(
+                room=self.room,
+                contact=self.contact,
+                text="Hello",
+                created_on=self.now + timedelta(seconds=150),
+            )
+        metrics.refresh_from_db()
+
+        self.assertFalse(metrics.response_time_tracked)
+        # (5 + 30 + 10) / 3
+        self.assertEqual(calculate_response_time(self.room), 15)
+
+    def test_untracked_metrics_are_not_updated(self):
+        metrics = RoomMetrics.objects.create(room=self.room)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._create_messages()
+        metrics.refresh_from_db()
+
+        self.assertEqual(metrics.response_count, 0)
+
+    def test_backfill_command(self):
+        self._create_messages()
+        metrics = RoomMetrics.objects.create(room=self.room)
+
+        call_command("backfill_room_response_time", batch_size=1, stdout=StringIO())
+        metrics.refresh_from_db()
+
+        self.assertTrue(metrics.response_time_tracked)
+        self.assertEqual(metrics.response_count, 3)
+        self.assertEqual(
+            get_average_response_time(metrics), calculate_response_time(self.room)
+        )
+
+    def test_backfill_command_recomputes_stale_tracked_rooms(self):
+        metrics = RoomMetrics.objects.create(room=self.room, response_time_tracked=True)
+        with override_settings(ROOM_METRICS_INCREMENTAL_RESPONSE_TIME=False):
+            self._create_messages()
+
+        call_command("backfill_room_response_time", stdout=StringIO())
+        metrics.refresh_from_db()
+        self.assertEqual(metrics.response_count, 0)
+
+        call_command("backfill_room_response_time", all=True, stdout=StringIO())
+        metrics.refresh_from_db()
+        self.assertEqual(metrics.response_count, 3)
+
+
 class CalculateWaitingTimeTests(TestCase):
     def setUp(self):
         self.user = User.objects.create(email="agent@example.com")
@@ -1,7 +1,9 @@
 import logging
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Iterable
 from datetime import timedelta, datetime
 
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
 
@@ -10,10 +12,20 @@ logger = logging.getLogger(__name__)
 
 if TYPE_CHECKING:
     from django.db.models import QuerySet
+    from chats.apps.dashboard.models import RoomMetrics
     from chats.apps.msgs.models import Message
     from chats.apps.rooms.models import Room
 
 
+RESPONSE_TIME_STATE_FIELDS = [
+    "response_time_sum",
+    "response_count",
+    "last_contact_message_at",
+    "last_message_from_agent",
+    "last_tracked_message_at",
+]
+
+
 def calculate_response_time(room: "Room") -> int:
     """
     Calculate the average response time for a room.
@@ -59,6 +71,108 @@ def calculate_response_time(room: "Room") -> int:
     return int(average_response_seconds)
 
 
+def is_incremental_response_time_enabled() -> bool:
+    return settings.ROOM_METRICS_INCREMENTAL_RESPONSE_TIME
+
+
+def apply_messages_to_response_time(
+    metrics: "RoomMetrics", messages: Iterable["Message"], room_created_on: datetime
+) -> None:
+    """
+    Fold messages, in creation order, into the running response time state
+    of the room metrics, following the same rules as `calculate_response_time`.
+
+    A message created before the last folded one (e.g. history or external
+    messages with a past `created_on`) can't be folded in order, so the
+    state stops being tracked and the room falls back to
+    `calculate_response_time`.
+    """
+    for message in messages:
+        if message.created_on < room_created_on:
+            continue
+
+        if (
+            metrics.last_tracked_message_at
+            and message.created_on < metrics.last_tracked_message_at
+        ):
+            metrics.response_time_tracked = False
+            return
+
+        metrics.last_tracked_message_at = message.created_on
+
+        if message.contact_id:
+            metrics.last_contact_message_at = message.created_on
+            metrics.last_message_from_agent = False
+            continue
+
+        if message.user_id and not metrics.last_message_from_agent:
+            metrics.last_message_from_agent = True
+            metrics.response_time_sum += message.created_on - (
+                metrics.last_contact_message_at or room_created_on
+            )
+            metrics.response_count += 1
+
+
+def track_response_time(room: "Room", messages: Iterable["Message"]) -> None:
+    """
+    Update the response time state of the room with newly created messages,
+    once the current transaction is committed. Rooms whose state is not
+    tracked are left to `calculate_response_time`.
+
+    The room metrics row is only locked (SELECT ... FOR UPDATE) while the
+    messages are applied, after the commit, so the callers' transactions
+    don't hold it. Messages created in bulk should be passed in a single
+    call, which takes the lock once.
+    """
+    if not is_incremental_response_time_enabled():
+        return
+
+    messages = sorted(
+        (message for message in messages if message.user_id or message.contact_id),
+        key=lambda message: message.created_on,
+    )
+    if not messages:
+        return
+
+    def track():
+        try:
+            _apply_tracked_response_time(room, messages)
+        except Exception as error:
+            logger.error(
+                "[RESPONSE TIME] Error tracking the response time of room %s: %s",
+                room.pk,
+                error,
+            )
+
+    transaction.on_commit(track)
+
+
+def _apply_tracked_response_time(room: "Room", messages: Iterable["Message"]):
+    from chats.apps.dashboard.models import RoomMetrics
+
+    with transaction.atomic():
+        metrics = (
+            RoomMetrics.objects.select_for_update()
+            .filter(room=room, response_time_tracked=True)
+            .first()
+        )
+        if metrics is None:
+            return
+
+        apply_messages_to_response_time(metrics, messages, room.created_on)
+        metrics.save(
+            update_fields=RESPONSE_TIME_STATE_FIELDS
+            + ["response_time_tracked", "modified_on"]
+        )
+
+
+def get_average_response_time(metrics: "RoomMetrics") -> int:
+    if not metrics.response_count:
+        return 0
+
+    return int(metrics.response_time_sum.total_seconds() / metrics.response_count)
+
+
 def calculate_last_queue_waiting_time(room: "Room", end_time: datetime = None):
     """
     Calculate waiting time for a room.
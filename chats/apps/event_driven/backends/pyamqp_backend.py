@@ -43,6 +43,12 @@ class PyAMQPConnectionBackend:
         return amqp.Connection(**self.connection_params, **kwargs)
 
     def start_consuming(self):
+        if getattr(settings, "EDA_CONSUMER_WORKERS", 0):
+            from chats.apps.event_driven.runtime import ConsumerRuntime
+
+            ConsumerRuntime(self._handle_consumers, self.connection_params).run()
+            return
+
         while True:
             try:
                 with self._conection() as connection:
@@ -79,6 +85,17 @@ class PyAMQPConnectionBackend:
         content_type: str = "application/octet-stream",
         headers: dict = {},
     ):
+        if getattr(settings, "EDA_USE_PUBLISHER", False):
+            from chats.apps.event_driven.publisher import get_publisher
+
+            get_publisher(self.connection_params).publish(
+                content=content,
+                exchange=exchange,
+                content_type=content_type,
+                headers=headers,
+            )
+            return
+
         sent = False
         while not sent:
             try:
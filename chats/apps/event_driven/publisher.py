@@ -0,0 +1,358 @@
+"""
+Persistent publisher of the event driven backend.
+
+With settings.EDA_USE_PUBLISHER enabled, `PyAMQPConnectionBackend.basic_publish`
+hands its messages to a per-process `AMQPPublisher` instead of opening a new
+connection for each one:
+
+- EDA_PUBLISHER_CONNECTIONS worker threads each keep a long-lived connection
+  with a channel in publisher confirm mode, publish the queued messages in
+  batches of up to EDA_PUBLISHER_BATCH_SIZE and wait once for their confirms;
+- callers wait at most EDA_PUBLISH_TIMEOUT seconds for their message to be
+  confirmed, the message is still delivered afterwards when they don't;
+- messages that failed EDA_PUBLISHER_MAX_RETRIES times, or that could not be
+  queued, are appended to a spool file in EDA_PUBLISHER_SPOOL_DIR and
+  published again when a worker connects, and every
+  EDA_PUBLISHER_SPOOL_REPLAY_INTERVAL seconds while it stays connected.
+
+Delivery is at least once: a batch whose confirms were lost with the
+connection is published again.
+"""
+
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import amqp
+from django.conf import settings
+
+from chats.apps.api.v1.prometheus.metrics import (
+    eda_publish_batch_size,
+    eda_publish_confirm_seconds,
+    eda_publish_total,
+    eda_publisher_pending,
+)
+from chats.apps.event_driven.backends.pyamqp_backend import basic_publish
+
+logger = logging.getLogger(__name__)
+
+
+CONFIRMED = "confirmed"
+SPOOLED = "spooled"
+
+
+@dataclass
+class PendingMessage:
+    content: dict
+    exchange: str
+    content_type: str = "application/octet-stream"
+    headers: dict = field(default_factory=dict)
+    attempts: int = 0
+    queued_at: float = field(default_factory=time.monotonic)
+    result: Optional[str] = None
+    settled: threading.Event = field(default_factory=threading.Event)
+
+    def settle(self, result: str) -> None:
+        self.result = result
+        eda_publish_total.labels(result=result).inc()
+        if result == CONFIRMED:
+            eda_publish_confirm_seconds.observe(time.monotonic() - self.queued_at)
+        self.settled.set()
+
+    def to_spool(self) -> dict:
+        return {
+            "content": self.content,
+            "exchange": self.exchange,
+            "content_type": self.content_type,
+            "headers": self.headers,
+        }
+
+
+class ConfirmChannel:
+    """
+    Connection with a channel in publisher confirm mode.
+    """
+
+    def __init__(self, connection_params: dict):
+        self.connection = amqp.Connection(**connection_params)
+        self.connection.connect()
+        self.channel = self.connection.channel()
+        self.channel.confirm_select()
+        self.channel.events["basic_ack"].add(self._on_ack)
+        self.channel.events["basic_nack"].add(self._on_nack)
+
+        self._delivery_tag = 0
+        self._unconfirmed: Dict[int, PendingMessage] = {}
+        self._nacked: List[PendingMessage] = []
+
+    def _settled_tags(self, delivery_tag: int, multiple: bool) -> List[int]:
+        if multiple:
+            return [tag for tag in self._unconfirmed if tag <= delivery_tag]
+        return [delivery_tag] if delivery_tag in self._unconfirmed else []
+
+    def _on_ack(self, delivery_tag, multiple):
+        for tag in self._settled_tags(delivery_tag, multiple):
+            self._unconfirmed.pop(tag).settle(CONFIRMED)
+
+    def _on_nack(self, delivery_tag, multiple):
+        for tag in self._settled_tags(delivery_tag, multiple):
+            self._nacked.append(self._unconfirmed.pop(tag))
+
+    def publish(self, batch: List[PendingMessage], timeout: float):
+        """
+        Publish the batch and wait for its confirms. Returns the messages
+        the broker refused.
+        """
+        for message in batch:
+            basic_publish(
+                channel=self.channel,
+                content=message.content,
+                exchange=message.exchange,
+                content_type=message.content_type,
+                properties={"delivery_mode": 2},
+                headers=message.headers,
+            )
+            self._delivery_tag += 1
+            self._unconfirmed[self._delivery_tag] = message
+
+        deadline = time.monotonic() + timeout
+        while self._unconfirmed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise socket.timeout("Timed out waiting for publisher confirms")
+            self.connection.drain_events(timeout=remaining)
+
+        nacked, self._nacked = self._nacked, []
+        return nacked
+
+    def close(self):
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+
+
+class AMQPPublisher:
+    def __init__(self, connection_params: dict):
+        self.connection_params = connection_params
+        self.pid = os.getpid()
+        self._queue = queue.Queue(maxsize=settings.EDA_PUBLISHER_MAX_PENDING)
+        self._stopping = threading.Event()
+        self._spool_lock = threading.Lock()
+        self._spool_replayed_at = time.monotonic()
+        self._workers = [
+            threading.Thread(
+                target=self._run, name=f"eda-publisher-{index}", daemon=True
+            )
+            for index in range(settings.EDA_PUBLISHER_CONNECTIONS)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def publish(
+        self,
+        content: dict,
+        exchange: str,
+        content_type: str = "application/octet-stream",
+        headers: Optional[dict] = None,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """
+        Queue the message and wait up to `timeout` seconds (defaults to
+        EDA_PUBLISH_TIMEOUT) for the broker to confirm it. Returns whether it
+        was confirmed in time; unconfirmed messages are still delivered, or
+        spooled, in the background.
+        """
+        if timeout is None:
+            timeout = settings.EDA_PUBLISH_TIMEOUT
+        deadline = time.monotonic() + timeout
+
+        message = PendingMessage(
+            content=content,
+            exchange=exchange,
+            content_type=content_type,
+            headers=headers or {},
+        )
+        try:
+            self._queue.put(message, timeout=timeout)
+        except queue.Full:
+            logger.warning("[EDA] Publisher queue is full, spooling the message")
+            self._spool([message])
+            return False
+        eda_publisher_pending.inc()
+
+        confirmed = message.settled.wait(max(deadline - time.monotonic(), 0))
+        return confirmed and message.result == CONFIRMED
+
+    def _next_batch(self) -> List[PendingMessage]:
+        try:
+            batch = [self._queue.get(timeout=1)]
+        except queue.Empty:
+            return []
+
+        while len(batch) < settings.EDA_PUBLISHER_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        eda_publisher_pending.dec(len(batch))
+        return batch
+
+    def _retry(self, messages: List[PendingMessage]) -> List[PendingMessage]:
+        """
+        Messages to publish again, spooling the ones out of attempts.
+        """
+        retries, exhausted = [], []
+        for message in messages:
+            message.attempts += 1
+            if message.attempts > settings.EDA_PUBLISHER_MAX_RETRIES:
+                exhausted.append(message)
+            else:
+                retries.append(message)
+
+        if exhausted:
+            self._spool(exhausted)
+        return retries
+
+    def _run(self):
+        channel = None
+        batch = []
+
+        while not self._stopping.is_set():
+            batch = batch or self._next_batch()
+            if channel is not None and self._is_spool_replay_due():
+                self._replay_spool()
+            if not batch:
+                continue
+
+            try:
+                if channel is None:
+                    channel = ConfirmChannel(self.connection_params)
+                    self._replay_spool()
+
+                eda_publish_batch_size.observe(len(batch))
+                nacked = channel.publish(batch, settings.EDA_PUBLISHER_CONFIRM_TIMEOUT)
+                batch = self._retry(nacked)
+
+            except Exception as error:
+                logger.warning("[EDA] Publisher connection error: %s", error)
+                if channel is not None:
+                    channel.close()
+                    channel = None
+                batch = self._retry(
+                    [message for message in batch if not message.settled.is_set()]
+                )
+                self._stopping.wait(settings.EDA_WAIT_TIME_RETRY)
+
+        if channel is not None:
+            channel.close()
+        self._spool([message for message in batch if not message.settled.is_set()])
+
+    def _spool_path(self) -> str:
+        return os.path.join(settings.EDA_PUBLISHER_SPOOL_DIR, f"{self.pid}.jsonl")
+
+    def _spool(self, messages: List[PendingMessage]) -> None:
+        if not messages:
+            return
+
+        try:
+            os.makedirs(settings.EDA_PUBLISHER_SPOOL_DIR, exist_ok=True)
+            with self._spool_lock, open(self._spool_path(), "a") as spool:
+                for message in messages:
+                    spool.write(json.dumps(message.to_spool()) + "\n")
+        except OSError as error:
+            logger.error(
+                "[EDA] Could not spool %s messages, dropping them: %s",
+                len(messages),
+                error,
+            )
+            return
+
+        for message in messages:
+            message.settle(SPOOLED)
+
+    def _is_spool_replay_due(self) -> bool:
+        return (
+            time.monotonic() - self._spool_replayed_at
+            >= settings.EDA_PUBLISHER_SPOOL_REPLAY_INTERVAL
+        )
+
+    def _replay_spool(self) -> None:
+        """
+        Queue the spooled messages of every process again.
+        """
+        self._spool_replayed_at = time.monotonic()
+        pattern = os.path.join(settings.EDA_PUBLISHER_SPOOL_DIR, "*.jsonl")
+        for path in glob.glob(pattern):
+            # Take the file, unless another worker took it first
+            replaying = f"{path}.{uuid.uuid4().hex}.replay"
+            try:
+                os.rename(path, replaying)
+            except OSError:
+                continue
+
+            messages = []
+            with open(replaying) as spool:
+                for line in spool:
+                    try:
+                        messages.append(PendingMessage(**json.loads(line)))
+                    except (TypeError, ValueError):
+                        logger.error("[EDA] Skipping invalid spooled message")
+
+            leftovers = []
+            for message in messages:
+                try:
+                    self._queue.put_nowait(message)
+                    eda_publisher_pending.inc()
+                except queue.Full:
+                    leftovers.append(message)
+
+            self._spool(leftovers)
+            os.remove(replaying)
+            logger.info("[EDA] %s spooled messages queued again", len(messages))
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the workers, spooling the messages not published yet.
+        """
+        self._stopping.set()
+        for worker in self._workers:
+            worker.join(timeout)
+
+        leftovers = []
+        while True:
+            try:
+                leftovers.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        eda_publisher_pending.dec(len(leftovers))
+        self._spool(leftovers)
+
+
+_publisher: Optional[AMQPPublisher] = None
+_publisher_lock = threading.Lock()
+
+
+def get_publisher(connection_params: dict) -> AMQPPublisher:
+    """
+    Publisher of the current process, created on first use (and again in
+    forked processes, which don't inherit its threads).
+    """
+    global _publisher
+
+    with _publisher_lock:
+        if _publisher is None or _publisher.pid != os.getpid():
+            _publisher = AMQPPublisher(connection_params)
+            atexit.register(_publisher.close, settings.EDA_PUBLISH_TIMEOUT)
+
+    return _publisher
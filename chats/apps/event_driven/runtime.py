@@ -0,0 +1,356 @@
+"""
+Multi-threaded runtime of the EDA consumers.
+
+With settings.EDA_CONSUMER_WORKERS set, `PyAMQPConnectionBackend.start_consuming`
+runs the consumers registered by its `handle_consumers` function through a
+`ConsumerRuntime` instead of processing each message inline:
+
+- every queue is consumed with its own prefetch (EDA_CONSUMER_PREFETCH, or
+  EDA_CONSUMER_DEFAULT_PREFETCH), bounding the messages in flight;
+- messages are processed by a pool of worker threads. Messages with the same
+  ordering key (e.g. the project of a permission update, see ORDERING_KEYS)
+  always go to the same worker, so they are processed in order. Messages of
+  queues without a key are ordered per queue;
+- the channel is only used by the consuming thread. Acks, rejects and
+  publishes of the consumers are deferred to it, and acks are sent in
+  batches (with `multiple` when they are contiguous) every
+  EDA_CONSUMER_ACK_INTERVAL seconds;
+- a message whose consumer raises is requeued once, and rejected without
+  requeue if it fails again.
+"""
+
+import json
+import logging
+import queue
+import socket
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable, Dict, List, Optional
+
+import amqp
+from django.conf import settings
+from sentry_sdk import capture_exception
+
+from chats.apps.api.v1.prometheus.metrics import (
+    eda_consumer_handler_seconds,
+    eda_consumer_lag_seconds,
+    eda_consumer_messages_total,
+    eda_consumer_queue_depth,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Body field whose value orders the messages of each queue. Queues keyed by
+# the project share the workers of the project across queues.
+ORDERING_KEYS = {
+    "chats.projects": "uuid",
+    "chats.update-projects": "project_uuid",
+    "chats.permissions": "project",
+    "chats.msgs": "chats_uuid",
+    "chats.msgs-status": "message_id",
+}
+
+ACK = "ack"
+REJECT = "reject"
+PUBLISH = "publish"
+
+
+@dataclass
+class ConsumerSpec:
+    queue: str
+    callback: Callable
+    prefetch: int
+
+
+class RegisteringChannel:
+    """
+    Channel handed to the `handle_consumers` functions, recording the
+    consumers they register.
+    """
+
+    def __init__(self):
+        self.consumers: List[ConsumerSpec] = []
+
+    def basic_consume(self, queue: str, callback: Callable, **kwargs):
+        prefetch = settings.EDA_CONSUMER_PREFETCH.get(
+            queue, settings.EDA_CONSUMER_DEFAULT_PREFETCH
+        )
+        self.consumers.append(ConsumerSpec(queue, callback, prefetch))
+
+
+class DeferredChannel:
+    """
+    Channel of the messages handed to the consumers, deferring its calls to
+    the consuming thread.
+    """
+
+    def __init__(self, runtime: "ConsumerRuntime", generation: int):
+        self._runtime = runtime
+        self._generation = generation
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self._runtime.defer(self._generation, ACK, delivery_tag)
+
+    def basic_reject(self, delivery_tag, requeue=True):
+        self._runtime.defer(self._generation, REJECT, delivery_tag, requeue)
+
+    def basic_nack(self, delivery_tag, multiple=False, requeue=True):
+        self.basic_reject(delivery_tag, requeue)
+
+    def basic_publish(self, msg, exchange="", routing_key="", **kwargs):
+        self._runtime.defer(
+            self._generation, PUBLISH, None, (msg, exchange, routing_key, kwargs)
+        )
+
+
+class DeferredMessage:
+    """
+    Message handed to the consumers, with a `DeferredChannel`.
+    """
+
+    def __init__(self, message: amqp.Message, channel: DeferredChannel):
+        self._message = message
+        self.channel = channel
+
+    def __getattr__(self, name):
+        return getattr(self._message, name)
+
+
+@dataclass
+class Delivery:
+    consumer: ConsumerSpec
+    message: DeferredMessage
+    generation: int
+    received_at: float
+
+
+def get_ordering_key(queue_name: str, body: bytes) -> str:
+    field = ORDERING_KEYS.get(queue_name)
+    if field is None:
+        return queue_name
+
+    try:
+        key = json.loads(body).get(field)
+    except (AttributeError, TypeError, ValueError):
+        key = None
+    return str(key) if key else queue_name
+
+
+class ConsumerRuntime:
+    _start_message = (
+        "[+] Connection established. Waiting for events. To exit press CTRL+C"
+    )
+
+    def __init__(
+        self,
+        handle_consumers: Callable,
+        connection_params: dict,
+        workers: Optional[int] = None,
+        connection_factory: Optional[Callable] = None,
+    ):
+        registering_channel = RegisteringChannel()
+        handle_consumers(registering_channel)
+        self.consumers = registering_channel.consumers
+
+        self.connection_params = connection_params
+        self._connection_factory = connection_factory or partial(
+            amqp.Connection, **connection_params
+        )
+        self._stopping = threading.Event()
+        self._operations = queue.Queue()
+        self._generation = 0
+        self._channel = None
+        # Queue of the messages not acked or rejected yet, by delivery tag
+        self._unsettled: Dict[int, str] = {}
+        self._acked = set()
+        self._depth_updated_at = 0
+
+        self._work_queues = [
+            queue.Queue() for _ in range(workers or settings.EDA_CONSUMER_WORKERS)
+        ]
+        self._workers = [
+            threading.Thread(
+                target=self._work,
+                args=(work_queue,),
+                name=f"eda-consumer-{index}",
+                daemon=True,
+            )
+            for index, work_queue in enumerate(self._work_queues)
+        ]
+
+    def run(self):
+        for worker in self._workers:
+            worker.start()
+
+        while not self._stopping.is_set():
+            try:
+                self._consume()
+            except (
+                *amqp.Connection.connection_errors,
+                amqp.exceptions.AMQPError,
+                ConnectionRefusedError,
+            ) as error:
+                print(f"[-] Connection error: {error}")
+                print("    [+] Reconnecting in 5 seconds...")
+                self._stopping.wait(settings.EDA_WAIT_TIME_RETRY)
+            except KeyboardInterrupt:
+                print("[-] Connection closed: Keyboard Interrupt")
+                break
+            except Exception as error:
+                print("error on drain_events:", type(error), error)
+                self._stopping.wait(settings.EDA_WAIT_TIME_RETRY)
+
+        self.stop()
+
+    def stop(self):
+        self._stopping.set()
+        for work_queue in self._work_queues:
+            work_queue.put(None)
+
+    def _consume(self):
+        with self._connection_factory() as connection:
+            channel = connection.channel()
+
+            # Acks of the messages of previous connections are dropped,
+            # those messages are delivered again
+            self._generation += 1
+            self._channel = channel
+            self._unsettled = {}
+            self._acked = set()
+
+            for consumer in self.consumers:
+                # Applies to the consumers created after it
+                channel.basic_qos(0, consumer.prefetch, False)
+                channel.basic_consume(
+                    consumer.queue,
+                    callback=partial(self._dispatch, consumer, self._generation),
+                )
+
+            print(self._start_message)
+
+            while not self._stopping.is_set():
+                try:
+                    connection.drain_events(timeout=settings.EDA_CONSUMER_ACK_INTERVAL)
+                except socket.timeout:
+                    pass
+                self._flush()
+                self._update_queue_depth()
+
+            self._flush()
+
+    def _dispatch(self, consumer: ConsumerSpec, generation: int, message):
+        self._unsettled[message.delivery_tag] = consumer.queue
+        delivery = Delivery(
+            consumer=consumer,
+            message=DeferredMessage(message, DeferredChannel(self, generation)),
+            generation=generation,
+            received_at=time.monotonic(),
+        )
+        key = get_ordering_key(consumer.queue, message.body)
+        index = zlib.crc32(key.encode()) % len(self._work_queues)
+        self._work_queues[index].put(delivery)
+
+    def _work(self, work_queue: queue.Queue):
+        while True:
+            delivery = work_queue.get()
+            if delivery is None:
+                return
+            if delivery.generation != self._generation:
+                # Delivered again by the current connection
+                continue
+
+            queue_name = delivery.consumer.queue
+            started_at = time.monotonic()
+            eda_consumer_lag_seconds.labels(queue=queue_name).observe(
+                started_at - delivery.received_at
+            )
+            try:
+                delivery.consumer.callback(delivery.message)
+            except Exception as error:
+                # Delivered once more, in case the error is transient. A
+                # message failing again is rejected for good (dead-lettered
+                # when the queue has a DLX), so it doesn't block its
+                # ordering key
+                capture_exception(error)
+                logger.error("[EDA] %s consumer failed: %s", queue_name, error)
+                delivery.message.channel.basic_reject(
+                    delivery.message.delivery_tag,
+                    requeue=not delivery.message.redelivered,
+                )
+            finally:
+                eda_consumer_handler_seconds.labels(queue=queue_name).observe(
+                    time.monotonic() - started_at
+                )
+
+    def defer(self, generation: int, operation: str, delivery_tag, *args):
+        self._operations.put((generation, operation, delivery_tag, args))
+
+    def _flush(self):
+        """
+        Apply the deferred operations, acking the contiguous acked messages
+        with a single frame.
+        """
+        while True:
+            try:
+                (
+                    generation,
+                    operation,
+                    delivery_tag,
+                    args,
+                ) = self._operations.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self._generation:
+                continue
+
+            if operation == ACK:
+                if delivery_tag in self._unsettled:
+                    self._acked.add(delivery_tag)
+            elif operation == REJECT:
+                self._acked.discard(delivery_tag)
+                queue_name = self._unsettled.pop(delivery_tag, None)
+                if queue_name is None:
+                    continue
+                self._channel.basic_reject(delivery_tag, requeue=args[0])
+                eda_consumer_messages_total.labels(
+                    queue=queue_name, result="rejected"
+                ).inc()
+            elif operation == PUBLISH:
+                msg, exchange, routing_key, kwargs = args[0]
+                self._channel.basic_publish(
+                    msg, exchange=exchange, routing_key=routing_key, **kwargs
+                )
+
+        if not self._acked:
+            return
+
+        oldest_unacked = min(self._unsettled.keys() - self._acked, default=None)
+        contiguous = {
+            tag for tag in self._acked if oldest_unacked is None or tag < oldest_unacked
+        }
+        if contiguous:
+            self._channel.basic_ack(max(contiguous), multiple=True)
+        for delivery_tag in self._acked - contiguous:
+            self._channel.basic_ack(delivery_tag)
+
+        for delivery_tag in self._acked:
+            eda_consumer_messages_total.labels(
+                queue=self._unsettled.pop(delivery_tag), result="acked"
+            ).inc()
+        self._acked = set()
+
+    def _update_queue_depth(self):
+        now = time.monotonic()
+        if now - self._depth_updated_at < settings.EDA_CONSUMER_DEPTH_INTERVAL:
+            return
+        self._depth_updated_at = now
+
+        for consumer in self.consumers:
+            declared = self._channel.queue_declare(consumer.queue, passive=True)
+            eda_consumer_queue_depth.labels(queue=consumer.queue).set(
+                declared.message_count
+            )
@@ -0,0 +1,178 @@
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from chats.apps.event_driven.publisher import (
+    CONFIRMED,
+    SPOOLED,
+    AMQPPublisher,
+    ConfirmChannel,
+    PendingMessage,
+)
+
+
+class FakeChannel:
+    def __init__(self):
+        self.events = defaultdict(set)
+        self.published = []
+
+    def confirm_select(self):
+        pass
+
+    def basic_publish(self, message, exchange):
+        self.published.append((message, exchange))
+
+
+class FakeConfirmChannel:
+    """
+    Confirms every message right away.
+    """
+
+    published = []
+
+    def __init__(self, connection_params):
+        pass
+
+    def publish(self, batch, timeout):
+        for message in batch:
+            self.published.append(message.content)
+            message.settle(CONFIRMED)
+        return []
+
+    def close(self):
+        pass
+
+
+class ConfirmChannelTests(SimpleTestCase):
+    def setUp(self):
+        self.channel = FakeChannel()
+        connection = mock.Mock()
+        connection.channel.return_value = self.channel
+        patcher = mock.patch(
+            "chats.apps.event_driven.publisher.amqp.Connection",
+            return_value=connection,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.confirm_channel = ConfirmChannel({})
+        self.connection = connection
+
+    def _confirm(self, event, delivery_tag, multiple):
+        def drain_events(timeout):
+            for callback in self.channel.events[event]:
+                callback(delivery_tag, multiple)
+
+        self.connection.drain_events.side_effect = drain_events
+
+    def test_batch_is_confirmed_at_once(self):
+        batch = [
+            PendingMessage(content={"index": index}, exchange="x") for index in range(3)
+        ]
+        self._confirm("basic_ack", 3, True)
+
+        self.assertEqual(self.confirm_channel.publish(batch, timeout=1), [])
+
+        self.assertEqual(len(self.channel.published), 3)
+        self.connection.drain_events.assert_called_once()
+        for message in batch:
+            self.assertEqual(message.result, CONFIRMED)
+
+    def test_nacked_messages_are_returned(self):
+        message = PendingMessage(content={}, exchange="x")
+        self._confirm("basic_nack", 1, False)
+
+        self.assertEqual(self.confirm_channel.publish([message], timeout=1), [message])
+        self.assertFalse(message.settled.is_set())
+
+
+class AMQPPublisherTests(SimpleTestCase):
+    def setUp(self):
+        spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        settings_override = override_settings(
+            EDA_PUBLISHER_CONNECTIONS=1,
+            EDA_PUBLISHER_MAX_PENDING=100,
+            EDA_PUBLISHER_BATCH_SIZE=10,
+            EDA_PUBLISHER_CONFIRM_TIMEOUT=1,
+            EDA_PUBLISHER_MAX_RETRIES=1,
+            EDA_PUBLISHER_SPOOL_DIR=spool_dir.name,
+            EDA_PUBLISH_TIMEOUT=1,
+            EDA_WAIT_TIME_RETRY=0,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.spool_dir = spool_dir.name
+        FakeConfirmChannel.published = []
+
+    def _spooled(self):
+        spooled = []
+        for name in os.listdir(self.spool_dir):
+            with open(os.path.join(self.spool_dir, name)) as spool:
+                spooled += [json.loads(line)["content"] for line in spool]
+        return spooled
+
+    @mock.patch("chats.apps.event_driven.publisher.ConfirmChannel", FakeConfirmChannel)
+    def test_publish_waits_for_the_confirm(self):
+        publisher = AMQPPublisher({})
+        self.addCleanup(publisher.close, 1)
+
+        self.assertTrue(publisher.publish(content={"room": 1}, exchange="rooms"))
+        self.assertEqual(FakeConfirmChannel.published, [{"room": 1}])
+
+    @mock.patch(
+        "chats.apps.event_driven.publisher.ConfirmChannel",
+        side_effect=ConnectionRefusedError,
+    )
+    def test_undeliverable_messages_are_spooled_and_replayed(self, mock_channel):
+        publisher = AMQPPublisher({})
+        message = PendingMessage(content={"room": 1}, exchange="rooms")
+        publisher._queue.put(message)
+
+        self.assertTrue(message.settled.wait(1))
+        publisher.close(1)
+        self.assertEqual(message.result, SPOOLED)
+        self.assertEqual(self._spooled(), [{"room": 1}])
+
+        with mock.patch(
+            "chats.apps.event_driven.publisher.ConfirmChannel", FakeConfirmChannel
+        ):
+            publisher = AMQPPublisher({})
+            self.addCleanup(publisher.close, 1)
+            self.assertTrue(publisher.publish(content={"room": 2}, exchange="rooms"))
+            # Queued after the spooled message, replayed on connect
+            self.assertTrue(publisher.publish(content={"room": 3}, exchange="rooms"))
+
+        self.assertEqual(
+            FakeConfirmChannel.published, [{"room": 2}, {"room": 1}, {"room": 3}]
+        )
+        self.assertEqual(self._spooled(), [])
+
+    @override_settings(EDA_PUBLISHER_SPOOL_REPLAY_INTERVAL=0.01)
+    @mock.patch("chats.apps.event_driven.publisher.ConfirmChannel", FakeConfirmChannel)
+    def test_spool_is_replayed_while_connected(self):
+        publisher = AMQPPublisher({})
+        self.addCleanup(publisher.close, 1)
+        self.assertTrue(publisher.publish(content={"room": 1}, exchange="rooms"))
+
+        # e.g. spooled as the queue was full
+        publisher._spool([PendingMessage(content={"room": 2}, exchange="rooms")])
+
+        deadline = time.monotonic() + 5
+        while len(FakeConfirmChannel.published) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(FakeConfirmChannel.published, [{"room": 1}, {"room": 2}])
+        self.assertEqual(self._spooled(), [])
+
+    def test_publish_never_blocks_longer_than_the_timeout(self):
+        with mock.patch.object(AMQPPublisher, "_run"):
+            publisher = AMQPPublisher({})
+
+        self.assertFalse(
+            publisher.publish(content={"room": 1}, exchange="rooms", timeout=0.01)
+        )
@@ -0,0 +1,209 @@
+import json
+import socket
+import threading
+import time
+from collections import defaultdict, namedtuple
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from chats.apps.event_driven.runtime import ConsumerRuntime, get_ordering_key
+
+QueueDeclareOk = namedtuple("QueueDeclareOk", "queue message_count consumer_count")
+
+
+class InMemoryMessage:
+    def __init__(self, body, delivery_tag, channel, redelivered=False):
+        self.body = body
+        self.delivery_tag = delivery_tag
+        self.channel = channel
+        self.redelivered = redelivered
+        self.headers = {}
+
+
+class InMemoryBroker:
+    """
+    Stand-in of a broker with a single connection and channel, enforcing the
+    prefetch of each consumer.
+    """
+
+    def __init__(self):
+        self.queues = defaultdict(list)
+        self.lock = threading.Lock()
+        self.consumers = []
+        self.unacked = {}
+        self.bodies = {}
+        self.max_unacked = defaultdict(int)
+        self.ack_frames = []
+        self.rejected = []
+        self.published = []
+        self._prefetch = 0
+        self._delivery_tag = 0
+
+    def publish(self, queue, content):
+        self.queues[queue].append((json.dumps(content).encode(), False))
+
+    # Connection
+
+    def __call__(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def channel(self):
+        return self
+
+    def drain_events(self, timeout=None):
+        delivered = False
+        for queue, callback, prefetch in self.consumers:
+            with self.lock:
+                in_flight = sum(1 for name in self.unacked.values() if name == queue)
+                if not self.queues[queue] or in_flight >= prefetch:
+                    continue
+                self._delivery_tag += 1
+                self.unacked[self._delivery_tag] = queue
+                self.max_unacked[queue] = max(self.max_unacked[queue], in_flight + 1)
+                body, redelivered = self.queues[queue].pop(0)
+                self.bodies[self._delivery_tag] = body
+            callback(InMemoryMessage(body, self._delivery_tag, self, redelivered))
+            delivered = True
+
+        if not delivered:
+            time.sleep(0.001)
+            raise socket.timeout()
+
+    # Channel
+
+    def basic_qos(self, prefetch_size, prefetch_count, a_global):
+        self._prefetch = prefetch_count
+
+    def basic_consume(self, queue, callback):
+        self.consumers.append((queue, callback, self._prefetch))
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.ack_frames.append((delivery_tag, multiple))
+        with self.lock:
+            tags = (
+                [tag for tag in self.unacked if tag <= delivery_tag]
+                if multiple
+                else [delivery_tag]
+            )
+            for tag in tags:
+                del self.unacked[tag]
+
+    def basic_reject(self, delivery_tag, requeue=True):
+        with self.lock:
+            queue = self.unacked.pop(delivery_tag)
+            if requeue:
+                self.queues[queue].insert(0, (self.bodies[delivery_tag], True))
+        self.rejected.append((delivery_tag, requeue))
+
+    def basic_publish(self, msg, exchange="", routing_key="", **kwargs):
+        self.published.append((msg, exchange))
+
+    def queue_declare(self, queue, passive=False):
+        return QueueDeclareOk(queue, len(self.queues[queue]), 1)
+
+
+@override_settings(
+    EDA_CONSUMER_PREFETCH={"chats.permissions": 5},
+    EDA_CONSUMER_DEFAULT_PREFETCH=2,
+    EDA_CONSUMER_ACK_INTERVAL=0.01,
+    EDA_CONSUMER_DEPTH_INTERVAL=0,
+    EDA_WAIT_TIME_RETRY=0,
+)
+class ConsumerRuntimeTests(SimpleTestCase):
+    def setUp(self):
+        self.broker = InMemoryBroker()
+        self.processed = defaultdict(list)
+        self.processed_lock = threading.Lock()
+
+    def _permission_consumer(self, message):
+        body = json.loads(message.body)
+        # Gives the other workers a chance to run out of order
+        time.sleep(0.001)
+        with self.processed_lock:
+            self.processed[body["project"]].append(body["index"])
+        message.channel.basic_ack(message.delivery_tag)
+
+    def _failing_consumer(self, message):
+        message.channel.basic_reject(message.delivery_tag, requeue=False)
+        message.channel.basic_publish(mock.sentinel.dead_letter, exchange="dlx")
+
+    def _raising_consumer(self, message):
+        raise ValueError("boom")
+
+    def _handle_consumers(self, channel):
+        channel.basic_consume("chats.permissions", callback=self._permission_consumer)
+        channel.basic_consume("chats.dlq", callback=self._failing_consumer)
+        channel.basic_consume("chats.raising", callback=self._raising_consumer)
+
+    def _run_until(self, runtime, condition, timeout=5):
+        thread = threading.Thread(target=runtime.run)
+        thread.start()
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        runtime.stop()
+        thread.join(timeout)
+
+    def test_messages_are_processed_in_order_per_project(self):
+        for index in range(60):
+            self.broker.publish(
+                "chats.permissions", {"project": f"project-{index % 3}", "index": index}
+            )
+        runtime = ConsumerRuntime(
+            self._handle_consumers, {}, workers=4, connection_factory=self.broker
+        )
+
+        self._run_until(
+            runtime,
+            lambda: not self.broker.queues["chats.permissions"]
+            and not self.broker.unacked,
+        )
+
+        self.assertEqual(sum(len(indexes) for indexes in self.processed.values()), 60)
+        for indexes in self.processed.values():
+            self.assertEqual(indexes, sorted(indexes))
+        self.assertLessEqual(self.broker.max_unacked["chats.permissions"], 5)
+        # Acked in batches
+        self.assertLess(len(self.broker.ack_frames), 60)
+
+    def test_rejects_and_publishes_are_deferred_to_the_channel(self):
+        self.broker.publish("chats.dlq", {"error": "boom"})
+        runtime = ConsumerRuntime(
+            self._handle_consumers, {}, workers=2, connection_factory=self.broker
+        )
+
+        self._run_until(runtime, lambda: self.broker.published)
+
+        self.assertEqual(self.broker.rejected, [(1, False)])
+        self.assertEqual(self.broker.published, [(mock.sentinel.dead_letter, "dlx")])
+        self.assertEqual(self.broker.unacked, {})
+
+    @mock.patch("chats.apps.event_driven.runtime.capture_exception")
+    def test_messages_failing_again_are_not_requeued(self, mock_capture):
+        self.broker.publish("chats.raising", {"project": "project-uuid"})
+        runtime = ConsumerRuntime(
+            self._handle_consumers, {}, workers=2, connection_factory=self.broker
+        )
+
+        self._run_until(runtime, lambda: len(self.broker.rejected) == 2)
+
+        self.assertEqual(self.broker.rejected, [(1, True), (2, False)])
+        self.assertEqual(self.broker.queues["chats.raising"], [])
+        self.assertEqual(self.broker.unacked, {})
+        self.assertEqual(mock_capture.call_count, 2)
+
+    def test_ordering_keys(self):
+        body = json.dumps({"project": "project-uuid"}).encode()
+
+        self.assertEqual(get_ordering_key("chats.permissions", body), "project-uuid")
+        self.assertEqual(
+            get_ordering_key("chats.permissions", b"{}"), "chats.permissions"
+        )
+        self.assertEqual(get_ordering_key("chats.dlq", body), "chats.dlq")
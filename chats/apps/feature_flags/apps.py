@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class FeatureFlagsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "chats.apps.feature_flags"
+
+    def ready(self):
+        from . import signals  # noqa: F401
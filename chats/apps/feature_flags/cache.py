@@ -0,0 +1,188 @@
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from weni.feature_flags import shortcuts
+
+from chats.apps.api.v1.prometheus.metrics import (
+    feature_flag_cache_hits_total,
+    feature_flag_cache_misses_total,
+)
+
+logger = logging.getLogger(__name__)
+
+
+GENERATION_CACHE_KEY = "feature_flags:evaluations:generation"
+
+_scope_cache: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar(
+    "feature_flags_scope_cache", default=None
+)
+
+
+def _make_key(key: str, attributes: dict) -> Tuple:
+    return (key, tuple(sorted((k, str(v)) for k, v in (attributes or {}).items())))
+
+
+class LocalFeatureFlagsCache:
+    """
+    Process-local cache of feature flag evaluations, with a short TTL.
+
+    Entries are also invalidated when the feature definitions are
+    refreshed: the Growthbook webhook bumps a generation number stored in
+    the shared cache, which each process re-reads at most once every
+    FEATURE_FLAGS_GENERATION_CHECK_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple, Tuple[Any, float]] = {}
+        self._generation = None
+        self._generation_checked_at = 0.0
+
+    @property
+    def ttl(self) -> int:
+        return settings.FEATURE_FLAGS_LOCAL_CACHE_TTL
+
+    def _check_generation(self):
+        now = time.monotonic()
+        if (
+            now - self._generation_checked_at
+            < settings.FEATURE_FLAGS_GENERATION_CHECK_INTERVAL
+        ):
+            return
+
+        self._generation_checked_at = now
+        try:
+            generation = cache.get(GENERATION_CACHE_KEY, 0)
+        except Exception:
+            return
+
+        if generation != self._generation:
+            self._generation = generation
+            self._entries.clear()
+
+    def get(self, cache_key: Tuple) -> Tuple[bool, Any]:
+        if self.ttl <= 0:
+            return False, None
+
+        with self._lock:
+            self._check_generation()
+            entry = self._entries.get(cache_key)
+
+            if entry is None:
+                return False, None
+
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[cache_key]
+                return False, None
+
+            return True, value
+
+    def set(self, cache_key: Tuple, value: Any):
+        if self.ttl <= 0:
+            return
+
+        with self._lock:
+            self._entries[cache_key] = (value, time.monotonic() + self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation_checked_at = 0.0
+
+
+local_cache = LocalFeatureFlagsCache()
+
+
+@contextmanager
+def feature_flags_scope():
+    """
+    Cache every feature flag evaluation made inside the block,
+    so one request or one task evaluates each flag for a project once.
+    Nested scopes reuse the outermost one.
+    """
+    if _scope_cache.get() is not None:
+        yield
+        return
+
+    token = _scope_cache.set({})
+    try:
+        yield
+    finally:
+        _scope_cache.reset(token)
+
+
+def start_feature_flags_scope():
+    """
+    Start a scope that must be closed with `end_feature_flags_scope`,
+    for callers that can't use a context manager (e.g. Celery signals).
+    """
+    return _scope_cache.set({})
+
+
+def end_feature_flags_scope(token):
+    _scope_cache.reset(token)
+
+
+def _get_or_evaluate(cache_key: Tuple, evaluate):
+    scope = _scope_cache.get()
+
+    if scope is not None and cache_key in scope:
+        feature_flag_cache_hits_total.labels(layer="scope").inc()
+        return scope[cache_key]
+
+    found, value = local_cache.get(cache_key)
+    if found:
+        feature_flag_cache_hits_total.labels(layer="local").inc()
+    else:
+        feature_flag_cache_misses_total.inc()
+        value = evaluate()
+        local_cache.set(cache_key, value)
+
+    if scope is not None:
+        scope[cache_key] = value
+
+    return value
+
+
+def is_feature_active_for_attributes(key: str, attributes: dict) -> bool:
+    """
+    Drop-in replacement of weni.feature_flags.shortcuts.is_feature_active_for_attributes
+    that caches evaluations in the current scope and in the process-local cache.
+    Evaluation errors are not cached and are re-raised to the caller.
+    """
+    return _get_or_evaluate(
+        _make_key(key, attributes),
+        lambda: shortcuts.is_feature_active_for_attributes(key, attributes),
+    )
+
+
+def is_feature_active(key: str, user_email: str, project_uuid: str) -> bool:
+    """
+    Drop-in replacement of weni.feature_flags.shortcuts.is_feature_active,
+    cached like `is_feature_active_for_attributes`.
+    """
+    return _get_or_evaluate(
+        _make_key(key, {"userEmail": user_email, "projectUUID": project_uuid}),
+        lambda: shortcuts.is_feature_active(key, user_email, project_uuid),
+    )
+
+
+def invalidate_feature_flags_cache():
+    """
+    Invalidate cached evaluations in every process,
+    called when the feature definitions are refreshed.
+    """
+    local_cache.clear()
+
+    try:
+        cache.add(GENERATION_CACHE_KEY, 0, timeout=None)
+        cache.incr(GENERATION_CACHE_KEY)
+    except Exception as error:
+        logger.error("Failed to invalidate feature flags evaluations: %s", error)
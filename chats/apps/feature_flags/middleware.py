@@ -0,0 +1,14 @@
+from chats.apps.feature_flags.cache import feature_flags_scope
+
+
+class FeatureFlagsScopeMiddleware:
+    """
+    Caches feature flag evaluations for the duration of a request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with feature_flags_scope():
+            return self.get_response(request)
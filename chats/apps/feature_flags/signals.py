@@ -0,0 +1,20 @@
+from celery.signals import task_postrun, task_prerun
+
+from chats.apps.feature_flags.cache import (
+    end_feature_flags_scope,
+    start_feature_flags_scope,
+)
+
+_scope_tokens = {}
+
+
+@task_prerun.connect
+def start_task_feature_flags_scope(task_id=None, **kwargs):
+    _scope_tokens[task_id] = start_feature_flags_scope()
+
+
+@task_postrun.connect
+def end_task_feature_flags_scope(task_id=None, **kwargs):
+    token = _scope_tokens.pop(task_id, None)
+    if token is not None:
+        end_feature_flags_scope(token)
@@ -0,0 +1,69 @@
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from chats.apps.feature_flags.cache import (
+    feature_flags_scope,
+    invalidate_feature_flags_cache,
+    is_feature_active_for_attributes,
+    local_cache,
+)
+
+
+@patch(
+    "chats.apps.feature_flags.cache.shortcuts.is_feature_active_for_attributes",
+    return_value=True,
+)
+class FeatureFlagsCacheTestCase(TestCase):
+    def setUp(self):
+        local_cache.clear()
+        self.attributes = {"projectUUID": "e7e1b4b8-7d8b-4b0e-9f4b-3b6b0c8f0f0a"}
+
+    def tearDown(self):
+        local_cache.clear()
+
+    @override_settings(FEATURE_FLAGS_LOCAL_CACHE_TTL=0)
+    def test_scope_evaluates_each_flag_once(self, mock_evaluate):
+        with feature_flags_scope():
+            for _ in range(3):
+                self.assertTrue(
+                    is_feature_active_for_attributes("flagKey", self.attributes)
+                )
+            is_feature_active_for_attributes("otherFlagKey", self.attributes)
+
+        self.assertEqual(mock_evaluate.call_count, 2)
+
+    @override_settings(FEATURE_FLAGS_LOCAL_CACHE_TTL=0)
+    def test_without_scope_and_local_cache_every_call_is_evaluated(self, mock_evaluate):
+        is_feature_active_for_attributes("flagKey", self.attributes)
+        is_feature_active_for_attributes("flagKey", self.attributes)
+
+        self.assertEqual(mock_evaluate.call_count, 2)
+
+    @override_settings(FEATURE_FLAGS_LOCAL_CACHE_TTL=30)
+    def test_local_cache_is_shared_between_scopes(self, mock_evaluate):
+        with feature_flags_scope():
+            is_feature_active_for_attributes("flagKey", self.attributes)
+
+        with feature_flags_scope():
+            is_feature_active_for_attributes("flagKey", self.attributes)
+
+        self.assertEqual(mock_evaluate.call_count, 1)
+
+    @override_settings(FEATURE_FLAGS_LOCAL_CACHE_TTL=30)
+    def test_invalidate_clears_local_cache(self, mock_evaluate):
+        is_feature_active_for_attributes("flagKey", self.attributes)
+        invalidate_feature_flags_cache()
+        is_feature_active_for_attributes("flagKey", self.attributes)
+
+        self.assertEqual(mock_evaluate.call_count, 2)
+
+    @override_settings(FEATURE_FLAGS_LOCAL_CACHE_TTL=30)
+    def test_evaluation_errors_are_not_cached(self, mock_evaluate):
+        mock_evaluate.side_effect = [Exception("Growthbook error"), False]
+
+        with self.assertRaises(Exception):
+            is_feature_active_for_attributes("flagKey", self.attributes)
+
+        self.assertFalse(is_feature_active_for_attributes("flagKey", self.attributes))
+        self.assertEqual(mock_evaluate.call_count, 2)
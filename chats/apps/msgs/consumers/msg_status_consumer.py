@@ -4,6 +4,10 @@ from django.conf import settings
 from chats.apps.event_driven.consumers import EDAConsumer, pyamqp_call_dlx_when_error
 from chats.apps.event_driven.parsers.json_parser import JSONParser
 from chats.apps.msgs.tasks import process_message_status
+from chats.apps.msgs.usecases.message_status_batches import (
+    is_status_batching_enabled,
+    queue_message_status,
+)
 
 
 class MessageStatusConsumer(EDAConsumer):
@@ -33,7 +37,10 @@ class MessageStatusConsumer(EDAConsumer):
                 print(
                     f"[MessageStatusConsumer] Processing status update - ID: {message_id}, Status: {message_status}"
                 )
-                process_message_status.delay(message_id, message_status)
+                if is_status_batching_enabled():
+                    queue_message_status(message_id, message_status)
+                else:
+                    process_message_status.delay(message_id, message_status)
                 channel.basic_ack(message.delivery_tag)
                 print(
                     f"[MessageStatusConsumer] Successfully queued status update for {message_id}"
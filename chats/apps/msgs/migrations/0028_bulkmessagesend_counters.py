@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("msgs", "0027_bulkmessagesend_rooms_qty"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bulkmessagesend",
+            name="success_total",
+            field=models.PositiveIntegerField(
+                blank=True, null=True, verbose_name="success total"
+            ),
+        ),
+        migrations.AddField(
+            model_name="bulkmessagesend",
+            name="failed_total",
+            field=models.PositiveIntegerField(
+                blank=True, null=True, verbose_name="failed total"
+            ),
+        ),
+    ]
@@ -12,6 +12,7 @@ from weni.feature_flags.shortcuts import is_feature_active_for_attributes
 
 from sentry_sdk import capture_exception
 from chats.apps.core.integrations.aws.s3.helpers import get_object_key
+from chats.apps.rooms.webhooks import enqueue_callback, is_webhook_service_enabled
 from chats.core.models import BaseModelWithManualCreatedOn, BaseModel
 from chats.core.requests import get_request_session_with_retries
 
@@ -115,10 +116,17 @@ class Message(BaseModelWithManualCreatedOn):
                 }
             )
 
+        is_new = self._state.adding
+
         data = super().save(*args, **kwargs)
 
         self.room.clear_24h_valid_cache()
 
+        if is_new:
+            from chats.apps.dashboard.utils import track_response_time
+
+            track_response_time(self.room, [self])
+
         return data
 
     @property
@@ -153,6 +161,11 @@ class Message(BaseModelWithManualCreatedOn):
         if self.room.callback_url and callback:
             data = self.update_msg_text_with_signature(data)
 
+            if is_webhook_service_enabled() and enqueue_callback(
+                self.room, "msg.create", data
+            ):
+                return
+
             request_session = get_request_session_with_retries(
                 retries=getattr(settings, "CALLBACK_RETRY_COUNT", 5),
                 backoff_factor=getattr(settings, "CALLBACK_RETRY_BACKOFF_FACTOR", 0.1),
@@ -344,6 +357,11 @@ class MessageMedia(BaseModelWithManualCreatedOn):
         msg_data["text"] = ""
 
         if self.message.room.callback_url:
+            if is_webhook_service_enabled() and enqueue_callback(
+                self.message.room, "msg.create", msg_data
+            ):
+                return
+
             request_session = get_request_session_with_retries(
                 retries=getattr(settings, "CALLBACK_RETRY_COUNT", 5),
                 backoff_factor=getattr(settings, "CALLBACK_RETRY_BACKOFF_FACTOR", 0.1),
@@ -540,6 +558,17 @@ class BulkMessageSend(BaseModel):
         null=True,
         blank=True,
     )
+    # Outcome counters of chunked sends, null for sends tracked per room
+    success_total = models.PositiveIntegerField(
+        _("success total"),
+        null=True,
+        blank=True,
+    )
+    failed_total = models.PositiveIntegerField(
+        _("failed total"),
+        null=True,
+        blank=True,
+    )
 
     class Meta:
         verbose_name = _("Bulk message send")
@@ -13,6 +13,10 @@ from chats.apps.msgs.models import (
     ChatMessageReplyIndex,
 )
 from chats.apps.msgs.usecases.get_bulk_send_rooms import GetBulkSendRoomsUseCase
+from chats.apps.msgs.usecases.message_status_batches import flush_message_statuses
+from chats.apps.msgs.usecases.send_bulk_message_chunk import (
+    SendBulkMessageChunkUseCase,
+)
 from chats.apps.msgs.usecases.send_bulk_message_to_room import (
     SendBulkMessageToRoomUseCase,
 )
@@ -29,6 +33,7 @@ logger = logging.getLogger(__name__)
 update_message_usecase = UpdateStatusMessageUseCase()
 get_bulk_send_rooms_usecase = GetBulkSendRoomsUseCase()
 send_bulk_message_to_room_usecase = SendBulkMessageToRoomUseCase()
+send_bulk_message_chunk_usecase = SendBulkMessageChunkUseCase()
 update_bulk_message_send_progress_usecase = UpdateBulkMessageSendProgressUseCase()
 
 
@@ -58,6 +63,17 @@ def process_message_status(self, message_id: str, message_status: str):
     update_message_usecase.update_status_message(message_id, message_status)
 
 
+@shared_task(name="flush_message_statuses")
+def flush_message_statuses_task():
+    """
+    Apply the message statuses queued by the batched ingestion.
+    """
+    handled = flush_message_statuses()
+    if handled:
+        logger.info("[flush_message_statuses] Handled %s message statuses", handled)
+    return handled
+
+
 @shared_task
 def process_bulk_message_send(bulk_send_uuid: UUID):
     """
@@ -70,6 +86,29 @@ def process_bulk_message_send(bulk_send_uuid: UUID):
     bulk_send = BulkMessageSend.objects.get(uuid=bulk_send_uuid)
     rooms = get_bulk_send_rooms_usecase.execute(bulk_send)
     rooms_count = rooms.count()
+
+    if settings.BULK_SEND_CHUNKED:
+        bulk_send.status = BulkMessageSendStatus.PROCESSING
+        bulk_send.rooms_qty = rooms_count
+        bulk_send.success_total = 0
+        bulk_send.failed_total = 0
+        bulk_send.save(
+            update_fields=[
+                "status",
+                "rooms_qty",
+                "success_total",
+                "failed_total",
+                "modified_on",
+            ]
+        )
+        send_bulk_message_chunk.delay(bulk_send_uuid)
+
+        logger.info(
+            f"[process_bulk_message_send] Bulk send with UUID {bulk_send_uuid} "
+            f"marked as PROCESSING, sending in chunks"
+        )
+        return
+
     room_uuids = list(rooms.values_list("uuid", flat=True))
 
     bulk_send.status = BulkMessageSendStatus.PROCESSING
@@ -108,6 +147,48 @@ def send_bulk_message_to_room(bulk_send_uuid: UUID, room_uuid: UUID):
     )
 
 
+@shared_task
+def send_bulk_message_chunk(
+    bulk_send_uuid: UUID, after_room_uuid: str = None, streamed: int = 0
+):
+    """
+    Send the bulk message text to the next BULK_SEND_CHUNK_SIZE rooms after
+    `after_room_uuid`, streaming the matching rooms in primary key order.
+
+    The task of the next chunk is queued before sending this one, so chunks
+    are sent in parallel by the available workers.
+    """
+    bulk_send = BulkMessageSend.objects.get(uuid=bulk_send_uuid)
+    rooms = get_bulk_send_rooms_usecase.execute(bulk_send).order_by("pk")
+    if after_room_uuid:
+        rooms = rooms.filter(pk__gt=after_room_uuid)
+    rooms = list(rooms[: settings.BULK_SEND_CHUNK_SIZE])
+    streamed += len(rooms)
+
+    if len(rooms) == settings.BULK_SEND_CHUNK_SIZE:
+        send_bulk_message_chunk.delay(bulk_send_uuid, str(rooms[-1].pk), streamed)
+    elif streamed != bulk_send.rooms_qty:
+        # Rooms that stopped or started matching the filters after they were
+        # counted; the send finishes once the streamed rooms are processed
+        logger.info(
+            f"[send_bulk_message_chunk] Bulk send with UUID {bulk_send_uuid} "
+            f"streamed {streamed} of {bulk_send.rooms_qty} rooms"
+        )
+        BulkMessageSend.objects.filter(uuid=bulk_send_uuid).update(
+            rooms_qty=streamed
+        )
+        update_bulk_message_send_progress.delay(bulk_send_uuid)
+
+    success_total, failed_total = send_bulk_message_chunk_usecase.execute(
+        bulk_send, rooms
+    )
+
+    logger.info(
+        f"[send_bulk_message_chunk] Sent bulk message to {success_total} rooms "
+        f"({failed_total} failed) for bulk send with UUID {bulk_send_uuid}"
+    )
+
+
 @shared_task
 def update_bulk_message_send_progress(bulk_send_uuid: UUID):
     """
@@ -0,0 +1,167 @@
+import json
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from chats.apps.accounts.models import User
+from chats.apps.msgs.models import ChatMessageReplyIndex, Message
+from chats.apps.msgs.usecases.message_status_batches import (
+    PENDING_KEY,
+    RETRY_KEY,
+    flush_message_statuses,
+    queue_message_status,
+)
+from chats.apps.projects.models.models import Project, ProjectPermission
+from chats.apps.queues.models import Queue
+from chats.apps.rooms.models import Room
+from chats.apps.sectors.models import Sector
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.commands.append((getattr(self.redis, name), args, kwargs))
+            return self
+
+        return command
+
+    def execute(self):
+        return [command(*args, **kwargs) for command, args, kwargs in self.commands]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def rpush(self, key, *values):
+        self.store.setdefault(key, []).extend(value.encode() for value in values)
+
+    def lrange(self, key, start, end):
+        return self.store.get(key, [])[slice(start, end + 1)]
+
+    def ltrim(self, key, start, end):
+        self.store[key] = self.store.get(key, [])[start:]
+
+    def zadd(self, key, mapping):
+        self.store.setdefault(key, {}).update(mapping)
+
+    def zrangebyscore(self, key, min_score, max_score):
+        return [
+            member.encode()
+            for member, score in self.store.get(key, {}).items()
+            if score <= max_score
+        ]
+
+    def zremrangebyscore(self, key, min_score, max_score):
+        members = self.store.get(key, {})
+        for member, score in list(members.items()):
+            if score <= max_score:
+                del members[member]
+
+
+@override_settings(MESSAGE_STATUS_BATCH_SIZE=10, MESSAGE_STATUS_MAX_RETRIES=2)
+class MessageStatusBatchesTests(TestCase):
+    def setUp(self):
+        project = Project.objects.create(name="Test Project")
+        sector = Sector.objects.create(
+            name="Test Sector",
+            project=project,
+            rooms_limit=10,
+            work_start="00:00",
+            work_end="23:59",
+        )
+        queue = Queue.objects.create(name="Test Queue", sector=sector)
+        agent = User.objects.create(email="agent@example.com")
+        self.permission = ProjectPermission.objects.create(
+            project=project, user=agent, role=ProjectPermission.ROLE_ATTENDANT
+        )
+        room = Room.objects.create(queue=queue, user=agent)
+
+        self.messages = [Message.objects.create(room=room) for _ in range(3)]
+        for index, message in enumerate(self.messages):
+            ChatMessageReplyIndex.objects.create(
+                external_id=f"wamid-{index}", message=message
+            )
+
+        self.redis = FakeRedis()
+        redis_patcher = patch(
+            "chats.apps.msgs.usecases.message_status_batches.get_redis_connection",
+            return_value=self.redis,
+        )
+        redis_patcher.start()
+        self.addCleanup(redis_patcher.stop)
+
+    @patch("chats.apps.msgs.usecases.message_status_batches.send_channels_group")
+    def test_statuses_are_applied_and_notified_in_batch(self, mock_send):
+        queue_message_status("wamid-0", "read")
+        queue_message_status("wamid-1", "DELIVERED")
+        queue_message_status("wamid-2", "V")
+
+        # Index lookup, one update per flag and the permissions lookup
+        with self.assertNumQueries(4):
+            self.assertEqual(flush_message_statuses(), 3)
+
+        for message in self.messages:
+            message.refresh_from_db()
+        self.assertEqual(self.messages[0].is_read, "read")
+        self.assertEqual(self.messages[1].is_delivered, "delivered")
+        self.assertEqual(self.messages[2].is_read, "read")
+
+        mock_send.assert_called_once()
+        notification = mock_send.call_args.kwargs
+        self.assertEqual(notification["group_name"], f"permission_{self.permission.pk}")
+        self.assertEqual(notification["action"], "message.status_update")
+        self.assertCountEqual(
+            notification["content"],
+            [
+                {"uuid": str(self.messages[0].uuid), "status": "read"},
+                {"uuid": str(self.messages[1].uuid), "status": "DELIVERED"},
+                {"uuid": str(self.messages[2].uuid), "status": "V"},
+            ],
+        )
+        self.assertEqual(self.redis.store[PENDING_KEY], [])
+
+    @patch("chats.apps.msgs.usecases.message_status_batches.send_channels_group")
+    def test_unknown_messages_are_retried_later(self, mock_send):
+        queue_message_status("wamid-unknown", "read")
+
+        flush_message_statuses()
+
+        retries = [json.loads(member) for member in self.redis.store[RETRY_KEY]]
+        self.assertEqual(
+            retries, [{"message_id": "wamid-unknown", "status": "read", "attempts": 1}]
+        )
+
+        # Due retries are taken by the next flush, and dropped once out of
+        # attempts
+        with patch("time.time", return_value=float("inf")):
+            self.assertEqual(flush_message_statuses(), 1)
+        self.assertEqual(self.redis.store[RETRY_KEY], {})
+        mock_send.assert_not_called()
+
+    def test_failed_batches_are_queued_again(self):
+        queue_message_status("wamid-0", "read")
+
+        with patch(
+            "chats.apps.msgs.usecases.message_status_batches.apply_statuses",
+            side_effect=RuntimeError,
+        ), self.assertRaises(RuntimeError):
+            flush_message_statuses()
+
+        self.assertEqual(
+            [json.loads(status) for status in self.redis.store[PENDING_KEY]],
+            [{"message_id": "wamid-0", "status": "read"}],
+        )
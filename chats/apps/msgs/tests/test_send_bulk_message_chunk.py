@@ -0,0 +1,207 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from chats.apps.contacts.models import Contact
+from chats.apps.msgs.choices import BulkMessageSendRoomStatus
+from chats.apps.msgs.models import (
+    BulkMessageSend,
+    BulkMessageSendMessage,
+    BulkMessageSendMessageStatus,
+    BulkMessageSendStatus,
+    Message,
+)
+from chats.apps.msgs.tasks import process_bulk_message_send, send_bulk_message_chunk
+from chats.apps.msgs.usecases.send_bulk_message_chunk import (
+    OUTSIDE_24H_WINDOW_ERROR,
+    SendBulkMessageChunkUseCase,
+)
+from chats.apps.msgs.usecases.update_bulk_message_send_progress import (
+    UpdateBulkMessageSendProgressUseCase,
+)
+from chats.apps.projects.models import Project
+from chats.apps.queues.models import Queue
+from chats.apps.rooms.models import Room
+from chats.apps.sectors.models import Sector
+
+User = get_user_model()
+
+
+class SendBulkMessageChunkTestMixin:
+    def setUp(self):
+        self.requester = User.objects.create_user(
+            email="requester@test.com", password="testpass123"
+        )
+        self.agent = User.objects.create_user(
+            email="agent@test.com", password="testpass123"
+        )
+        self.project = Project.objects.create(name="Test Project")
+        sector = Sector.objects.create(
+            name="Sector",
+            project=self.project,
+            rooms_limit=10,
+            work_start="09:00",
+            work_end="18:00",
+        )
+        self.queue = Queue.objects.create(name="Queue", sector=sector)
+        self.bulk_send = BulkMessageSend.objects.create(
+            user=self.requester,
+            project=self.project,
+            text="Bulk hello",
+            filter_snapshot={
+                "statuses": [
+                    BulkMessageSendRoomStatus.ONGOING,
+                    BulkMessageSendRoomStatus.WAITING,
+                ]
+            },
+            status=BulkMessageSendStatus.PROCESSING,
+            success_total=0,
+            failed_total=0,
+        )
+
+    def _create_room(self, user=None, **kwargs):
+        return Room.objects.create(
+            contact=Contact.objects.create(name="Contact"),
+            queue=self.queue,
+            user=user,
+            **kwargs,
+        )
+
+
+@patch("chats.apps.msgs.tasks.update_bulk_message_send_progress.delay")
+@patch("chats.apps.msgs.models.Message.notify_room")
+class SendBulkMessageChunkUseCaseTests(SendBulkMessageChunkTestMixin, TestCase):
+    def test_sends_the_chunk_in_bulk(self, mock_notify_room, mock_progress_delay):
+        rooms = [self._create_room(user=self.agent), self._create_room()]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(
+                SendBulkMessageChunkUseCase().execute(self.bulk_send, rooms), (2, 0)
+            )
+
+        for room in rooms:
+            room.refresh_from_db()
+            message = Message.objects.get(room=room)
+            self.assertEqual(message.text, "Bulk hello")
+            self.assertEqual(message.user_id, room.user_id)
+            self.assertEqual(room.last_message, message)
+            self.assertEqual(room.last_message_text, "Bulk hello")
+            self.assertEqual(
+                BulkMessageSendMessage.objects.get(room=room).status,
+                BulkMessageSendMessageStatus.SUCCESS,
+            )
+        self.assertEqual(rooms[0].last_message_user, self.agent)
+        self.assertIsNone(rooms[1].last_message_user)
+
+        self.bulk_send.refresh_from_db()
+        self.assertEqual(self.bulk_send.success_total, 2)
+        self.assertEqual(self.bulk_send.failed_total, 0)
+        self.assertEqual(mock_notify_room.call_count, 2)
+        mock_progress_delay.assert_called_once_with(self.bulk_send.uuid)
+
+    def test_rooms_outside_the_24h_window_fail(
+        self, mock_notify_room, mock_progress_delay
+    ):
+        room = self._create_room(user=self.agent, urn="whatsapp:5582999999999")
+        Room.objects.filter(pk=room.pk).update(
+            created_on=timezone.now() - timedelta(days=2)
+        )
+        room.refresh_from_db()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(
+                SendBulkMessageChunkUseCase().execute(self.bulk_send, [room]), (0, 1)
+            )
+
+        bulk_message = BulkMessageSendMessage.objects.get(room=room)
+        self.assertEqual(bulk_message.status, BulkMessageSendMessageStatus.FAILED)
+        self.assertEqual(bulk_message.errors["error"], OUTSIDE_24H_WINDOW_ERROR)
+        self.assertFalse(Message.objects.filter(room=room).exists())
+        mock_notify_room.assert_not_called()
+
+    @patch(
+        "chats.apps.msgs.usecases.update_bulk_message_send_progress.send_channels_group"
+    )
+    def test_progress_reads_the_counters(
+        self, mock_send, mock_notify_room, mock_progress_delay
+    ):
+        BulkMessageSend.objects.filter(pk=self.bulk_send.pk).update(
+            rooms_qty=4, success_total=3, failed_total=1
+        )
+
+        content = UpdateBulkMessageSendProgressUseCase().execute(self.bulk_send.uuid)
+
+        self.assertEqual(content["success_total"], 3)
+        self.assertEqual(content["failed_total"], 1)
+        self.assertEqual(content["percentage"], 100)
+        self.bulk_send.refresh_from_db()
+        self.assertEqual(self.bulk_send.status, BulkMessageSendStatus.FINISHED)
+
+
+@patch("chats.apps.msgs.tasks.update_bulk_message_send_progress.delay")
+@patch("chats.apps.msgs.models.Message.notify_room", side_effect=Exception("boom"))
+class SendBulkMessageChunkCommitTests(
+    SendBulkMessageChunkTestMixin, TransactionTestCase
+):
+    def test_failing_notifications_do_not_send_the_chunk_again(
+        self, mock_notify_room, mock_progress_delay
+    ):
+        rooms = [self._create_room(user=self.agent), self._create_room()]
+
+        self.assertEqual(
+            SendBulkMessageChunkUseCase().execute(self.bulk_send, rooms), (2, 0)
+        )
+
+        for room in rooms:
+            self.assertEqual(Message.objects.filter(room=room).count(), 1)
+        self.assertEqual(
+            BulkMessageSendMessage.objects.filter(bulk_message_send=self.bulk_send)
+            .filter(status=BulkMessageSendMessageStatus.SUCCESS)
+            .count(),
+            2,
+        )
+        self.bulk_send.refresh_from_db()
+        self.assertEqual(self.bulk_send.success_total, 2)
+        self.assertEqual(self.bulk_send.failed_total, 0)
+        # The other rooms are still notified
+        self.assertEqual(mock_notify_room.call_count, 2)
+        mock_progress_delay.assert_called_once_with(self.bulk_send.uuid)
+
+
+@override_settings(BULK_SEND_CHUNKED=True, BULK_SEND_CHUNK_SIZE=2)
+class SendBulkMessageChunkTaskTests(SendBulkMessageChunkTestMixin, TestCase):
+    @patch("chats.apps.msgs.tasks.send_bulk_message_chunk.delay")
+    def test_process_starts_the_chunks(self, mock_chunk_delay):
+        self._create_room()
+
+        process_bulk_message_send(self.bulk_send.uuid)
+
+        self.bulk_send.refresh_from_db()
+        self.assertEqual(self.bulk_send.rooms_qty, 1)
+        self.assertEqual(self.bulk_send.success_total, 0)
+        mock_chunk_delay.assert_called_once_with(self.bulk_send.uuid)
+
+    @patch("chats.apps.msgs.tasks.send_bulk_message_chunk_usecase")
+    @patch("chats.apps.msgs.tasks.send_bulk_message_chunk.delay")
+    def test_rooms_are_streamed_in_keyset_chunks(self, mock_chunk_delay, mock_usecase):
+        mock_usecase.execute.return_value = (2, 0)
+        BulkMessageSend.objects.filter(pk=self.bulk_send.pk).update(rooms_qty=3)
+        rooms = sorted(
+            [self._create_room() for _ in range(3)], key=lambda room: room.pk
+        )
+
+        send_bulk_message_chunk(self.bulk_send.uuid)
+
+        mock_chunk_delay.assert_called_once_with(
+            self.bulk_send.uuid, str(rooms[1].pk), 2
+        )
+        self.assertEqual(mock_usecase.execute.call_args.args[1], rooms[:2])
+
+        mock_chunk_delay.reset_mock()
+        send_bulk_message_chunk(self.bulk_send.uuid, str(rooms[1].pk), 2)
+
+        mock_chunk_delay.assert_not_called()
+        self.assertEqual(mock_usecase.execute.call_args.args[1], rooms[2:])
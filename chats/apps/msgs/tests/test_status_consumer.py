@@ -74,3 +74,17 @@ class TestMessageStatusConsumer(TestCase):
         self.mock_channel.basic_reject.assert_called_once_with(
             "delivery-tag-1", requeue=False
         )
+
+    @patch("chats.apps.msgs.consumers.msg_status_consumer.queue_message_status")
+    @patch(
+        "chats.apps.msgs.consumers.msg_status_consumer.process_message_status"
+    )
+    def test_queues_the_status_when_batching(self, mock_process, mock_queue):
+        self._set_body(b'{"message_id": "abc", "status": "READ"}')
+
+        with self.settings(MESSAGE_STATUS_BATCHING=True):
+            MessageStatusConsumer.consume(self.mock_message)
+
+        mock_queue.assert_called_once_with("abc", "READ")
+        mock_process.delay.assert_not_called()
+        self.mock_channel.basic_ack.assert_called_once_with("delivery-tag-1")
@@ -0,0 +1,227 @@
+"""
+Batched ingestion of the message statuses.
+
+With settings.MESSAGE_STATUS_BATCHING enabled, `MessageStatusConsumer` pushes
+the delivered/read statuses to a Redis list instead of queueing one
+`process_message_status` task per status, and `flush_message_statuses`
+periodically applies them in batches of MESSAGE_STATUS_BATCH_SIZE:
+
+- the messages of a batch are resolved with one `external_id__in` lookup on
+  `ChatMessageReplyIndex`, and the permissions of their agents with another;
+- the read and delivered flags are set with one UPDATE each;
+- each agent gets a single `message.status_update` event, whose content is
+  the list of the updated messages with their status.
+
+Statuses arriving before their message exists (its external id is set after
+the message is sent) go to a delayed retry set, and are tried again after
+MESSAGE_STATUS_RETRY_DELAY seconds, up to MESSAGE_STATUS_MAX_RETRIES times.
+"""
+
+import json
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from chats.apps.api.v1.prometheus.metrics import (
+    message_status_batch_size,
+    message_status_total,
+)
+from chats.apps.msgs.models import ChatMessageReplyIndex, Message
+from chats.apps.msgs.usecases.UpdateStatusMessageUseCase import (
+    STATUS_DELIVERED_ALIASES,
+    STATUS_READ_ALIASES,
+)
+from chats.apps.projects.models.models import ProjectPermission
+from chats.utils.websockets import send_channels_group
+
+logger = logging.getLogger(__name__)
+
+
+PENDING_KEY = "msg_status:pending"
+RETRY_KEY = "msg_status:retry"
+
+
+def is_status_batching_enabled() -> bool:
+    return settings.MESSAGE_STATUS_BATCHING
+
+
+def queue_message_status(message_id: str, message_status: str) -> None:
+    redis = get_redis_connection()
+    redis.rpush(
+        PENDING_KEY, json.dumps({"message_id": message_id, "status": message_status})
+    )
+
+
+def _take_pending(redis, batch_size: int) -> List[dict]:
+    with redis.pipeline() as pipe:
+        pipe.lrange(PENDING_KEY, 0, batch_size - 1)
+        pipe.ltrim(PENDING_KEY, batch_size, -1)
+        pending, _ = pipe.execute()
+    return [json.loads(status) for status in pending]
+
+
+def _take_due_retries(redis) -> List[dict]:
+    now = time.time()
+    with redis.pipeline() as pipe:
+        pipe.zrangebyscore(RETRY_KEY, "-inf", now)
+        pipe.zremrangebyscore(RETRY_KEY, "-inf", now)
+        retries, _ = pipe.execute()
+    return [json.loads(status) for status in retries]
+
+
+def _schedule_retries(redis, statuses: List[dict]) -> None:
+    retry_at = time.time() + settings.MESSAGE_STATUS_RETRY_DELAY
+    retries = {}
+    for status in statuses:
+        attempts = status.get("attempts", 0) + 1
+        if attempts >= settings.MESSAGE_STATUS_MAX_RETRIES:
+            logger.warning(
+                "[MESSAGE STATUS] Message without external_id: %s",
+                status["message_id"],
+            )
+            message_status_total.labels(result="dropped").inc()
+            continue
+        retries[json.dumps({**status, "attempts": attempts})] = retry_at
+        message_status_total.labels(result="retried").inc()
+
+    if retries:
+        redis.zadd(RETRY_KEY, retries)
+
+
+def _notify_permissions(notifications: Dict[str, List[dict]]) -> None:
+    for permission_pk, statuses in notifications.items():
+        try:
+            send_channels_group(
+                group_name=f"permission_{permission_pk}",
+                call_type="notify",
+                content=statuses,
+                action="message.status_update",
+            )
+        except Exception as error:
+            logger.warning(
+                "[MESSAGE STATUS] Notification failed for permission %s: %s",
+                permission_pk,
+                error,
+            )
+
+
+def apply_statuses(statuses: List[dict]) -> List[dict]:
+    """
+    Apply a batch of statuses. Returns the statuses whose message was not
+    found.
+    """
+    statuses_by_external_id = defaultdict(list)
+    for status in statuses:
+        statuses_by_external_id[status["message_id"]].append(status)
+
+    indexes = ChatMessageReplyIndex.objects.filter(
+        external_id__in=statuses_by_external_id.keys()
+    ).values(
+        "external_id",
+        "message__uuid",
+        "message__is_read",
+        "message__is_delivered",
+        "message__room__user_id",
+        "message__room__queue__sector__project_id",
+    )
+
+    read, delivered = set(), set()
+    # Updated messages statuses, by agent (project, user)
+    updated = defaultdict(list)
+    found = set()
+    for index in indexes:
+        found.add(index["external_id"])
+        project_id = index["message__room__queue__sector__project_id"]
+        if project_id is None:
+            continue
+
+        message_uuid = index["message__uuid"]
+        for status in statuses_by_external_id[index["external_id"]]:
+            message_status = status["status"]
+            normalized = (message_status or "").upper()
+            if (
+                normalized in STATUS_READ_ALIASES
+                and not index["message__is_read"]
+                and message_uuid not in read
+            ):
+                read.add(message_uuid)
+            elif (
+                normalized in STATUS_DELIVERED_ALIASES
+                and not index["message__is_delivered"]
+                and message_uuid not in delivered
+            ):
+                delivered.add(message_uuid)
+            else:
+                continue
+
+            user_id = index["message__room__user_id"]
+            if user_id:
+                updated[(project_id, user_id)].append(
+                    {"uuid": str(message_uuid), "status": message_status}
+                )
+
+    if read:
+        Message.objects.filter(uuid__in=read).update(is_read="read")
+    if delivered:
+        Message.objects.filter(uuid__in=delivered).update(is_delivered="delivered")
+
+    if updated:
+        permissions = ProjectPermission.objects.filter(
+            project_id__in={project_id for project_id, _ in updated},
+            user_id__in={user_id for _, user_id in updated},
+        ).values_list("pk", "project_id", "user_id")
+        _notify_permissions(
+            {
+                permission_pk: updated[(project_id, user_id)]
+                for permission_pk, project_id, user_id in permissions
+                if (project_id, user_id) in updated
+            }
+        )
+
+    missing = [
+        status
+        for external_id, external_id_statuses in statuses_by_external_id.items()
+        if external_id not in found
+        for status in external_id_statuses
+    ]
+    message_status_total.labels(result="applied").inc(len(statuses) - len(missing))
+    return missing
+
+
+def flush_message_statuses(batch_size: Optional[int] = None) -> int:
+    """
+    Apply the queued statuses and the retries that are due. Returns how many
+    statuses were handled.
+    """
+    batch_size = batch_size or settings.MESSAGE_STATUS_BATCH_SIZE
+    redis = get_redis_connection()
+
+    retries = _take_due_retries(redis)
+    handled = 0
+    while True:
+        batch, retries = retries[:batch_size], retries[batch_size:]
+        if len(batch) < batch_size:
+            batch += _take_pending(redis, batch_size - len(batch))
+        if not batch:
+            break
+
+        try:
+            missing = apply_statuses(batch)
+        except Exception:
+            # Queue the statuses again for the next flush
+            redis.rpush(
+                PENDING_KEY, *[json.dumps(status) for status in [*batch, *retries]]
+            )
+            raise
+
+        _schedule_retries(redis, missing)
+        message_status_batch_size.observe(len(batch))
+        handled += len(batch)
+        if len(batch) < batch_size:
+            break
+
+    return handled
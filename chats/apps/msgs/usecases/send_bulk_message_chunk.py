@@ -0,0 +1,217 @@
+import logging
+from datetime import datetime, timedelta
+from typing import List, Set, Tuple
+from uuid import UUID
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from chats.apps.accounts.models import User
+from chats.apps.msgs.models import (
+    BulkMessageSend,
+    BulkMessageSendMessage,
+    BulkMessageSendMessageStatus,
+    Message,
+)
+from chats.apps.msgs.usecases.send_bulk_message_to_room import (
+    SendBulkMessageToRoomUseCase,
+    _schedule_progress_update,
+)
+from chats.apps.rooms.models import Room
+from chats.apps.rooms.usecases.inactivity_deadlines import schedule_rooms_on_commit
+from chats.utils.websockets import notification_outbox
+
+logger = logging.getLogger(__name__)
+
+OUTSIDE_24H_WINDOW_ERROR = (
+    "You can't send messages after 24h from the last contact message"
+)
+
+
+class SendBulkMessageChunkUseCase:
+    """
+    Creates and delivers a bulk-send message to a chunk of rooms at once.
+
+    Messages and ``BulkMessageSendMessage`` rows are created with
+    ``bulk_create``, the rooms' last message fields are updated with a single
+    statement, and the websocket notifications and callbacks are sent
+    through the notification outbox. Outcomes are added to the bulk send
+    ``success_total`` / ``failed_total`` counters.
+
+    Rooms outside the WhatsApp 24h window are marked as FAILED, as
+    ``Message.save`` would refuse them. When the chunk can't be committed as
+    a whole, its rooms are sent one by one with
+    ``SendBulkMessageToRoomUseCase``. Once it is committed, failures of the
+    notifications are only logged, as the chunk must not be sent again.
+    """
+
+    def execute(self, bulk_send: BulkMessageSend, rooms: List[Room]) -> Tuple[int, int]:
+        """
+        Returns the (success, failed) totals of the chunk.
+        """
+        if not rooms:
+            return 0, 0
+
+        try:
+            with transaction.atomic():
+                valid_rooms, messages, failed_total = self._send(bulk_send, rooms)
+        except Exception as exc:
+            logger.info(
+                f"[SendBulkMessageChunkUseCase] Failed to send chunk of {len(rooms)} "
+                f"rooms for bulk send with UUID {bulk_send.uuid}, sending them one "
+                f"by one: {exc}",
+                exc_info=True,
+            )
+            return self._send_one_by_one(bulk_send, rooms)
+
+        success_total = len(messages)
+        logger.info(
+            f"[SendBulkMessageChunkUseCase] Sent bulk message to {success_total} rooms "
+            f"({failed_total} failed) for bulk send with UUID {bulk_send.uuid}"
+        )
+
+        try:
+            schedule_rooms_on_commit([room.pk for room in valid_rooms])
+            _schedule_progress_update(bulk_send.uuid)
+            transaction.on_commit(lambda: self._notify(valid_rooms, messages))
+        except Exception as exc:
+            logger.error(
+                f"[SendBulkMessageChunkUseCase] Failed to notify the chunk of "
+                f"{len(rooms)} rooms for bulk send with UUID {bulk_send.uuid}: {exc}",
+                exc_info=True,
+            )
+        return success_total, failed_total
+
+    def _get_rooms_outside_24h_window(
+        self, rooms: List[Room], now: datetime
+    ) -> Set[UUID]:
+        """
+        Pks of the WhatsApp rooms with an agent, created over a day ago, whose
+        contact didn't send a message in the last day.
+        """
+        day_ago = now - timedelta(days=1)
+        candidates = [
+            room
+            for room in rooms
+            if room.user_id
+            and (room.urn or "").startswith("whatsapp")
+            and room.created_on <= day_ago
+        ]
+        if not candidates:
+            return set()
+
+        recently_active = set(
+            Message.objects.filter(
+                room__in=candidates,
+                created_on__gte=day_ago,
+                contact_id=F("room__contact_id"),
+            )
+            .values_list("room_id", flat=True)
+            .distinct()
+        )
+        return {room.pk for room in candidates if room.pk not in recently_active}
+
+    def _send(
+        self, bulk_send: BulkMessageSend, rooms: List[Room]
+    ) -> Tuple[List[Room], List[Message], int]:
+        """
+        Returns the rooms the message was sent to, their messages and the
+        failed total.
+        """
+        now = timezone.now()
+        outside_window = self._get_rooms_outside_24h_window(rooms, now)
+        valid_rooms = [room for room in rooms if room.pk not in outside_window]
+
+        messages = Message.objects.bulk_create(
+            [
+                Message(
+                    room=room,
+                    user_id=room.user_id,
+                    contact=None,
+                    text=bulk_send.text,
+                    created_on=now,
+                )
+                for room in valid_rooms
+            ]
+        )
+        BulkMessageSendMessage.objects.bulk_create(
+            [
+                BulkMessageSendMessage(
+                    bulk_message_send=bulk_send,
+                    room=message.room,
+                    message=message,
+                    status=BulkMessageSendMessageStatus.SUCCESS,
+                )
+                for message in messages
+            ]
+            + [
+                BulkMessageSendMessage(
+                    bulk_message_send=bulk_send,
+                    room=room,
+                    message=None,
+                    status=BulkMessageSendMessageStatus.FAILED,
+                    errors={"error": OUTSIDE_24H_WINDOW_ERROR, "traceback": ""},
+                )
+                for room in rooms
+                if room.pk in outside_window
+            ]
+        )
+
+        if valid_rooms:
+            Room.objects.filter(pk__in=[room.pk for room in valid_rooms]).update(
+                last_message_id=Subquery(
+                    BulkMessageSendMessage.objects.filter(
+                        bulk_message_send=bulk_send, room=OuterRef("pk")
+                    ).values("message_id")[:1]
+                ),
+                last_message_text=bulk_send.text,
+                last_message_user_id=Subquery(
+                    User.objects.filter(email=OuterRef("user_id")).values("pk")[:1]
+                ),
+                last_message_contact=None,
+                last_message_media=[],
+                last_interaction=now,
+            )
+
+        self._add_to_counters(bulk_send, len(messages), len(outside_window))
+        return valid_rooms, messages, len(outside_window)
+
+    def _send_one_by_one(
+        self, bulk_send: BulkMessageSend, rooms: List[Room]
+    ) -> Tuple[int, int]:
+        use_case = SendBulkMessageToRoomUseCase()
+        statuses = [use_case.execute(bulk_send, room).status for room in rooms]
+
+        success_total = statuses.count(BulkMessageSendMessageStatus.SUCCESS)
+        failed_total = len(statuses) - success_total
+        self._add_to_counters(bulk_send, success_total, failed_total)
+        return success_total, failed_total
+
+    def _add_to_counters(
+        self, bulk_send: BulkMessageSend, success_total: int, failed_total: int
+    ):
+        BulkMessageSend.objects.filter(pk=bulk_send.pk).update(
+            success_total=F("success_total") + success_total,
+            failed_total=F("failed_total") + failed_total,
+        )
+
+    def _notify(self, rooms: List[Room], messages: List[Message]):
+        from chats.apps.dashboard.utils import track_response_time
+
+        cache.delete_many([room.room_24h_valid_cache_key for room in rooms])
+
+        with notification_outbox():
+            for message in messages:
+                # Each room on its own, as when sent one by one
+                try:
+                    message.room.invalidate_serialized_ws_data()
+                    track_response_time(message.room, [message])
+                    message.notify_room("create", True)
+                except Exception as exc:
+                    logger.error(
+                        f"[SendBulkMessageChunkUseCase] Failed to notify room "
+                        f"{message.room.pk} of message {message.pk}: {exc}",
+                        exc_info=True,
+                    )
@@ -37,18 +37,23 @@ class UpdateBulkMessageSendProgressUseCase:
             )
             return None
 
-        stats = BulkMessageSendMessage.objects.filter(
-            bulk_message_send=bulk_send
-        ).aggregate(
-            success_total=Count(
-                "pk", filter=Q(status=BulkMessageSendMessageStatus.SUCCESS)
-            ),
-            failed_total=Count(
-                "pk", filter=Q(status=BulkMessageSendMessageStatus.FAILED)
-            ),
-        )
-        success_total = stats["success_total"] or 0
-        failed_total = stats["failed_total"] or 0
+        if bulk_send.success_total is not None:
+            # Chunked sends keep counters instead
+            success_total = bulk_send.success_total
+            failed_total = bulk_send.failed_total or 0
+        else:
+            stats = BulkMessageSendMessage.objects.filter(
+                bulk_message_send=bulk_send
+            ).aggregate(
+                success_total=Count(
+                    "pk", filter=Q(status=BulkMessageSendMessageStatus.SUCCESS)
+                ),
+                failed_total=Count(
+                    "pk", filter=Q(status=BulkMessageSendMessageStatus.FAILED)
+                ),
+            )
+            success_total = stats["success_total"] or 0
+            failed_total = stats["failed_total"] or 0
         processed = success_total + failed_total
         total_to_send = bulk_send.rooms_qty or 0
 
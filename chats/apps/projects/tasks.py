@@ -118,3 +118,12 @@ def log_agent_status_change(
     except Exception as e:
         logger.error(f"Error logging agent status change: {e}", exc_info=True)
         raise
+
+
+@app.task(name="flush_last_seen_heartbeats")
+def flush_last_seen_heartbeats():
+    from chats.apps.projects.usecases.last_seen_heartbeats import flush_heartbeats
+
+    flushed = flush_heartbeats()
+    if flushed:
+        logger.info("[LAST SEEN] %s heartbeats flushed", flushed)
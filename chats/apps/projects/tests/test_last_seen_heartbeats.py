@@ -0,0 +1,174 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from chats.apps.accounts.models import User
+from chats.apps.projects.models.models import Project, ProjectPermission
+from chats.apps.projects.usecases.last_seen_heartbeats import (
+    PENDING_KEY,
+    flush_heartbeats,
+    get_recently_seen_permission_pks,
+    record_heartbeat,
+)
+from chats.apps.queues.models import Queue, QueueAuthorization
+from chats.apps.sectors.models import Sector
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.commands.append((getattr(self.redis, name), args, kwargs))
+            return self
+
+        return command
+
+    def execute(self):
+        return [command(*args, **kwargs) for command, args, kwargs in self.commands]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def zadd(self, key, mapping):
+        self.store.setdefault(key, {}).update(mapping)
+
+    def zremrangebyscore(self, key, min_score, max_score):
+        members = self.store.get(key, {})
+        for member, score in list(members.items()):
+            if score <= max_score:
+                del members[member]
+
+    def zrangebyscore(self, key, min_score, max_score):
+        return [
+            member.encode()
+            for member, score in self.store.get(key, {}).items()
+            if score >= min_score
+        ]
+
+    def exists(self, key):
+        return int(key in self.store)
+
+    def expire(self, key, seconds):
+        return True
+
+    def hset(self, key, field, value):
+        self.store.setdefault(key, {})[field] = value
+
+    def hsetnx(self, key, field, value):
+        self.store.setdefault(key, {}).setdefault(field, value)
+
+    def hgetall(self, key):
+        return {
+            field.encode(): str(value).encode()
+            for field, value in self.store.get(key, {}).items()
+        }
+
+    def delete(self, *keys):
+        return sum(self.store.pop(key, None) is not None for key in keys)
+
+
+@override_settings(WS_LAST_SEEN_HEARTBEAT_INDEX=True)
+class LastSeenHeartbeatsTests(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(name="Test Project")
+        sector = Sector.objects.create(
+            name="Test Sector",
+            project=self.project,
+            rooms_limit=10,
+            work_start="00:00",
+            work_end="23:59",
+        )
+        self.queue = Queue.objects.create(name="Test Queue", sector=sector)
+        self.seen_agent = User.objects.create(email="seen@example.com")
+        self.unseen_agent = User.objects.create(email="unseen@example.com")
+        self.seen_permission, self.unseen_permission = [
+            ProjectPermission.objects.create(
+                project=self.project,
+                user=agent,
+                role=ProjectPermission.ROLE_ATTENDANT,
+                status=ProjectPermission.STATUS_ONLINE,
+                last_seen=timezone.now(),
+            )
+            for agent in (self.seen_agent, self.unseen_agent)
+        ]
+        for permission in (self.seen_permission, self.unseen_permission):
+            QueueAuthorization.objects.create(
+                queue=self.queue, permission=permission, role=1
+            )
+
+        self.redis = FakeRedis()
+        redis_patcher = patch(
+            "chats.apps.projects.usecases.last_seen_heartbeats.get_redis_connection",
+            return_value=self.redis,
+        )
+        redis_patcher.start()
+        self.addCleanup(redis_patcher.stop)
+
+    def test_recently_seen_permissions(self):
+        self.assertIsNone(get_recently_seen_permission_pks(self.project.pk))
+
+        self.assertTrue(
+            record_heartbeat(self.project.pk, self.seen_permission.pk, timezone.now())
+        )
+
+        self.assertEqual(
+            get_recently_seen_permission_pks(self.project.pk),
+            {str(self.seen_permission.pk)},
+        )
+        with override_settings(WS_LAST_SEEN_HEARTBEAT_INDEX=False):
+            self.assertIsNone(get_recently_seen_permission_pks(self.project.pk))
+
+    def test_online_agents_read_the_index(self):
+        record_heartbeat(self.project.pk, self.seen_permission.pk, timezone.now())
+
+        with patch.object(Queue, "_is_ping_timeout_feature_enabled", return_value=True):
+            online_agents = list(self.queue.online_agents)
+
+        self.assertEqual(online_agents, [self.seen_agent])
+
+    def test_flush_writes_pending_heartbeats(self):
+        seen_at = timezone.now() + timedelta(seconds=5)
+        record_heartbeat(self.project.pk, self.seen_permission.pk, seen_at)
+        record_heartbeat(
+            self.project.pk, self.unseen_permission.pk, seen_at - timedelta(days=1)
+        )
+
+        with self.assertNumQueries(1):
+            self.assertEqual(flush_heartbeats(), 2)
+
+        self.seen_permission.refresh_from_db()
+        self.assertEqual(self.seen_permission.last_seen, seen_at)
+        # Older heartbeats never move last_seen backwards
+        last_seen = self.unseen_permission.last_seen
+        self.unseen_permission.refresh_from_db()
+        self.assertEqual(self.unseen_permission.last_seen, last_seen)
+
+        self.assertNotIn(PENDING_KEY, self.redis.store)
+        self.assertEqual(flush_heartbeats(), 0)
+
+    def test_failed_flush_keeps_the_heartbeats(self):
+        record_heartbeat(self.project.pk, self.seen_permission.pk, timezone.now())
+
+        with patch(
+            "chats.apps.projects.usecases.last_seen_heartbeats.bulk_update_last_seen",
+            side_effect=RuntimeError,
+        ), self.assertRaises(RuntimeError):
+            flush_heartbeats()
+
+        self.assertIn(str(self.seen_permission.pk), self.redis.store[PENDING_KEY])
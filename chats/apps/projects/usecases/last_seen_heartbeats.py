@@ -0,0 +1,177 @@
+"""
+Heartbeat index of the agents `last_seen`.
+
+With settings.WS_LAST_SEEN_HEARTBEAT_INDEX enabled, the websocket consumers
+record the agents heartbeats in Redis instead of saving
+`ProjectPermission.last_seen` one row at a time:
+
+- a sorted set per project, scored by the heartbeat timestamp and keyed by
+  permission pk, tells which agents were seen within
+  WS_LAST_SEEN_THRESHOLD_SECONDS (`Queue.online_agents` and the router read it);
+- a hash of the heartbeats not written to the database yet, which
+  `flush_heartbeats` periodically writes with bulk UPDATEs.
+
+Readers fall back to the `last_seen` column when Redis fails or when the
+project has no index yet (e.g. right after enabling the setting, or after a
+Redis restart).
+"""
+
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+from itertools import islice
+from typing import List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import connection
+from django_redis import get_redis_connection
+
+from chats.apps.api.v1.prometheus.metrics import (
+    last_seen_flush_lag_seconds,
+    last_seen_flush_size,
+)
+from chats.apps.projects.models.models import ProjectPermission
+
+logger = logging.getLogger(__name__)
+
+
+PENDING_KEY = "last_seen:pending"
+
+
+def is_heartbeat_index_enabled() -> bool:
+    return settings.WS_LAST_SEEN_HEARTBEAT_INDEX
+
+
+def get_project_key(project_uuid) -> str:
+    return f"last_seen:{project_uuid}"
+
+
+def record_heartbeat(project_uuid, permission_pk, seen_at: datetime) -> bool:
+    """
+    Record that the agent was seen at `seen_at`. Returns False when the
+    heartbeat could not be recorded, for the caller to save it instead.
+    """
+    key = get_project_key(project_uuid)
+    timestamp = seen_at.timestamp()
+    threshold = settings.WS_LAST_SEEN_THRESHOLD_SECONDS
+
+    try:
+        redis = get_redis_connection()
+        with redis.pipeline() as pipe:
+            pipe.zadd(key, {str(permission_pk): timestamp})
+            # Agents not seen within the threshold are offline anyway
+            pipe.zremrangebyscore(key, "-inf", timestamp - threshold)
+            pipe.expire(key, threshold * 2)
+            pipe.hset(PENDING_KEY, str(permission_pk), timestamp)
+            pipe.execute()
+    except Exception as error:
+        logger.warning(
+            "[LAST SEEN] Could not record the heartbeat of %s: %s",
+            permission_pk,
+            error,
+        )
+        return False
+
+    return True
+
+
+def get_recently_seen_permission_pks(project_uuid) -> Optional[Set[str]]:
+    """
+    Pks of the project permissions seen within WS_LAST_SEEN_THRESHOLD_SECONDS,
+    or None when they must be read from the database instead.
+    """
+    if not is_heartbeat_index_enabled():
+        return None
+
+    key = get_project_key(project_uuid)
+    threshold = time.time() - settings.WS_LAST_SEEN_THRESHOLD_SECONDS
+
+    try:
+        redis = get_redis_connection()
+        with redis.pipeline(transaction=False) as pipe:
+            pipe.exists(key)
+            pipe.zrangebyscore(key, threshold, "+inf")
+            exists, permission_pks = pipe.execute()
+    except Exception as error:
+        logger.warning(
+            "[LAST SEEN] Could not read the heartbeats of project %s: %s",
+            project_uuid,
+            error,
+        )
+        return None
+
+    if not exists:
+        return None
+    return {permission_pk.decode() for permission_pk in permission_pks}
+
+
+def bulk_update_last_seen(rows: List[Tuple[str, datetime]]) -> int:
+    """
+    Write the (permission pk, last seen) rows with a single UPDATE, never
+    moving a `last_seen` backwards.
+    """
+    values = ", ".join(["(%s::uuid, %s::timestamptz)"] * len(rows))
+    params = [value for row in rows for value in row]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {ProjectPermission._meta.db_table} AS permission "
+            "SET last_seen = heartbeat.last_seen "
+            f"FROM (VALUES {values}) AS heartbeat (uuid, last_seen) "
+            "WHERE permission.uuid = heartbeat.uuid "
+            "AND (permission.last_seen IS NULL "
+            "OR permission.last_seen < heartbeat.last_seen)",
+            params,
+        )
+        return cursor.rowcount
+
+
+def flush_heartbeats(batch_size: Optional[int] = None) -> int:
+    """
+    Write the pending heartbeats to the database. Returns how many were
+    written.
+    """
+    batch_size = batch_size or settings.WS_LAST_SEEN_FLUSH_BATCH_SIZE
+
+    redis = get_redis_connection()
+    with redis.pipeline() as pipe:
+        pipe.hgetall(PENDING_KEY)
+        pipe.delete(PENDING_KEY)
+        pending, _ = pipe.execute()
+
+    if not pending:
+        last_seen_flush_size.observe(0)
+        return 0
+
+    last_seen_flush_lag_seconds.observe(
+        time.time() - min(float(timestamp) for timestamp in pending.values())
+    )
+
+    rows = [
+        (
+            permission_pk.decode(),
+            datetime.fromtimestamp(float(timestamp), tz=dt_timezone.utc),
+        )
+        for permission_pk, timestamp in pending.items()
+    ]
+    remaining = iter(rows)
+    flushed = 0
+    while True:
+        batch = list(islice(remaining, batch_size))
+        if not batch:
+            break
+
+        try:
+            bulk_update_last_seen(batch)
+        except Exception:
+            # Put the unwritten heartbeats back for the next flush, unless
+            # newer ones were recorded meanwhile
+            with redis.pipeline() as pipe:
+                for permission_pk, seen_at in [*batch, *remaining]:
+                    pipe.hsetnx(PENDING_KEY, permission_pk, seen_at.timestamp())
+                pipe.execute()
+            raise
+        flushed += len(batch)
+
+    last_seen_flush_size.observe(flushed)
+    return flushed
@@ -0,0 +1,282 @@
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from chats.apps.dashboard.models import RoomMetrics
+from chats.apps.dashboard.rollups import mark_rooms_dirty
+from chats.apps.dashboard.utils import calculate_last_queue_waiting_time
+from chats.apps.feature_flags.cache import is_feature_active_for_attributes
+from chats.apps.rooms.choices import RoomFeedbackMethods
+from chats.apps.rooms.utils import create_transfer_json
+from chats.utils.websockets import notification_outbox, send_channels_group
+
+if TYPE_CHECKING:
+    from chats.apps.accounts.models import User
+    from chats.apps.queues.capacity_ledger import AgentCapacityLedger
+    from chats.apps.queues.models import Queue
+    from chats.apps.rooms.models import Room
+
+
+logger = logging.getLogger(__name__)
+
+
+def is_bulk_assignment_enabled(project) -> bool:
+    """Check if bulk room assignment is enabled for the given project."""
+    try:
+        return is_feature_active_for_attributes(
+            settings.QUEUE_ROUTING_BULK_ASSIGNMENT_FEATURE_FLAG_KEY,
+            {"projectUUID": str(project.uuid)},
+        )
+    except Exception:
+        return False
+
+
+@dataclass
+class RoomAssignment:
+    room: "Room"
+    agent: "User"
+    old_user_assigned_at: Optional[datetime] = None
+
+
+class BulkRoomAssigner:
+    """
+    Claims and assigns queued rooms in batches.
+
+    Each batch locks up to N queued rooms with a single
+    SELECT ... FOR UPDATE SKIP LOCKED, pairs them with agents from the
+    capacity ledger and writes all assignments with a single UPDATE.
+    Side effects (feedback messages, metrics, ticket updates and websocket
+    notifications) are then applied per batch instead of per room. As with
+    the per-room routing, the agents' in-service status is not updated.
+    """
+
+    def __init__(self, queue: "Queue"):
+        self.queue = queue
+        self.project = queue.sector.project
+
+    def get_rooms_to_claim(self):
+        from chats.apps.rooms.models import Room
+
+        return (
+            Room.objects.filter(queue=self.queue, is_active=True, user__isnull=True)
+            .annotate(date_field=Coalesce("added_to_queue_at", "created_on"))
+            .order_by("date_field")
+        )
+
+    def claim_and_assign(
+        self, ledger: "AgentCapacityLedger", limit: int
+    ) -> List[RoomAssignment]:
+        """
+        Claim up to `limit` queued rooms and assign them to the agents
+        returned by the ledger. Returns the assignments made.
+        """
+        with transaction.atomic():
+            rooms = list(
+                self.get_rooms_to_claim()
+                .select_related("queue__sector")
+                .select_for_update(skip_locked=True, of=("self",))[:limit]
+            )
+
+            assignments = []
+            for room in rooms:
+                agent = ledger.peek()
+                if not agent:
+                    break
+                ledger.assign(agent)
+                assignments.append(
+                    RoomAssignment(
+                        room=room,
+                        agent=agent,
+                        old_user_assigned_at=room.user_assigned_at,
+                    )
+                )
+
+            if not assignments:
+                return []
+
+            self._write_assignments(assignments)
+            self._update_metrics(assignments)
+            # Rooms and metrics are written in bulk, bypassing save signals
+            mark_rooms_dirty(assignment.room.pk for assignment in assignments)
+            messages = self._create_feedback_messages(assignments)
+
+            transaction.on_commit(lambda: self._run_side_effects(assignments, messages))
+
+        return assignments
+
+    def _write_assignments(self, assignments: List[RoomAssignment]):
+        from chats.apps.rooms.models import Room
+
+        now = timezone.now()
+
+        Room.objects.filter(
+            pk__in=[assignment.room.pk for assignment in assignments]
+        ).update(
+            user_id=models.Case(
+                *[
+                    models.When(
+                        pk=assignment.room.pk,
+                        then=models.Value(assignment.agent.email),
+                    )
+                    for assignment in assignments
+                ],
+                output_field=models.CharField(),
+            ),
+            user_assigned_at=now,
+            first_user_assigned_at=Coalesce(
+                "first_user_assigned_at",
+                models.Value(now, output_field=models.DateTimeField()),
+            ),
+            modified_on=now,
+        )
+
+        for assignment in assignments:
+            room = assignment.room
+            room.user = assignment.agent
+            room.user_assigned_at = now
+            room.first_user_assigned_at = room.first_user_assigned_at or now
+            room.modified_on = now
+
+    def _update_metrics(self, assignments: List[RoomAssignment]):
+        rooms = [assignment.room for assignment in assignments]
+        existing_metrics = {
+            metric.room_id: metric
+            for metric in RoomMetrics.objects.filter(room__in=rooms)
+        }
+
+        metrics_to_create = []
+        metrics_to_update = []
+
+        for room in rooms:
+            metric = existing_metrics.get(room.pk)
+            waiting_time = calculate_last_queue_waiting_time(room)
+
+            if metric is None:
+                metrics_to_create.append(
+                    RoomMetrics(room=room, waiting_time=waiting_time, queued_count=1)
+                )
+                continue
+
+            metric.waiting_time += waiting_time
+            metric.queued_count += 1
+            metrics_to_update.append(metric)
+
+        RoomMetrics.objects.bulk_create(metrics_to_create)
+        RoomMetrics.objects.bulk_update(
+            metrics_to_update, ["waiting_time", "queued_count"]
+        )
+
+    def _create_feedback_messages(self, assignments: List[RoomAssignment]):
+        from chats.apps.msgs.models import Message
+        from chats.apps.rooms.views import create_feedback_json
+
+        messages = Message.objects.bulk_create(
+            [
+                Message(
+                    room=assignment.room,
+                    text=json.dumps(
+                        create_feedback_json(
+                            method=RoomFeedbackMethods.ROOM_TRANSFER,
+                            content=create_transfer_json(
+                                action="auto_assign_from_queue",
+                                from_=self.queue,
+                                to=assignment.agent,
+                            ),
+                        )
+                    ),
+                    seen=True,
+                )
+                for assignment in assignments
+            ]
+        )
+
+        # Mirrors Message.save, which is skipped by bulk_create
+        cache.delete_many(
+            [assignment.room.room_24h_valid_cache_key for assignment in assignments]
+        )
+
+        return messages
+
+    def _get_permissions_by_agent(self, assignments: List[RoomAssignment]) -> Dict:
+        from chats.apps.projects.models import ProjectPermission
+
+        permissions = ProjectPermission.objects.filter(
+            project=self.project,
+            user__in={assignment.agent.email for assignment in assignments},
+            is_deleted=False,
+        ).only("pk", "user_id")
+
+        return {permission.user_id: permission for permission in permissions}
+
+    def _run_side_effects(self, assignments: List[RoomAssignment], messages: list):
+        from chats.apps.rooms.tasks import update_tickets_assignees_async
+
+        permissions = self._get_permissions_by_agent(assignments)
+
+        with notification_outbox():
+            for assignment, message in zip(assignments, messages):
+                room = assignment.room
+                permission = permissions.get(assignment.agent.email)
+                content = room.serialized_ws_data
+
+                if permission:
+                    send_channels_group(
+                        group_name=f"permission_{permission.pk}",
+                        call_type="notify",
+                        content=content,
+                        action="rooms.update",
+                    )
+                send_channels_group(
+                    group_name=f"queue_{self.queue.pk}",
+                    call_type="notify",
+                    content=content,
+                    action="rooms.update",
+                )
+                if permission:
+                    send_channels_group(
+                        group_name=f"permission_{permission.pk}",
+                        call_type="notify",
+                        content=message.serialized_ws_data,
+                        action="msg.create",
+                    )
+
+                if (
+                    not assignment.old_user_assigned_at
+                    and room.queue.sector.is_automatic_message_active
+                    and room.queue.sector.automatic_message_text
+                ):
+                    room.send_automatic_message()
+
+        tickets = [
+            {
+                "room_uuid": str(assignment.room.uuid),
+                "ticket_uuid": str(assignment.room.ticket_uuid),
+                "user_email": assignment.agent.email,
+            }
+            for assignment in assignments
+            if assignment.room.ticket_uuid
+        ]
+        if tickets:
+            task = update_tickets_assignees_async.delay(tickets)
+            logger.info(
+                "[ROOM] Launched grouped async ticket update task - "
+                "Queue: %s, Tickets: %s, Task ID: %s",
+                self.queue.uuid,
+                len(tickets),
+                task.id,
+            )
+
+        logger.info(
+            "[BULK ASSIGNMENT] Queue %s: %s rooms assigned to %s agents",
+            self.queue.uuid,
+            len(assignments),
+            len(permissions),
+        )
@@ -0,0 +1,193 @@
+import heapq
+import logging
+import random
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from chats.apps.feature_flags.cache import is_feature_active_for_attributes
+
+if TYPE_CHECKING:
+    from chats.apps.accounts.models import User
+    from chats.apps.queues.models import Queue
+
+
+logger = logging.getLogger(__name__)
+
+
+def is_capacity_ledger_enabled(project) -> bool:
+    """Check if the routing capacity ledger is enabled for the given project."""
+    try:
+        return is_feature_active_for_attributes(
+            settings.QUEUE_ROUTING_CAPACITY_LEDGER_FEATURE_FLAG_KEY,
+            {"projectUUID": str(project.uuid)},
+        )
+    except Exception:
+        return False
+
+
+@dataclass
+class AgentCapacity:
+    """
+    Capacity snapshot of a single agent for the queue's sector.
+
+    `routing_count` is the value the routing option sorts by
+    (active rooms for `queue_limit`, active + closed today for `general`),
+    while `active_rooms_count` is compared against `limit`.
+    """
+
+    agent: "User"
+    active_rooms_count: int
+    routing_count: int
+    limit: int
+    closed_today_count: int = 0
+
+    @property
+    def has_capacity(self) -> bool:
+        return self.active_rooms_count < self.limit
+
+
+@dataclass
+class AgentCapacityLedger:
+    """
+    In-memory ledger of the available agents of a queue, loaded once per
+    routing pass.
+
+    Agents are kept in a heap ordered by the same criteria used by
+    Queue.get_available_agent(): the routing count first, then (when the
+    least rooms closed today feature is active) the rooms closed today,
+    then a random tie-breaker. Assigning a room updates the counters
+    locally, so the database is only hit again when the ledger is reloaded.
+    """
+
+    queue: "Queue"
+    capacities: Dict[str, AgentCapacity] = field(default_factory=dict)
+    use_closed_today_tiebreak: bool = False
+    _heap: List[tuple] = field(default_factory=list, repr=False)
+
+    @classmethod
+    def load(cls, queue: "Queue") -> "AgentCapacityLedger":
+        ledger = cls(queue=queue)
+        ledger.reload()
+        return ledger
+
+    def reload(self):
+        """
+        (Re)load the agents capacity from the database.
+
+        Uses a single Queue.available_agents query (plus one grouped query
+        for rooms closed today, when needed), instead of one per room.
+        """
+        project = self.queue.sector.project
+        is_general = project.routing_option == "general"
+
+        agents = list(self.queue.available_agents)
+
+        self.use_closed_today_tiebreak = bool(agents) and (
+            is_feature_active_for_attributes(
+                settings.LEAST_ROOMS_CLOSED_TODAY_FEATURE_FLAG_KEY,
+                {"projectUUID": str(project.uuid)},
+            )
+        )
+        closed_today = (
+            self._get_rooms_closed_today(agents)
+            if self.use_closed_today_tiebreak
+            else {}
+        )
+
+        self.capacities = {}
+        for agent in agents:
+            limit = getattr(agent, "effective_limit", None)
+            routing_count = (
+                agent.active_and_day_closed_rooms
+                if is_general
+                else agent.active_rooms_count
+            )
+            self.capacities[agent.email] = AgentCapacity(
+                agent=agent,
+                active_rooms_count=agent.active_rooms_count,
+                routing_count=routing_count,
+                limit=limit if limit is not None else self.queue.limit,
+                closed_today_count=closed_today.get(agent.email, 0),
+            )
+
+        self._heap = []
+        for capacity in self.capacities.values():
+            self._push(capacity)
+
+        logger.info(
+            "[CAPACITY LEDGER] Loaded %s available agents for queue %s",
+            len(self.capacities),
+            self.queue.uuid,
+        )
+
+    def _get_rooms_closed_today(self, agents) -> Dict[str, int]:
+        from chats.apps.rooms.models import Room
+
+        today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        rooms_closed_counts = (
+            Room.objects.filter(
+                user__in=agents,
+                queue__sector=self.queue.sector,
+                ended_at__gte=today_start,
+                ended_at__lt=today_start + timedelta(days=1),
+                is_active=False,
+            )
+            .values("user_id")
+            .annotate(count=models.Count("uuid"))
+        )
+
+        return {item["user_id"]: item["count"] for item in rooms_closed_counts}
+
+    def _push(self, capacity: AgentCapacity):
+        if not capacity.has_capacity:
+            return
+
+        secondary = capacity.closed_today_count if self.use_closed_today_tiebreak else 0
+        heapq.heappush(
+            self._heap,
+            (
+                capacity.routing_count,
+                secondary,
+                random.random(),
+                capacity.agent.email,
+            ),
+        )
+
+    def peek(self) -> Optional["User"]:
+        """
+        Return the next agent to receive a room, without consuming capacity.
+        """
+        while self._heap:
+            routing_count, _, _, email = self._heap[0]
+            capacity = self.capacities.get(email)
+
+            # Stale entry: the agent was removed or its counters changed
+            if (
+                capacity is None
+                or not capacity.has_capacity
+                or capacity.routing_count != routing_count
+            ):
+                heapq.heappop(self._heap)
+                continue
+
+            return capacity.agent
+
+        return None
+
+    def assign(self, agent: "User"):
+        """
+        Consume one unit of the agent's capacity.
+        """
+        capacity = self.capacities.get(agent.email)
+        if capacity is None:
+            return
+
+        capacity.active_rooms_count += 1
+        capacity.routing_count += 1
+        self._push(capacity)
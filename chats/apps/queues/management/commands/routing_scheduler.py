@@ -0,0 +1,20 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from chats.apps.queues.scheduler import RoutingScheduler
+
+
+class Command(BaseCommand):
+    help = "Run the routing scheduler worker, draining pending sector routing triggers"
+
+    def handle(self, *args, **options):
+        self.stopping = False
+
+        def stop(signum, frame):
+            self.stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        RoutingScheduler().run_forever(should_stop=lambda: self.stopping)
@@ -8,8 +8,8 @@ from django.db import models
 from django.db.models import OuterRef, Q, Subquery
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from weni.feature_flags.shortcuts import is_feature_active_for_attributes
 
+from chats.apps.feature_flags.cache import is_feature_active_for_attributes
 from chats.apps.projects.models.models import CustomStatus
 from chats.apps.queues.dataclass import QueueLimit
 from chats.core.models import (
@@ -125,6 +125,10 @@ class Queue(AuditableMixin, BaseSoftDeleteModel, BaseConfigurableModel, BaseMode
 
     @property
     def online_agents(self):
+        from chats.apps.projects.usecases.last_seen_heartbeats import (
+            get_recently_seen_permission_pks,
+        )
+
         # Base filter: status must be ONLINE
         base_filter = {
             "project_permissions__status": "ONLINE",
@@ -136,10 +140,14 @@ class Queue(AuditableMixin, BaseSoftDeleteModel, BaseConfigurableModel, BaseMode
 
         # If ping timeout feature is enabled, also filter by last_seen
         if self._is_ping_timeout_feature_enabled():
-            last_seen_threshold = timezone.now() - timedelta(
-                seconds=LAST_SEEN_THRESHOLD_SECONDS
-            )
-            base_filter["project_permissions__last_seen__gte"] = last_seen_threshold
+            recently_seen = get_recently_seen_permission_pks(self.sector.project_id)
+            if recently_seen is not None:
+                base_filter["project_permissions__pk__in"] = recently_seen
+            else:
+                last_seen_threshold = timezone.now() - timedelta(
+                    seconds=LAST_SEEN_THRESHOLD_SECONDS
+                )
+                base_filter["project_permissions__last_seen__gte"] = last_seen_threshold
 
         agents = self.agents.filter(**base_filter)
 
@@ -0,0 +1,176 @@
+import logging
+import time
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from sentry_sdk import capture_exception
+
+from chats.apps.api.v1.prometheus.metrics import (
+    routing_passes_total,
+    routing_trigger_to_assignment_seconds,
+    routing_triggers_coalesced_total,
+    routing_triggers_total,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RoutingScheduler:
+    """
+    Coalescing work queue of sectors waiting to be routed.
+
+    Triggers are stored in a Redis sorted set, where the member is the
+    sector UUID and the score is the timestamp of the oldest pending
+    trigger. Adding a sector that is already pending does not change its
+    score, so bursts of triggers (e.g. many agents changing status at once)
+    collapse into a single routing pass.
+
+    A long-running worker (see the `routing_scheduler` management command)
+    drains the set, routing each due sector under the same sector lock used
+    by the `route_sector_rooms` task.
+    """
+
+    def __init__(self, redis_connection=None):
+        self.redis = redis_connection or get_redis_connection()
+        self.key = settings.ROUTING_SCHEDULER_KEY
+
+    def enqueue(self, sector_uuid: UUID, triggered_at: Optional[float] = None):
+        """
+        Register a routing trigger for the sector.
+        Returns False when the trigger was coalesced with a pending one.
+        """
+        triggered_at = triggered_at or time.time()
+        added = self.redis.zadd(self.key, {str(sector_uuid): triggered_at}, nx=True)
+
+        routing_triggers_total.inc()
+        if not added:
+            routing_triggers_coalesced_total.inc()
+            logger.debug(
+                "[ROUTING SCHEDULER] Trigger for sector %s coalesced", sector_uuid
+            )
+
+        return bool(added)
+
+    def pop(self, count: int) -> List[Tuple[str, float]]:
+        """
+        Atomically remove and return up to `count` pending sectors,
+        oldest triggers first.
+        """
+        return [
+            (member.decode() if isinstance(member, bytes) else member, score)
+            for member, score in self.redis.zpopmin(self.key, count)
+        ]
+
+    def pending_count(self) -> int:
+        return self.redis.zcard(self.key)
+
+    def route_sector(self, sector_uuid: str, triggered_at: float) -> bool:
+        """
+        Route all queues of a sector. When another worker holds the sector
+        lock, the trigger is re-enqueued keeping its original timestamp.
+        """
+        from chats.apps.queues.models import Queue
+        from chats.apps.queues.services import QueueRouterService
+        from chats.apps.queues.tasks import get_route_lock_key_for_sector
+
+        lock_key = get_route_lock_key_for_sector(sector_uuid)
+
+        if not cache.add(
+            lock_key, True, timeout=settings.ROUTE_QUEUE_COOLDOWN_MAX_TIME
+        ):
+            self.enqueue(sector_uuid, triggered_at)
+            return False
+
+        try:
+            for queue in Queue.objects.filter(sector__uuid=sector_uuid):
+                try:
+                    QueueRouterService(queue).route_rooms()
+                except ValueError:
+                    logger.info(
+                        "[ROUTING SCHEDULER] Skipping queue %s: priority routing not enabled",
+                        queue.uuid,
+                    )
+        finally:
+            cache.delete(lock_key)
+
+        routing_passes_total.inc()
+        routing_trigger_to_assignment_seconds.observe(
+            max(time.time() - triggered_at, 0)
+        )
+
+        return True
+
+    def drain(self) -> int:
+        """
+        Route every sector currently pending, in batches.
+        Returns the number of routing passes executed.
+        """
+        passes = 0
+
+        while pending := self.pop(settings.ROUTING_SCHEDULER_BATCH_SIZE):
+            batch_passes = 0
+
+            for sector_uuid, triggered_at in pending:
+                try:
+                    if self.route_sector(sector_uuid, triggered_at):
+                        batch_passes += 1
+                except Exception as error:
+                    logger.error(
+                        "[ROUTING SCHEDULER] Error routing sector %s: %s",
+                        sector_uuid,
+                        error,
+                    )
+                    capture_exception(error)
+                    # Keep the trigger, so the sector's rooms are routed by
+                    # a later pass
+                    self.enqueue(sector_uuid, triggered_at)
+
+            passes += batch_passes
+
+            # Stop when the batch was not full or every sector in it was
+            # locked by another worker, to avoid spinning on the same triggers
+            if not batch_passes or len(pending) < settings.ROUTING_SCHEDULER_BATCH_SIZE:
+                break
+
+        return passes
+
+    def run_forever(self, should_stop=lambda: False):
+        """
+        Drain the queue continuously, sleeping at most
+        ROUTING_SCHEDULER_POLL_INTERVAL seconds between empty polls,
+        which bounds the latency between a trigger and its routing pass.
+        """
+        logger.info("[ROUTING SCHEDULER] Worker started")
+
+        while not should_stop():
+            if not self.drain():
+                time.sleep(settings.ROUTING_SCHEDULER_POLL_INTERVAL)
+
+        logger.info("[ROUTING SCHEDULER] Worker stopped")
+
+
+def enqueue_sector_routing(sector_uuid: UUID) -> bool:
+    """
+    Enqueue a sector to be routed by the routing scheduler worker.
+    """
+    try:
+        return RoutingScheduler().enqueue(sector_uuid)
+    except Exception as error:
+        logger.error(
+            "[ROUTING SCHEDULER] Failed to enqueue sector %s, "
+            "falling back to the routing task: %s",
+            sector_uuid,
+            error,
+        )
+        capture_exception(error)
+
+        from chats.apps.queues.tasks import route_sector_rooms
+
+        if settings.USE_CELERY:
+            route_sector_rooms.delay(sector_uuid)
+        else:
+            route_sector_rooms(sector_uuid)
+        return True
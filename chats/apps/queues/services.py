@@ -1,14 +1,26 @@
 import logging
 from datetime import timedelta
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, List, Optional
 
 from django.conf import settings
+from django.db import transaction
 from django.db.models.functions import Coalesce
 from django.utils import timezone
-from weni.feature_flags.shortcuts import is_feature_active_for_attributes
 
 from chats.apps.dashboard.models import RoomMetrics
 from chats.apps.dashboard.utils import calculate_last_queue_waiting_time
+from chats.apps.feature_flags.cache import is_feature_active_for_attributes
+from chats.apps.projects.usecases.last_seen_heartbeats import (
+    get_recently_seen_permission_pks,
+)
+from chats.apps.queues.bulk_assignment import (
+    BulkRoomAssigner,
+    is_bulk_assignment_enabled,
+)
+from chats.apps.queues.capacity_ledger import (
+    AgentCapacityLedger,
+    is_capacity_ledger_enabled,
+)
 from chats.apps.queues.models import LAST_SEEN_THRESHOLD_SECONDS
 from chats.apps.queues.usecases.can_agent_receive_room import (
     CanAgentReceiveRoomUseCase,
@@ -19,6 +31,7 @@ logger = logging.getLogger(__name__)
 
 if TYPE_CHECKING:
     from chats.apps.queues.models import Queue
+    from chats.apps.rooms.transitions import RoomSideEffect
 
 
 class QueueRouterService:
@@ -50,8 +63,6 @@ class QueueRouterService:
         Route rooms to available agents.
         """
         from chats.apps.projects.models import ProjectPermission
-        from chats.apps.queues.utils import create_room_assigned_from_queue_feedback
-        from chats.apps.rooms.tasks import update_ticket_assignee_async
 
         logger.info("Start routing rooms for queue %s", self.queue.uuid)
 
@@ -69,6 +80,12 @@ class QueueRouterService:
             )
             return
 
+        if is_capacity_ledger_enabled(self.queue.sector.project):
+            if is_bulk_assignment_enabled(self.queue.sector.project):
+                return self._route_rooms_in_bulk()
+
+            return self._route_rooms_with_ledger(rooms)
+
         rooms_routed = 0
 
         for room in rooms:
@@ -102,10 +119,16 @@ class QueueRouterService:
 
             # If ping timeout feature is enabled, also verify last_seen
             if self.queue._is_ping_timeout_feature_enabled():
-                last_seen_threshold = timezone.now() - timedelta(
-                    seconds=LAST_SEEN_THRESHOLD_SECONDS
+                recently_seen = get_recently_seen_permission_pks(
+                    self.queue.sector.project_id
                 )
-                is_still_online_filter["last_seen__gte"] = last_seen_threshold
+                if recently_seen is not None:
+                    is_still_online_filter["pk__in"] = recently_seen
+                else:
+                    last_seen_threshold = timezone.now() - timedelta(
+                        seconds=LAST_SEEN_THRESHOLD_SECONDS
+                    )
+                    is_still_online_filter["last_seen__gte"] = last_seen_threshold
 
             is_still_online = ProjectPermission.objects.filter(
                 **is_still_online_filter
@@ -130,47 +153,170 @@ class QueueRouterService:
                 if not capacity.can_receive:
                     continue
 
-            old_user_assigned_at = room.user_assigned_at
+            self._assign_room(room, agent)
 
-            room.user = agent
-            room.save()
+            rooms_routed += 1
 
-            room.notify_user("update")
-            room.notify_queue("update")
+        logger.info(
+            "%s rooms routed for queue %s, ending routing",
+            rooms_routed,
+            self.queue.uuid,
+        )
 
-            task = update_ticket_assignee_async.delay(
-                room_uuid=str(room.uuid),
-                ticket_uuid=room.ticket_uuid,
-                user_email=agent.email,
-            )
+    def _route_rooms_with_ledger(self, rooms):
+        """
+        Route rooms using an in-memory capacity ledger, loaded once per
+        routing pass instead of once per room.
 
-            logger.info(
-                "[ROOM] Launched async ticket update task - Room: %s, "
-                "Ticket: %s, User: %s, Task ID: %s",
-                room.uuid,
-                room.ticket_uuid,
-                agent.email,
-                task.id,
-            )
+        The ledger is reloaded from the database every
+        QUEUE_ROUTING_LEDGER_REVALIDATION_BATCH_SIZE assignments, which
+        re-validates agents status, last seen and active rooms in batches.
+        """
+        ledger = AgentCapacityLedger.load(self.queue)
+        batch_size = settings.QUEUE_ROUTING_LEDGER_REVALIDATION_BATCH_SIZE
 
-            create_room_assigned_from_queue_feedback(room, agent)
+        rooms_routed = 0
+        assigned_since_reload = 0
 
-            if (
-                not old_user_assigned_at
-                and room.queue.sector.is_automatic_message_active
-                and room.queue.sector.automatic_message_text
-            ):
-                room.send_automatic_message()
+        for room in rooms.iterator():
+            if assigned_since_reload >= batch_size:
+                ledger.reload()
+                assigned_since_reload = 0
+
+            agent = ledger.peek()
+
+            if not agent:
+                break
+
+            # Claim the room only if it is still unassigned,
+            # avoiding routing the same room multiple times (race condition)
+            old_user_assigned_at = room.user_assigned_at
+            side_effects = self._claim_room(room, agent)
+            if side_effects is None:
+                logger.info(
+                    "Room %s already routed or closed, skipping",
+                    room.uuid,
+                )
+                continue
+
+            self._run_assignment_side_effects(
+                room, agent, old_user_assigned_at, side_effects
+            )
+            ledger.assign(agent)
 
             rooms_routed += 1
+            assigned_since_reload += 1
 
-            metrics = RoomMetrics.objects.get_or_create(room=room)[0]
-            metrics.waiting_time += calculate_last_queue_waiting_time(room)
-            metrics.queued_count += 1
-            metrics.save()
+        logger.info(
+            "%s rooms routed for queue %s, ending routing",
+            rooms_routed,
+            self.queue.uuid,
+        )
+
+    def _route_rooms_in_bulk(self):
+        """
+        Route rooms in batches of QUEUE_ROUTING_BULK_ASSIGNMENT_BATCH_SIZE,
+        claiming each batch with a single locking query and writing all its
+        assignments with a single UPDATE.
+
+        The capacity ledger is reloaded between batches, so agents status
+        and active rooms are re-validated once per batch.
+        """
+        ledger = AgentCapacityLedger.load(self.queue)
+        assigner = BulkRoomAssigner(self.queue)
+        batch_size = settings.QUEUE_ROUTING_BULK_ASSIGNMENT_BATCH_SIZE
+
+        rooms_routed = 0
+
+        while ledger.peek():
+            assignments = assigner.claim_and_assign(ledger, batch_size)
+
+            if not assignments:
+                break
+
+            rooms_routed += len(assignments)
+
+            if len(assignments) < batch_size:
+                break
+
+            ledger.reload()
 
         logger.info(
             "%s rooms routed for queue %s, ending routing",
             rooms_routed,
             self.queue.uuid,
         )
+
+    def _claim_room(self, room, agent) -> Optional[List["RoomSideEffect"]]:
+        """
+        Assign the room to the agent if it is still active and unassigned,
+        returning the side effects of the assignment, or None when it was
+        routed or closed by someone else first.
+
+        The conditional UPDATE locks the room until the assignment is saved,
+        so concurrent routers can't both claim it.
+        """
+        from chats.apps.rooms import transitions
+        from chats.apps.rooms.models import Room
+
+        with transaction.atomic():
+            claimed = Room.objects.filter(
+                pk=room.pk, is_active=True, user__isnull=True
+            ).update(user=agent)
+            if not claimed:
+                return None
+
+            return transitions.assign(room, agent)
+
+    def _assign_room(self, room, agent):
+        """
+        Assign the room to the agent and run the assignment side effects.
+        """
+        from chats.apps.rooms import transitions
+
+        old_user_assigned_at = room.user_assigned_at
+
+        self._run_assignment_side_effects(
+            room, agent, old_user_assigned_at, transitions.assign(room, agent)
+        )
+
+    def _run_assignment_side_effects(
+        self, room, agent, old_user_assigned_at, side_effects
+    ):
+        from chats.apps.queues.utils import create_room_assigned_from_queue_feedback
+        from chats.apps.rooms import transitions
+        from chats.apps.rooms.tasks import update_ticket_assignee_async
+
+        transitions.run_side_effects(room, side_effects)
+
+        room.notify_user("update")
+        room.notify_queue("update")
+
+        task = update_ticket_assignee_async.delay(
+            room_uuid=str(room.uuid),
+            ticket_uuid=room.ticket_uuid,
+            user_email=agent.email,
+        )
+
+        logger.info(
+            "[ROOM] Launched async ticket update task - Room: %s, "
+            "Ticket: %s, User: %s, Task ID: %s",
+            room.uuid,
+            room.ticket_uuid,
+            agent.email,
+            task.id,
+        )
+
+        create_room_assigned_from_queue_feedback(room, agent)
+
+        if (
+            not old_user_assigned_at
+            and room.queue.sector.is_automatic_message_active
+            and room.queue.sector.automatic_message_text
+        ):
+            room.send_automatic_message()
+
+        metrics = RoomMetrics.objects.get_or_create(room=room)[0]
+        metrics.waiting_time += calculate_last_queue_waiting_time(room)
+        metrics.queued_count += 1
+        metrics.save()
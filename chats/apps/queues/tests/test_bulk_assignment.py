@@ -0,0 +1,129 @@
+import json
+import uuid
+from datetime import time
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from chats.apps.accounts.models import User
+from chats.apps.dashboard.models import RoomMetrics
+from chats.apps.projects.models.models import (
+    Project,
+    ProjectPermission,
+    RoomRoutingType,
+)
+from chats.apps.queues.bulk_assignment import BulkRoomAssigner
+from chats.apps.queues.capacity_ledger import AgentCapacityLedger
+from chats.apps.queues.models import Queue, QueueAuthorization
+from chats.apps.queues.services import QueueRouterService
+from chats.apps.rooms.models import Room
+from chats.apps.sectors.models import Sector
+
+
+class BulkRoomAssignerTestCase(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(
+            name="Test Project",
+            room_routing_type=RoomRoutingType.QUEUE_PRIORITY,
+        )
+        self.sector = Sector.objects.create(
+            name="Test Sector",
+            project=self.project,
+            rooms_limit=3,
+            work_start=time(hour=0, minute=0),
+            work_end=time(hour=23, minute=59),
+        )
+        self.queue = Queue.objects.create(name="Test Queue", sector=self.sector)
+
+        self.agent_1 = User.objects.create(email="agent_1@example.com")
+        self.agent_2 = User.objects.create(email="agent_2@example.com")
+
+        for agent in [self.agent_1, self.agent_2]:
+            permission = ProjectPermission.objects.create(
+                project=self.project,
+                user=agent,
+                role=ProjectPermission.ROLE_ATTENDANT,
+                status="ONLINE",
+                last_seen=timezone.now(),
+            )
+            QueueAuthorization.objects.create(
+                queue=self.queue,
+                permission=permission,
+                role=QueueAuthorization.ROLE_AGENT,
+            )
+
+    @patch("chats.apps.queues.bulk_assignment.send_channels_group")
+    @patch("chats.apps.rooms.tasks.update_tickets_assignees_async.delay")
+    def test_claim_and_assign(self, mock_update_tickets, mock_send_channels_group):
+        rooms = [Room.objects.create(queue=self.queue) for _ in range(4)]
+
+        ledger = AgentCapacityLedger.load(self.queue)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            assignments = BulkRoomAssigner(self.queue).claim_and_assign(ledger, 3)
+
+        self.assertEqual(len(assignments), 3)
+
+        for room in rooms:
+            room.refresh_from_db()
+
+        self.assertEqual(len([room for room in rooms if room.user_id]), 3)
+        # Oldest rooms are claimed first
+        self.assertIsNone(rooms[-1].user)
+
+        for room in rooms[:3]:
+            self.assertIsNotNone(room.user_assigned_at)
+            self.assertIsNotNone(room.first_user_assigned_at)
+            self.assertEqual(room.messages.count(), 1)
+            message_text = json.loads(room.messages.first().text)
+            self.assertEqual(
+                message_text["content"]["action"], "auto_assign_from_queue"
+            )
+            self.assertEqual(RoomMetrics.objects.get(room=room).queued_count, 1)
+
+        mock_update_tickets.assert_not_called()
+        self.assertTrue(mock_send_channels_group.called)
+
+    @patch("chats.apps.queues.bulk_assignment.send_channels_group")
+    @patch("chats.apps.rooms.tasks.update_tickets_assignees_async.delay")
+    def test_ticket_updates_are_grouped_in_one_task(
+        self, mock_update_tickets, mock_send_channels_group
+    ):
+        rooms = [
+            Room.objects.create(queue=self.queue, ticket_uuid=uuid.uuid4())
+            for _ in range(2)
+        ]
+
+        ledger = AgentCapacityLedger.load(self.queue)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BulkRoomAssigner(self.queue).claim_and_assign(ledger, 10)
+
+        mock_update_tickets.assert_called_once()
+        tickets = mock_update_tickets.call_args[0][0]
+        self.assertEqual(
+            {ticket["room_uuid"] for ticket in tickets},
+            {str(room.uuid) for room in rooms},
+        )
+
+    @override_settings(QUEUE_ROUTING_BULK_ASSIGNMENT_BATCH_SIZE=2)
+    @patch("chats.apps.queues.bulk_assignment.send_channels_group")
+    @patch("chats.apps.queues.services.is_bulk_assignment_enabled", return_value=True)
+    @patch("chats.apps.queues.services.is_capacity_ledger_enabled", return_value=True)
+    def test_route_rooms_in_bulk(
+        self, mock_ledger_enabled, mock_bulk_enabled, mock_send_channels_group
+    ):
+        rooms = [Room.objects.create(queue=self.queue) for _ in range(7)]
+
+        QueueRouterService(self.queue).route_rooms()
+
+        for room in rooms:
+            room.refresh_from_db()
+
+        assigned = [room.user_id for room in rooms if room.user_id]
+
+        # Rooms limit is 3 per agent
+        self.assertEqual(len(assigned), 6)
+        self.assertEqual(assigned.count(self.agent_1.email), 3)
+        self.assertEqual(assigned.count(self.agent_2.email), 3)
@@ -0,0 +1,146 @@
+from datetime import time
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from chats.apps.accounts.models import User
+from chats.apps.projects.models.models import (
+    Project,
+    ProjectPermission,
+    RoomRoutingType,
+)
+from chats.apps.queues.capacity_ledger import AgentCapacityLedger
+from chats.apps.queues.models import Queue, QueueAuthorization
+from chats.apps.queues.services import QueueRouterService
+from chats.apps.rooms.models import Room
+from chats.apps.sectors.models import Sector
+
+
+class AgentCapacityLedgerTestCase(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(
+            name="Test Project",
+            room_routing_type=RoomRoutingType.QUEUE_PRIORITY,
+        )
+        self.sector = Sector.objects.create(
+            name="Test Sector",
+            project=self.project,
+            rooms_limit=2,
+            work_start=time(hour=0, minute=0),
+            work_end=time(hour=23, minute=59),
+        )
+        self.queue = Queue.objects.create(name="Test Queue", sector=self.sector)
+
+        self.agent_1 = User.objects.create(email="agent_1@example.com")
+        self.agent_2 = User.objects.create(email="agent_2@example.com")
+
+        for agent in [self.agent_1, self.agent_2]:
+            permission = ProjectPermission.objects.create(
+                project=self.project,
+                user=agent,
+                role=ProjectPermission.ROLE_ATTENDANT,
+                status="ONLINE",
+                last_seen=timezone.now(),
+            )
+            QueueAuthorization.objects.create(
+                queue=self.queue,
+                permission=permission,
+                role=QueueAuthorization.ROLE_AGENT,
+            )
+
+    def test_load_capacity_from_available_agents(self):
+        Room.objects.create(queue=self.queue, user=self.agent_1)
+
+        ledger = AgentCapacityLedger.load(self.queue)
+
+        self.assertEqual(ledger.capacities[self.agent_1.email].active_rooms_count, 1)
+        self.assertEqual(ledger.capacities[self.agent_2.email].active_rooms_count, 0)
+        self.assertEqual(ledger.peek(), self.agent_2)
+
+    def test_assign_decrements_capacity_locally(self):
+        ledger = AgentCapacityLedger.load(self.queue)
+
+        assigned = []
+        with self.assertNumQueries(0):
+            while agent := ledger.peek():
+                ledger.assign(agent)
+                assigned.append(agent.email)
+
+        # Rooms limit is 2 per agent
+        self.assertEqual(len(assigned), 4)
+        self.assertEqual(assigned.count(self.agent_1.email), 2)
+        self.assertEqual(assigned.count(self.agent_2.email), 2)
+
+
+@patch(
+    "chats.apps.queues.services.is_capacity_ledger_enabled",
+    return_value=True,
+)
+class QueueRouterServiceWithLedgerTestCase(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(
+            name="Test Project",
+            room_routing_type=RoomRoutingType.QUEUE_PRIORITY,
+        )
+        self.sector = Sector.objects.create(
+            name="Test Sector",
+            project=self.project,
+            rooms_limit=2,
+            work_start=time(hour=0, minute=0),
+            work_end=time(hour=23, minute=59),
+        )
+        self.queue = Queue.objects.create(name="Test Queue", sector=self.sector)
+
+        self.agent_1 = User.objects.create(email="agent_1@example.com")
+        self.agent_2 = User.objects.create(email="agent_2@example.com")
+
+        for agent in [self.agent_1, self.agent_2]:
+            permission = ProjectPermission.objects.create(
+                project=self.project,
+                user=agent,
+                role=ProjectPermission.ROLE_ATTENDANT,
+                status="ONLINE",
+                last_seen=timezone.now(),
+            )
+            QueueAuthorization.objects.create(
+                queue=self.queue,
+                permission=permission,
+                role=QueueAuthorization.ROLE_AGENT,
+            )
+
+    def test_route_rooms_respects_rooms_limit(self, mock_ledger_enabled):
+        rooms = [Room.objects.create(queue=self.queue) for _ in range(5)]
+
+        QueueRouterService(self.queue).route_rooms()
+
+        for room in rooms:
+            room.refresh_from_db()
+
+        assigned = [room.user_id for room in rooms if room.user_id]
+
+        self.assertEqual(len(assigned), 4)
+        self.assertEqual(assigned.count(self.agent_1.email), 2)
+        self.assertEqual(assigned.count(self.agent_2.email), 2)
+        self.assertIsNone(rooms[-1].user)
+
+    def test_route_rooms_skips_rooms_assigned_concurrently(self, mock_ledger_enabled):
+        room_1 = Room.objects.create(queue=self.queue)
+        room_2 = Room.objects.create(queue=self.queue)
+
+        service = QueueRouterService(self.queue)
+        original_claim_room = service._claim_room
+
+        def claim_room(room, agent):
+            if room.pk == room_1.pk:
+                Room.objects.filter(pk=room_1.pk).update(user=self.agent_1)
+            return original_claim_room(room, agent)
+
+        with patch.object(service, "_claim_room", side_effect=claim_room):
+            service.route_rooms()
+
+        room_1.refresh_from_db()
+        room_2.refresh_from_db()
+
+        self.assertEqual(room_1.user, self.agent_1)
+        self.assertIsNotNone(room_2.user)
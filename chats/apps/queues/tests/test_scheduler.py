@@ -0,0 +1,128 @@
+import time
+from datetime import time as dt_time
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase, override_settings
+
+from chats.apps.projects.models.models import Project, RoomRoutingType
+from chats.apps.queues.models import Queue
+from chats.apps.queues.scheduler import RoutingScheduler
+from chats.apps.queues.utils import (
+    start_queue_priority_routing,
+    start_queue_priority_routing_for_all_queues_in_project,
+)
+from chats.apps.sectors.models import Sector
+
+
+class RoutingSchedulerTestCase(TestCase):
+    def setUp(self):
+        self.redis = MagicMock()
+        self.scheduler = RoutingScheduler(redis_connection=self.redis)
+
+    @patch("chats.apps.queues.scheduler.routing_triggers_coalesced_total")
+    def test_enqueue_new_trigger(self, mock_coalesced):
+        self.redis.zadd.return_value = 1
+
+        self.assertTrue(self.scheduler.enqueue("sector-uuid", triggered_at=10.0))
+
+        self.redis.zadd.assert_called_once_with(
+            self.scheduler.key, {"sector-uuid": 10.0}, nx=True
+        )
+        mock_coalesced.inc.assert_not_called()
+
+    @patch("chats.apps.queues.scheduler.routing_triggers_coalesced_total")
+    def test_enqueue_coalesced_trigger(self, mock_coalesced):
+        self.redis.zadd.return_value = 0
+
+        self.assertFalse(self.scheduler.enqueue("sector-uuid"))
+
+        mock_coalesced.inc.assert_called_once()
+
+    @override_settings(ROUTING_SCHEDULER_BATCH_SIZE=10)
+    def test_drain_routes_pending_sectors(self):
+        now = time.time()
+        self.redis.zpopmin.side_effect = [
+            [(b"sector-1", now), (b"sector-2", now)],
+            [],
+        ]
+
+        with patch.object(
+            self.scheduler, "route_sector", return_value=True
+        ) as mock_route_sector:
+            passes = self.scheduler.drain()
+
+        self.assertEqual(passes, 2)
+        mock_route_sector.assert_any_call("sector-1", now)
+        mock_route_sector.assert_any_call("sector-2", now)
+
+    @override_settings(ROUTING_SCHEDULER_BATCH_SIZE=1)
+    def test_drain_stops_when_every_sector_is_locked(self):
+        self.redis.zpopmin.return_value = [(b"sector-1", time.time())]
+
+        with patch.object(
+            self.scheduler, "route_sector", return_value=False
+        ) as mock_route_sector:
+            passes = self.scheduler.drain()
+
+        self.assertEqual(passes, 0)
+        mock_route_sector.assert_called_once()
+
+    @override_settings(ROUTING_SCHEDULER_BATCH_SIZE=10)
+    @patch("chats.apps.queues.scheduler.capture_exception")
+    def test_drain_reenqueues_sectors_that_failed_routing(self, mock_capture):
+        self.redis.zpopmin.return_value = [(b"sector-1", 10.0)]
+
+        with patch.object(
+            self.scheduler, "route_sector", side_effect=RuntimeError
+        ), patch.object(self.scheduler, "enqueue") as mock_enqueue:
+            passes = self.scheduler.drain()
+
+        self.assertEqual(passes, 0)
+        mock_enqueue.assert_called_once_with("sector-1", 10.0)
+        mock_capture.assert_called_once()
+
+    @patch("chats.apps.queues.scheduler.cache")
+    def test_route_sector_reenqueues_when_locked(self, mock_cache):
+        mock_cache.add.return_value = False
+
+        with patch.object(self.scheduler, "enqueue") as mock_enqueue:
+            self.assertFalse(self.scheduler.route_sector("sector-1", 10.0))
+
+        mock_enqueue.assert_called_once_with("sector-1", 10.0)
+
+
+@override_settings(USE_ROUTING_SCHEDULER=True)
+class StartQueuePriorityRoutingWithSchedulerTestCase(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(
+            name="Test Project",
+            room_routing_type=RoomRoutingType.QUEUE_PRIORITY,
+        )
+        self.sector = Sector.objects.create(
+            name="Test Sector",
+            project=self.project,
+            rooms_limit=1,
+            work_start=dt_time(hour=5, minute=0),
+            work_end=dt_time(hour=23, minute=59),
+        )
+        self.queue = Queue.objects.create(name="Test Queue", sector=self.sector)
+
+    @patch("chats.apps.queues.utils.route_queue_rooms")
+    @patch("chats.apps.queues.utils.enqueue_sector_routing")
+    def test_start_queue_priority_routing_enqueues_sector(
+        self, mock_enqueue, mock_route_queue_rooms
+    ):
+        start_queue_priority_routing(self.queue)
+
+        mock_enqueue.assert_called_once_with(self.sector.uuid)
+        mock_route_queue_rooms.delay.assert_not_called()
+
+    @patch("chats.apps.queues.utils.route_sector_rooms")
+    @patch("chats.apps.queues.utils.enqueue_sector_routing")
+    def test_start_routing_for_all_queues_enqueues_sectors(
+        self, mock_enqueue, mock_route_sector_rooms
+    ):
+        start_queue_priority_routing_for_all_queues_in_project(self.project)
+
+        mock_enqueue.assert_called_once_with(self.sector.uuid)
+        mock_route_sector_rooms.delay.assert_not_called()
@@ -3,7 +3,8 @@ from dataclasses import dataclass
 from typing import TYPE_CHECKING, Optional
 
 from django.conf import settings
-from weni.feature_flags.shortcuts import is_feature_active_for_attributes
+
+from chats.apps.feature_flags.cache import is_feature_active_for_attributes
 
 if TYPE_CHECKING:
     from chats.apps.accounts.models import User
@@ -5,6 +5,7 @@ from django.conf import settings
 
 from chats.apps.projects.models.models import Project
 from chats.apps.queues.models import Queue
+from chats.apps.queues.scheduler import enqueue_sector_routing
 from chats.apps.queues.tasks import route_queue_rooms, route_sector_rooms
 from chats.apps.rooms.choices import RoomFeedbackMethods
 from chats.apps.rooms.utils import create_transfer_json
@@ -29,6 +30,16 @@ def start_queue_priority_routing(queue: Queue):
         )
         return
 
+    if settings.USE_ROUTING_SCHEDULER:
+        logger.info(
+            "Enqueuing sector %s in the routing scheduler for queue %s",
+            queue.sector.uuid,
+            queue.uuid,
+        )
+        enqueue_sector_routing(queue.sector.uuid)
+
+        return
+
     if not settings.USE_CELERY:
         logger.info(
             "Calling route_queue_rooms for queue %s synchronously because celery is disabled",
@@ -71,7 +82,9 @@ def start_queue_priority_routing_for_all_queues_in_project(project: Project):
     )
 
     for sector_uuid in sector_uuids:
-        if settings.USE_CELERY:
+        if settings.USE_ROUTING_SCHEDULER:
+            enqueue_sector_routing(sector_uuid)
+        elif settings.USE_CELERY:
             route_sector_rooms.delay(sector_uuid)
         else:
             route_sector_rooms(sector_uuid)
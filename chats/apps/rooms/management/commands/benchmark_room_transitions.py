@@ -0,0 +1,81 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from chats.apps.accounts.models import User
+from chats.apps.projects.models.models import Project
+from chats.apps.queues.models import Queue
+from chats.apps.rooms import transitions
+from chats.apps.rooms.models import Room
+from chats.apps.sectors.models import Sector
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure queries and time per room transfer and close, through "
+        "Room.save and through the room transitions, against synthetic rooms "
+        "created inside a transaction that is rolled back"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=100)
+
+    def create_rooms(self, count):
+        project = Project.objects.create(name="Room transitions benchmark")
+        sector = Sector.objects.create(
+            name="Benchmark",
+            project=project,
+            rooms_limit=count,
+            work_start="00:00",
+            work_end="23:59",
+        )
+        queue = Queue.objects.create(name="Benchmark", sector=sector)
+        agents = [
+            User.objects.create(email=f"room-transitions-benchmark-{index}@example.com")
+            for index in range(2)
+        ]
+        Room.objects.bulk_create(
+            [Room(queue=queue, user=agents[0]) for _ in range(count)]
+        )
+        rooms = list(Room.objects.filter(queue=queue).select_related("queue__sector"))
+        return rooms, agents
+
+    def measure(self, label, rooms, operation):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for room in rooms:
+                operation(room)
+            elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f"{label}: {len(queries) / len(rooms):.2f} queries/room, "
+            f"{elapsed * 1000 / len(rooms):.2f} ms/room"
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rooms, agents = self.create_rooms(options["rooms"])
+            half = len(rooms) // 2
+            saved_rooms, transitioned_rooms = rooms[:half], rooms[half:]
+
+            def save_transfer(room):
+                room.user = agents[1]
+                room.save()
+
+            def transition_transfer(room):
+                transitions.run_side_effects(
+                    room, transitions.transfer(room, user=agents[1])
+                )
+
+            self.measure("transfer with save", saved_rooms, save_transfer)
+            self.measure(
+                "transfer with transition", transitioned_rooms, transition_transfer
+            )
+
+            self.measure("close", rooms, lambda room: room.close(end_by="benchmark"))
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("Done, benchmark data rolled back"))
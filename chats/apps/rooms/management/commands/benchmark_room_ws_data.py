@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from chats.apps.rooms.models import Room
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure queries and time spent building room websocket payloads, "
+        "with and without the serialized payload cache. Read only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=20)
+        parser.add_argument(
+            "--payloads-per-room",
+            type=int,
+            default=3,
+            help="Payloads built per room, e.g. queue group, agent group and callback",
+        )
+        parser.add_argument("--project", type=str, default=None)
+
+    def _run(self, room_pks, payloads_per_room, cache_enabled):
+        rooms = Room.objects.filter(pk__in=room_pks).select_related(
+            "user", "contact", "queue__sector__project"
+        )
+
+        with override_settings(
+            ROOM_SERIALIZED_WS_DATA_CACHE=cache_enabled
+        ), CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for room in rooms:
+                for _ in range(payloads_per_room):
+                    room.serialized_ws_data
+            elapsed = time.perf_counter() - start
+
+        return len(queries), elapsed
+
+    def handle(self, *args, **options):
+        rooms = Room.objects.filter(is_active=True).order_by("-created_on")
+        if options["project"]:
+            rooms = rooms.filter(queue__sector__project__uuid=options["project"])
+
+        room_pks = list(rooms.values_list("pk", flat=True)[: options["rooms"]])
+        if not room_pks:
+            self.stdout.write(self.style.WARNING("No active rooms found"))
+            return
+
+        payloads = len(room_pks) * options["payloads_per_room"]
+
+        for label, cache_enabled in [("without cache", False), ("with cache", True)]:
+            query_count, elapsed = self._run(
+                room_pks, options["payloads_per_room"], cache_enabled
+            )
+            self.stdout.write(
+                f"{label}: {payloads} payloads, "
+                f"{query_count / payloads:.2f} queries/payload, "
+                f"{elapsed * 1000 / payloads:.2f} ms/payload"
+            )
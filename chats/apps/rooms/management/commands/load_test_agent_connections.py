@@ -0,0 +1,188 @@
+import asyncio
+import statistics
+import time
+from unittest.mock import patch
+from urllib.parse import parse_qs
+
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from chats.apps.accounts.models import User
+from chats.apps.api.websockets.rooms.consumers.agent import AgentRoomConsumer
+from chats.apps.projects.models.models import Project, ProjectPermission
+from chats.apps.queues.models import Queue, QueueAuthorization
+from chats.apps.sectors.models import Sector
+
+IN_MEMORY_CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+}
+
+
+class AgentScopeMiddleware:
+    """
+    Authenticate the synthetic agents without tokens, by their index.
+    """
+
+    def __init__(self, inner, users, project_uuid):
+        self.inner = inner
+        self.users = users
+        self.project_uuid = project_uuid
+
+    async def __call__(self, scope, receive, send):
+        index = int(parse_qs(scope["query_string"].decode())["agent"][0])
+        scope = dict(
+            scope,
+            user=self.users[index],
+            query_params={"project": [self.project_uuid]},
+        )
+        return await self.inner(scope, receive, send)
+
+
+class Command(BaseCommand):
+    help = (
+        "Connect and disconnect thousands of synthetic agents concurrently to "
+        "the agent websocket consumer, over an in-memory channel layer, with "
+        "and without the connection lifecycle service. The synthetic project "
+        "and agents are committed, as the consumer reads them from other "
+        "threads, and deleted at the end"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--agents", type=int, default=1000)
+        parser.add_argument("--queues", type=int, default=5)
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=60,
+            help="Seconds each agent waits for its connection to be accepted",
+        )
+        parser.add_argument(
+            "--ping-timeout",
+            action="store_true",
+            help="Run with the ping timeout feature flag enabled",
+        )
+
+    def create_agents(self, agents_count, queues_count):
+        project = Project.objects.create(name="Agent connections load test")
+        sector = Sector.objects.create(
+            name="Load test",
+            project=project,
+            rooms_limit=1,
+            work_start="00:00",
+            work_end="23:59",
+        )
+        queues = [
+            Queue.objects.create(name=f"Load test {index}", sector=sector)
+            for index in range(queues_count)
+        ]
+        users = User.objects.bulk_create(
+            [
+                User(email=f"agent-connections-load-test-{index}@example.com")
+                for index in range(agents_count)
+            ]
+        )
+        permissions = ProjectPermission.objects.bulk_create(
+            [
+                ProjectPermission(
+                    project=project,
+                    user=user,
+                    role=ProjectPermission.ROLE_ATTENDANT,
+                    status=ProjectPermission.STATUS_ONLINE,
+                )
+                for user in users
+            ]
+        )
+        QueueAuthorization.objects.bulk_create(
+            [
+                QueueAuthorization(queue=queue, permission=permission)
+                for permission in permissions
+                for queue in queues
+            ]
+        )
+        return project, users
+
+    async def connect_agent(self, application, index, timeout):
+        communicator = WebsocketCommunicator(
+            application, f"/ws/agent/rooms?agent={index}"
+        )
+        start = time.perf_counter()
+        connected, _ = await communicator.connect(timeout=timeout)
+        return communicator, connected, time.perf_counter() - start
+
+    async def run_round(self, application, agents_count, timeout):
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *[
+                self.connect_agent(application, index, timeout)
+                for index in range(agents_count)
+            ]
+        )
+        connect_elapsed = time.perf_counter() - start
+
+        connected = [result for result in results if result[1]]
+        start = time.perf_counter()
+        await asyncio.gather(
+            *[
+                communicator.disconnect(timeout=timeout)
+                for communicator, *_ in connected
+            ]
+        )
+        disconnect_elapsed = time.perf_counter() - start
+
+        return (
+            connected,
+            len(results) - len(connected),
+            connect_elapsed,
+            disconnect_elapsed,
+        )
+
+    def report(self, label, connected, refused, connect_elapsed, disconnect_elapsed):
+        latencies = sorted(elapsed for *_, elapsed in connected)
+        if latencies:
+            p50 = statistics.median(latencies) * 1000
+            p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+        else:
+            p50 = p99 = 0
+
+        self.stdout.write(
+            f"{label}: {len(connected)} connected, {refused} refused, "
+            f"connect p50 {p50:.1f} ms, p99 {p99:.1f} ms, "
+            f"all connected in {connect_elapsed:.2f} s, "
+            f"all disconnected in {disconnect_elapsed:.2f} s"
+        )
+
+    def handle(self, *args, **options):
+        project, users = self.create_agents(options["agents"], options["queues"])
+        application = AgentScopeMiddleware(
+            AgentRoomConsumer.as_asgi(), users, str(project.uuid)
+        )
+
+        try:
+            # The status logs are not relevant to the connections, don't
+            # enqueue them
+            with override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS), patch(
+                "chats.apps.projects.tasks.log_agent_status_change.delay"
+            ), patch(
+                "chats.apps.api.websockets.rooms.consumers.agent.is_feature_active_for_attributes",
+                return_value=options["ping_timeout"],
+            ), patch(
+                "chats.apps.api.websockets.rooms.lifecycle.is_feature_active_for_attributes",
+                return_value=options["ping_timeout"],
+            ):
+                for label, lifecycle_service in (
+                    ("without lifecycle service", False),
+                    ("with lifecycle service", True),
+                ):
+                    with override_settings(
+                        WS_AGENT_LIFECYCLE_SERVICE=lifecycle_service
+                    ):
+                        results = asyncio.run(
+                            self.run_round(application, len(users), options["timeout"])
+                        )
+                    self.report(label, *results)
+        finally:
+            Project.objects.filter(pk=project.pk).delete()
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+        self.stdout.write(self.style.SUCCESS("Done, load test data deleted"))
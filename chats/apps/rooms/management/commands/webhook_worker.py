@@ -0,0 +1,20 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from chats.apps.rooms.webhooks import WebhookWorker
+
+
+class Command(BaseCommand):
+    help = "Run the webhook worker, delivering the enqueued room and message callbacks"
+
+    def handle(self, *args, **options):
+        self.stopping = False
+
+        def stop(signum, frame):
+            self.stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        WebhookWorker().run_forever(should_stop=lambda: self.stopping)
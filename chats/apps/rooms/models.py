@@ -2,7 +2,7 @@ import json
 import logging
 import time
 from datetime import datetime, timedelta
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, List, Optional
 
 import requests
 import sentry_sdk
@@ -10,7 +10,7 @@ from django.conf import settings
 from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
 from django.core.serializers.json import DjangoJSONEncoder
-from django.db import models, transaction
+from django.db import models
 from django.db.models import F, Q
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
@@ -23,18 +23,24 @@ from chats.apps.accounts.models import User
 from chats.apps.api.v1.internal.rest_clients.flows_rest_client import FlowRESTClient
 from chats.apps.projects.models.models import RoomRoutingType
 from chats.apps.projects.usecases.send_room_info import RoomInfoUseCase
-from chats.apps.projects.usecases.status_service import InServiceStatusService
 from chats.apps.queues.models import Queue
+from chats.apps.rooms import transitions
 from chats.apps.rooms.exceptions import (
     MaxPinRoomLimitReachedError,
     RoomIsNotActiveError,
 )
+from chats.apps.rooms.transitions import (
+    RoomSideEffect,
+    plan_side_effects,
+    run_side_effects,
+)
+from chats.apps.rooms.webhooks import enqueue_callback, is_webhook_service_enabled
 from chats.core.models import (
     BaseConfigurableModel,
     BaseModel,
     BaseModelWithManualCreatedOn,
 )
-from chats.utils.websockets import send_channels_group
+from chats.utils.websockets import get_notification_outbox, send_channels_group
 
 if TYPE_CHECKING:
     from chats.apps.projects.models.models import Project
@@ -186,7 +192,7 @@ class Room(BaseModel, BaseConfigurableModel):
         ),
     )
 
-    tracker = FieldTracker(fields=["user_id", "queue_id"])
+    tracker = FieldTracker(fields=["user_id", "queue_id", "is_active"])
 
     def get_automatic_message_sent_at(self) -> Optional[datetime]:
         if self.automatic_message_sent_at:
@@ -239,44 +245,6 @@ class Room(BaseModel, BaseConfigurableModel):
             self.pk,
         )
 
-    def _update_agent_service_status(self, is_new):
-        """
-        Atualiza o status 'In-Service' dos agentes baseado nas mudanças na sala
-        Args:
-            is_new: Boolean indicando se é uma sala nova
-        """
-        old_user_pk = (
-            Room.objects.filter(pk=self.pk).values_list("user", flat=True).first()
-        )
-        old_user = User.objects.get(email=old_user_pk) if old_user_pk else None
-        new_user = self.user
-
-        project = None
-        if self.queue and hasattr(self.queue, "sector"):
-            sector = self.queue.sector
-            if sector and hasattr(sector, "project"):
-                project = sector.project
-
-        if not project:
-            return
-
-        if is_new and new_user:
-            InServiceStatusService.room_assigned(new_user, project)
-            return
-
-        if old_user is None and new_user is not None:
-            InServiceStatusService.room_assigned(new_user, project)
-            return
-
-        if old_user is not None and new_user is not None and old_user != new_user:
-            InServiceStatusService.room_closed(old_user, project)
-            InServiceStatusService.room_assigned(new_user, project)
-            return
-
-        if old_user is not None and new_user is None:
-            InServiceStatusService.room_closed(old_user, project)
-            return
-
     class Meta:
         verbose_name = _("Room")
         verbose_name_plural = _("Rooms")
@@ -330,11 +298,14 @@ class Room(BaseModel, BaseConfigurableModel):
         ]
 
     def save(self, *args, **kwargs) -> None:
-        current_is_active = (
-            Room.objects.filter(pk=self.pk).values_list("is_active", flat=True).first()
-        )
+        run_side_effects(self, self.save_state(*args, **kwargs))
 
-        if self._state.adding is False and current_is_active is False:
+    def save_state(self, *args, **kwargs) -> List[RoomSideEffect]:
+        """
+        Save the room and return the side effects of the change, without
+        running them (see `chats.apps.rooms.transitions`).
+        """
+        if self._state.adding is False and self.tracker.previous("is_active") is False:
             raise ValidationError({"detail": _("Closed rooms can't receive updates")})
 
         if self._state.adding:
@@ -354,23 +325,27 @@ class Room(BaseModel, BaseConfigurableModel):
         if user_has_changed and not self.user:
             self.added_to_queue_at = timezone.now()
 
-        if user_has_changed:
-            self.clear_pins()
-
-        is_new = self._state.adding
-
-        queue_has_changed = self.tracker.has_changed("queue_id")
-        old_queue_id = self.tracker.previous("queue_id")
+        side_effects = plan_side_effects(self, is_new=self._state.adding)
 
         super().save(*args, **kwargs)
 
-        if queue_has_changed and old_queue_id and self.queue:
-            old_queue = Queue.objects.get(pk=old_queue_id)
-
-            if old_queue.sector != self.queue.sector:
-                self.tags.clear()
-
-        self._update_agent_service_status(is_new)
+        self.invalidate_serialized_ws_data()
+        return side_effects
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        # Closed rooms can't receive updates. Checked by the UPDATE itself
+        # rather than by reading the row before every save.
+        updated = super()._do_update(
+            base_qs.filter(is_active=True),
+            using,
+            pk_val,
+            values,
+            update_fields,
+            forced_update,
+        )
+        if not updated and base_qs.filter(pk=pk_val).exists():
+            raise ValidationError({"detail": _("Closed rooms can't receive updates")})
+        return updated
 
     def send_automatic_message(self, delay: int = 0, check_ticket: bool = False):
         from chats.apps.sectors.tasks import send_automatic_message
@@ -489,11 +464,46 @@ class Room(BaseModel, BaseConfigurableModel):
 
         return is_24h_valid
 
+    def _get_serialized_ws_data_stamp(self) -> tuple:
+        return (
+            self.modified_on,
+            self.user_id,
+            self.queue_id,
+            self.is_active,
+            self.is_inactive,
+            self.last_message_id,
+        )
+
     @property
     def serialized_ws_data(self):
+        """
+        Room payload sent to websockets and callbacks.
+
+        With ROOM_SERIALIZED_WS_DATA_CACHE enabled, the payload is serialized
+        once per instance and reused until the room is saved, its last
+        message or tags change, or one of the fields in the stamp is modified.
+        A shallow copy is returned, as callers may add keys to it.
+        """
         from chats.apps.api.v1.rooms.serializers import RoomSerializer  # noqa
 
-        return RoomSerializer(self).data
+        if not settings.ROOM_SERIALIZED_WS_DATA_CACHE:
+            return RoomSerializer(self).data
+
+        stamp = self._get_serialized_ws_data_stamp()
+        cached = self.__dict__.get("_serialized_ws_data_cache")
+
+        if cached is None or cached[0] != stamp:
+            cached = (stamp, RoomSerializer(self).data)
+            self._serialized_ws_data_cache = cached
+
+        return dict(cached[1])
+
+    def invalidate_serialized_ws_data(self):
+        self.__dict__.pop("_serialized_ws_data_cache", None)
+
+    def refresh_from_db(self, *args, **kwargs):
+        self.invalidate_serialized_ws_data()
+        super().refresh_from_db(*args, **kwargs)
 
     @property
     def last_5_messages(self):
@@ -514,37 +524,20 @@ class Room(BaseModel, BaseConfigurableModel):
         self.tags.remove(*tags_to_remove_ids)
 
     def close(self, tags: list = [], end_by: str = "", closed_by: "User" = None):
-        from chats.apps.projects.usecases.status_service import InServiceStatusService
-
-        self.is_active = False
-        self.ended_at = timezone.now()
-        self.ended_by = end_by
-        self.closed_by = closed_by
-
-        with transaction.atomic():
-            if tags is not None:
-                self._handle_close_tags(tags)
-
-            self.clear_pins()
-
-            self.save()
-
-        if self.user:
-            project = None
-            if self.queue and hasattr(self.queue, "sector"):
-                sector = self.queue.sector
-                if sector and hasattr(sector, "project"):
-                    project = sector.project
-            if project:
-                InServiceStatusService.room_closed(self.user, project)
-
-        if self.queue.sector.is_csat_enabled and self.user:
-            transaction.on_commit(lambda: self.start_csat_flow())
+        run_side_effects(
+            self,
+            transitions.close(self, end_by=end_by, closed_by=closed_by, tags=tags),
+        )
 
     def request_callback(self, room_data: dict):
         if self.callback_url is None:
             return None
 
+        if is_webhook_service_enabled() and enqueue_callback(
+            self, "room.update", room_data
+        ):
+            return None
+
         for attempt in range(settings.MAX_RETRIES):
             try:
                 response = requests.post(
@@ -607,14 +600,10 @@ class Room(BaseModel, BaseConfigurableModel):
         Contact create new room,
         Call the sector group(all agents) and send the 'create' action to add them in the room group
         """
-        content = self.serialized_ws_data
-        if transferred_by != "":
-            content["transferred_by"] = transferred_by
-        send_channels_group(
+        self._send_room_notification(
             group_name=f"queue_{self.queue.pk}",
-            call_type="notify",
-            content=content,
             action=f"rooms.{action}",
+            transferred_by=transferred_by,
         )
 
         if self.callback_url and callback and action in ["update", "destroy", "close"]:
@@ -644,15 +633,35 @@ class Room(BaseModel, BaseConfigurableModel):
         permission = self.get_permission(user)
         if not permission:
             return
+
+        self._send_room_notification(
+            group_name=f"permission_{permission.pk}",
+            action=f"rooms.{action}",
+            transferred_by=transferred_by,
+        )
+
+    def _send_room_notification(
+        self, group_name: str, action: str, transferred_by: str = ""
+    ):
+        """
+        Send the serialized room to a channels group. Inside a notification
+        outbox, serialization is deferred to the flush, so the room is
+        serialized once for all groups it is sent to.
+        """
+        outbox = get_notification_outbox()
+        if outbox is not None:
+            outbox.add_room(group_name, self, action, transferred_by=transferred_by)
+            return
+
         content = self.serialized_ws_data
         if transferred_by != "":
             content["transferred_by"] = transferred_by
 
         send_channels_group(
-            group_name=f"permission_{permission.pk}",
+            group_name=group_name,
             call_type="notify",
             content=content,
-            action=f"rooms.{action}",
+            action=action,
         )
 
     def notify_inactivity(self):
@@ -859,10 +868,41 @@ class Room(BaseModel, BaseConfigurableModel):
             fields["last_interaction"] = message.created_on
 
         Room.objects.filter(pk=self.pk).update(**fields)
+        self.invalidate_serialized_ws_data()
+
+        if update_last_interaction:
+            from chats.apps.rooms.usecases.inactivity_deadlines import (
+                schedule_rooms_on_commit,
+            )
+
+            schedule_rooms_on_commit([self.pk])
 
     def on_new_message(self, message, contact=None, increment_unread: int = 0):
         """
         Updates room state when a new message arrives from contact.
+
+        With ROOM_COALESCE_NEW_MESSAGES enabled, the update is buffered and
+        applied together with the other messages the room receives within
+        a short window (see `chats.apps.rooms.usecases.new_messages_buffer`).
+        """
+        from chats.apps.rooms.usecases.new_messages_buffer import (
+            buffer_new_message,
+            is_new_messages_coalescing_enabled,
+        )
+
+        if not (
+            is_new_messages_coalescing_enabled()
+            and buffer_new_message(self, message, contact, increment_unread)
+        ):
+            self.apply_new_message(message, contact, increment_unread)
+
+        if self.is_inactive and contact is not None:
+            from chats.apps.rooms.usecases.inactivity import InactivityService
+
+            InactivityService().reset_inactivity(self)
+
+    def apply_new_message(self, message, contact=None, increment_unread: int = 0):
+        """
         Single UPDATE with all last_message fields.
         Only updates if message is newer than last_interaction.
         """
@@ -891,11 +931,7 @@ class Room(BaseModel, BaseConfigurableModel):
                 | Q(last_interaction__isnull=True)
             ),
         ).update(**update_fields)
-
-        if self.is_inactive and contact is not None:
-            from chats.apps.rooms.usecases.inactivity import InactivityService
-
-            InactivityService().reset_inactivity(self)
+        self.invalidate_serialized_ws_data()
 
     def start_csat_flow(self):
         """
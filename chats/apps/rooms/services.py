@@ -15,6 +15,7 @@ from chats.apps.projects.models.models import Project
 from chats.apps.queues.utils import start_queue_priority_routing
 from chats.core.cache import CacheClient
 
+from . import transitions
 from .models import Room
 
 logger = logging.getLogger(__name__)
@@ -30,8 +31,7 @@ def requeue_agent_rooms(rooms_queryset):
         old_user = room.user
         if old_user is None:
             continue
-        room.user = None
-        room.save()
+        transitions.run_side_effects(room, transitions.requeue(room))
         room.notify_user("update", user=old_user)
         room.notify_queue("update")
         if room.queue:
@@ -0,0 +1,10 @@
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+
+from chats.apps.rooms.models import Room
+
+
+@receiver(m2m_changed, sender=Room.tags.through)
+def invalidate_room_serialized_ws_data(sender, instance, **kwargs):
+    if isinstance(instance, Room):
+        instance.invalidate_serialized_ws_data()
@@ -88,6 +88,45 @@ def update_ticket_assignee_async(room_uuid: str, ticket_uuid: str, user_email: s
         raise exc
 
 
+@app.task
+def update_tickets_assignees_async(tickets: list):
+    """
+    Update the assignee of several tickets in the external Flows API
+    within a single task, used by bulk room assignments.
+
+    Args:
+        tickets (list): dicts with room_uuid, ticket_uuid and user_email
+
+    Returns:
+        dict: Number of tickets updated and the ones that failed
+    """
+    flows_client = FlowRESTClient()
+    failed = []
+
+    for ticket in tickets:
+        try:
+            flows_client.update_ticket_assignee(
+                ticket["ticket_uuid"], ticket["user_email"]
+            )
+        except Exception as exc:
+            logger.error(
+                f"[TASK] Error updating ticket assignee - Room: {ticket['room_uuid']}, "
+                f"Ticket: {ticket['ticket_uuid']}, User: {ticket['user_email']}, "
+                f"Error: {str(exc)}"
+            )
+            failed.append(ticket)
+
+    # Failed tickets are retried individually, with the single ticket task
+    for ticket in failed:
+        update_ticket_assignee_async.delay(**ticket)
+
+    return {
+        "status": "success" if not failed else "partial",
+        "updated": len(tickets) - len(failed),
+        "failed": len(failed),
+    }
+
+
 @app.task(name="check_inactivity_rooms")
 def check_inactivity_rooms():
     """
@@ -105,6 +144,9 @@ def check_inactivity_rooms():
     from django_redis import get_redis_connection
 
     from chats.apps.rooms.usecases.inactivity import InactivityService
+    from chats.apps.rooms.usecases.inactivity_deadlines import (
+        resync_deadlines_if_due,
+    )
 
     redis_conn = get_redis_connection("default")
     lock = redis_conn.lock(
@@ -124,6 +166,12 @@ def check_inactivity_rooms():
     try:
         service = InactivityService()
 
+        try:
+            resync_deadlines_if_due()
+        except Exception as exc:
+            logger.exception("[INACTIVITY TASK] resync_deadlines failed: %s", exc)
+            capture_exception(exc)
+
         try:
             warned = service.warn_inactive_rooms()
             logger.info(
@@ -155,6 +203,30 @@ def check_inactivity_rooms():
             )
 
 
+@app.task(name="flush_room_new_messages")
+def flush_room_new_messages(room_pk: str):
+    """
+    Apply the inbound messages buffered for a room by `Room.on_new_message`.
+    """
+    from chats.apps.rooms.usecases.new_messages_buffer import flush_new_messages
+
+    flush_new_messages(room_pk)
+
+
+@app.task(name="reschedule_sector_inactivity_deadlines")
+def reschedule_sector_inactivity_deadlines(sector_pk: str):
+    """
+    Recompute the inactivity deadlines of a sector's open rooms after its
+    `inactivity_timeout` config changed.
+    """
+    from chats.apps.rooms.usecases.inactivity_deadlines import schedule_sector_rooms
+
+    rescheduled = schedule_sector_rooms(sector_pk)
+    logger.info(
+        "[INACTIVITY TASK] rescheduled %s rooms of sector %s", rescheduled, sector_pk
+    )
+
+
 # ---------------------------------------------------------------------------
 # Room export tasks
 # ---------------------------------------------------------------------------
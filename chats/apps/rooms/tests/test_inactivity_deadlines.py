@@ -0,0 +1,211 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from chats.apps.accounts.models import User
+from chats.apps.contacts.models import Contact
+from chats.apps.msgs.models import Message
+from chats.apps.projects.models.models import Project
+from chats.apps.queues.models import Queue
+from chats.apps.rooms.models import Room
+from chats.apps.rooms.usecases.inactivity import InactivityService
+from chats.apps.rooms.usecases.inactivity_deadlines import (
+    CLOSE_DEADLINES_KEY,
+    WARN_DEADLINES_KEY,
+    compute_deadline,
+    resync_deadlines,
+    schedule_rooms,
+)
+from chats.apps.sectors.models import Sector
+
+
+def _enabled_inactivity_config(message_timeout_time=600):
+    return {
+        "is_message_timeout_enabled": True,
+        "message_timeout_text": "Are you still there?",
+        "message_timeout_time": message_timeout_time,
+        "is_close_room_enabled": True,
+        "close_room_message_text": "Closing due to inactivity.",
+        "close_room_timeout_time": 60,
+    }
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.commands.append((getattr(self.redis, name), args, kwargs))
+            return self
+
+        return command
+
+    def execute(self):
+        return [command(*args, **kwargs) for command, args, kwargs in self.commands]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.zsets = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, *members):
+        for member in members:
+            self.zsets.get(key, {}).pop(member, None)
+
+    def zrangebyscore(self, key, min, max, start=None, num=None):
+        members = sorted(
+            (score, member)
+            for member, score in self.zsets.get(key, {}).items()
+            if score <= max
+        )
+        members = [member.encode() for _, member in members]
+        if num is None:
+            return members
+        return members[start:][:num]
+
+    def members(self, key):
+        return set(self.zsets.get(key, {}))
+
+
+@override_settings(INACTIVITY_USE_DEADLINE_INDEX=True)
+class InactivityDeadlinesTests(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(name="Test Project")
+        self.sector = Sector.objects.create(
+            name="Sector",
+            project=self.project,
+            rooms_limit=5,
+            work_start="09:00",
+            work_end="18:00",
+            inactivity_timeout=_enabled_inactivity_config(),
+        )
+        self.queue = Queue.objects.create(name="Queue", sector=self.sector)
+        self.user = User.objects.create(email="agent@example.com")
+        self.contact = Contact.objects.create(name="Contact", external_id="c-1")
+
+        self.redis = FakeRedis()
+        redis_patcher = patch(
+            "chats.apps.rooms.usecases.inactivity_deadlines.get_redis_connection",
+            return_value=self.redis,
+        )
+        redis_patcher.start()
+        self.addCleanup(redis_patcher.stop)
+
+    def _create_room(self, last_interaction_offset_seconds=700, **fields) -> Room:
+        room = Room.objects.create(queue=self.queue, contact=self.contact)
+        room.user = self.user
+        room.last_message_user = self.user
+        room.last_interaction = timezone.now() - timedelta(
+            seconds=last_interaction_offset_seconds
+        )
+        for field, value in fields.items():
+            setattr(room, field, value)
+        room.save()
+        return room
+
+    def test_compute_deadline(self):
+        now = timezone.now()
+        config = _enabled_inactivity_config()
+
+        self.assertEqual(
+            compute_deadline(False, now, config),
+            (WARN_DEADLINES_KEY, now.timestamp() + 600),
+        )
+        self.assertEqual(
+            compute_deadline(True, now, config),
+            (CLOSE_DEADLINES_KEY, now.timestamp() + 660),
+        )
+        self.assertIsNone(compute_deadline(False, None, config))
+        self.assertIsNone(compute_deadline(False, now, None))
+        self.assertIsNone(
+            compute_deadline(True, now, {**config, "is_close_room_enabled": False})
+        )
+
+    def test_resync_indexes_eligible_rooms_only(self):
+        room = self._create_room()
+        contact_replied = self._create_room(last_message_user=None)
+
+        self.assertEqual(resync_deadlines(), 1)
+        self.assertEqual(self.redis.members(WARN_DEADLINES_KEY), {str(room.pk)})
+        self.assertNotIn(
+            str(contact_replied.pk), self.redis.members(WARN_DEADLINES_KEY)
+        )
+
+    def test_warn_only_loads_due_rooms(self):
+        due = self._create_room()
+        # Eligible and past its timeout, but not in the index
+        self._create_room()
+        schedule_rooms([due.pk])
+
+        with patch.object(Room, "notify_inactivity"):
+            warned = InactivityService().warn_inactive_rooms()
+
+        self.assertEqual(warned, 1)
+        due.refresh_from_db()
+        self.assertTrue(due.is_inactive)
+        # Warned rooms wait for their closure deadline
+        self.assertEqual(self.redis.members(WARN_DEADLINES_KEY), set())
+        self.assertEqual(self.redis.members(CLOSE_DEADLINES_KEY), {str(due.pk)})
+
+    def test_warn_reschedules_rooms_that_are_not_due_anymore(self):
+        room = self._create_room(last_interaction_offset_seconds=60)
+        self.redis.zadd(WARN_DEADLINES_KEY, {str(room.pk): 0})
+
+        with patch.object(Room, "notify_inactivity"):
+            warned = InactivityService().warn_inactive_rooms()
+
+        self.assertEqual(warned, 0)
+        self.assertEqual(
+            self.redis.zsets[WARN_DEADLINES_KEY][str(room.pk)],
+            room.last_interaction.timestamp() + 600,
+        )
+
+    @override_settings(INACTIVITY_MAX_WARNINGS_PER_RUN=1)
+    def test_warn_keeps_the_per_run_cap(self):
+        rooms = [self._create_room(), self._create_room()]
+        schedule_rooms([room.pk for room in rooms])
+
+        with patch.object(Room, "notify_inactivity"):
+            warned = InactivityService().warn_inactive_rooms()
+
+        self.assertEqual(warned, 1)
+        self.assertEqual(len(self.redis.members(WARN_DEADLINES_KEY)), 1)
+
+    def test_closed_rooms_leave_the_index(self):
+        room = self._create_room(is_inactive=True)
+        schedule_rooms([room.pk])
+
+        with patch.object(Room, "notify_user"), patch.object(Message, "notify_room"):
+            closed = InactivityService().close_inactive_rooms()
+
+        self.assertEqual(closed, 1)
+        self.assertEqual(self.redis.members(CLOSE_DEADLINES_KEY), set())
+
+    @patch("chats.apps.rooms.tasks.reschedule_sector_inactivity_deadlines.delay")
+    def test_sector_config_change_reschedules_rooms(self, mock_reschedule):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sector.save()
+        mock_reschedule.assert_not_called()
+
+        self.sector.inactivity_timeout = _enabled_inactivity_config(
+            message_timeout_time=300
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sector.save()
+        mock_reschedule.assert_called_once_with(str(self.sector.pk))
@@ -0,0 +1,186 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from chats.apps.contacts.models import Contact
+from chats.apps.msgs.models import Message
+from chats.apps.projects.models.models import Project
+from chats.apps.queues.models import Queue
+from chats.apps.rooms.models import Room
+from chats.apps.rooms.usecases.new_messages_buffer import flush_new_messages
+from chats.apps.sectors.models import Sector
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.commands.append((getattr(self.redis, name), args, kwargs))
+            return self
+
+        return command
+
+    def execute(self):
+        return [command(*args, **kwargs) for command, args, kwargs in self.commands]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def zadd(self, key, mapping):
+        self.store.setdefault(key, {}).update(mapping)
+
+    def zrevrange(self, key, start, end):
+        members = sorted(
+            self.store.get(key, {}).items(), key=lambda item: item[1], reverse=True
+        )
+        return [member.encode() for member, _ in members][
+            slice(start, None if end == -1 else end + 1)
+        ]
+
+    def incrby(self, key, amount):
+        self.store[key] = self.store.get(key, 0) + amount
+        return self.store[key]
+
+    def expire(self, key, seconds):
+        return True
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value
+        return True
+
+    def get(self, key):
+        value = self.store.get(key)
+        return None if value is None else str(value).encode()
+
+    def delete(self, *keys):
+        return sum(self.store.pop(key, None) is not None for key in keys)
+
+
+@override_settings(ROOM_COALESCE_NEW_MESSAGES=True)
+class NewMessagesBufferTests(TestCase):
+    def setUp(self):
+        project = Project.objects.create(name="Test Project")
+        sector = Sector.objects.create(
+            name="Test Sector",
+            project=project,
+            rooms_limit=10,
+            work_start="09:00",
+            work_end="18:00",
+        )
+        queue = Queue.objects.create(name="Test Queue", sector=sector)
+        self.contact = Contact.objects.create(name="Test Contact")
+        self.room = Room.objects.create(queue=queue, contact=self.contact)
+
+        self.redis = FakeRedis()
+        redis_patcher = patch(
+            "chats.apps.rooms.usecases.new_messages_buffer.get_redis_connection",
+            return_value=self.redis,
+        )
+        redis_patcher.start()
+        self.addCleanup(redis_patcher.stop)
+
+    def _receive(self, text, created_on=None):
+        message = Message.objects.create(
+            room=self.room, text=text, contact=self.contact
+        )
+        if created_on is not None:
+            Message.objects.filter(pk=message.pk).update(created_on=created_on)
+            message.created_on = created_on
+        self.room.on_new_message(
+            message=message, contact=self.contact, increment_unread=1
+        )
+        return message
+
+    @patch("chats.apps.rooms.tasks.flush_room_new_messages.apply_async")
+    def test_burst_is_flushed_with_one_update(self, mock_apply_async):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._receive("First")
+            latest = self._receive("Second")
+            self._receive("Older", created_on=timezone.now() - timedelta(minutes=1))
+
+        mock_apply_async.assert_called_once()
+        self.room.refresh_from_db()
+        self.assertIsNone(self.room.last_message)
+        self.assertEqual(self.room.unread_messages_count, 0)
+
+        with patch.object(Room, "notify_room") as mock_notify_room:
+            self.assertTrue(flush_new_messages(self.room.pk))
+
+        mock_notify_room.assert_called_once_with("update")
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.last_message, latest)
+        self.assertEqual(self.room.last_message_text, "Second")
+        self.assertEqual(self.room.last_message_contact, self.contact)
+        self.assertEqual(self.room.last_interaction, latest.created_on)
+        self.assertEqual(self.room.unread_messages_count, 3)
+
+        # Nothing left to apply, and the next message schedules a new flush
+        self.assertFalse(flush_new_messages(self.room.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            self._receive("Third")
+        self.assertEqual(mock_apply_async.call_count, 2)
+
+    @patch("chats.apps.rooms.tasks.flush_room_new_messages.apply_async")
+    def test_rolled_back_messages_are_skipped(self, mock_apply_async):
+        # Its transaction never commits, so no flush is scheduled for it
+        with self.captureOnCommitCallbacks(execute=False):
+            rolled_back = self._receive(
+                "Rolled back", created_on=timezone.now() + timedelta(minutes=1)
+            )
+        rolled_back.delete()
+        mock_apply_async.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self._receive("First")
+        mock_apply_async.assert_called_once()
+
+        with patch.object(Room, "notify_room"):
+            self.assertTrue(flush_new_messages(self.room.pk))
+
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.last_message, first)
+        self.assertEqual(self.room.unread_messages_count, 2)
+
+    @patch("chats.apps.rooms.tasks.flush_room_new_messages.apply_async")
+    def test_unread_count_is_kept_when_an_agent_replies_meanwhile(
+        self, mock_apply_async
+    ):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._receive("First", created_on=timezone.now() - timedelta(seconds=2))
+            self._receive("Second", created_on=timezone.now() - timedelta(seconds=1))
+        reply = Message.objects.create(room=self.room, text="Reply")
+        self.room.update_last_message(reply)
+
+        with patch.object(Room, "notify_room"):
+            self.assertTrue(flush_new_messages(self.room.pk))
+
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.last_message, reply)
+        self.assertEqual(self.room.last_interaction, reply.created_on)
+        self.assertEqual(self.room.unread_messages_count, 2)
+
+    def test_falls_back_to_synchronous_update(self):
+        with patch.object(self.redis, "pipeline", side_effect=ConnectionError):
+            message = self._receive("Hello")
+
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.last_message, message)
+        self.assertEqual(self.room.unread_messages_count, 1)
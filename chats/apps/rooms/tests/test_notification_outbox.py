@@ -0,0 +1,100 @@
+import json
+from unittest.mock import MagicMock, PropertyMock, patch
+
+from django.test import TestCase, override_settings
+
+from chats.apps.accounts.models import User
+from chats.apps.projects.models.models import Project
+from chats.apps.queues.models import Queue
+from chats.apps.rooms.models import Room
+from chats.apps.sectors.models import Sector
+from chats.utils.websockets import notification_outbox, send_channels_group
+
+
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(name="Test Project")
+        self.sector = Sector.objects.create(
+            name="Sector",
+            project=self.project,
+            rooms_limit=5,
+            work_start="09:00",
+            work_end="18:00",
+        )
+        self.queue = Queue.objects.create(name="Queue", sector=self.sector)
+        self.user = User.objects.create(email="agent@example.com")
+        self.room = Room.objects.create(queue=self.queue)
+        self.room.user = self.user
+        self.room.save()
+
+    @override_settings(USE_WS_NOTIFICATION_OUTBOX=False)
+    @patch("chats.utils.websockets._group_send_many")
+    @patch("chats.utils.websockets._group_send")
+    def test_sends_directly_when_outbox_is_disabled(
+        self, mock_group_send, mock_group_send_many
+    ):
+        with notification_outbox():
+            send_channels_group("queue_1", "notify", {"id": 1}, "rooms.update")
+
+        mock_group_send.assert_called_once()
+        mock_group_send_many.assert_not_called()
+
+    @override_settings(USE_WS_NOTIFICATION_OUTBOX=True)
+    @patch("chats.utils.websockets._group_send_many")
+    def test_room_is_serialized_once_and_duplicates_are_dropped(
+        self, mock_group_send_many
+    ):
+        mock_group_send_many.return_value = [None, None]
+
+        with patch.object(
+            Room, "get_permission", return_value=MagicMock(pk=42)
+        ), patch.object(
+            Room,
+            "serialized_ws_data",
+            new_callable=PropertyMock,
+            return_value={"uuid": str(self.room.uuid)},
+        ) as mock_serialized_ws_data:
+            with self.captureOnCommitCallbacks(execute=True):
+                with notification_outbox():
+                    self.room.notify_queue("update")
+                    self.room.notify_user("update", user=self.user)
+                    self.room.notify_user("update")
+
+        self.assertEqual(mock_serialized_ws_data.call_count, 1)
+
+        messages = mock_group_send_many.call_args[0][0]
+        self.assertEqual(
+            [group_name for group_name, _ in messages],
+            [f"queue_{self.queue.pk}", "permission_42"],
+        )
+        for _, message in messages:
+            self.assertEqual(message["action"], "rooms.update")
+            self.assertEqual(
+                json.loads(message["content"]), {"uuid": str(self.room.uuid)}
+            )
+
+    @override_settings(USE_WS_NOTIFICATION_OUTBOX=True)
+    @patch("chats.utils.websockets._group_send")
+    @patch("chats.utils.websockets._group_send_many")
+    def test_failed_sends_are_retried_individually(
+        self, mock_group_send_many, mock_group_send
+    ):
+        mock_group_send_many.return_value = [None, Exception("Redis error")]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with notification_outbox():
+                send_channels_group("queue_1", "notify", {"id": 1}, "rooms.update")
+                send_channels_group("queue_2", "notify", {"id": 1}, "rooms.update")
+
+        mock_group_send.assert_called_once()
+        self.assertEqual(mock_group_send.call_args[0][0], "queue_2")
+
+    @override_settings(USE_WS_NOTIFICATION_OUTBOX=True)
+    @patch("chats.utils.websockets._group_send_many")
+    def test_nothing_is_sent_before_commit(self, mock_group_send_many):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            with notification_outbox():
+                send_channels_group("queue_1", "notify", {"id": 1}, "rooms.update")
+
+        mock_group_send_many.assert_not_called()
+        self.assertEqual(len(callbacks), 1)
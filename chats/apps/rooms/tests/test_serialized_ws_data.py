@@ -0,0 +1,70 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from chats.apps.accounts.models import User
+from chats.apps.contacts.models import Contact
+from chats.apps.projects.models.models import Project
+from chats.apps.queues.models import Queue
+from chats.apps.rooms.models import Room
+from chats.apps.sectors.models import Sector, SectorTag
+
+
+@override_settings(ROOM_SERIALIZED_WS_DATA_CACHE=True)
+class RoomSerializedWSDataCacheTests(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(name="Test Project")
+        self.sector = Sector.objects.create(
+            name="Sector",
+            project=self.project,
+            rooms_limit=5,
+            work_start="09:00",
+            work_end="18:00",
+        )
+        self.queue = Queue.objects.create(name="Queue", sector=self.sector)
+        self.user = User.objects.create(email="agent@example.com")
+        self.contact = Contact.objects.create(name="Contact", external_id="c-1")
+        self.room = Room.objects.create(queue=self.queue, contact=self.contact)
+
+    def _count_queries(self, room):
+        with CaptureQueriesContext(connection) as queries:
+            room.serialized_ws_data
+        return len(queries)
+
+    def test_repeated_payloads_do_not_query(self):
+        self.room.serialized_ws_data
+
+        with override_settings(ROOM_SERIALIZED_WS_DATA_CACHE=False):
+            self.assertGreater(self._count_queries(self.room), 0)
+
+        self.assertEqual(self._count_queries(self.room), 0)
+
+    def test_returns_a_copy(self):
+        payload = self.room.serialized_ws_data
+        payload["transferred_by"] = "agent@example.com"
+
+        self.assertNotIn("transferred_by", self.room.serialized_ws_data)
+
+    def test_save_invalidates_payload(self):
+        self.room.serialized_ws_data
+        self.room.user = self.user
+        self.room.save()
+
+        self.assertEqual(self.room.serialized_ws_data["user"]["email"], self.user.email)
+
+    def test_tag_changes_invalidate_payload(self):
+        tag = SectorTag.objects.create(name="Tag", sector=self.sector)
+
+        self.assertEqual(self.room.serialized_ws_data["tags"], [])
+        self.room.tags.add(tag)
+
+        self.assertEqual(len(self.room.serialized_ws_data["tags"]), 1)
+
+    def test_refresh_from_db_invalidates_payload(self):
+        self.room.serialized_ws_data
+        Room.objects.filter(pk=self.room.pk).update(custom_fields={"key": "value"})
+        self.room.refresh_from_db()
+
+        self.assertEqual(
+            self.room.serialized_ws_data["custom_fields"], {"key": "value"}
+        )
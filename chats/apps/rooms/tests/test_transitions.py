@@ -0,0 +1,132 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+from rest_framework.exceptions import ValidationError
+
+from chats.apps.accounts.models import User
+from chats.apps.projects.models.models import Project
+from chats.apps.queues.models import Queue
+from chats.apps.rooms import transitions
+from chats.apps.rooms.models import Room, RoomPin
+from chats.apps.rooms.transitions import (
+    AGENT_RELEASED,
+    CLEAR_PINS,
+    CLEAR_TAGS,
+    RoomSideEffect,
+)
+from chats.apps.sectors.models import Sector, SectorTag
+
+
+class RoomTransitionsTests(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(name="Test Project")
+        self.sector = Sector.objects.create(
+            name="Test Sector",
+            project=self.project,
+            rooms_limit=10,
+            work_start="09:00",
+            work_end="18:00",
+        )
+        self.queue = Queue.objects.create(name="Test Queue", sector=self.sector)
+        self.agent = User.objects.create(email="agent@example.com")
+        self.other_agent = User.objects.create(email="other@example.com")
+        self.room = Room.objects.create(queue=self.queue)
+
+    def test_saving_a_closed_room_fails_without_queries(self):
+        Room.objects.filter(pk=self.room.pk).update(is_active=False)
+        room = Room.objects.get(pk=self.room.pk)
+
+        with self.assertNumQueries(0), self.assertRaises(ValidationError):
+            room.save()
+
+    def test_saving_a_room_closed_meanwhile_fails(self):
+        Room.objects.filter(pk=self.room.pk).update(is_active=False, user=self.agent)
+
+        self.room.user = self.other_agent
+        with self.assertRaises(ValidationError):
+            self.room.save()
+
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.user, self.agent)
+
+    def test_creating_an_assigned_room_updates_the_agent_status(self):
+        with patch(
+            "chats.apps.projects.usecases.status_service.InServiceStatusService.room_assigned"
+        ) as mock_room_assigned:
+            Room.objects.create(queue=self.queue, user=self.agent)
+
+        mock_room_assigned.assert_called_once_with(self.agent, self.project)
+
+    def test_assign(self):
+        side_effects = transitions.assign(self.room, self.agent)
+
+        self.assertEqual(side_effects, [RoomSideEffect(CLEAR_PINS)])
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.user, self.agent)
+        self.assertIsNotNone(self.room.user_assigned_at)
+        self.assertIsNotNone(self.room.first_user_assigned_at)
+
+    def test_transfer_to_another_sector(self):
+        transitions.run_side_effects(
+            self.room, transitions.assign(self.room, self.agent)
+        )
+        self.room.tags.add(SectorTag.objects.create(name="Tag", sector=self.sector))
+        other_sector = Sector.objects.create(
+            name="Other Sector",
+            project=self.project,
+            rooms_limit=10,
+            work_start="09:00",
+            work_end="18:00",
+        )
+        other_queue = Queue.objects.create(name="Other Queue", sector=other_sector)
+
+        side_effects = transitions.transfer(
+            self.room, user=self.other_agent, queue=other_queue
+        )
+
+        self.assertEqual(
+            side_effects,
+            [
+                RoomSideEffect(CLEAR_PINS),
+                RoomSideEffect(CLEAR_TAGS, queue_id=self.queue.pk),
+            ],
+        )
+
+        transitions.run_side_effects(self.room, side_effects)
+
+        self.assertEqual(self.room.tags.count(), 0)
+
+    def test_requeue(self):
+        transitions.run_side_effects(
+            self.room, transitions.assign(self.room, self.agent)
+        )
+
+        side_effects = transitions.requeue(self.room)
+
+        self.assertEqual(side_effects, [RoomSideEffect(CLEAR_PINS)])
+        self.room.refresh_from_db()
+        self.assertIsNone(self.room.user)
+
+    def test_close(self):
+        transitions.run_side_effects(
+            self.room, transitions.assign(self.room, self.agent)
+        )
+
+        RoomPin.objects.create(room=self.room, user=self.agent, project=self.project)
+
+        with patch.object(
+            Room, "save_state", side_effect=RuntimeError
+        ), self.assertRaises(RuntimeError):
+            transitions.close(self.room, end_by="agent")
+        # Pins are cleared in the same transaction as the room is closed
+        self.assertTrue(RoomPin.objects.filter(room=self.room).exists())
+
+        side_effects = transitions.close(self.room, end_by="agent")
+
+        self.assertEqual(
+            side_effects, [RoomSideEffect(AGENT_RELEASED, user_id=self.agent.pk)]
+        )
+        self.assertFalse(RoomPin.objects.filter(room=self.room).exists())
+        self.room.refresh_from_db()
+        self.assertFalse(self.room.is_active)
+        self.assertEqual(self.room.ended_by, "agent")
@@ -0,0 +1,215 @@
+import json
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import requests
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from chats.apps.rooms.webhooks import (
+    DELIVERED,
+    FAILED,
+    RETRY,
+    WebhookWorker,
+    enqueue_callback,
+    get_room_key,
+    get_room_lock_key,
+)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.commands.append((getattr(self.redis, name), args, kwargs))
+            return self
+
+        return command
+
+    def execute(self):
+        return [command(*args, **kwargs) for command, args, kwargs in self.commands]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.lists = {}
+        self.ready = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def rpush(self, key, value):
+        self.lists.setdefault(key, []).append(value.encode())
+
+    def lindex(self, key, index):
+        values = self.lists.get(key, [])
+        return values[index] if index < len(values) else None
+
+    def lset(self, key, index, value):
+        self.lists[key][index] = value.encode()
+
+    def lpop(self, key):
+        value = self.lists[key].pop(0)
+        if not self.lists[key]:
+            del self.lists[key]
+        return value
+
+    def llen(self, key):
+        return len(self.lists.get(key, []))
+
+    def zadd(self, key, mapping, nx=False):
+        for member, score in mapping.items():
+            if not (nx and member in self.ready):
+                self.ready[member] = score
+
+    def zpopmin(self, key, count):
+        popped = sorted(self.ready.items(), key=lambda item: item[1])[:count]
+        for member, _ in popped:
+            del self.ready[member]
+        return [(member.encode(), score) for member, score in popped]
+
+    def scan_iter(self, match, count):
+        return [key.encode() for key in self.lists]
+
+
+def response(status_code):
+    return SimpleNamespace(status_code=status_code, text="")
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    WEBHOOK_WORKER_CONCURRENCY=2,
+    WEBHOOK_MAX_PER_DESTINATION=1,
+    WEBHOOK_RETRY_DELAYS=[10, 20],
+    WEBHOOK_CIRCUIT_FAILURE_THRESHOLD=2,
+    WEBHOOK_CIRCUIT_OPEN_SECONDS=30,
+    WEBHOOK_POLL_INTERVAL=1,
+)
+class WebhookWorkerTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        redis_patcher = patch(
+            "chats.apps.rooms.webhooks.get_redis_connection", return_value=self.redis
+        )
+        redis_patcher.start()
+        self.addCleanup(redis_patcher.stop)
+
+        self.session = MagicMock()
+        self.worker = WebhookWorker(session=self.session)
+        self.addCleanup(self.worker.executor.shutdown)
+        self.queue = SimpleNamespace(sector=SimpleNamespace(project_id="p1"))
+        self.room = SimpleNamespace(
+            pk="room-1",
+            callback_url="https://example.com/hook",
+            queue=self.queue,
+            queue_id="queue-1",
+        )
+
+    def _posted_types(self):
+        return [
+            json.loads(call.kwargs["data"])["type"]
+            for call in self.session.post.call_args_list
+        ]
+
+    def test_callbacks_of_a_room_are_delivered_in_order(self):
+        self.assertTrue(enqueue_callback(self.room, "room.update", {"uuid": "room-1"}))
+        self.assertTrue(enqueue_callback(self.room, "msg.create", {"uuid": "msg-1"}))
+        self.assertEqual(self.worker.claim(10), ["room-1"])
+        self.session.post.return_value = response(200)
+
+        self.assertEqual(self.worker.deliver_room("room-1"), DELIVERED)
+        # The next callback of the room is due right away
+        self.assertEqual(self.worker.claim(10), ["room-1"])
+        self.assertEqual(self.worker.deliver_room("room-1"), DELIVERED)
+
+        self.assertEqual(self._posted_types(), ["room.update", "msg.create"])
+        self.assertEqual(self.redis.lists, {})
+        self.assertEqual(self.redis.ready, {})
+
+    @override_settings(WEBHOOK_CIRCUIT_FAILURE_THRESHOLD=10)
+    def test_failed_callback_holds_the_next_ones_until_retried(self):
+        enqueue_callback(self.room, "room.update", {})
+        enqueue_callback(self.room, "msg.create", {})
+        self.session.post.return_value = response(503)
+
+        self.assertEqual(self.worker.deliver_room("room-1"), RETRY)
+
+        self.assertEqual(self.worker.claim(10), [])
+        self.assertGreater(self.redis.ready["room-1"], time.time() + 5)
+        first = json.loads(self.redis.lindex(get_room_key("room-1"), 0))
+        self.assertEqual(first["attempts"], 1)
+        self.assertEqual(self.redis.llen(get_room_key("room-1")), 2)
+
+        # Given up once the retry schedule is over
+        self.assertEqual(self.worker.deliver_room("room-1"), RETRY)
+        self.assertEqual(self.worker.deliver_room("room-1"), FAILED)
+        self.assertEqual(self.redis.llen(get_room_key("room-1")), 1)
+
+    def test_callbacks_are_labelled_with_the_sector_project(self):
+        enqueue_callback(self.room, "room.update", {})
+
+        delivery = json.loads(self.redis.lindex(get_room_key("room-1"), 0))
+        self.assertEqual(delivery["project"], "p1")
+
+    def test_non_retryable_status_is_dropped(self):
+        enqueue_callback(self.room, "room.update", {})
+        self.session.post.return_value = response(404)
+
+        self.assertEqual(self.worker.deliver_room("room-1"), FAILED)
+        self.assertEqual(self.redis.lists, {})
+
+    def test_failing_destination_is_paused(self):
+        other_room = SimpleNamespace(
+            pk="room-2",
+            callback_url=self.room.callback_url,
+            queue=self.queue,
+            queue_id="queue-1",
+        )
+        for room in (self.room, other_room, self.room):
+            enqueue_callback(room, "room.update", {})
+        self.session.post.side_effect = requests.ConnectionError
+
+        self.worker.deliver_room("room-1")
+        self.worker.deliver_room("room-2")
+        self.assertIsNone(self.worker.deliver_room("room-1"))
+
+        self.assertEqual(self.session.post.call_count, 2)
+        self.assertGreater(self.redis.ready["room-1"], time.time() + 20)
+
+    def test_locked_room_is_scheduled_again(self):
+        enqueue_callback(self.room, "room.update", {})
+        self.worker.claim(10)
+        cache.add(get_room_lock_key("room-1"), True)
+        self.addCleanup(cache.delete, get_room_lock_key("room-1"))
+
+        self.assertIsNone(self.worker.deliver_room("room-1"))
+
+        self.session.post.assert_not_called()
+        self.assertIn("room-1", self.redis.ready)
+
+    def test_recover_schedules_orphaned_rooms(self):
+        enqueue_callback(self.room, "room.update", {})
+        self.worker.claim(10)
+
+        self.worker.recover()
+
+        self.assertEqual(self.worker.claim(10), ["room-1"])
+
+    def test_enqueue_failure_is_reported(self):
+        with patch(
+            "chats.apps.rooms.webhooks.get_redis_connection",
+            side_effect=ConnectionError,
+        ):
+            self.assertFalse(enqueue_callback(self.room, "room.update", {}))
+        self.assertEqual(self.redis.ready, {})
+        self.assertEqual(self.redis.lists, {})
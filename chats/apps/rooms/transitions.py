@@ -0,0 +1,183 @@
+"""
+Room state transitions.
+
+`Room.save_state` saves a room and returns the side effects of the change,
+planned from the field tracker, without running them; `Room.save` runs them
+right away. Closed rooms are guarded by the UPDATE itself (`WHERE is_active`),
+so saving a room does not read it first.
+
+The helpers below apply the usual transitions (assign, transfer, requeue,
+close) and return their side effects, leaving it to the caller to run them
+with `run_side_effects`. All but `close` only write the columns they change.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterable, List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+if TYPE_CHECKING:
+    from chats.apps.accounts.models import User
+    from chats.apps.queues.models import Queue
+    from chats.apps.rooms.models import Room
+
+
+logger = logging.getLogger(__name__)
+
+
+CLEAR_PINS = "clear_pins"
+# Clear the room tags when its previous queue belongs to another sector
+CLEAR_TAGS = "clear_tags"
+AGENT_ASSIGNED = "agent_assigned"
+AGENT_RELEASED = "agent_released"
+START_CSAT_FLOW = "start_csat_flow"
+
+# Fields `Room.save_state` may set on its own, written along with the
+# fields a transition changes
+STATE_FIELDS = (
+    "added_to_queue_at",
+    "user_assigned_at",
+    "first_user_assigned_at",
+    "modified_on",
+)
+
+
+@dataclass(frozen=True)
+class RoomSideEffect:
+    action: str
+    # Agent whose in-service status must be updated
+    user_id: Optional[str] = None
+    # Queue the room was moved from
+    queue_id: Optional[str] = None
+
+
+def plan_side_effects(room: "Room", is_new: bool) -> List[RoomSideEffect]:
+    """
+    Side effects of the pending changes of the room, from its tracker.
+    Must be called before the room is saved.
+    """
+    side_effects = []
+    tracker = room.tracker
+
+    user_has_changed = not is_new and tracker.has_changed("user_id")
+    if user_has_changed:
+        side_effects.append(RoomSideEffect(CLEAR_PINS))
+
+    old_queue_id = tracker.previous("queue_id")
+    if tracker.has_changed("queue_id") and old_queue_id and room.queue_id:
+        side_effects.append(RoomSideEffect(CLEAR_TAGS, queue_id=old_queue_id))
+
+    # The agent in-service status is only updated by saves creating an
+    # assigned room, and by `close`, keeping its locking queries out of
+    # assignments and transfers
+    if is_new and room.user_id:
+        side_effects.append(RoomSideEffect(AGENT_ASSIGNED, user_id=room.user_id))
+
+    return side_effects
+
+
+def _get_project(room: "Room"):
+    sector = getattr(room.queue, "sector", None) if room.queue else None
+    return getattr(sector, "project", None) if sector else None
+
+
+def _get_user(room: "Room", user_id) -> Optional["User"]:
+    from chats.apps.accounts.models import User
+
+    if user_id == room.user_id:
+        return room.user
+    return User.objects.filter(pk=user_id).first()
+
+
+def run_side_effects(room: "Room", side_effects: Iterable[RoomSideEffect]) -> None:
+    from chats.apps.projects.usecases.status_service import InServiceStatusService
+    from chats.apps.queues.models import Queue
+
+    for side_effect in side_effects:
+        if side_effect.action == CLEAR_PINS:
+            room.clear_pins()
+
+        elif side_effect.action == CLEAR_TAGS:
+            old_sector_id = (
+                Queue.all_objects.filter(pk=side_effect.queue_id)
+                .values_list("sector_id", flat=True)
+                .first()
+            )
+            if old_sector_id != room.queue.sector_id:
+                room.tags.clear()
+
+        elif side_effect.action in (AGENT_ASSIGNED, AGENT_RELEASED):
+            project = _get_project(room)
+            if project is None:
+                continue
+
+            user = _get_user(room, side_effect.user_id)
+            if side_effect.action == AGENT_ASSIGNED:
+                InServiceStatusService.room_assigned(user, project)
+            else:
+                InServiceStatusService.room_closed(user, project)
+
+        elif side_effect.action == START_CSAT_FLOW:
+            transaction.on_commit(room.start_csat_flow)
+
+        else:
+            logger.warning("[ROOM] Unknown side effect %s", side_effect.action)
+
+
+def assign(room: "Room", user: "User") -> List[RoomSideEffect]:
+    """
+    Assign the room to an agent.
+    """
+    room.user = user
+    return room.save_state(update_fields=["user", *STATE_FIELDS])
+
+
+def transfer(
+    room: "Room", user: Optional["User"] = None, queue: Optional["Queue"] = None
+) -> List[RoomSideEffect]:
+    """
+    Move the room to another agent, queue or both. Without an agent the
+    room waits in its (new) queue.
+    """
+    room.user = user
+    if queue is not None:
+        room.queue = queue
+    return room.save_state(update_fields=["user", "queue", *STATE_FIELDS])
+
+
+def requeue(room: "Room", queue: Optional["Queue"] = None) -> List[RoomSideEffect]:
+    """
+    Return the room to its queue, or another one, without an agent.
+    """
+    return transfer(room, user=None, queue=queue)
+
+
+def close(
+    room: "Room",
+    end_by: str = "",
+    closed_by: Optional["User"] = None,
+    tags: Optional[list] = None,
+) -> List[RoomSideEffect]:
+    """
+    Close the room. The whole room is saved, as callers commonly set other
+    fields (e.g. `automatic_closed`) right before closing it.
+    """
+    room.is_active = False
+    room.ended_at = timezone.now()
+    room.ended_by = end_by
+    room.closed_by = closed_by
+
+    with transaction.atomic():
+        if tags is not None:
+            room._handle_close_tags(tags)
+        room.clear_pins()
+        side_effects = room.save_state()
+
+    if room.user_id:
+        side_effects.append(RoomSideEffect(AGENT_RELEASED, user_id=room.user_id))
+        if room.queue.sector.is_csat_enabled:
+            side_effects.append(RoomSideEffect(START_CSAT_FLOW))
+
+    return side_effects
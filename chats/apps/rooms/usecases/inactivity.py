@@ -7,6 +7,11 @@ Responsibilities:
 - `close_inactive_rooms` : find rooms already warned that exceeded the closure
   timeout and close them automatically.
 - `reset_inactivity`     : clear the inactive flag when the contact replies.
+
+With `settings.INACTIVITY_USE_DEADLINE_INDEX` enabled, both passes only load
+the rooms whose deadline has passed in the index kept by
+`chats.apps.rooms.usecases.inactivity_deadlines`, instead of every eligible
+room.
 """
 
 import logging
@@ -20,6 +25,14 @@ from sentry_sdk import capture_exception
 from chats.apps.msgs.models import AutomaticMessage, AutomaticMessageType, Message
 from chats.apps.rooms.choices import RoomFeedbackMethods
 from chats.apps.rooms.models import Room
+from chats.apps.rooms.usecases.inactivity_deadlines import (
+    CLOSE_DEADLINES_KEY,
+    WARN_DEADLINES_KEY,
+    get_due_room_pks,
+    is_deadline_index_enabled,
+    schedule_rooms,
+    schedule_rooms_on_commit,
+)
 
 if TYPE_CHECKING:
     from chats.apps.accounts.models import User
@@ -154,9 +167,11 @@ class InactivityService:
         now = timezone.now()
         warned = 0
         max_per_run = settings.INACTIVITY_MAX_WARNINGS_PER_RUN
-        chunk_size = settings.INACTIVITY_QUERYSET_CHUNK_SIZE
 
-        for room in _eligible_warn_queryset().iterator(chunk_size=chunk_size):
+        rooms, due_room_pks = self._candidate_rooms(
+            _eligible_warn_queryset(), WARN_DEADLINES_KEY, now, max_per_run
+        )
+        for room in rooms:
             if warned >= max_per_run:
                 logger.info(
                     "[INACTIVITY] reached warn batch limit (%s); "
@@ -181,6 +196,10 @@ class InactivityService:
             if self._warn_room(room, config):
                 warned += 1
 
+        # Warned rooms move to their closure deadline, the others to
+        # their current one (or out of the index)
+        schedule_rooms(due_room_pks)
+
         logger.info("[INACTIVITY] Warned %s rooms", warned)
         return warned
 
@@ -198,9 +217,11 @@ class InactivityService:
         now = timezone.now()
         closed = 0
         max_per_run = settings.INACTIVITY_MAX_CLOSURES_PER_RUN
-        chunk_size = settings.INACTIVITY_QUERYSET_CHUNK_SIZE
 
-        for room in _eligible_close_queryset().iterator(chunk_size=chunk_size):
+        rooms, due_room_pks = self._candidate_rooms(
+            _eligible_close_queryset(), CLOSE_DEADLINES_KEY, now, max_per_run
+        )
+        for room in rooms:
             if closed >= max_per_run:
                 logger.info(
                     "[INACTIVITY] reached close batch limit (%s); "
@@ -226,6 +247,8 @@ class InactivityService:
             if self._close_room(room, config):
                 closed += 1
 
+        schedule_rooms(due_room_pks)
+
         logger.info("[INACTIVITY] Closed %s rooms", closed)
         return closed
 
@@ -243,6 +266,7 @@ class InactivityService:
 
         Room.objects.filter(pk=room.pk, is_active=True).update(is_inactive=False)
         room.is_inactive = False
+        schedule_rooms_on_commit([room.pk])
 
         try:
             room.notify_inactivity()
@@ -255,6 +279,27 @@ class InactivityService:
 
         return True
 
+    def _candidate_rooms(self, queryset, deadlines_key: str, now, limit: int):
+        """
+        Return the rooms of the eligible queryset to check on this run,
+        and the due room pks taken from the deadline index, which must be
+        rescheduled once the run is over.
+
+        Without the index every eligible room is checked. With it, only the
+        rooms due by `now`, at most `limit` of them, are loaded; the caller
+        still re-validates each of them against the current timeouts.
+        """
+        chunk_size = settings.INACTIVITY_QUERYSET_CHUNK_SIZE
+        if not is_deadline_index_enabled():
+            return queryset.iterator(chunk_size=chunk_size), []
+
+        due_room_pks = get_due_room_pks(deadlines_key, now, limit)
+        if not due_room_pks:
+            return [], []
+
+        rooms = queryset.filter(pk__in=due_room_pks).iterator(chunk_size=chunk_size)
+        return rooms, due_room_pks
+
     def _warn_room(self, room: "Room", config: dict) -> bool:
         text = config.get("message_timeout_text") or ""
 
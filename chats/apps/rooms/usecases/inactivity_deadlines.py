@@ -0,0 +1,222 @@
+"""
+Deadline index of the inactivity feature.
+
+Rooms that may be warned (or closed, once warned) are kept in Redis sorted
+sets scored by the timestamp of their next deadline, computed from the room's
+`last_interaction` and its sector's `inactivity_timeout` config. The periodic
+task only loads the rooms whose deadline has passed instead of scanning every
+eligible room.
+
+The index is a hint, never the source of truth: due rooms are re-validated
+against the database before being processed and rescheduled right after, and
+the index is periodically refilled from the database so rooms changed by
+paths that do not schedule themselves (bulk updates, admin edits) are picked
+up as well.
+"""
+
+import logging
+from itertools import islice
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django_redis import get_redis_connection
+
+from chats.apps.rooms.models import Room
+
+logger = logging.getLogger(__name__)
+
+
+WARN_DEADLINES_KEY = "inactivity:warn_deadlines"
+CLOSE_DEADLINES_KEY = "inactivity:close_deadlines"
+RESYNC_CACHE_KEY = "inactivity:deadlines_resync"
+
+ROOM_FIELDS = (
+    "pk",
+    "is_active",
+    "is_inactive",
+    "is_waiting",
+    "user_id",
+    "last_message_user_id",
+    "last_interaction",
+    "queue__sector__inactivity_timeout",
+)
+
+
+def is_deadline_index_enabled() -> bool:
+    return settings.INACTIVITY_USE_DEADLINE_INDEX
+
+
+def compute_deadline(
+    is_inactive: bool, last_interaction, config: Optional[dict]
+) -> Optional[Tuple[str, float]]:
+    """
+    Return the sorted set and the timestamp of the room's next inactivity
+    deadline, or None when the sector config never warns or closes it.
+
+    Mirrors the timeout rules of `InactivityService`: rooms not warned yet
+    are due at `last_interaction + message_timeout_time`, warned rooms at
+    `last_interaction + message_timeout_time + close_room_timeout_time`.
+    """
+    config = config or {}
+    if last_interaction is None:
+        return None
+
+    warn_timeout = config.get("message_timeout_time") or 0
+    if warn_timeout <= 0:
+        return None
+
+    if not is_inactive:
+        if not config.get("is_message_timeout_enabled"):
+            return None
+        return WARN_DEADLINES_KEY, last_interaction.timestamp() + warn_timeout
+
+    close_timeout = config.get("close_room_timeout_time") or 0
+    if not config.get("is_close_room_enabled") or close_timeout <= 0:
+        return None
+    return (
+        CLOSE_DEADLINES_KEY,
+        last_interaction.timestamp() + warn_timeout + close_timeout,
+    )
+
+
+def _schedule_row(pipeline, row) -> None:
+    (
+        room_pk,
+        is_active,
+        is_inactive,
+        is_waiting,
+        user_id,
+        last_message_user_id,
+        last_interaction,
+        config,
+    ) = row
+
+    deadline = None
+    if is_active and not is_waiting and user_id and last_message_user_id:
+        deadline = compute_deadline(is_inactive, last_interaction, config)
+
+    member = str(room_pk)
+    for key in (WARN_DEADLINES_KEY, CLOSE_DEADLINES_KEY):
+        if deadline is not None and deadline[0] == key:
+            pipeline.zadd(key, {member: deadline[1]})
+        else:
+            pipeline.zrem(key, member)
+
+
+def _index_rooms(rooms) -> int:
+    """
+    (Re)schedule the rooms of a queryset, one pipeline per chunk.
+    Returns the number of rooms read.
+    """
+    chunk_size = settings.INACTIVITY_QUERYSET_CHUNK_SIZE
+    rows = rooms.values_list(*ROOM_FIELDS).iterator(chunk_size=chunk_size)
+    redis_connection = get_redis_connection()
+
+    indexed = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return indexed
+
+        with redis_connection.pipeline(transaction=True) as pipeline:
+            for row in chunk:
+                _schedule_row(pipeline, row)
+            pipeline.execute()
+        indexed += len(chunk)
+
+
+def schedule_rooms(room_pks: Iterable) -> None:
+    """
+    Recompute the deadlines of the given rooms from the database.
+    Rooms that no longer exist are dropped from the index.
+    """
+    room_pks = [str(room_pk) for room_pk in room_pks]
+    if not room_pks:
+        return
+
+    with get_redis_connection().pipeline(transaction=True) as pipeline:
+        for key in (WARN_DEADLINES_KEY, CLOSE_DEADLINES_KEY):
+            pipeline.zrem(key, *room_pks)
+        for row in Room.objects.filter(pk__in=room_pks).values_list(*ROOM_FIELDS):
+            _schedule_row(pipeline, row)
+        pipeline.execute()
+
+
+def schedule_rooms_on_commit(room_pks: Iterable) -> None:
+    """
+    Recompute the deadlines of the given rooms once the current
+    transaction is committed, when the deadline index is enabled.
+    """
+    if not is_deadline_index_enabled():
+        return
+
+    room_pks = [str(room_pk) for room_pk in room_pks]
+    if not room_pks:
+        return
+
+    def schedule():
+        try:
+            schedule_rooms(room_pks)
+        except Exception as error:
+            logger.error("[INACTIVITY] Error scheduling rooms deadlines: %s", error)
+
+    transaction.on_commit(schedule)
+
+
+def schedule_sector_rooms(sector_pk) -> int:
+    """
+    Reschedule the open rooms of a sector, e.g. after its inactivity
+    config changed. Returns the number of rooms read.
+    """
+    return _index_rooms(Room.objects.filter(queue__sector=sector_pk, is_active=True))
+
+
+def get_due_room_pks(key: str, now, limit: int) -> List[str]:
+    """
+    Return up to `limit` rooms, earliest first, whose deadline has passed.
+    They stay in the index until the caller reschedules them.
+    """
+    room_pks = get_redis_connection().zrangebyscore(
+        key, "-inf", now.timestamp(), start=0, num=limit
+    )
+    return [room_pk.decode() for room_pk in room_pks]
+
+
+def resync_deadlines() -> int:
+    """
+    Schedule every room the inactivity feature may act on, read straight
+    from the database. Stale entries are left for the periodic task, which
+    drops them once they are due and no longer eligible.
+    Returns the number of rooms read.
+    """
+    rooms = Room.objects.filter(
+        Q(queue__sector__inactivity_timeout__is_message_timeout_enabled=True)
+        | Q(queue__sector__inactivity_timeout__is_close_room_enabled=True),
+        is_active=True,
+        is_waiting=False,
+        user__isnull=False,
+        last_message_user__isnull=False,
+    )
+    return _index_rooms(rooms)
+
+
+def resync_deadlines_if_due() -> Optional[int]:
+    """
+    Run `resync_deadlines` at most once per
+    `settings.INACTIVITY_DEADLINES_RESYNC_INTERVAL` seconds. The first run
+    after the index is enabled fills it.
+    """
+    if not is_deadline_index_enabled():
+        return None
+
+    if not cache.add(
+        RESYNC_CACHE_KEY, True, timeout=settings.INACTIVITY_DEADLINES_RESYNC_INTERVAL
+    ):
+        return None
+
+    indexed = resync_deadlines()
+    logger.info("[INACTIVITY] Resynced deadlines of %s rooms", indexed)
+    return indexed
@@ -0,0 +1,194 @@
+"""
+Write-behind buffer of the room state changed by inbound messages.
+
+With `settings.ROOM_COALESCE_NEW_MESSAGES` enabled, `Room.on_new_message`
+does not update the room row per message. Messages received within
+`settings.ROOM_NEW_MESSAGES_COALESCE_WINDOW` seconds are buffered in Redis,
+per room, and `flush_room_new_messages` applies them at once: the latest
+message sets the `last_message*` fields and `last_interaction` (unless the
+room has a newer interaction, e.g. an agent replied meanwhile), and the
+unread counter is always incremented by the summed delta.
+
+Keys of a room:
+- `{prefix}:messages` : sorted set of `[message_pk, contact_pk]` members
+  scored by the message creation timestamp, so the latest one is kept
+  whatever the order the messages arrive in;
+- `{prefix}:unread`   : summed unread delta;
+- `{prefix}:flush`    : set while a flush is scheduled for the room.
+
+Messages are buffered right away, while the flush is only scheduled once
+the transaction creating them commits. Messages of rolled back
+transactions may still be buffered, so the flush applies the newest
+buffered message that exists.
+"""
+
+import json
+import logging
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+
+KEY_PREFIX_TEMPLATE = "room_new_messages:{room_pk}"
+# Buffered messages survive a lost flush task long enough
+# for the next message of the room to schedule a new one
+BUFFER_TTL = 60 * 60
+
+
+def is_new_messages_coalescing_enabled() -> bool:
+    return settings.ROOM_COALESCE_NEW_MESSAGES
+
+
+def _keys(room_pk) -> tuple:
+    prefix = KEY_PREFIX_TEMPLATE.format(room_pk=room_pk)
+    return f"{prefix}:messages", f"{prefix}:unread", f"{prefix}:flush"
+
+
+def buffer_new_message(room, message, contact=None, increment_unread: int = 0) -> bool:
+    """
+    Buffer an inbound message of the room and, once the transaction
+    commits, schedule its flush unless one is already scheduled. Returns
+    False when the message could not be buffered and the caller must
+    update the room synchronously.
+    """
+    messages_key, unread_key, _ = _keys(room.pk)
+    member = json.dumps(
+        [str(message.pk), str(contact.pk) if contact is not None else None]
+    )
+
+    try:
+        with get_redis_connection().pipeline(transaction=True) as pipeline:
+            pipeline.zadd(messages_key, {member: message.created_on.timestamp()})
+            pipeline.expire(messages_key, BUFFER_TTL)
+            if increment_unread > 0:
+                pipeline.incrby(unread_key, increment_unread)
+                pipeline.expire(unread_key, BUFFER_TTL)
+            pipeline.execute()
+    except Exception as error:
+        logger.error(
+            "[NEW MESSAGES BUFFER] Error buffering message of room %s: %s",
+            room.pk,
+            error,
+        )
+        return False
+
+    room_pk = str(room.pk)
+    transaction.on_commit(lambda: schedule_flush(room_pk))
+    return True
+
+
+def schedule_flush(room_pk: str) -> None:
+    """
+    Schedule the flush of the room, unless one is already scheduled.
+    """
+    from chats.apps.rooms.tasks import flush_room_new_messages
+
+    _, _, flush_key = _keys(room_pk)
+    try:
+        should_schedule = get_redis_connection().set(
+            flush_key, 1, nx=True, ex=settings.ROOM_NEW_MESSAGES_FLUSH_TIMEOUT
+        )
+    except Exception as error:
+        # An extra flush finds an empty buffer, a missing one leaves the
+        # room behind until its next message
+        logger.error(
+            "[NEW MESSAGES BUFFER] Error setting the flush flag of room %s: %s",
+            room_pk,
+            error,
+        )
+        should_schedule = True
+
+    if should_schedule:
+        flush_room_new_messages.apply_async(
+            args=[room_pk], countdown=settings.ROOM_NEW_MESSAGES_COALESCE_WINDOW
+        )
+
+
+def pop_buffered_messages(
+    room_pk,
+) -> Optional[Tuple[List[Tuple[str, Optional[str]]], int]]:
+    """
+    Take the buffered messages of the room, as `(message_pk, contact_pk)`
+    pairs from the latest to the oldest, with the summed unread delta, and
+    clear the buffer. Returns None when nothing is buffered.
+
+    The flush flag is cleared in the same transaction, so messages buffered
+    from now on schedule another flush.
+    """
+    messages_key, unread_key, flush_key = _keys(room_pk)
+    with get_redis_connection().pipeline(transaction=True) as pipeline:
+        pipeline.delete(flush_key)
+        pipeline.zrevrange(messages_key, 0, -1)
+        pipeline.get(unread_key)
+        pipeline.delete(messages_key, unread_key)
+        _, members, unread, _ = pipeline.execute()
+
+    if not members:
+        return None
+
+    return [tuple(json.loads(member)) for member in members], int(unread or 0)
+
+
+def flush_new_messages(room_pk) -> bool:
+    """
+    Apply the buffered messages of the room and notify the room, so
+    websocket clients receive the resulting unread count.
+    Returns False when there was nothing to apply.
+    """
+    from chats.apps.contacts.models import Contact
+    from chats.apps.msgs.models import Message
+    from chats.apps.rooms.models import Room
+
+    buffered = pop_buffered_messages(room_pk)
+    if buffered is None:
+        return False
+
+    members, increment_unread = buffered
+    room = Room.objects.filter(pk=room_pk).first()
+    if room is None:
+        logger.info("[NEW MESSAGES BUFFER] Room %s no longer exists", room_pk)
+        return False
+
+    messages = {
+        str(pk): message
+        for pk, message in Message.objects.filter(
+            pk__in=[message_pk for message_pk, _ in members]
+        )
+        .prefetch_related("medias")
+        .in_bulk()
+        .items()
+    }
+    # The latest messages may have been rolled back after being buffered
+    message, contact_pk = next(
+        (
+            (messages[message_pk], contact_pk)
+            for message_pk, contact_pk in members
+            if message_pk in messages
+        ),
+        (None, None),
+    )
+    if message is None:
+        logger.info(
+            "[NEW MESSAGES BUFFER] No buffered message of room %s exists", room_pk
+        )
+        return False
+
+    contact = Contact.objects.filter(pk=contact_pk).first() if contact_pk else None
+    with transaction.atomic():
+        room.apply_new_message(message, contact=contact)
+        # Not guarded by `last_interaction` as the last message fields are,
+        # so an agent reply within the window doesn't drop the unread count
+        if increment_unread > 0:
+            Room.objects.filter(pk=room.pk).update(
+                unread_messages_count=F("unread_messages_count") + increment_unread
+            )
+
+    room.refresh_from_db()
+    if room.is_active:
+        room.notify_room("update")
+    return True
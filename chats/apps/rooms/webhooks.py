@@ -0,0 +1,366 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+import sentry_sdk
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django_redis import get_redis_connection
+
+from chats.apps.api.v1.prometheus.metrics import (
+    webhook_circuit_opened_total,
+    webhook_deliveries_total,
+    webhook_delivery_seconds,
+)
+
+logger = logging.getLogger(__name__)
+
+
+READY_KEY = "webhooks:ready"
+ROOM_KEY_PREFIX = "webhooks:room:"
+
+DELIVERED = "delivered"
+RETRY = "retry"
+FAILED = "failed"
+
+
+def get_room_key(room_uuid) -> str:
+    return f"{ROOM_KEY_PREFIX}{room_uuid}"
+
+
+def get_room_lock_key(room_uuid) -> str:
+    return f"webhooks:lock:{room_uuid}"
+
+
+def is_webhook_service_enabled() -> bool:
+    return settings.WEBHOOK_DELIVERY_SERVICE
+
+
+def build_callback_body(event_type: str, content) -> str:
+    return json.dumps(
+        {"type": event_type, "content": content},
+        sort_keys=True,
+        indent=1,
+        cls=DjangoJSONEncoder,
+    )
+
+
+def enqueue_callback(room, event_type: str, content) -> bool:
+    """
+    Enqueue a callback to the room's callback_url, delivered by the webhook
+    worker after the callbacks enqueued before it for the same room.
+    Returns False when it could not be enqueued, for the caller to send it
+    instead.
+    """
+    now = time.time()
+    delivery = {
+        "url": room.callback_url,
+        "body": build_callback_body(event_type, content),
+        "project": str(room.queue.sector.project_id) if room.queue_id else "",
+        "room": str(room.pk),
+        "enqueued_at": now,
+        "attempts": 0,
+    }
+
+    try:
+        redis = get_redis_connection()
+        with redis.pipeline() as pipe:
+            pipe.rpush(get_room_key(room.pk), json.dumps(delivery))
+            pipe.zadd(READY_KEY, {str(room.pk): now}, nx=True)
+            pipe.execute()
+    except Exception as error:
+        logger.error(
+            "[WEBHOOKS] Failed to enqueue the %s callback of room %s: %s",
+            event_type,
+            room.pk,
+            error,
+        )
+        sentry_sdk.capture_exception(error)
+        return False
+
+    return True
+
+
+class CircuitBreaker:
+    """
+    Failure counter of each destination (host) of a worker process. After
+    WEBHOOK_CIRCUIT_FAILURE_THRESHOLD consecutive failures, the destination
+    is not called for WEBHOOK_CIRCUIT_OPEN_SECONDS; the first failure after
+    that opens it again, and the first success closes it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._failures: Dict[str, int] = defaultdict(int)
+        self._open_until: Dict[str, float] = {}
+
+    def open_until(self, destination: str) -> Optional[float]:
+        with self._lock:
+            open_until = self._open_until.get(destination)
+        if open_until and open_until > time.time():
+            return open_until
+        return None
+
+    def record_success(self, destination: str) -> None:
+        with self._lock:
+            self._failures.pop(destination, None)
+            self._open_until.pop(destination, None)
+
+    def record_failure(self, destination: str) -> None:
+        with self._lock:
+            self._failures[destination] += 1
+            if self._failures[destination] < settings.WEBHOOK_CIRCUIT_FAILURE_THRESHOLD:
+                return
+            self._open_until[destination] = (
+                time.time() + settings.WEBHOOK_CIRCUIT_OPEN_SECONDS
+            )
+
+        webhook_circuit_opened_total.inc()
+        logger.warning("[WEBHOOKS] Circuit opened for %s", destination)
+
+
+class WebhookWorker:
+    """
+    Delivers the enqueued room callbacks.
+
+    Each room has a Redis list of pending callbacks, and a sorted set holds
+    the rooms with callbacks to deliver, scored by when the first one is
+    due. Rooms are delivered by a pool of WEBHOOK_WORKER_CONCURRENCY
+    threads, one callback at a time per room (under a room lock), so the
+    callbacks of a room arrive in order; a failed callback holds the ones
+    after it until it is delivered, or given up after the
+    WEBHOOK_RETRY_DELAYS schedule.
+
+    At most WEBHOOK_MAX_PER_DESTINATION callbacks are sent at once to each
+    host, and hosts failing repeatedly are paused by a `CircuitBreaker`.
+    Rooms waiting for either are scheduled again instead of holding a
+    thread.
+    """
+
+    def __init__(self, redis_connection=None, session: requests.Session = None):
+        self.redis = redis_connection or get_redis_connection()
+        self.session = session or requests.Session()
+        self.breaker = CircuitBreaker()
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.WEBHOOK_WORKER_CONCURRENCY,
+            thread_name_prefix="webhook",
+        )
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._destinations: Dict[str, int] = defaultdict(int)
+        self._recovered_at = 0.0
+
+    def schedule(self, room_uuid: str, due_at: float) -> None:
+        self.redis.zadd(READY_KEY, {room_uuid: due_at})
+
+    def claim(self, count: int) -> List[str]:
+        """
+        Remove and return up to `count` rooms with a due callback.
+        """
+        now = time.time()
+        due, later = [], {}
+        for member, score in self.redis.zpopmin(READY_KEY, count):
+            room_uuid = member.decode() if isinstance(member, bytes) else member
+            if score <= now:
+                due.append(room_uuid)
+            else:
+                later[room_uuid] = score
+
+        if later:
+            self.redis.zadd(READY_KEY, later)
+        return due
+
+    def recover(self) -> None:
+        """
+        Schedule the rooms with pending callbacks missing from the sorted
+        set, e.g. claimed by a worker that died before delivering them.
+        """
+        now = time.time()
+        with self.redis.pipeline(transaction=False) as pipe:
+            for key in self.redis.scan_iter(match=f"{ROOM_KEY_PREFIX}*", count=1000):
+                key = key.decode() if isinstance(key, bytes) else key
+                room_uuid = key.replace(ROOM_KEY_PREFIX, "", 1)
+                pipe.zadd(READY_KEY, {room_uuid: now}, nx=True)
+            pipe.execute()
+
+    def _acquire_destination(self, destination: str) -> bool:
+        with self._lock:
+            if self._destinations[destination] >= settings.WEBHOOK_MAX_PER_DESTINATION:
+                return False
+            self._destinations[destination] += 1
+            return True
+
+    def _release_destination(self, destination: str) -> None:
+        with self._lock:
+            self._destinations[destination] -= 1
+            if not self._destinations[destination]:
+                del self._destinations[destination]
+
+    def post(self, delivery: dict) -> str:
+        try:
+            response = self.session.post(
+                delivery["url"],
+                data=delivery["body"],
+                headers={"content-type": "application/json"},
+                timeout=settings.CALLBACK_TIMEOUT_SECONDS,
+            )
+        except requests.RequestException as error:
+            delivery["error"] = f"{type(error).__name__}: {str(error)[:200]}"
+            return RETRY
+
+        if response.status_code < 400:
+            return DELIVERED
+
+        delivery["error"] = f"HTTP {response.status_code}: {response.text[:200]}"
+        if response.status_code in settings.CALLBACK_NON_RETRYABLE_STATUS_CODES:
+            return FAILED
+        if (
+            response.status_code in settings.CALLBACK_RETRYABLE_STATUS_CODES
+            or response.status_code >= 500
+        ):
+            return RETRY
+        return FAILED
+
+    def deliver_room(self, room_uuid: str) -> Optional[str]:
+        """
+        Send the first pending callback of the room. Returns its outcome, or
+        None when nothing was sent.
+        """
+        lock_key = get_room_lock_key(room_uuid)
+        if not cache.add(lock_key, True, timeout=settings.WEBHOOK_ROOM_LOCK_SECONDS):
+            # Being delivered by another worker
+            self.schedule(room_uuid, time.time() + settings.WEBHOOK_POLL_INTERVAL)
+            return None
+
+        try:
+            return self._deliver_first(room_uuid)
+        finally:
+            cache.delete(lock_key)
+
+    def _deliver_first(self, room_uuid: str) -> Optional[str]:
+        room_key = get_room_key(room_uuid)
+        raw_delivery = self.redis.lindex(room_key, 0)
+        if raw_delivery is None:
+            # Callbacks enqueued from now on schedule the room again
+            return None
+
+        delivery = json.loads(raw_delivery)
+        destination = urlparse(delivery["url"]).netloc
+        open_until = self.breaker.open_until(destination)
+        if open_until:
+            self.schedule(room_uuid, open_until)
+            return None
+        if not self._acquire_destination(destination):
+            self.schedule(room_uuid, time.time() + settings.WEBHOOK_POLL_INTERVAL)
+            return None
+
+        try:
+            outcome = self.post(delivery)
+        finally:
+            self._release_destination(destination)
+
+        if outcome == RETRY:
+            self.breaker.record_failure(destination)
+        else:
+            self.breaker.record_success(destination)
+
+        if outcome == RETRY:
+            delivery["attempts"] += 1
+            retry_delays = settings.WEBHOOK_RETRY_DELAYS
+            if delivery["attempts"] <= len(retry_delays):
+                webhook_deliveries_total.labels(
+                    project=delivery["project"], result="retried"
+                ).inc()
+                self.redis.lset(room_key, 0, json.dumps(delivery))
+                self.schedule(
+                    room_uuid, time.time() + retry_delays[delivery["attempts"] - 1]
+                )
+                return outcome
+            outcome = FAILED
+
+        with self.redis.pipeline() as pipe:
+            pipe.lpop(room_key)
+            pipe.llen(room_key)
+            _, remaining = pipe.execute()
+        if remaining:
+            self.schedule(room_uuid, time.time())
+
+        webhook_deliveries_total.labels(
+            project=delivery["project"], result=outcome
+        ).inc()
+        if outcome == DELIVERED:
+            webhook_delivery_seconds.labels(project=delivery["project"]).observe(
+                time.time() - delivery["enqueued_at"]
+            )
+        else:
+            self._report_failure(delivery)
+        return outcome
+
+    def _report_failure(self, delivery: dict) -> None:
+        error_msg = (
+            f"[WEBHOOKS] Callback failed - Room ID: {delivery['room']}, "
+            f"{delivery.get('error')}"
+        )
+        logger.error(error_msg)
+        sentry_sdk.capture_message(
+            error_msg,
+            level="error",
+            extras={
+                "room_uuid": delivery["room"],
+                "callback_url": delivery["url"],
+                "attempts": delivery["attempts"],
+            },
+        )
+
+    def _run_delivery(self, room_uuid: str) -> None:
+        try:
+            self.deliver_room(room_uuid)
+        except Exception as error:
+            logger.error(
+                "[WEBHOOKS] Error delivering the callbacks of room %s: %s",
+                room_uuid,
+                error,
+            )
+            sentry_sdk.capture_exception(error)
+            self.schedule(room_uuid, time.time() + settings.WEBHOOK_POLL_INTERVAL)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def dispatch(self) -> int:
+        """
+        Hand the due rooms to the pool, up to its free threads. Returns how
+        many were dispatched.
+        """
+        with self._lock:
+            free = settings.WEBHOOK_WORKER_CONCURRENCY - self._in_flight
+        if free <= 0:
+            return 0
+
+        rooms = self.claim(free)
+        for room_uuid in rooms:
+            with self._lock:
+                self._in_flight += 1
+            self.executor.submit(self._run_delivery, room_uuid)
+        return len(rooms)
+
+    def run_forever(self, should_stop=lambda: False):
+        logger.info("[WEBHOOKS] Worker started")
+
+        while not should_stop():
+            if time.time() - self._recovered_at >= settings.WEBHOOK_RECOVERY_INTERVAL:
+                self._recovered_at = time.time()
+                self.recover()
+
+            if not self.dispatch():
+                time.sleep(settings.WEBHOOK_POLL_INTERVAL)
+
+        self.executor.shutdown(wait=True)
+        logger.info("[WEBHOOKS] Worker stopped")
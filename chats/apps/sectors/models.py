@@ -3,6 +3,7 @@ from datetime import timedelta
 from typing import Optional
 
 import pendulum
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import models, transaction
@@ -100,7 +101,9 @@ class Sector(AuditableMixin, BaseSoftDeleteModel, BaseConfigurableModel, BaseMod
         ),
     )
 
-    tracker = FieldTracker(fields=["rooms_limit", "is_csat_enabled"])
+    tracker = FieldTracker(
+        fields=["rooms_limit", "is_csat_enabled", "inactivity_timeout"]
+    )
 
     objects = SectorManager()
     all_objects = SectorManager(include_deleted=True)
@@ -336,9 +339,21 @@ class Sector(AuditableMixin, BaseSoftDeleteModel, BaseConfigurableModel, BaseMod
 
         is_new = self._state.adding
         is_csat_enabled_has_changed = self.tracker.has_changed("is_csat_enabled")
+        inactivity_timeout_has_changed = not is_new and self.tracker.has_changed(
+            "inactivity_timeout"
+        )
 
         super().save(*args, **kwargs)
 
+        if inactivity_timeout_has_changed and settings.INACTIVITY_USE_DEADLINE_INDEX:
+            # Open rooms must be rescheduled against the new timeouts
+            from chats.apps.rooms.tasks import reschedule_sector_inactivity_deadlines
+
+            sector_pk = str(self.pk)
+            transaction.on_commit(
+                lambda: reschedule_sector_inactivity_deadlines.delay(sector_pk)
+            )
+
         if should_trigger_queue_priority_routing:
             logger.info(
                 "Rooms limit increased for sector %s (%s), triggering queue priority routing",
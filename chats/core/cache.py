@@ -1,7 +1,11 @@
+import asyncio
+import weakref
 from abc import ABC, abstractmethod
 
+from django.conf import settings
 from django_redis import get_redis_connection
-from typing import Optional, Any
+from redis import asyncio as aioredis
+from typing import Optional, Any, Dict, List
 
 
 class BaseCacheClient(ABC):
@@ -19,17 +23,107 @@ class BaseCacheClient(ABC):
 
 
 class CacheClient(BaseCacheClient):
+    """
+    Sync client for Django code, using the connection pool
+    shared with the django-redis cache backend.
+    """
+
     def __init__(self) -> None:
-        pass
+        self._redis_connection = None
+
+    @property
+    def redis_connection(self):
+        if self._redis_connection is None:
+            self._redis_connection = get_redis_connection()
+        return self._redis_connection
 
     def get(self, key: str) -> Optional[Any]:
-        with get_redis_connection() as redis_connection:
-            return redis_connection.get(key)
+        return self.redis_connection.get(key)
 
     def set(self, key: str, value: Any, ex: Optional[int] = None) -> bool:
-        with get_redis_connection() as redis_connection:
-            return redis_connection.set(key, value, ex=ex)
+        return self.redis_connection.set(key, value, ex=ex)
 
     def delete(self, key: str) -> bool:
-        with get_redis_connection() as redis_connection:
-            return redis_connection.delete(key)
+        return self.redis_connection.delete(key)
+
+    def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        if not keys:
+            return []
+        return self.redis_connection.mget(keys)
+
+    def mset(self, mapping: Dict[str, Any], ex: Optional[int] = None) -> bool:
+        if not mapping:
+            return True
+
+        with self.redis_connection.pipeline(transaction=False) as pipeline:
+            for key, value in mapping.items():
+                pipeline.set(key, value, ex=ex)
+            return all(pipeline.execute())
+
+    def pipeline(self, transaction: bool = False):
+        return self.redis_connection.pipeline(transaction=transaction)
+
+
+# Asyncio connections are bound to the event loop that created them,
+# so each loop gets its own pool
+_async_pools = weakref.WeakKeyDictionary()
+
+
+def get_async_connection_pool() -> aioredis.ConnectionPool:
+    loop = asyncio.get_running_loop()
+    pool = _async_pools.get(loop)
+
+    if pool is None:
+        # When every connection is in use, wait for one to be released
+        # instead of failing right away
+        pool = aioredis.BlockingConnectionPool.from_url(
+            settings.CACHES["default"]["LOCATION"],
+            max_connections=settings.ASYNC_REDIS_MAX_CONNECTIONS,
+            timeout=settings.ASYNC_REDIS_POOL_TIMEOUT,
+        )
+        _async_pools[loop] = pool
+
+    return pool
+
+
+class AsyncCacheClient:
+    """
+    Async client for ASGI code (e.g. websocket consumers), backed by
+    redis.asyncio with a connection pool shared by every client
+    running on the same event loop.
+    """
+
+    @property
+    def redis_connection(self) -> aioredis.Redis:
+        return aioredis.Redis(connection_pool=get_async_connection_pool())
+
+    async def get(self, key: str) -> Optional[Any]:
+        return await self.redis_connection.get(key)
+
+    async def set(self, key: str, value: Any, ex: Optional[int] = None) -> bool:
+        return await self.redis_connection.set(key, value, ex=ex)
+
+    async def delete(self, *keys: str) -> int:
+        return await self.redis_connection.delete(*keys)
+
+    async def get_and_delete(self, key: str) -> Optional[Any]:
+        async with self.pipeline(transaction=True) as pipeline:
+            value, _ = await pipeline.get(key).delete(key).execute()
+        return value
+
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        if not keys:
+            return []
+        return await self.redis_connection.mget(keys)
+
+    async def mset(self, mapping: Dict[str, Any], ex: Optional[int] = None) -> bool:
+        if not mapping:
+            return True
+
+        async with self.pipeline() as pipeline:
+            for key, value in mapping.items():
+                pipeline.set(key, value, ex=ex)
+            return all(await pipeline.execute())
+
+    def pipeline(self, transaction: bool = False):
+        return self.redis_connection.pipeline(transaction=transaction)
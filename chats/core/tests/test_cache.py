@@ -0,0 +1,110 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+
+from chats.core.cache import (
+    AsyncCacheClient,
+    CacheClient,
+    aioredis,
+    get_async_connection_pool,
+)
+
+
+class CacheClientTestCase(TestCase):
+    @patch("chats.core.cache.get_redis_connection")
+    def test_connection_is_checked_out_once(self, mock_get_redis_connection):
+        client = CacheClient()
+
+        client.set("key", "value", ex=10)
+        client.get("key")
+        client.delete("key")
+
+        mock_get_redis_connection.assert_called_once()
+        redis_connection = mock_get_redis_connection.return_value
+        redis_connection.set.assert_called_once_with("key", "value", ex=10)
+        redis_connection.get.assert_called_once_with("key")
+        redis_connection.delete.assert_called_once_with("key")
+
+    @patch("chats.core.cache.get_redis_connection")
+    def test_mset_uses_a_single_pipeline(self, mock_get_redis_connection):
+        pipeline = MagicMock()
+        pipeline.execute.return_value = [True, True]
+        mock_get_redis_connection.return_value.pipeline.return_value.__enter__.return_value = (
+            pipeline
+        )
+
+        self.assertTrue(CacheClient().mset({"key_1": "1", "key_2": "2"}, ex=10))
+
+        self.assertEqual(pipeline.set.call_count, 2)
+        pipeline.execute.assert_called_once()
+
+    @patch("chats.core.cache.get_redis_connection")
+    def test_empty_batches_do_not_hit_redis(self, mock_get_redis_connection):
+        client = CacheClient()
+
+        self.assertEqual(client.mget([]), [])
+        self.assertTrue(client.mset({}))
+        mock_get_redis_connection.assert_not_called()
+
+
+class AsyncCacheClientTestCase(TestCase):
+    def setUp(self):
+        self.redis_connection = MagicMock()
+        patcher = patch.object(
+            AsyncCacheClient,
+            "redis_connection",
+            new=self.redis_connection,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = AsyncCacheClient()
+
+    def test_get_and_set(self):
+        self.redis_connection.get = AsyncMock(return_value=b"value")
+        self.redis_connection.set = AsyncMock(return_value=True)
+
+        self.assertTrue(async_to_sync(self.client.set)("key", "value", ex=10))
+        self.assertEqual(async_to_sync(self.client.get)("key"), b"value")
+
+        self.redis_connection.set.assert_awaited_once_with("key", "value", ex=10)
+
+    def test_mget(self):
+        self.redis_connection.mget = AsyncMock(return_value=[b"1", None])
+
+        self.assertEqual(
+            async_to_sync(self.client.mget)(["key_1", "key_2"]), [b"1", None]
+        )
+        self.assertEqual(async_to_sync(self.client.mget)([]), [])
+        self.redis_connection.mget.assert_awaited_once_with(["key_1", "key_2"])
+
+    def test_get_and_delete_uses_one_round_trip(self):
+        pipeline = MagicMock()
+        pipeline.get.return_value = pipeline
+        pipeline.delete.return_value = pipeline
+        pipeline.execute = AsyncMock(return_value=[b"True", 1])
+        self.redis_connection.pipeline.return_value.__aenter__ = AsyncMock(
+            return_value=pipeline
+        )
+        self.redis_connection.pipeline.return_value.__aexit__ = AsyncMock(
+            return_value=False
+        )
+
+        self.assertEqual(async_to_sync(self.client.get_and_delete)("key"), b"True")
+
+        self.redis_connection.pipeline.assert_called_once_with(transaction=True)
+        pipeline.execute.assert_awaited_once()
+
+
+class AsyncConnectionPoolTestCase(TestCase):
+    @override_settings(ASYNC_REDIS_MAX_CONNECTIONS=2, ASYNC_REDIS_POOL_TIMEOUT=0.5)
+    def test_pool_waits_for_free_connections(self):
+        async def get_pools():
+            return get_async_connection_pool(), get_async_connection_pool()
+
+        pool, same_pool = async_to_sync(get_pools)()
+
+        self.assertIs(pool, same_pool)
+        self.assertIsInstance(pool, aioredis.BlockingConnectionPool)
+        self.assertEqual(pool.max_connections, 2)
+        self.assertEqual(pool.timeout, 0.5)
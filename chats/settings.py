@@ -102,6 +102,7 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "chats.core.middleware.InternalErrorHandlerMiddleware",
+    "chats.apps.feature_flags.middleware.FeatureFlagsScopeMiddleware",
     "django_prometheus.middleware.PrometheusAfterMiddleware",
 ]
 
@@ -148,6 +149,11 @@ CACHES = {
     }
 }
 
+# Connections of each event loop pool used by chats.core.cache.AsyncCacheClient
+ASYNC_REDIS_MAX_CONNECTIONS = env.int("ASYNC_REDIS_MAX_CONNECTIONS", default=50)
+# Seconds to wait for a free connection of the pool before raising
+ASYNC_REDIS_POOL_TIMEOUT = env.float("ASYNC_REDIS_POOL_TIMEOUT", default=5.0)
+
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
 
@@ -330,6 +336,10 @@ BULK_SEND_STALE_FINISH_MINUTES = env.int(
     "BULK_SEND_STALE_FINISH_MINUTES",
     default=30,
 )
+# Send bulk messages to chunks of BULK_SEND_CHUNK_SIZE rooms per task,
+# instead of one task per room
+BULK_SEND_CHUNKED = env.bool("BULK_SEND_CHUNKED", default=False)
+BULK_SEND_CHUNK_SIZE = env.int("BULK_SEND_CHUNK_SIZE", default=500)
 
 # Logging
 
@@ -550,6 +560,17 @@ INACTIVITY_MAX_CLOSURES_PER_RUN = env.int(
 )
 INACTIVITY_QUERYSET_CHUNK_SIZE = env.int("INACTIVITY_QUERYSET_CHUNK_SIZE", default=200)
 
+# Keep each room's next warn/close deadline in Redis sorted sets, so the
+# inactivity task only loads the rooms that are due instead of scanning every
+# eligible room. The index is refilled from the database every
+# INACTIVITY_DEADLINES_RESYNC_INTERVAL seconds.
+INACTIVITY_USE_DEADLINE_INDEX = env.bool(
+    "INACTIVITY_USE_DEADLINE_INDEX", default=False
+)
+INACTIVITY_DEADLINES_RESYNC_INTERVAL = env.int(
+    "INACTIVITY_DEADLINES_RESYNC_INTERVAL", default=900
+)
+
 # Distributed lock used by `check_inactivity_rooms` to guarantee only one
 # instance of the task runs at a time, even if a previous run overlaps the
 # 1-minute schedule.
@@ -583,6 +604,7 @@ RISK_ALERT_CELERY_QUEUE = env.str("RISK_ALERT_CELERY_QUEUE", default="celery")
 
 CELERY_TASK_ROUTES = {
     "check_inactivity_rooms": {"queue": INACTIVITY_CELERY_QUEUE},
+    "reschedule_sector_inactivity_deadlines": {"queue": INACTIVITY_CELERY_QUEUE},
     "check_metric_goal_violations": {"queue": RISK_ALERT_CELERY_QUEUE},
     "send_metric_goal_email": {"queue": RISK_ALERT_CELERY_QUEUE},
 }
@@ -622,6 +644,18 @@ CELERY_BEAT_SCHEDULE = {
         "task": "finish_stale_bulk_message_sends",
         "schedule": FINISH_STALE_BULK_SENDS_SCHEDULE_SECONDS,
     },
+    "update-dashboard-rollups": {
+        "task": "update_dashboard_rollups",
+        "schedule": env.float("DASHBOARD_ROLLUPS_SCHEDULE_SECONDS", default=300.0),
+    },
+    "flush-last-seen-heartbeats": {
+        "task": "flush_last_seen_heartbeats",
+        "schedule": env.float("WS_LAST_SEEN_FLUSH_INTERVAL_SECONDS", default=15.0),
+    },
+    "flush-message-statuses": {
+        "task": "flush_message_statuses",
+        "schedule": env.float("MESSAGE_STATUS_FLUSH_INTERVAL_SECONDS", default=2.0),
+    },
 }
 
 METRIC_GOAL_STATE_TTL_SECONDS = env.int(
@@ -642,6 +676,9 @@ REPORTS_SAVE_DIR = env.str(
 )
 REPORTS_CHUNK_SIZE = env.int("REPORTS_CHUNK_SIZE", default=5000)
 REPORTS_SAVE_LOCALLY = env.bool("REPORTS_SAVE_LOCALLY", default=False)
+# Trace allocations while generating reports to record their peak memory,
+# slows the report generation down
+REPORTS_TRACK_PEAK_MEMORY = env.bool("REPORTS_TRACK_PEAK_MEMORY", default=False)
 
 # celery beat
 CELERY_TASK_TRACK_STARTED = True
@@ -663,6 +700,35 @@ if USE_EDA:
     EDA_BROKER_USER = env("EDA_BROKER_USER", default="guest")
     EDA_BROKER_PASSWORD = env("EDA_BROKER_PASSWORD", default="guest")
     EDA_WAIT_TIME_RETRY = env.int("EDA_WAIT_TIME_RETRY", default=5)
+    # Publish through a per-process publisher with long-lived connections
+    # and batched publisher confirms, see chats.apps.event_driven.publisher
+    EDA_USE_PUBLISHER = env.bool("EDA_USE_PUBLISHER", default=False)
+    # How long (in seconds) publishing may block the caller
+    EDA_PUBLISH_TIMEOUT = env.float("EDA_PUBLISH_TIMEOUT", default=2.0)
+    EDA_PUBLISHER_CONNECTIONS = env.int("EDA_PUBLISHER_CONNECTIONS", default=1)
+    EDA_PUBLISHER_MAX_PENDING = env.int("EDA_PUBLISHER_MAX_PENDING", default=10000)
+    EDA_PUBLISHER_BATCH_SIZE = env.int("EDA_PUBLISHER_BATCH_SIZE", default=100)
+    EDA_PUBLISHER_CONFIRM_TIMEOUT = env.float(
+        "EDA_PUBLISHER_CONFIRM_TIMEOUT", default=10.0
+    )
+    EDA_PUBLISHER_MAX_RETRIES = env.int("EDA_PUBLISHER_MAX_RETRIES", default=3)
+    EDA_PUBLISHER_SPOOL_DIR = env.str(
+        "EDA_PUBLISHER_SPOOL_DIR", default=str(BASE_DIR / "eda_spool")
+    )
+    # How often (in seconds) connected workers publish the spool again
+    EDA_PUBLISHER_SPOOL_REPLAY_INTERVAL = env.float(
+        "EDA_PUBLISHER_SPOOL_REPLAY_INTERVAL", default=60.0
+    )
+    # Process the consumed messages in a pool of worker threads (0 processes
+    # them inline), see chats.apps.event_driven.runtime
+    EDA_CONSUMER_WORKERS = env.int("EDA_CONSUMER_WORKERS", default=0)
+    # Prefetch per queue, e.g. "chats.permissions=100,chats.msgs-status=200"
+    EDA_CONSUMER_PREFETCH = env.dict(
+        "EDA_CONSUMER_PREFETCH", cast={"value": int}, default={}
+    )
+    EDA_CONSUMER_DEFAULT_PREFETCH = env.int("EDA_CONSUMER_DEFAULT_PREFETCH", default=20)
+    EDA_CONSUMER_ACK_INTERVAL = env.float("EDA_CONSUMER_ACK_INTERVAL", default=0.2)
+    EDA_CONSUMER_DEPTH_INTERVAL = env.float("EDA_CONSUMER_DEPTH_INTERVAL", default=30)
 
     FLOWS_TICKETER_EXCHANGE = env("FLOWS_TICKETER_EXCHANGE", default="sectors.topic")
     FLOWS_QUEUE_EXCHANGE = env("FLOWS_QUEUE_EXCHANGE", default="queues.topic")
@@ -687,6 +753,22 @@ if USE_EDA:
 WS_MESSAGE_RETRIES = env.int("WS_MESSAGE_RETRIES", default=5)
 WEBSOCKET_RETRY_SLEEP = env.int("WEBSOCKET_RETRY_SLEEP", default=0.5)
 USE_WS_CONNECTION_CHECK = env.bool("USE_WS_CONNECTION_CHECK", default=False)
+USE_WS_NOTIFICATION_OUTBOX = env.bool("USE_WS_NOTIFICATION_OUTBOX", default=False)
+ROOM_SERIALIZED_WS_DATA_CACHE = env.bool("ROOM_SERIALIZED_WS_DATA_CACHE", default=False)
+# Buffer the room updates of inbound messages in Redis and apply the ones
+# received within the window (in seconds) with a single UPDATE
+ROOM_COALESCE_NEW_MESSAGES = env.bool("ROOM_COALESCE_NEW_MESSAGES", default=False)
+ROOM_NEW_MESSAGES_COALESCE_WINDOW = env.float(
+    "ROOM_NEW_MESSAGES_COALESCE_WINDOW", default=1.0
+)
+# How long a scheduled flush blocks new ones, should its task be lost
+ROOM_NEW_MESSAGES_FLUSH_TIMEOUT = env.int(
+    "ROOM_NEW_MESSAGES_FLUSH_TIMEOUT", default=30
+)
+USE_WS_BACKGROUND_SENDER = env.bool("USE_WS_BACKGROUND_SENDER", default=False)
+WEBSOCKET_RETRY_MAX_SLEEP = env.float("WEBSOCKET_RETRY_MAX_SLEEP", default=8)
+WS_SENDER_MAX_PENDING = env.int("WS_SENDER_MAX_PENDING", default=10000)
+WS_SENDER_SHUTDOWN_TIMEOUT = env.float("WS_SENDER_SHUTDOWN_TIMEOUT", default=5)
 
 # CLOSE ROOM RETRY
 MAX_RETRIES = env.int("WS_MESSAGE_RETRIES", default=3)
@@ -706,6 +788,23 @@ CALLBACK_NON_RETRYABLE_STATUS_CODES = env.list(
 CALLBACK_RETRY_COUNT = env.int("CALLBACK_RETRY_COUNT", default=5)
 CALLBACK_RETRY_BACKOFF_FACTOR = env.float("CALLBACK_RETRY_BACKOFF_FACTOR", default=0.5)
 CALLBACK_TIMEOUT_SECONDS = env.int("CALLBACK_TIMEOUT_SECONDS", default=30)
+# Enqueue the room and message callbacks in Redis, delivered by the
+# `webhook_worker` command, instead of sending them within the request
+WEBHOOK_DELIVERY_SERVICE = env.bool("WEBHOOK_DELIVERY_SERVICE", default=False)
+WEBHOOK_WORKER_CONCURRENCY = env.int("WEBHOOK_WORKER_CONCURRENCY", default=50)
+WEBHOOK_MAX_PER_DESTINATION = env.int("WEBHOOK_MAX_PER_DESTINATION", default=5)
+# Seconds to wait before each retry of a failed callback
+WEBHOOK_RETRY_DELAYS = env.list(
+    "WEBHOOK_RETRY_DELAYS", default=[1, 5, 30, 120, 600], cast=float
+)
+WEBHOOK_CIRCUIT_FAILURE_THRESHOLD = env.int(
+    "WEBHOOK_CIRCUIT_FAILURE_THRESHOLD", default=10
+)
+WEBHOOK_CIRCUIT_OPEN_SECONDS = env.float("WEBHOOK_CIRCUIT_OPEN_SECONDS", default=30)
+# Must be longer than CALLBACK_TIMEOUT_SECONDS
+WEBHOOK_ROOM_LOCK_SECONDS = env.int("WEBHOOK_ROOM_LOCK_SECONDS", default=60)
+WEBHOOK_POLL_INTERVAL = env.float("WEBHOOK_POLL_INTERVAL", default=0.5)
+WEBHOOK_RECOVERY_INTERVAL = env.float("WEBHOOK_RECOVERY_INTERVAL", default=300)
 
 # Email
 
@@ -764,6 +863,10 @@ BULK_TRANSFER_MAX_ROOMS = env.int("BULK_TRANSFER_MAX_ROOMS", default=200)
 # Message Status Consumer Settings
 MESSAGE_STATUS_MAX_RETRIES = env.int("MESSAGE_STATUS_MAX_RETRIES", default=3)
 MESSAGE_STATUS_RETRY_DELAY = env.int("MESSAGE_STATUS_RETRY_DELAY", default=2)
+# Queue the statuses in Redis and apply them in batches (see
+# "flush-message-statuses") instead of one Celery task per status
+MESSAGE_STATUS_BATCHING = env.bool("MESSAGE_STATUS_BATCHING", default=False)
+MESSAGE_STATUS_BATCH_SIZE = env.int("MESSAGE_STATUS_BATCH_SIZE", default=500)
 
 # Agent WebSocket message create idempotency (request_id)
 AGENT_MESSAGE_CREATE_REQUEST_ID_CACHE_TTL = env.int(
@@ -794,6 +897,13 @@ GROWTHBOOK_LONG_CACHE_TTL = env.int(
 )  # 30 days
 GROWTHBOOK_WEBHOOK_SECRET = env.str("GROWTHBOOK_WEBHOOK_SECRET", default="")
 
+# Feature flags evaluations cache
+# 0 disables the process-local cache (request/task scoped caching still applies)
+FEATURE_FLAGS_LOCAL_CACHE_TTL = env.int("FEATURE_FLAGS_LOCAL_CACHE_TTL", default=30)
+FEATURE_FLAGS_GENERATION_CHECK_INTERVAL = env.int(
+    "FEATURE_FLAGS_GENERATION_CHECK_INTERVAL", default=5
+)
+
 
 # Feature flags
 FEEDBACK_FEATURE_FLAG_KEY = env.str(
@@ -808,6 +918,20 @@ WS_LAST_SEEN_UPDATE_INTERVAL_SECONDS = env.int(
     "WS_LAST_SEEN_UPDATE_INTERVAL_SECONDS", default=60
 )
 WS_LAST_SEEN_THRESHOLD_SECONDS = env.int("WS_LAST_SEEN_THRESHOLD_SECONDS", default=90)
+# Record the agents heartbeats in Redis, read by the online agents checks,
+# and write them to `last_seen` in bulk (see "flush-last-seen-heartbeats")
+WS_LAST_SEEN_HEARTBEAT_INDEX = env.bool("WS_LAST_SEEN_HEARTBEAT_INDEX", default=False)
+WS_LAST_SEEN_FLUSH_BATCH_SIZE = env.int("WS_LAST_SEEN_FLUSH_BATCH_SIZE", default=1000)
+# Load the agent connection, and set agents offline, with one database call
+# each, running at most WS_AGENT_LIFECYCLE_MAX_CONCURRENCY of them at a time.
+# Connects that wait longer than the timeout (in seconds) are refused.
+WS_AGENT_LIFECYCLE_SERVICE = env.bool("WS_AGENT_LIFECYCLE_SERVICE", default=False)
+WS_AGENT_LIFECYCLE_MAX_CONCURRENCY = env.int(
+    "WS_AGENT_LIFECYCLE_MAX_CONCURRENCY", default=50
+)
+WS_AGENT_LIFECYCLE_ACQUIRE_TIMEOUT = env.float(
+    "WS_AGENT_LIFECYCLE_ACQUIRE_TIMEOUT", default=5
+)
 
 # CSAT
 CUSTOM_CSAT_FLOW_FEATURE_FLAG_KEY = env.str(
@@ -911,11 +1035,25 @@ ARCHIVE_CHATS_BATCH_SIZE = env.int("ARCHIVE_CHATS_BATCH_SIZE", default=500)
 ARCHIVE_CHATS_BULK_CREATE_PENDING_BATCH_SIZE = env.int(
     "ARCHIVE_CHATS_BULK_CREATE_PENDING_BATCH_SIZE", default=2000
 )
+# Archive several rooms per task, claiming them, reading their messages and
+# deleting them with a few statements per batch of rooms
+ARCHIVE_CHATS_USE_MULTI_ROOM_TASKS = env.bool(
+    "ARCHIVE_CHATS_USE_MULTI_ROOM_TASKS", default=False
+)
+ARCHIVE_CHATS_ROOMS_PER_TASK = env.int("ARCHIVE_CHATS_ROOMS_PER_TASK", default=100)
+ARCHIVE_CHATS_MESSAGES_DELETE_BATCH_SIZE = env.int(
+    "ARCHIVE_CHATS_MESSAGES_DELETE_BATCH_SIZE", default=1000
+)
 # Page size for keyset-paginated message iteration during archive.
 # Keeps peak memory bounded to one page of messages + their medias.
 ARCHIVE_CHATS_MESSAGE_PAGE_SIZE = env.int(
     "ARCHIVE_CHATS_MESSAGE_PAGE_SIZE", default=500
 )
+# Upload archived conversations as gzip compressed JSONL (messages.jsonl.gz)
+ARCHIVE_CHATS_COMPRESS_MESSAGES_FILE = env.bool(
+    "ARCHIVE_CHATS_COMPRESS_MESSAGES_FILE", default=False
+)
+ARCHIVE_CHATS_COMPRESSION_LEVEL = env.int("ARCHIVE_CHATS_COMPRESSION_LEVEL", default=6)
 # Soft-lock threshold used by ArchiveChatsService to decide whether an
 # in-progress RoomArchivedConversation is still being processed by another
 # worker or stale enough to be reclaimed.
@@ -980,6 +1118,24 @@ METRIC_GOAL_ALERTS_FEATURE_FLAG_CACHE_TTL = env.int(
     default=30,
 )
 
+# Maintain the room response time as messages are created, instead of
+# rescanning every message of the room when it is closed.
+# Run the backfill_room_response_time command after enabling it, with --all
+# when re-enabling it, as tracked rooms are not updated while it is disabled.
+# Message writes of a room wait on the lock of its metrics row.
+ROOM_METRICS_INCREMENTAL_RESPONSE_TIME = env.bool(
+    "ROOM_METRICS_INCREMENTAL_RESPONSE_TIME", default=False
+)
+
+# Serve historical dashboard windows from hourly room rollups, maintained
+# by the update_dashboard_rollups task.
+# Run the backfill_dashboard_rollups command to cover past dates.
+DASHBOARD_ROLLUPS_ENABLED = env.bool("DASHBOARD_ROLLUPS_ENABLED", default=False)
+# Caps the hours rolled up per run, e.g. after the task was down for a while
+DASHBOARD_ROLLUPS_MAX_BUCKETS_PER_RUN = env.int(
+    "DASHBOARD_ROLLUPS_MAX_BUCKETS_PER_RUN", default=24
+)
+
 IMPROVE_USER_MESSAGE_FEATURE_PROMPT_CACHE_TTL = env.int(
     "IMPROVE_USER_MESSAGE_FEATURE_PROMPT_CACHE_TTL", default=30
 )
@@ -994,6 +1150,39 @@ ROUTE_QUEUE_COOLDOWN_RETRY_DELAY = env.int(
     default=2,
 )
 
+# Queue routing capacity ledger
+QUEUE_ROUTING_CAPACITY_LEDGER_FEATURE_FLAG_KEY = env.str(
+    "QUEUE_ROUTING_CAPACITY_LEDGER_FEATURE_FLAG_KEY",
+    default="weniChatsQueueRoutingCapacityLedger",
+)
+# Number of assignments after which the ledger is reloaded from the database
+QUEUE_ROUTING_LEDGER_REVALIDATION_BATCH_SIZE = env.int(
+    "QUEUE_ROUTING_LEDGER_REVALIDATION_BATCH_SIZE",
+    default=50,
+)
+# Bulk room assignment (requires the capacity ledger)
+QUEUE_ROUTING_BULK_ASSIGNMENT_FEATURE_FLAG_KEY = env.str(
+    "QUEUE_ROUTING_BULK_ASSIGNMENT_FEATURE_FLAG_KEY",
+    default="weniChatsQueueRoutingBulkAssignment",
+)
+QUEUE_ROUTING_BULK_ASSIGNMENT_BATCH_SIZE = env.int(
+    "QUEUE_ROUTING_BULK_ASSIGNMENT_BATCH_SIZE",
+    default=100,
+)
+
+# Routing scheduler
+# When enabled, routing triggers are coalesced per sector in Redis and
+# drained by the `routing_scheduler` management command worker,
+# instead of dispatching one Celery task per trigger.
+USE_ROUTING_SCHEDULER = env.bool("USE_ROUTING_SCHEDULER", default=False)
+ROUTING_SCHEDULER_KEY = env.str(
+    "ROUTING_SCHEDULER_KEY", default="routing_scheduler:pending_sectors"
+)
+ROUTING_SCHEDULER_BATCH_SIZE = env.int("ROUTING_SCHEDULER_BATCH_SIZE", default=50)
+ROUTING_SCHEDULER_POLL_INTERVAL = env.float(
+    "ROUTING_SCHEDULER_POLL_INTERVAL", default=0.5
+)
+
 
 # Meta
 META_GRAPH_API_BASE_HOST_URL = env.str(
@@ -1,12 +1,54 @@
+import asyncio
+import contextvars
 import json
+import logging
 import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from django.conf import settings
 from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
 from sentry_sdk import capture_exception
 
+from chats.apps.api.v1.prometheus.metrics import (
+    ws_outbox_events_deduplicated_total,
+    ws_outbox_events_enqueued_total,
+    ws_outbox_flush_seconds,
+)
+from chats.utils.ws_sender import get_background_sender
+
+if TYPE_CHECKING:
+    from chats.apps.rooms.models import Room
+
+
+logger = logging.getLogger(__name__)
+
+
+def _build_message(call_type: str, content, action: str, encoded: bool = False):
+    return {
+        "type": call_type,
+        "action": action,
+        "content": content if encoded else json.dumps(content, cls=DjangoJSONEncoder),
+    }
+
+
+def _group_send(group_name: str, message: dict, retry=settings.WS_MESSAGE_RETRIES):
+    if settings.USE_WS_BACKGROUND_SENDER:
+        get_background_sender().submit(group_name, message)
+        return
+
+    try:
+        channel_layer = get_channel_layer()
+        async_to_sync(channel_layer.group_send)(group_name, message)
+    except Exception as err:
+        if retry > 0:
+            time.sleep(settings.WEBSOCKET_RETRY_SLEEP)
+            return _group_send(group_name, message, retry - 1)
+        capture_exception(err)
+
 
 def send_channels_group(
     group_name: str,
@@ -16,22 +58,149 @@ def send_channels_group(
     retry=settings.WS_MESSAGE_RETRIES,
 ):
     """
-    helper function that sends data to channels groups
+    helper function that sends data to channels groups,
+    or enqueues it when a notification outbox is active
     """
-    try:
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            group_name,
-            {
-                "type": call_type,
-                "action": action,
-                "content": json.dumps(content, cls=DjangoJSONEncoder),
-            },
+    outbox = get_notification_outbox()
+    if outbox is not None:
+        outbox.add(group_name, call_type, content, action)
+        return
+
+    _group_send(group_name, _build_message(call_type, content, action), retry)
+
+
+class NotificationOutbox:
+    """
+    Collects channels group sends to deliver them together.
+
+    Identical events (same group, type, action and content) are sent once,
+    rooms added with `add_room` are serialized once when the outbox is
+    flushed, no matter how many groups they are sent to, and all group
+    sends are awaited concurrently in a single event loop pass.
+    """
+
+    def __init__(self):
+        # Insertion ordered, keyed by the dedupe key of each event
+        self._events: Dict[Tuple, Tuple] = {}
+
+    def __len__(self):
+        return len(self._events)
+
+    def _enqueue(self, key: Tuple, event: Tuple):
+        ws_outbox_events_enqueued_total.inc()
+        if key in self._events:
+            ws_outbox_events_deduplicated_total.inc()
+            return
+        self._events[key] = event
+
+    def add(self, group_name: str, call_type: str, content, action: str):
+        encoded_content = json.dumps(content, cls=DjangoJSONEncoder)
+        self._enqueue(
+            (group_name, call_type, action, encoded_content),
+            (group_name, call_type, action, encoded_content, None),
         )
-    except Exception as err:
-        if retry > 0:
-            time.sleep(settings.WEBSOCKET_RETRY_SLEEP)
-            return send_channels_group(
-                group_name, call_type, content, action, retry - 1
+
+    def add_room(
+        self,
+        group_name: str,
+        room: "Room",
+        action: str,
+        transferred_by: str = "",
+        call_type: str = "notify",
+    ):
+        self._enqueue(
+            (group_name, call_type, action, "room", room.pk, transferred_by),
+            (group_name, call_type, action, None, (room, transferred_by)),
+        )
+
+    def _build_messages(self) -> List[Tuple[str, dict]]:
+        serialized_rooms = {}
+        messages = []
+
+        for group_name, call_type, action, content, room_data in self._events.values():
+            if room_data is not None:
+                room, transferred_by = room_data
+                cache_key = (room.pk, transferred_by)
+
+                if cache_key not in serialized_rooms:
+                    room_content = room.serialized_ws_data
+                    if transferred_by != "":
+                        room_content["transferred_by"] = transferred_by
+                    serialized_rooms[cache_key] = json.dumps(
+                        room_content, cls=DjangoJSONEncoder
+                    )
+                content = serialized_rooms[cache_key]
+
+            messages.append(
+                (group_name, _build_message(call_type, content, action, encoded=True))
             )
-        capture_exception(err)
+
+        return messages
+
+    def flush(self):
+        if not self._events:
+            return
+
+        start = time.perf_counter()
+        messages = self._build_messages()
+        self._events = {}
+
+        if settings.USE_WS_BACKGROUND_SENDER:
+            sender = get_background_sender()
+            for group_name, message in messages:
+                sender.submit(group_name, message)
+            ws_outbox_flush_seconds.observe(time.perf_counter() - start)
+            return
+
+        try:
+            results = async_to_sync(_group_send_many)(messages)
+        except Exception as error:
+            logger.warning("[WS OUTBOX] Concurrent flush failed: %s", error)
+            results = [error] * len(messages)
+
+        # Failed sends fall back to the retrying single send
+        for (group_name, message), result in zip(messages, results):
+            if isinstance(result, Exception):
+                _group_send(group_name, message)
+
+        ws_outbox_flush_seconds.observe(time.perf_counter() - start)
+
+
+async def _group_send_many(messages: List[Tuple[str, dict]]):
+    channel_layer = get_channel_layer()
+    return await asyncio.gather(
+        *[
+            channel_layer.group_send(group_name, message)
+            for group_name, message in messages
+        ],
+        return_exceptions=True,
+    )
+
+
+_notification_outbox: contextvars.ContextVar[
+    Optional[NotificationOutbox]
+] = contextvars.ContextVar("notification_outbox", default=None)
+
+
+def get_notification_outbox() -> Optional[NotificationOutbox]:
+    return _notification_outbox.get()
+
+
+@contextmanager
+def notification_outbox():
+    """
+    Buffer every channels group send made inside the block and flush them
+    once the current transaction commits (or right away, outside of one).
+    Nested blocks reuse the outermost outbox.
+    """
+    if not settings.USE_WS_NOTIFICATION_OUTBOX or get_notification_outbox() is not None:
+        yield
+        return
+
+    outbox = NotificationOutbox()
+    token = _notification_outbox.set(outbox)
+    try:
+        yield
+    finally:
+        _notification_outbox.reset(token)
+        transaction.on_commit(outbox.flush)
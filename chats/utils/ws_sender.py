@@ -0,0 +1,184 @@
+import asyncio
+import atexit
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from sentry_sdk import capture_exception
+
+from chats.apps.api.v1.prometheus.metrics import (
+    ws_sender_dropped_total,
+    ws_sender_pending,
+    ws_sender_retries_total,
+    ws_sender_sent_total,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def get_retry_delay(attempt: int) -> float:
+    """
+    Exponential backoff starting at WEBSOCKET_RETRY_SLEEP,
+    capped at WEBSOCKET_RETRY_MAX_SLEEP seconds.
+    """
+    return min(
+        settings.WEBSOCKET_RETRY_SLEEP * (2**attempt),
+        settings.WEBSOCKET_RETRY_MAX_SLEEP,
+    )
+
+
+async def async_group_send(
+    group_name: str,
+    message: dict,
+    retries: int = None,
+    channel_layer=None,
+) -> bool:
+    """
+    Send a message to a channels group from async code, retrying failures
+    with exponential backoff without blocking the event loop.
+    Returns False when every attempt failed.
+    """
+    retries = settings.WS_MESSAGE_RETRIES if retries is None else retries
+    channel_layer = channel_layer or get_channel_layer()
+
+    for attempt in range(retries + 1):
+        try:
+            await channel_layer.group_send(group_name, message)
+            return True
+        except Exception as error:
+            if attempt >= retries:
+                capture_exception(error)
+                return False
+
+            ws_sender_retries_total.inc()
+            await asyncio.sleep(get_retry_delay(attempt))
+
+    return False
+
+
+class BackgroundWebsocketSender:
+    """
+    Delivers channels group messages from a daemon thread running its own
+    event loop, so sync code (gunicorn workers, Celery tasks) does not block
+    while the channel layer is slow or unavailable.
+
+    At most WS_SENDER_MAX_PENDING messages, including the ones waiting for a
+    retry, are held at once; messages submitted above that are dropped.
+    """
+
+    def __init__(self, max_pending: int = None):
+        self.max_pending = max_pending or settings.WS_SENDER_MAX_PENDING
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _ensure_started(self):
+        # Threads do not survive forks, so workers forked after the first
+        # send (e.g. gunicorn preload or Celery prefork) start their own
+        if self._thread is not None and self._pid == os.getpid():
+            return
+
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            ready.set()
+            self._loop.run_forever()
+
+        self._pending = 0
+        self._pid = os.getpid()
+        self._thread = threading.Thread(
+            target=run, name="websocket-sender", daemon=True
+        )
+        self._thread.start()
+        ready.wait()
+
+    def submit(self, group_name: str, message: dict) -> bool:
+        """
+        Schedule the message to be sent and return immediately.
+        Returns False when the message was dropped because too many
+        messages are pending.
+        """
+        with self._lock:
+            self._ensure_started()
+
+            if self._pending >= self.max_pending:
+                ws_sender_dropped_total.labels(reason="overflow").inc()
+                logger.warning(
+                    "[WS SENDER] Dropping message to %s: %s messages pending",
+                    group_name,
+                    self._pending,
+                )
+                return False
+
+            self._pending += 1
+            ws_sender_pending.inc()
+
+        self._loop.call_soon_threadsafe(
+            self._loop.create_task, self._deliver(group_name, message)
+        )
+        return True
+
+    async def _deliver(self, group_name: str, message: dict):
+        try:
+            if await async_group_send(group_name, message):
+                ws_sender_sent_total.inc()
+            else:
+                ws_sender_dropped_total.labels(reason="retries_exhausted").inc()
+        finally:
+            with self._lock:
+                self._pending -= 1
+                ws_sender_pending.dec()
+                self._idle.notify_all()
+
+    def wait_until_idle(self, timeout: float = None) -> bool:
+        """
+        Block until every pending message was delivered or dropped.
+        Returns False on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._lock:
+            while self._pending > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+
+        return True
+
+
+_sender: Optional[BackgroundWebsocketSender] = None
+_sender_lock = threading.Lock()
+
+
+def get_background_sender() -> BackgroundWebsocketSender:
+    global _sender
+
+    if _sender is None:
+        with _sender_lock:
+            if _sender is None:
+                _sender = BackgroundWebsocketSender()
+                atexit.register(_flush_at_exit)
+
+    return _sender
+
+
+def _flush_at_exit():
+    if _sender is not None and _sender.pending:
+        if not _sender.wait_until_idle(settings.WS_SENDER_SHUTDOWN_TIMEOUT):
+            logger.warning(
+                "[WS SENDER] Exiting with %s undelivered messages", _sender.pending
+            )